@@ -0,0 +1,104 @@
+"""
+Benchmark tabular questions answered by the columnar engine against the same questions answered by Cypher.
+
+The columnar engine is timed over the Bloomberg dataset held in memory. If Neo4j is running, configured through
+NEO4J_URI, NEO4J_USERNAME and NEO4J_PASSWORD as for the app (e.g. `docker compose up neo4j`), the dataset is also
+loaded as one node per row into a `Benchmark_` namespace and the equivalent Cypher timed. The LLM that writes the
+Cypher in the app is not included, so the Cypher timings are a lower bound on that path. The namespace is removed
+afterwards.
+
+Run from the `backend` directory:
+
+    python -m benchmarks.columnar_engine_benchmark --repeats 20
+"""
+
+import argparse
+import asyncio
+import csv
+import time
+from typing import Callable, Iterator
+
+from src.utils import graph_db_utils
+from src.utils.columnar_engine import ColumnarStore
+
+DATASET = "./datasets/bloomberg.csv"
+NAMESPACE = "Benchmark_"
+IMPORT_QUERY = (
+    "WITH $data AS data UNWIND data.all_data[1..] AS row "
+    "CREATE (:Benchmark_Row {company: row[1], year: toInteger(row[2]), esg_score: toFloat(row[3]), "
+    "industry: row[10], scope_1: toFloat(row[17])})"
+)
+
+# Each question as the router would describe it, with the equivalent Cypher
+QUESTIONS = [
+    (
+        ("Average ESG score by industry", "group", "ESG_score, industry", "average", "descending", "2021"),
+        "MATCH (r:Benchmark_Row) WHERE r.year = 2021 AND r.esg_score IS NOT NULL "
+        "RETURN r.industry AS industry, avg(r.esg_score) AS average ORDER BY average DESC",
+    ),
+    (
+        ("Which company has the highest Scope_1 emissions?", "sort", "Scope_1", "none", "descending", "latest"),
+        "MATCH (r:Benchmark_Row) WITH max(r.year) AS latest MATCH (r:Benchmark_Row) "
+        "WHERE r.year = latest AND r.scope_1 IS NOT NULL "
+        "RETURN r.company AS company, r.scope_1 AS scope_1 ORDER BY scope_1 DESC LIMIT 1",
+    ),
+    (
+        ("Total Scope_1 emissions of airlines", "sum", "Scope_1, Airlines", "sum", "none", "2019 to 2021"),
+        "MATCH (r:Benchmark_Row) WHERE r.industry = 'Airlines' AND r.year >= 2019 AND r.year <= 2021 "
+        "RETURN sum(r.scope_1) AS total",
+    ),
+]
+
+
+def read_csv_rows(path: str) -> Iterator[list[str]]:
+    with open(path, newline="", encoding="utf-8") as file:
+        yield from csv.reader(file)
+
+
+async def time_async(action: Callable, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        await action()
+    return (time.perf_counter() - start) / repeats
+
+
+def time_sync(action: Callable, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        action()
+    return (time.perf_counter() - start) / repeats
+
+
+async def main(repeats: int) -> None:
+    store = ColumnarStore()
+    start = time.perf_counter()
+    store.load("bloomberg", read_csv_rows(DATASET))
+    print(f"Columnar load: {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    try:
+        await graph_db_utils.populate_db(IMPORT_QUERY, read_csv_rows(DATASET), NAMESPACE)
+        neo4j_available = True
+    except Exception as e:
+        print(f"Neo4j is unavailable, only the columnar engine is timed: {e}")
+        neo4j_available = False
+
+    for parameters, cypher in QUESTIONS:
+        print(f"\n{parameters[0]}")
+        columnar = time_sync(lambda: store.query(*parameters), repeats)
+        print(f"  columnar engine: {columnar * 1000:.2f}ms")
+        if neo4j_available:
+            # The first run compiles the query, so only its execution is timed
+            await graph_db_utils.execute_query(cypher)
+            duration = await time_async(lambda: graph_db_utils.execute_query(cypher), repeats)
+            print(f"  cypher:          {duration * 1000:.2f}ms ({duration / columnar:.0f}x slower)")
+
+    if neo4j_available:
+        await graph_db_utils.execute_query("MATCH (r:Benchmark_Row) DETACH DELETE r")
+        await graph_db_utils.close_driver()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the columnar engine against Cypher")
+    parser.add_argument("--repeats", type=int, default=20, help="Number of times each question is answered")
+    args = parser.parse_args()
+    asyncio.run(main(args.repeats))
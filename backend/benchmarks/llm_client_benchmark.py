@@ -0,0 +1,106 @@
+"""
+Benchmark per-call latency of a fresh HTTP client per LLM call against the pooled, keep-alive clients each
+LLM instance now owns.
+
+A local stub of the OpenAI-compatible `/v1/chat/completions` endpoint is started so that only client
+overheads are measured. Against a real provider the gap is larger, as every new client also pays for DNS and
+a TLS handshake.
+
+Run from the `backend` directory:
+
+    python -m benchmarks.llm_client_benchmark --calls 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable
+
+import aiohttp
+from aiohttp import web
+from openai import AsyncOpenAI
+
+from src.llm import lmstudio
+from src.llm.http_client import create_async_http_client
+from src.llm.lmstudio import LMStudio
+from src.utils.usage_recorder import ConsoleUsageRecorder
+
+STUB_RESPONSE = {
+    "id": "chatcmpl-stub",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "stub-model",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "stub answer"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+PAYLOAD = {"model": "stub-model", "messages": [{"role": "user", "content": "Hello"}]}
+
+
+async def start_stub_server() -> tuple[web.AppRunner, str]:
+    async def chat_completions(_: web.Request) -> web.Response:
+        return web.json_response(STUB_RESPONSE)
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def measure(name: str, calls: int, call: Callable[[], Awaitable]) -> None:
+    await call()  # warm up
+    durations = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await call()
+        durations.append((time.perf_counter() - start) * 1000)
+    durations.sort()
+    print(
+        f"{name:<40} mean {statistics.mean(durations):7.2f}ms  "
+        f"p50 {durations[len(durations) // 2]:7.2f}ms  p95 {durations[int(len(durations) * 0.95)]:7.2f}ms"
+    )
+
+
+async def main(calls: int) -> None:
+    runner, base_url = await start_stub_server()
+    try:
+        async def aiohttp_new_session():
+            async with aiohttp.ClientSession() as session:
+                async with session.post(f"{base_url}/v1/chat/completions", json=PAYLOAD) as response:
+                    await response.text()
+
+        lmstudio.config.lmstudio_url = base_url
+        pooled_lmstudio = LMStudio(ConsoleUsageRecorder())
+
+        async def lmstudio_pooled():
+            await pooled_lmstudio.chat("stub-model", "system", "Hello", agent="benchmark")
+
+        async def openai_new_client():
+            async with AsyncOpenAI(api_key="stub", base_url=f"{base_url}/v1") as client:
+                await client.chat.completions.create(**PAYLOAD)
+
+        pooled_openai = AsyncOpenAI(api_key="stub", base_url=f"{base_url}/v1", http_client=create_async_http_client())
+
+        async def openai_pooled():
+            await pooled_openai.chat.completions.create(**PAYLOAD)
+
+        await measure("LM Studio: new ClientSession per call", calls, aiohttp_new_session)
+        await measure("LM Studio: pooled session", calls, lmstudio_pooled)
+        await measure("OpenAI: new AsyncOpenAI per call", calls, openai_new_client)
+        await measure("OpenAI: pooled client", calls, openai_pooled)
+
+        await pooled_lmstudio.close()
+        await pooled_openai.close()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pooled vs per-call LLM HTTP clients")
+    parser.add_argument("--calls", type=int, default=200, help="Number of timed calls per scenario")
+    args = parser.parse_args()
+    asyncio.run(main(args.calls))
@@ -0,0 +1,80 @@
+"""
+Benchmark concurrent DatastoreAgent questions against the previous synchronous Neo4j access, where every query
+blocked the event loop and the driver was closed (and its connection pool thrown away) after each query.
+
+The LLM is stubbed to return a fixed Cypher query immediately, so only the database side is measured. This
+benchmark needs a running Neo4j, configured through NEO4J_URI, NEO4J_USERNAME and NEO4J_PASSWORD as for the
+app (e.g. `docker compose up neo4j`).
+
+Run from the `backend` directory:
+
+    python -m benchmarks.neo4j_concurrency_benchmark --questions 20
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from neo4j import GraphDatabase
+
+from src.agents import datastore_agent
+from src.agents.datastore_agent import generate_cypher_query_core
+from src.utils import graph_db_utils
+from src.utils.semantic_layer_builder import semantic_layer_ready
+
+# A read query that keeps the database busy for a few tens of milliseconds
+QUERY = "UNWIND range(1, 500000) AS x RETURN sum(x) AS total"
+
+
+class StubLLM:
+    async def chat(self, *args, **kwargs) -> str:
+        return json.dumps({"query": QUERY})
+
+
+async def blocking_execute_query(query):
+    # The previous implementation: a synchronous driver, closed after every query
+    driver = GraphDatabase.driver(graph_db_utils.URI, auth=graph_db_utils.AUTH)
+    try:
+        with driver.session() as session:
+            return [record.data() for record in session.run(query)]
+    finally:
+        driver.close()
+
+
+async def ask_questions(questions: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(
+        *[
+            generate_cypher_query_core("intent", "operation", "params", "none", "none", "none", StubLLM(), "stub")
+            for _ in range(questions)
+        ]
+    )
+    return time.perf_counter() - start
+
+
+async def main(questions: int) -> None:
+    semantic_layer_ready.set()
+    datastore_agent.cache = {"nodes": [], "relationships": []}
+
+    # Time a single question first, so the concurrent timings can be compared against running them in sequence
+    await graph_db_utils.execute_query(QUERY)
+    single = await ask_questions(1)
+
+    async_duration = await ask_questions(questions)
+
+    datastore_agent.execute_query = blocking_execute_query
+    blocking_duration = await ask_questions(questions)
+
+    print(f"Single question: {single * 1000:.0f}ms")
+    print(f"{questions} concurrent questions, blocking driver closed per query: {blocking_duration * 1000:.0f}ms")
+    print(f"{questions} concurrent questions, async pooled driver:          {async_duration * 1000:.0f}ms")
+
+    await graph_db_utils.close_driver()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark concurrent DatastoreAgent questions against Neo4j")
+    parser.add_argument("--questions", type=int, default=20, help="Number of questions asked at once")
+    args = parser.parse_args()
+    asyncio.run(main(args.questions))
@@ -71,18 +71,21 @@ class ChatAgent(Agent):
         return {
             "agent": self.name,
             "description": self.description() if callable(self.description) else self.description,
-            "tools": [
-                {
-                    "name": tool.name,
-                    "description": tool.description,
-                    "parameters": {
-                        key: dataclasses.asdict(parameter) for key, parameter in tool.parameters.items()
-                    }
-                }
-                for tool in self.tools
-            ]
+            "tools": self.get_tool_details()
         }
 
+    def get_tool_details(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "name": tool.name,
+                "description": tool.description,
+                "parameters": {
+                    key: dataclasses.asdict(parameter) for key, parameter in tool.parameters.items()
+                }
+            }
+            for tool in self.tools
+        ]
+
 
 T = TypeVar('T', bound=ChatAgent)
 
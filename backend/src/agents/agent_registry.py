@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+from functools import cache
+import json
+import logging
+from typing import Iterable, Optional
+
+from src.agents import ChatAgent, get_chat_agents
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AgentDescriptor:
+    agent: ChatAgent
+    # The agent's details serialised for the router prompt, or None if its description changes, as the FileAgent's
+    # does with the files uploaded in the session
+    details: Optional[str]
+    serialised_tools: str
+
+
+def create_descriptor(agent: ChatAgent) -> AgentDescriptor:
+    serialised_tools = json.dumps(agent.get_tool_details())
+    if callable(agent.description):
+        return AgentDescriptor(agent, None, serialised_tools)
+    return AgentDescriptor(agent, serialise_details(agent.name, agent.description, serialised_tools), serialised_tools)
+
+
+def serialise_details(name: str, description: str, serialised_tools: str) -> str:
+    return f'{{"agent": {json.dumps(name)}, "description": {json.dumps(description)}, "tools": {serialised_tools}}}'
+
+
+class AgentRegistry:
+    """
+    The chat agents, created once, with their details serialised for the router prompt. Agents whose description
+    changes are listed after the rest, so that the prompt begins with the same text on every call and can be served
+    from a provider's prompt cache, and their details are only serialised again when their description changes.
+    """
+
+    def __init__(self, agents: Iterable[ChatAgent]):
+        descriptors = [create_descriptor(agent) for agent in agents]
+        self.descriptors = tuple(sorted(descriptors, key=lambda descriptor: descriptor.details is None))
+        self.agents = {descriptor.agent.name: descriptor.agent for descriptor in self.descriptors}
+        self.dynamic_details: dict[str, tuple[str, str]] = {}
+
+    def get_agent(self, name: str) -> Optional[ChatAgent]:
+        return self.agents.get(name)
+
+    def get_agents(self, excluded_agents: Iterable[str] = ()) -> list[ChatAgent]:
+        excluded = set(excluded_agents)
+        return [descriptor.agent for descriptor in self.descriptors if descriptor.agent.name not in excluded]
+
+    def get_details(self, descriptor: AgentDescriptor) -> str:
+        if descriptor.details is not None:
+            return descriptor.details
+        name = descriptor.agent.name
+        description = descriptor.agent.description
+        if callable(description):
+            description = description()
+        cached = self.dynamic_details.get(name)
+        if cached is None or cached[0] != description:
+            cached = (description, serialise_details(name, description, descriptor.serialised_tools))
+            self.dynamic_details[name] = cached
+        return cached[1]
+
+    def get_catalogue(self, excluded_agents: Iterable[str] = ()) -> str:
+        """
+        The details of the agents and their tools as a JSON list, for the router to choose from
+        """
+        excluded = set(excluded_agents)
+        details = [
+            self.get_details(descriptor) for descriptor in self.descriptors if descriptor.agent.name not in excluded
+        ]
+        return "[\n" + ",\n".join(details) + "\n]"
+
+
+@cache
+def get_agent_registry() -> AgentRegistry:
+    registry = AgentRegistry(get_chat_agents())
+    logger.info(f"Registered chat agents: {', '.join(registry.agents)}")
+    return registry
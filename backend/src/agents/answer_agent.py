@@ -1,18 +1,39 @@
+import time
+
 from src.utils import get_scratchpad
 from src.prompts import PromptEngine
+from src.websockets.connection_manager import connection_manager
+from src.websockets.types import Message, MessageTypes
 
 from src.agents import Agent
 
 engine = PromptEngine()
 
+# The least time between two streamed updates of an answer. Each update carries the answer so far, so a client that
+# misses a message still renders the full answer, and sending one per chunk would resend the answer for every token
+ANSWER_STREAM_INTERVAL_SECONDS = 0.25
+
 
 class AnswerAgent(Agent):
     async def create_answer(self, utterance: str) -> str:
         final_scratchpad = get_scratchpad()
 
-        return await self.llm.chat(
+        answer = ""
+        streamed_answer = ""
+        last_streamed_at = float("-inf")
+        async for chunk in self.llm.chat_stream(
             self.model,
             engine.load_prompt("create-answer-system-prompt"),
             engine.load_prompt("create-answer-user-prompt", question=utterance, final_scratchpad=final_scratchpad),
             agent="answer"
-        )
+        ):
+            answer += chunk
+            if time.monotonic() - last_streamed_at >= ANSWER_STREAM_INTERVAL_SECONDS:
+                streamed_answer = answer
+                await connection_manager.broadcast(Message(type=MessageTypes.CHAT_ANSWER_STREAM, data=answer))
+                last_streamed_at = time.monotonic()
+
+        if answer != streamed_answer:
+            await connection_manager.broadcast(Message(type=MessageTypes.CHAT_ANSWER_STREAM, data=answer))
+
+        return answer
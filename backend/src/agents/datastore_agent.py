@@ -1,20 +1,34 @@
+import asyncio
 import json
 import logging
 import os
 
 from dotenv import load_dotenv
 from src.llm.llm import LLM
+from src.llm.prompt import Prompt
+from src.llm.scheduler import Priority, llm_priority
 from src.utils.graph_db_utils import execute_query
+from src.utils.dataset_registry import get_datasets
+from src.utils.cypher_plan_cache import (
+    CypherPlan,
+    confirm_current_plan,
+    create_plan_key,
+    current_plan,
+    evict_cypher_plan,
+    get_cypher_plan,
+)
 from src.prompts import PromptEngine
 from datetime import datetime
-from src.utils import to_json
+from src.utils import Config, to_json
+from src.utils.columnar_engine import columnar_store
 from src.utils.log_publisher import LogPrefix, publish_log_info
 from src.agents.agent import chat_agent
 from src.agents.base_chat_agent import BaseChatAgent
-from src.agents.tool import tool, Parameter, ToolActionSuccess, ToolActionFailure
+from src.agents.tool import tool, Parameter, ToolActionSuccess, ToolActionFailure, ToolAnswerType
 from src.utils.semantic_layer_builder import get_semantic_layer, semantic_layer_ready
 
 logger = logging.getLogger(__name__)
+config = Config()
 
 engine = PromptEngine()
 
@@ -38,8 +52,32 @@ async def generate_cypher_query_core(
         graph_schema = await get_semantic_layer_cache(llm, model)
         graph_schema = json.dumps(graph_schema, separators=(",", ":"))
 
-        generate_cypher_query_prompt = engine.load_prompt(
-            "generate-cypher-query", graph_schema=graph_schema, current_date=datetime.now()
+        plan_key = create_plan_key(
+            graph_schema,
+            question_intent=question_intent,
+            operation=operation,
+            question_params=question_params,
+            aggregation=aggregation,
+            sort_order=sort_order,
+            timeframe=timeframe,
+        )
+        cached_query = await get_cypher_plan(plan_key)
+        if cached_query is not None:
+            try:
+                await publish_log_info(
+                    LogPrefix.USER, f"Cypher reused from a previous question: {cached_query}", __name__
+                )
+                response = await run_query(cached_query)
+                current_plan.set(CypherPlan(plan_key, cached_query, from_cache=True))
+                return ToolActionSuccess(response)
+            except Exception as e:
+                logger.warning(f"Cached Cypher failed, generating a new query: {e}")
+                await evict_cypher_plan(plan_key)
+
+        # The date changes on every call, so it follows the instructions and schema rather than being part of them
+        generate_cypher_query_prompt = Prompt(
+            engine.load_prompt("generate-cypher-query", graph_schema=graph_schema),
+            engine.load_prompt("current-date", current_date=datetime.now()),
         )
 
         llm_query = await llm.chat(
@@ -49,14 +87,20 @@ async def generate_cypher_query_core(
         await publish_log_info(LogPrefix.USER, f"Cypher generated by the LLM: {llm_query}", __name__)
         if json_query["query"] == "None":
             return ToolActionFailure("No database query", True)
-        response = execute_query(json_query["query"])
-        await publish_log_info(LogPrefix.USER, f"Database response: {response}", __name__)
+        response = await run_query(json_query["query"])
+        current_plan.set(CypherPlan(plan_key, json_query["query"], from_cache=False))
     except Exception as e:
         logger.error(f"Error during data retrieval: {e}")
         raise
     return ToolActionSuccess(response)
 
 
+async def run_query(query: str) -> list:
+    response = await execute_query(query, use_cache=True)
+    await publish_log_info(LogPrefix.USER, f"Database response: {response}", __name__)
+    return response
+
+
 @tool(
     name="generate cypher query",
     description="Generate Cypher query if the category is data driven, based on the operation to be performed",
@@ -96,6 +140,64 @@ async def generate_cypher(
     )
 
 
+async def analyse_tabular_data_core(
+    question_intent, operation, question_params, aggregation, sort_order, timeframe
+) -> ToolActionSuccess | ToolActionFailure:
+    response = await asyncio.to_thread(
+        columnar_store.query, question_intent, operation, question_params, aggregation, sort_order, timeframe
+    )
+    if response is None:
+        # The router retries the question, which it can then answer with the generate cypher query tool
+        return ToolActionFailure(
+            "The question does not map onto the columns of a dataset, use the generate cypher query tool", True
+        )
+    await publish_log_info(LogPrefix.USER, f"Columnar engine response: {response}", __name__)
+    return ToolActionSuccess(response)
+
+
+@tool(
+    name="analyse tabular data",
+    description="Answer a data driven question by filtering, grouping, aggregating and sorting the columns of a "
+    "dataset directly, without a database query. Use this in preference to generate cypher query for questions that "
+    "aggregate, rank or look up numeric columns, such as ESG scores or emissions, of companies, industries or years. "
+    "Use generate cypher query for questions about relationships, such as fund holdings.",
+    parameters={
+        "question_intent": Parameter(
+            type="string",
+            description="The intent the question will be based on",
+        ),
+        "operation": Parameter(
+            type="string",
+            description="The operation to perform, e.g. filter, group, aggregate or sort",
+        ),
+        "question_params": Parameter(
+            type="string",
+            description="The column names and values the question refers to, e.g. 'ESG score, Airlines industry', "
+            "or none if no params required",
+        ),
+        "aggregation": Parameter(
+            type="string",
+            description="One of average, sum, count, max or min, or none if no aggregation is needed",
+        ),
+        "sort_order": Parameter(
+            type="string",
+            description="ascending or descending, or none if no sort_order is needed",
+        ),
+        "timeframe": Parameter(
+            type="string",
+            description="The year or range of years to be considered, e.g. '2020 to 2023', latest for the most "
+            "recent year, or none if no timeframe is needed",
+        ),
+    },
+)
+async def analyse_tabular_data(
+    question_intent, operation, question_params, aggregation, sort_order, timeframe, llm: LLM, model
+) -> ToolActionSuccess | ToolActionFailure:
+    return await analyse_tabular_data_core(
+        question_intent, operation, question_params, aggregation, sort_order, timeframe
+    )
+
+
 async def get_semantic_layer_cache(llm, model):
     global cache
     if not cache:
@@ -115,19 +217,27 @@ async def initialize_semantic_layer():
         llm_instances = LLM.get_instances()
         llm = llm_instances.get(llm_name)
 
-        await get_semantic_layer_cache(llm, model_name)
+        with llm_priority(Priority.BACKGROUND):
+            await get_semantic_layer_cache(llm, model_name)
     except Exception as e:
         logger.exception(e)
 
 
+dataset_names = ", ".join(dataset.file_name for dataset in get_datasets())
+
+
 @chat_agent(
     name="DatastoreAgent",
-    description="This agent is responsible for answering questions about the bloomberg.csv dataset. This includes "
-    "retrieving ESG scores, financial metrics, and other bloomberg-specific information. It interacts with "
-    "the graph database to extract, process, and return ESG-related information from various sources, such "
-    "as company sustainability reports or fund portfolios. This agent can not answer questions that do not "
-    "specifically reference the bloomberg.csv dataset.",
-    tools=[generate_cypher],
+    description=f"This agent is responsible for answering questions about the {dataset_names} datasets. This "
+    "includes retrieving ESG scores, financial metrics, fund holdings and other dataset-specific information. It "
+    "interacts with the graph database to extract, process, and return ESG-related information from various "
+    "sources, such as company sustainability reports or fund portfolios. This agent can not answer questions that "
+    f"do not specifically reference one of the {dataset_names} datasets.",
+    tools=[generate_cypher, analyse_tabular_data] if config.columnar_engine_enabled else [generate_cypher],
 )
 class DatastoreAgent(BaseChatAgent):
-    pass
+    async def validate(self, utterance: str, answer: ToolAnswerType) -> bool:
+        valid = await super().validate(utterance, answer)
+        # Only Cypher that produced a valid answer is reused for the same question parameters
+        await confirm_current_plan(valid)
+        return valid
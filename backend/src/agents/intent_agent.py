@@ -1,9 +1,11 @@
+from src.llm.prompt import Prompt
 from src.prompts import PromptEngine
 from src.agents import Agent
-from src.session import get_session_chat
-from src.session.file_uploads import get_uploaded_report
+from src.session import Message
+from src.session.conversation_memory import NO_CHAT_HISTORY, format_message, get_chat_history
 import logging
 from src.utils.config import Config
+from src.utils.report_digest import get_uploaded_report_prompt
 
 
 config = Config()
@@ -12,27 +14,20 @@ engine = PromptEngine()
 
 logger = logging.getLogger(__name__)
 
-report_prompt_template = "The following report was generated from the file {filename}:\n{report_content}"
-
 
 class IntentAgent(Agent):
     async def determine_intent(self, utterance: str) -> str:
-        session_chat = get_session_chat()
-        session_report = get_uploaded_report()
-        if session_report and session_report.get("filename") and session_report.get("report"):
-            report_prompt = report_prompt_template.format(
-                filename=session_report.get("filename"),
-                report_content=session_report.get("report")
-            )
-        else:
-            report_prompt = "There is no report content"
+        report_prompt = await get_uploaded_report_prompt(utterance, config.intent_report_tokens)
 
         return await self.llm.chat(
             self.model,
-            engine.load_prompt(
-                "intent-system",
-                chat_history=session_chat if session_chat else "There is no chat history",
-                report_prompt=report_prompt,
+            Prompt(
+                engine.load_prompt("intent-system"),
+                engine.load_prompt(
+                    "intent-system-context",
+                    chat_history=get_chat_history(config.intent_chat_history_tokens),
+                    report_prompt=report_prompt or "There is no report content",
+                ),
             ),
             user_prompt=engine.load_prompt(
                 "intent",
@@ -41,3 +36,15 @@ class IntentAgent(Agent):
             agent="intent",
             return_json=True
         )
+
+    async def summarise_conversation(self, previous_summary: str | None, messages: list[Message]) -> str:
+        return await self.llm.chat(
+            self.model,
+            engine.load_prompt(
+                "summarise-conversation",
+                previous_summary=previous_summary or NO_CHAT_HISTORY,
+                messages="\n".join(format_message(message) for message in messages),
+            ),
+            user_prompt="Summarise the conversation.",
+            agent="conversation_summary",
+        )
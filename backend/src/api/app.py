@@ -13,14 +13,23 @@ from src.session.chat_response import get_session_chat_response_ids
 from src.chat_storage_service import clear_chat_messages, get_chat_message
 from src.directors.report_director import create_report_from_file, prepare_file_for_report
 from src.session.file_uploads import clear_session_file_uploads, get_report
-from src.session.redis_session_middleware import reset_session
+from src.session.redis_session_middleware import get_session_id, reset_session
 from src.utils import Config, test_connection
-from src.directors.chat_director import question, dataset_upload
+from src.directors.chat_director import compact_conversation, question, dataset_upload
 from src.websockets.connection_manager import connection_manager, parse_message
 from src.session import RedisSessionMiddleware
 from src.suggestions_generator import generate_suggestions
 from src.utils.file_utils import get_file_upload
+from src.utils.graph_db_utils import close_driver
+from src.utils.graph_indexes import get_index_coverage
+from src.fast_path_router import fast_path_router
+from src.router import router_decision_cache
+from src.agents.agent_registry import get_agent_registry
+from src.utils.query_cache import query_cache
+from src.utils.redis_utils import redis_health
+from src.llm import LLM
 from src.llm.openai import OpenAILLMFileUploadManager
+from src.llm.scheduler import scheduler
 from src.websockets.connection_manager import Message, MessageTypes
 
 config_file_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "config.ini"))
@@ -33,6 +42,9 @@ config = Config()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # start up
+    await redis_health.start()
+    # Create the chat agents before the first question, rather than while it is routed
+    get_agent_registry()
     try:
         logger.info("Starting dataset upload and semantic layer initialization.")
         asyncio.create_task(dataset_upload())
@@ -44,6 +56,9 @@ async def lifespan(app: FastAPI):
     # meaning no graceful shutdown logs will be seen
     openai_file_manager = OpenAILLMFileUploadManager()
     await openai_file_manager.delete_all_files()
+    await LLM.close_instances()
+    await close_driver()
+    await redis_health.stop()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -79,7 +94,7 @@ report_get_upload_failed_response = "Unable to download report. Check the servic
 async def health_check():
     response = JSONResponse(status_code=200, content=healthy_response)
     try:
-        if not test_connection():
+        if not await test_connection():
             response = JSONResponse(status_code=500, content=unhealthy_neo4j_response)
     except Exception as e:
         logger.exception(f"Healthcheck method failed with error: {e}")
@@ -88,11 +103,41 @@ async def health_check():
         return response
 
 
+@app.get("/metrics/llm")
+async def llm_metrics():
+    return JSONResponse(status_code=200, content=scheduler.get_metrics())
+
+
+@app.get("/metrics/query-cache")
+async def query_cache_metrics():
+    return JSONResponse(status_code=200, content=query_cache.get_metrics())
+
+
+@app.get("/metrics/index-coverage")
+async def index_coverage_metrics():
+    try:
+        return JSONResponse(status_code=200, content=await get_index_coverage())
+    except Exception as e:
+        logger.exception(e)
+        return JSONResponse(status_code=500, content="Unable to read index coverage")
+
+
+@app.get("/metrics/router")
+async def router_metrics():
+    return JSONResponse(
+        status_code=200,
+        content={**fast_path_router.get_metrics(), "decision_cache": router_decision_cache.get_metrics()},
+    )
+
+
 @app.get("/chat")
-async def chat(utterance: str):
+async def chat(utterance: str, background_tasks: BackgroundTasks):
     logger.info(f"Chat method called with utterance: {utterance}")
     try:
         final_result = await question(utterance)
+        session_id = get_session_id()
+        if session_id:
+            background_tasks.add_task(compact_conversation, session_id)
         return JSONResponse(status_code=200, content=final_result)
     except Exception as e:
         logger.exception(e)
@@ -106,8 +151,8 @@ async def clear_chat():
         cancellation_message = Message(type=MessageTypes.REPORT_CANCELLED, data="Chat session cleared")
         await connection_manager.broadcast(cancellation_message)
         # clear chatresponses and files first as need session data for keys
-        clear_chat_messages(get_session_chat_response_ids())
-        clear_session_file_uploads()
+        await clear_chat_messages(get_session_chat_response_ids())
+        await clear_session_file_uploads()
         reset_session()
         return Response(status_code=204)
     except Exception as e:
@@ -116,10 +161,10 @@ async def clear_chat():
 
 
 @app.get("/chat/{id}")
-def chat_message(id: str):
+async def chat_message(id: str):
     logger.info(f"Get chat message called with id: {id}")
     try:
-        final_result = get_chat_message(id)
+        final_result = await get_chat_message(id)
         if final_result is None:
             return JSONResponse(status_code=404, content=f"Message with id {id} not found")
         return JSONResponse(status_code=200, content=final_result)
@@ -147,13 +192,13 @@ async def report(file: UploadFile, background_tasks: BackgroundTasks):
         if not file.filename:
             raise HTTPException(status_code=400, detail="Filename missing from file upload.")
 
-        existing_id = get_llm_file_upload_id(file.filename)
+        existing_id = await get_llm_file_upload_id(file.filename)
         if existing_id:
             logger.info(f"File {file.filename} already uploaded to OpenAI with id '{existing_id}'")
 
         file_id = existing_id if existing_id else str(uuid.uuid4())
 
-        prepare_file_for_report(file_contents, file.filename, file_id)
+        await prepare_file_for_report(file_contents, file.filename, file_id)
 
         background_tasks.add_task(generate_report, file_contents, file.filename, file_id)
 
@@ -194,10 +239,10 @@ async def generate_report(file_contents: bytes, filename: str, file_id: str ):
         await connection_manager.broadcast(error_message)
 
 @app.get("/report/{id}")
-def download_report(id: str):
+async def download_report(id: str):
     logger.info(f"Get report download called for id: {id}")
     try:
-        final_result = get_report(id)
+        final_result = await get_report(id)
         if final_result is None:
             return JSONResponse(status_code=404, content=f"Message with id {id} not found")
         headers = {"Content-Disposition": 'attachment; filename="report.md"'}
@@ -211,7 +256,7 @@ def download_report(id: str):
 async def fetch_file(id: str):
     logger.info(f"fetch uploaded file id={id} ")
     try:
-        final_result = get_file_upload(id)
+        final_result = await get_file_upload(id)
         if final_result is None:
             return JSONResponse(status_code=404, content=f"Upload with id {id} not found")
         return JSONResponse(status_code=200, content=final_result)
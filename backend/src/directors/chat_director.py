@@ -1,22 +1,39 @@
 import asyncio
 from dataclasses import dataclass
+from itertools import islice
 import json
 import logging
 from typing import Optional
 from uuid import uuid4
 
 from src.agents.datastore_agent import initialize_semantic_layer
+from src.session.chat import CHAT_SESSION_KEY, CHAT_SUMMARY_SESSION_KEY
 from src.session.chat_response import update_session_chat_response_ids
+from src.session.conversation_memory import apply_summary, count_messages_to_summarise
+from src.session.redis_session import load_session
 from src.utils.json import try_pretty_print
 from src.chat_storage_service import ChatResponse, store_chat_message
 from src.utils import clear_scratchpad, update_scratchpad, get_scratchpad
 from src.session import update_session_chat
 from src.agents import get_intent_agent, get_answer_agent
-from src.utils.dynamic_knowledge_graph import generate_dynamic_knowledge_graph
+from src.utils.dynamic_knowledge_graph import DATASET_SAMPLE_SIZE, generate_dynamic_knowledge_graph
 from src.prompts import PromptEngine
 from src.supervisors.supervisor import solve_questions
 from src.utils import Config
-from src.utils.graph_db_utils import populate_db, is_db_populated
+from src.utils.graph_db_utils import populate_db, is_db_populated, remove_other_namespaces
+from src.utils.dataset_registry import (
+    Dataset,
+    apply_namespace,
+    create_content_hash,
+    get_datasets,
+    get_loaded_hash,
+    store_loaded_hash,
+)
+from src.llm.scheduler import Priority, llm_priority
+from src.utils.metric_views import materialise_metric_views
+from src.utils.columnar_engine import columnar_store
+from src.utils.graph_indexes import get_index_coverage, provision_merge_indexes, provision_property_indexes
+from src.utils.file_utils import read_csv_rows
 from src.websockets.connection_manager import connection_manager
 
 logger = logging.getLogger(__name__)
@@ -72,7 +89,7 @@ async def question(question: str) -> ChatResponse:
         reasoning=try_pretty_print(current_scratchpad),
     )
 
-    store_chat_message(response)
+    await store_chat_message(response)
     update_session_chat_response_ids(response.get("id"))
 
     clear_scratchpad()
@@ -80,6 +97,28 @@ async def question(question: str) -> ChatResponse:
     return response
 
 
+async def compact_conversation(session_id: str) -> None:
+    """
+    Fold the oldest messages of the chat history into its summary once it outgrows its window. This runs after the
+    response has been sent, so the summary does not add to the latency of a question.
+    """
+    try:
+        session = await load_session(session_id)
+        messages = session.get(CHAT_SESSION_KEY, [])
+        count = count_messages_to_summarise(messages)
+        if not count:
+            return
+        previous_summary = session.get(CHAT_SUMMARY_SESSION_KEY)
+        with llm_priority(Priority.BACKGROUND):
+            summary = await get_intent_agent().summarise_conversation(
+                previous_summary["text"] if previous_summary else None, messages[:count]
+            )
+        apply_summary(session, count, summary)
+        await session.save()
+    except Exception as e:
+        logger.exception(f"Failed to summarise the chat history for session {session_id}: {e}")
+
+
 async def __create_final_answer(question: str) -> FinalAnswer:
     datastore_agents = [scratch for scratch in get_scratchpad() if scratch['agent_name'] == 'DatastoreAgent']
     query_result = datastore_agents[-1]['result'] if datastore_agents else None
@@ -89,19 +128,70 @@ async def __create_final_answer(question: str) -> FinalAnswer:
     return FinalAnswer(message, query_result)
 
 
-async def dataset_upload() -> None:
-    dataset_file = "./datasets/bloomberg.csv"
+async def load_dataset(dataset: Dataset, content_hash: str) -> None:
+    # Only a sample of the dataset is needed to generate the knowledge graph, the rest is streamed into the database
+    sample_rows = list(islice(read_csv_rows(dataset.path), DATASET_SAMPLE_SIZE))
+    knowledge_graph_config = await generate_dynamic_knowledge_graph(sample_rows)
+
+    query = apply_namespace(knowledge_graph_config["cypher_query"], dataset.namespace)
+    await provision_merge_indexes(query)
+    await populate_db(query, read_csv_rows(dataset.path), dataset.namespace)
+    if config.metric_views_enabled:
+        await materialise_metric_views(read_csv_rows(dataset.path), dataset.namespace)
+    await store_loaded_hash(dataset, content_hash)
 
-    if is_db_populated():
-        logger.info("Skipping database population as already has data")
-        asyncio.create_task(initialize_semantic_layer())
-        return
 
-    with open(dataset_file, "r") as file:
-        csv_data = [[entry for entry in line.strip("\n").split(",")] for line in file]
+async def dataset_upload() -> None:
+    """
+    Load each registered dataset into its own namespace, skipping those already loaded with the same content.
+    Changed datasets are loaded concurrently and the semantic layer is then rebuilt over all of them.
+    """
+    datasets = get_datasets()
+
+    outdated: list[tuple[Dataset, str]] = []
+    for dataset in datasets:
+        content_hash = create_content_hash(dataset)
+        if await get_loaded_hash(dataset) == content_hash and await is_db_populated(dataset.namespace):
+            logger.info(f"Skipping dataset {dataset.file_name} as it is already loaded")
+        else:
+            outdated.append((dataset, content_hash))
+
+    if outdated:
+        await remove_other_namespaces([dataset.namespace for dataset in datasets])
+        with llm_priority(Priority.BACKGROUND):
+            results = await asyncio.gather(
+                *[load_dataset(dataset, content_hash) for dataset, content_hash in outdated], return_exceptions=True
+            )
+        for (dataset, _), result in zip(outdated, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to load dataset {dataset.file_name}: {result}")
 
-    knowledge_graph_config = await generate_dynamic_knowledge_graph(csv_data)
+    if config.columnar_engine_enabled:
+        await load_columnar_store(datasets)
 
-    populate_db(knowledge_graph_config["cypher_query"], csv_data)
+    # Indexes are part of the schema the semantic layer is built from, so are provisioned before it is built
+    await provision_indexes()
     asyncio.create_task(initialize_semantic_layer())
 
+
+async def load_columnar_store(datasets: list[Dataset]) -> None:
+    # The columnar copies are held in memory, so every dataset is loaded on startup, including unchanged ones
+    for dataset in datasets:
+        try:
+            await asyncio.to_thread(columnar_store.load, dataset.name, read_csv_rows(dataset.path))
+        except Exception as e:
+            logger.exception(f"Failed to load dataset {dataset.file_name} into the columnar engine: {e}")
+
+
+async def provision_indexes() -> None:
+    try:
+        await provision_property_indexes()
+        coverage = await get_index_coverage()
+        logger.info(
+            f"{coverage['indexed']} of {coverage['identifier_properties']} identifier properties are indexed"
+        )
+        for prop in coverage["properties"]:
+            if not prop["indexes"]:
+                logger.warning(f"Property {prop['property']} of {prop['label']} nodes is not indexed")
+    except Exception as e:
+        logger.exception(f"Failed to provision indexes: {e}")
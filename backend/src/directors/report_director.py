@@ -1,18 +1,21 @@
 import sys
 from fastapi import HTTPException
 from src.llm.llm import LLMFile
+from src.llm.scheduler import Priority, llm_priority
 from src.session.file_uploads import (
     FileUpload,
     ReportResponse,
     store_report,
+    store_report_digest,
     update_session_file_uploads
 )
 from src.agents import get_report_agent, get_materiality_agent
+from src.utils.report_digest import create_report_digest
 
 MAX_FILE_SIZE = 40 * 1024 * 1024
 
 
-def prepare_file_for_report(file_contents: bytes, filename: str, file_id:  str):
+async def prepare_file_for_report(file_contents: bytes, filename: str, file_id:  str):
     file_size = sys.getsizeof(file_contents)
 
     if file_size > MAX_FILE_SIZE:
@@ -25,7 +28,7 @@ def prepare_file_for_report(file_contents: bytes, filename: str, file_id:  str):
         content=None
     )
 
-    update_session_file_uploads(session_file)
+    await update_session_file_uploads(session_file)
 
 
 async def create_report_from_file(file_contents: bytes, filename: str, file_id:  str) -> ReportResponse:
@@ -34,11 +37,13 @@ async def create_report_from_file(file_contents: bytes, filename: str, file_id:
 
     report_agent = get_report_agent()
 
-    company_name = await report_agent.get_company_name(file)
+    # Reports are generated in the background, so give way to interactive chat when LLM calls are queued
+    with llm_priority(Priority.BACKGROUND):
+        company_name = await report_agent.get_company_name(file)
 
-    topics = await get_materiality_agent().list_material_topics_for_company(company_name)
+        topics = await get_materiality_agent().list_material_topics_for_company(company_name)
 
-    report = await report_agent.create_report(file, topics)
+        report = await report_agent.create_report(file, topics)
 
     report_response = ReportResponse(
         filename=filename,
@@ -47,7 +52,9 @@ async def create_report_from_file(file_contents: bytes, filename: str, file_id:
         answer=create_report_chat_message(filename, company_name, topics),
     )
 
-    store_report(report_response)
+    await store_report(report_response)
+    # Chat prompts include the digest of the report rather than all of it
+    await store_report_digest(create_report_digest(report_response))
 
     return report_response
 
@@ -0,0 +1,259 @@
+from collections import Counter
+from dataclasses import asdict, dataclass
+from functools import cache
+import json
+import logging
+import math
+from pathlib import Path
+import re
+from typing import Any, Callable, Optional
+
+from src.agents import ChatAgent
+from src.llm.retrieval import tokenize
+from src.session.file_uploads import get_session_file_uploads_meta
+from src.utils import Config
+from src.utils.usage_recorder import CSV_DIR
+
+logger = logging.getLogger(__name__)
+config = Config()
+
+CATALOGUE_PATH = "./library/catalogue.json"
+MATERIALITY_PATTERN = re.compile(r"\bmaterial(ity)?\b", re.IGNORECASE)
+
+
+@dataclass
+class Route:
+    agent: str
+    tool: str
+    # None if the parameters of the tool cannot be filled in without an LLM
+    parameters: Optional[dict[str, Any]]
+    confidence: float
+    # Whether the route came from a rule or from the classifier
+    source: str
+
+
+@dataclass
+class RouterStats:
+    fast_path_routes: int = 0
+    llm_routes: int = 0
+    # LLM routes for which the classifier also made a prediction, and how many of those it got right
+    comparisons: int = 0
+    agreements: int = 0
+
+    @property
+    def agreement_rate(self) -> float:
+        return self.agreements / self.comparisons if self.comparisons else 0.0
+
+    @property
+    def fast_path_rate(self) -> float:
+        total = self.fast_path_routes + self.llm_routes
+        return self.fast_path_routes / total if total else 0.0
+
+
+class RouteClassifier:
+    """
+    Multinomial naive Bayes classifier from the words of a question to the agent and tool that answered it
+    """
+
+    def __init__(self):
+        self.label_counts: Counter[tuple[str, str]] = Counter()
+        self.term_counts: dict[tuple[str, str], Counter[str]] = {}
+        self.vocabulary: set[str] = set()
+
+    def learn(self, question: str, label: tuple[str, str]) -> None:
+        terms = tokenize(question)
+        self.label_counts[label] += 1
+        self.term_counts.setdefault(label, Counter()).update(terms)
+        self.vocabulary.update(terms)
+
+    def predict(self, question: str, labels: set[tuple[str, str]]) -> Optional[tuple[tuple[str, str], float]]:
+        """
+        The most likely of the given labels with its confidence, or None if none of them have been learnt. The
+        confidence is the probability of the label, discounted by the share of the words of the question seen with it
+        before, so that a question unlike any seen is not confidently given the only label learnt.
+        """
+        candidates = [label for label in labels if self.label_counts[label]]
+        terms = tokenize(question)
+        if not candidates or not terms:
+            return None
+        total = sum(self.label_counts[label] for label in candidates)
+        vocabulary_size = len(self.vocabulary) + 1
+
+        log_likelihoods = {}
+        for label in candidates:
+            term_counts = self.term_counts[label]
+            label_terms = term_counts.total()
+            log_likelihoods[label] = math.log(self.label_counts[label] / total) + sum(
+                math.log((term_counts[term] + 1) / (label_terms + vocabulary_size)) for term in terms
+            )
+
+        best = max(log_likelihoods, key=log_likelihoods.__getitem__)
+        probability = 1 / sum(math.exp(value - log_likelihoods[best]) for value in log_likelihoods.values())
+        coverage = sum(term in self.term_counts[best] for term in terms) / len(terms)
+        return best, probability * coverage
+
+
+@cache
+def get_sectors() -> list[str]:
+    try:
+        with open(CATALOGUE_PATH) as file:
+            catalogue = json.load(file)
+    except OSError as e:
+        logger.warning(f"Unable to read the materiality catalogue: {e}")
+        return []
+    sectors = {entry["sector-label"] for entries in catalogue["library"].values() for entry in entries}
+    # Longest first, so that "Agriculture Aquaculture and Fishing" is found rather than "Aquaculture"
+    return sorted(sectors, key=len, reverse=True)
+
+
+def find_sector(question: str) -> Optional[str]:
+    lowered = question.lower()
+    return next((sector for sector in get_sectors() if sector.lower() in lowered), None)
+
+
+def find_uploaded_filename(question: str) -> Optional[str]:
+    try:
+        uploads = get_session_file_uploads_meta() or []
+    except LookupError:
+        # Routing outside of a request has no session uploads
+        return None
+    lowered = question.lower()
+    for upload in uploads:
+        filename = upload["filename"]
+        stem = Path(filename).stem.lower()
+        if filename.lower() in lowered or (len(stem) > 2 and re.search(rf"\b{re.escape(stem)}\b", lowered)):
+            return filename
+    return None
+
+
+# How each parameter of a tool is filled in from a question without an LLM
+PARAMETER_FILLERS: dict[str, Callable[[str], Optional[str]]] = {
+    "user_question": lambda question: question,
+    "search_query": lambda question: question,
+    "filename": find_uploaded_filename,
+    "sector": find_sector,
+}
+
+
+def fill_parameters(agent: ChatAgent, tool_name: str, question: str) -> Optional[dict[str, Any]]:
+    """
+    The parameters for a tool, or None if any of its required parameters cannot be filled in from the question
+    """
+    tool = next((tool for tool in agent.tools if tool.name == tool_name), None)
+    if tool is None:
+        return None
+    parameters = {}
+    for name, parameter in tool.parameters.items():
+        filler = PARAMETER_FILLERS.get(name)
+        value = filler(question) if filler else None
+        if value is not None:
+            parameters[name] = value
+        elif parameter.required:
+            return None
+    return parameters
+
+
+class FastPathRouter:
+    """
+    Route questions without an LLM where the route is obvious: questions naming an uploaded file or asking about the
+    materiality of a sector, and questions the classifier, trained on the past decisions of the LLM router, is
+    confident about. The LLM router is used for everything else, and its decisions are logged to train the classifier.
+    """
+
+    def __init__(self, decisions_path: Path):
+        self.decisions_path = decisions_path
+        self.classifier: Optional[RouteClassifier] = None
+        self.stats = RouterStats()
+
+    def get_classifier(self) -> RouteClassifier:
+        if self.classifier is None:
+            self.classifier = RouteClassifier()
+            if self.decisions_path.is_file():
+                with open(self.decisions_path) as file:
+                    for line in file:
+                        decision = json.loads(line)
+                        self.classifier.learn(decision["question"], (decision["agent"], decision["tool"]))
+            logger.info(f"Trained the router classifier on {self.classifier.label_counts.total()} decisions")
+        return self.classifier
+
+    def match_rules(self, question: str, agents: dict[str, ChatAgent]) -> Optional[Route]:
+        if "FileAgent" in agents and (filename := find_uploaded_filename(question)):
+            return Route(
+                "FileAgent", "read_file", {"user_question": question, "filename": filename}, 1.0, "rule"
+            )
+        if "MaterialityAgent" in agents and MATERIALITY_PATTERN.search(question) and (sector := find_sector(question)):
+            return Route(
+                "MaterialityAgent",
+                "answer_materiality_question",
+                {"user_question": question, "sector": sector},
+                1.0,
+                "rule",
+            )
+        return None
+
+    def predict(self, question: str, agents: dict[str, ChatAgent]) -> Optional[Route]:
+        """
+        The route the classifier predicts, however confident it is, with the parameters it can fill in
+        """
+        labels = {(agent.name, tool.name) for agent in agents.values() for tool in agent.tools}
+        prediction = self.get_classifier().predict(question, labels)
+        if prediction is None:
+            return None
+        (agent_name, tool_name), confidence = prediction
+        parameters = fill_parameters(agents[agent_name], tool_name, question)
+        return Route(agent_name, tool_name, parameters, confidence, "classifier")
+
+    def is_confident(self, route: Route) -> bool:
+        if route.source == "rule":
+            return True
+        examples = self.get_classifier().label_counts[(route.agent, route.tool)]
+        return (
+            route.parameters is not None
+            and route.confidence >= config.router_fast_path_confidence
+            and examples >= config.router_fast_path_min_examples
+        )
+
+    def route(self, question: str, agents: list[ChatAgent]) -> tuple[Optional[Route], bool]:
+        """
+        The predicted route for a question and whether it is confident enough to be taken without the LLM router
+        """
+        agents_by_name = {agent.name: agent for agent in agents}
+        route = self.match_rules(question, agents_by_name) or self.predict(question, agents_by_name)
+        confident = route is not None and self.is_confident(route)
+        if route is not None and confident:
+            self.stats.fast_path_routes += 1
+            logger.info(
+                f"Routed to {route.agent} {route.tool} by {route.source} with confidence {route.confidence:.2f}"
+            )
+        return route, confident
+
+    def record_llm_route(self, question: str, prediction: Optional[Route], agent: str, tool: str) -> None:
+        """
+        Compare the route the LLM router chose with the prediction, and learn from it
+        """
+        self.stats.llm_routes += 1
+        if prediction is not None:
+            self.stats.comparisons += 1
+            self.stats.agreements += prediction.agent == agent and prediction.tool == tool
+            logger.info(
+                f"Fast path predicted {prediction.agent} {prediction.tool} with confidence "
+                f"{prediction.confidence:.2f}, LLM router chose {agent} {tool}. Agreement rate "
+                f"{self.stats.agreement_rate:.2f} over {self.stats.comparisons} routes"
+            )
+
+        self.get_classifier().learn(question, (agent, tool))
+        try:
+            with open(self.decisions_path, mode="a") as file:
+                file.write(json.dumps({"question": question, "agent": agent, "tool": tool}) + "\n")
+        except OSError as e:
+            logger.warning(f"Unable to log router decision: {e}")
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            **asdict(self.stats),
+            "agreement_rate": self.stats.agreement_rate,
+            "fast_path_rate": self.stats.fast_path_rate,
+        }
+
+
+fast_path_router = FastPathRouter(CSV_DIR / config.router_decisions_log_filename)
@@ -1,4 +1,5 @@
 from .llm import LLM, LLMFile
+from .prompt import Prompt
 from .factory import get_llm
 from .mistral import Mistral
 from .count_calls import count_calls
@@ -12,5 +13,6 @@ __all__ = [
     "LLMFile",
     "Mistral",
     "OpenAI",
+    "Prompt",
     "LMStudio"
 ]
@@ -0,0 +1,23 @@
+import httpx
+
+from src.utils import Config
+
+config = Config()
+
+
+def create_async_http_client() -> httpx.AsyncClient:
+    """
+    Create a pooled, keep-alive HTTP client for an LLM provider SDK.
+
+    Each LLM instance owns one of these for its lifetime so that connections (and TLS sessions) are reused
+    across calls rather than re-established per request.
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=config.llm_max_connections,
+            max_keepalive_connections=config.llm_max_keepalive_connections,
+            keepalive_expiry=config.llm_keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(config.llm_timeout, connect=config.llm_connect_timeout),
+        follow_redirects=True,
+    )
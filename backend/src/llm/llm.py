@@ -1,14 +1,30 @@
 from abc import ABC, ABCMeta, abstractmethod
 from dataclasses import dataclass
 from os import PathLike
-from typing import Any, Coroutine, Dict, Optional, Union
+from typing import Any, AsyncIterator, Coroutine, Dict, Optional, Union
 
 from src.utils.usage_recorder import UsageRecorder, CSVUsageRecorder
 
 from .count_calls import count_calls
+from .prompt import Prompt
+from .response_cache import cache_response, capture_usage
+from .scheduler import schedule_call, schedule_stream, scheduler
 
 
-count_calls_of_functions = ["chat", "chat_with_file"]
+count_calls_of_functions = ["chat", "chat_with_file", "chat_stream"]
+# chat_with_file is not cached or scheduled itself as every provider answers it through a call to chat, which
+# is, with the content of the files in its prompt
+cache_response_of_functions = ["chat"]
+schedule_functions = {"chat": schedule_call, "chat_stream": schedule_stream}
+
+
+def calls_chat(func):
+    """
+    Mark a function as making its call through chat, so that it is not scheduled itself. Scheduling it as well would
+    hold a second slot while chat waits for its own, which never frees at a concurrency of one
+    """
+    func.calls_chat = True
+    return func
 
 
 @dataclass
@@ -26,6 +42,14 @@ class LLMMeta(ABCMeta):
         cls.instances[name.lower()] = cls(CSVUsageRecorder())
 
     def __new__(cls, name, bases, attrs):
+        for function, schedule in schedule_functions.items():
+            if function in attrs and not getattr(attrs[function], "calls_chat", False):
+                attrs[function] = schedule(attrs[function])
+
+        for function in cache_response_of_functions:
+            if function in attrs:
+                attrs[function] = cache_response(attrs[function])
+
         for function in count_calls_of_functions:
             if function in attrs:
                 attrs[function] = count_calls(attrs[function])
@@ -41,6 +65,17 @@ class LLM(ABC, metaclass=LLMMeta):
     def get_instances(cls):
         return cls.instances
 
+    @classmethod
+    async def close_instances(cls) -> None:
+        for instance in cls.instances.values():
+            await instance.close()
+
+    async def close(self) -> None:
+        """
+        Release any long-lived HTTP clients held by this LLM. Clients are recreated on next use.
+        """
+        pass
+
     def record_usage(
         self,
         model: str,
@@ -48,6 +83,7 @@ class LLM(ABC, metaclass=LLMMeta):
         agent: str,
         token_usage: Optional[Union[Dict, str]] = None,
         duration: float = 0.0,
+        usage_provider: Optional[str] = None,
     ) -> None:
         """
         Record usage information
@@ -56,23 +92,53 @@ class LLM(ABC, metaclass=LLMMeta):
             model: The model name used for the request
             provider: The provider name used for the request
             agent: The name of the agent making the call
-            token_usage: Dictionary containing token usage information
+            token_usage: Dictionary containing token usage information, including the prompt tokens served from the
+                provider's prompt cache as cached_tokens
             duration: Time taken for the request in seconds
+            usage_provider: The provider name to record in the usage log, when it differs from the provider the
+                request was rate limited under
         """
-        self.usage_recorder.record_activity(model, provider, agent, token_usage, duration)
+        self.usage_recorder.record_activity(model, usage_provider or provider, agent, token_usage, duration)
+        self.usage_recorder.record_prompt_cache_activity(agent, token_usage)
+        capture_usage(token_usage, duration)
+        scheduler.record_usage(provider, token_usage)
 
     @abstractmethod
     def chat(
-        self, model: str, system_prompt: str, user_prompt: str, agent: str, return_json: bool = False
+        self,
+        model: str,
+        system_prompt: str | Prompt,
+        user_prompt: str | Prompt,
+        agent: str,
+        return_json: bool = False,
     ) -> Coroutine[Any, Any, str]:
+        """
+        Chat with a model. Prompts given as a Prompt have their static prefix sent before their dynamic suffix, so
+        that the prefix can be served from the provider's prompt cache.
+        """
         pass
 
+    @calls_chat
+    async def chat_stream(
+        self,
+        model: str,
+        system_prompt: str | Prompt,
+        user_prompt: str | Prompt,
+        agent: str,
+        return_json: bool = False,
+    ) -> AsyncIterator[str]:
+        """
+        Stream the response to a chat as it is generated. Providers without streaming support yield the
+        complete response as a single chunk.
+        """
+        yield await self.chat(model, system_prompt, user_prompt, agent, return_json)
+
     @abstractmethod
     def chat_with_file(
         self,
         model: str,
-        system_prompt: str,
-        user_prompt: str,
+        system_prompt: str | Prompt,
+        user_prompt: str | Prompt,
         files: list[LLMFile],
         agent: str,
         return_json: bool = False,
@@ -81,10 +147,6 @@ class LLM(ABC, metaclass=LLMMeta):
 
 
 class LLMFileUploadManager(ABC):
-    @abstractmethod
-    async def upload_files(self, files: list[LLMFile]) -> list[str]:
-        pass
-
     @abstractmethod
     async def delete_all_files(self):
         pass
@@ -4,10 +4,13 @@ import json
 import aiohttp
 import re
 import time
+from typing import AsyncIterator
 from src.utils import Config
 from src.session.file_uploads import get_file_content_for_filename, set_file_content_for_filename
 from src.utils.file_utils import extract_text
 from .llm import LLM, LLMFile
+from .prompt import Prompt, create_messages, get_cached_tokens
+from .scheduler import RETRYABLE_STATUS_CODES, scheduler
 
 logger = logging.getLogger(__name__)
 config = Config()
@@ -20,11 +23,200 @@ class LMStudio(LLM):
     This implementation uses aiohttp to directly call LM Studio's API endpoints.
     """
 
-    async def chat(self, model, system_prompt: str, user_prompt: str, agent: str, return_json=False) -> str:
+    _session: aiohttp.ClientSession | None = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """
+        Get the long-lived, pooled keep-alive session used for all requests to LM Studio.
+        The session is created lazily as it must be bound to the running event loop.
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=config.llm_max_connections,
+                    keepalive_timeout=config.llm_keepalive_expiry,
+                ),
+                timeout=aiohttp.ClientTimeout(total=config.llm_timeout, connect=config.llm_connect_timeout),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def chat(
+        self, model, system_prompt: str | Prompt, user_prompt: str | Prompt, agent: str, return_json=False
+    ) -> str:
         logger.debug(
             "Called LMStudio llm. Waiting on response with prompt {0}.".format(str([system_prompt, user_prompt]))
         )
 
+        url = self._get_chat_completions_url()
+        headers = {"Content-Type": "application/json"}
+        payload = self._create_payload(model, system_prompt, user_prompt, return_json)
+
+        # Log the complete payload for debugging
+        logger.debug(f"LM Studio API request payload: {json.dumps(payload, indent=2)}")
+        logger.info(f"Sending direct HTTP request to LM Studio at {url}")
+
+        async def post() -> tuple[int, str]:
+            async with self.get_session().post(url, json=payload, headers=headers) as response:
+                response_text = await response.text()
+                if response.status in RETRYABLE_STATUS_CODES:
+                    raise aiohttp.ClientResponseError(
+                        response.request_info, response.history, status=response.status, message=response_text
+                    )
+                return response.status, response_text
+
+        start_time = time.time()
+        try:
+            status, response_text = await scheduler.with_retry("lmstudio", post)
+            duration = time.time() - start_time
+            logger.debug(f"LM Studio API raw response: {response_text}")
+
+            if status != 200:
+                logger.error(f"LM Studio API error: {status} - {response_text}")
+
+                # Try to extract more detailed error information if available
+                try:
+                    error_json = json.loads(response_text)
+                    if "error" in error_json:
+                        logger.error(f"Detailed error: {error_json['error']}")
+                except Exception as parse_error:
+                    logger.error(f"Error parsing error response: {str(parse_error)}")
+
+                return f"Error connecting to the local LLM server: {status}"
+
+            try:
+                result = json.loads(response_text)
+
+                # Log the full response from LM Studio for debugging
+                logger.debug(f"LM Studio API complete response: {json.dumps(result, indent=2)}")
+            except json.JSONDecodeError as json_error:
+                logger.error(f"Failed to parse response as JSON: {str(json_error)}")
+                return f"The LLM server returned an invalid JSON response: {response_text[:100]}..."
+            if "choices" not in result or not result["choices"]:
+                logger.error(f"No choices in LM Studio response: {result}")
+                return "The LLM server returned an incomplete response."
+            if "message" not in result["choices"][0]:
+                logger.error(f"No message in first choice: {result['choices'][0]}")
+                return "The LLM server returned an invalid response format."
+            content = result["choices"][0]["message"].get("content")
+            if not content:
+                logger.error("No content in message")
+                return "The LLM server returned an empty response."
+
+            # Log usage data if available
+            token_info = {}
+            if "usage" in result:
+                token_info = {
+                    "prompt_tokens": result["usage"].get("prompt_tokens", "N/A"),
+                    "completion_tokens": result["usage"].get("completion_tokens", "N/A"),
+                    "total_tokens": result["usage"].get("total_tokens", "N/A"),
+                    "cached_tokens": get_cached_tokens(result["usage"]),
+                }
+            else:
+                logger.warning("No usage data in LM Studio response")
+                token_info = {
+                    "prompt_tokens": "N/A",
+                    "completion_tokens": "N/A",
+                    "total_tokens": "N/A",
+                }
+
+                # Log to CSV
+            self.record_usage(
+                model="local_model",
+                provider="lmstudio",
+                agent=agent,
+                token_usage=token_info,
+                duration=duration,
+            )
+
+            logger.info(f"Successfully got response from LM Studio: {content[:100]}...")
+            logger.debug(f"Duration: {duration:.2f}s, Token usage: {token_info}")
+
+            # Return either raw content or validated JSON
+            return self._process_content(content, return_json) if return_json else content
+        except Exception as e:
+            logger.error(f"Error in HTTP request: {str(e)}")
+            return f"Error connecting to the local LLM server: {str(e)}"
+
+    async def chat_stream(
+        self, model, system_prompt: str | Prompt, user_prompt: str | Prompt, agent: str, return_json=False
+    ) -> AsyncIterator[str]:
+        logger.debug(
+            "Called LMStudio llm stream. Waiting on response with prompt {0}.".format(str([system_prompt, user_prompt]))
+        )
+
+        url = self._get_chat_completions_url()
+        headers = {"Content-Type": "application/json"}
+        payload = {
+            **self._create_payload(model, system_prompt, user_prompt, return_json),
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+
+        logger.info(f"Sending streaming HTTP request to LM Studio at {url}")
+
+        start_time = time.time()
+        content_streamed = False
+        try:
+            async with self.get_session().post(url, json=payload, headers=headers) as response:
+                if response.status != 200:
+                    response_text = await response.text()
+                    logger.error(f"LM Studio API error: {response.status} - {response_text}")
+                    yield f"Error connecting to the local LLM server: {response.status}"
+                    return
+
+                token_info = {
+                    "prompt_tokens": "N/A",
+                    "completion_tokens": "N/A",
+                    "total_tokens": "N/A",
+                }
+                # The response is a server-sent event stream of "data: {chunk}" lines, ending with "data: [DONE]"
+                async for line in response.content:
+                    event = line.decode("utf-8").strip()
+                    if not event.startswith("data:"):
+                        continue
+                    data = event[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    if chunk.get("usage"):
+                        token_info = {
+                            "prompt_tokens": chunk["usage"].get("prompt_tokens", "N/A"),
+                            "completion_tokens": chunk["usage"].get("completion_tokens", "N/A"),
+                            "total_tokens": chunk["usage"].get("total_tokens", "N/A"),
+                            "cached_tokens": get_cached_tokens(chunk["usage"]),
+                        }
+                    choices = chunk.get("choices") or []
+                    content = choices[0].get("delta", {}).get("content") if choices else None
+                    if content:
+                        content_streamed = True
+                        yield content
+                duration = time.time() - start_time
+
+                self.record_usage(
+                    model="local_model",
+                    provider="lmstudio",
+                    agent=agent,
+                    token_usage=token_info,
+                    duration=duration,
+                )
+                logger.debug(f"Duration: {duration:.2f}s, Token usage: {token_info}")
+
+                if not content_streamed:
+                    logger.error("No content in streamed response")
+                    yield "The LLM server returned an empty response."
+        except Exception as e:
+            logger.error(f"Error in streaming HTTP request: {str(e)}")
+            # Part of the answer has reached the caller, so an error message would read as the end of the answer
+            if content_streamed:
+                raise
+            yield f"Error connecting to the local LLM server: {str(e)}"
+
+    def _get_chat_completions_url(self) -> str:
         url = config.lmstudio_url
         if url is None:
             logger.error("LMSTUDIO_URL configuration is missing")
@@ -37,101 +229,25 @@ class LMStudio(LLM):
             url = url[:-1]
 
         # Construct the API endpoint
-        url = f"{url}/v1/chat/completions"
+        return f"{url}/v1/chat/completions"
 
-        headers = {"Content-Type": "application/json"}
+    def _create_payload(
+        self, model, system_prompt: str | Prompt, user_prompt: str | Prompt, return_json: bool
+    ) -> dict:
         # If JSON is requested, modify the system prompt to ensure valid JSON response
         if return_json:
             system_prompt = (
-                system_prompt + "\nIMPORTANT: You must respond with valid JSON only. Format your entire response as a "
-                "proper JSON object."
+                f"{system_prompt}\nIMPORTANT: You must respond with valid JSON only. Format your entire response as "
+                "a proper JSON object."
             )
 
-        payload = {
+        return {
             "model": model or config.lmstudio_model or "local-model",
-            "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+            "messages": create_messages(system_prompt, user_prompt),
             "temperature": 0,
             "max_tokens": config.lmstudio_max_tokens,  # Get token limit from config
         }
 
-        # Log the complete payload for debugging
-        logger.debug(f"LM Studio API request payload: {json.dumps(payload, indent=2)}")
-        logger.info(f"Sending direct HTTP request to LM Studio at {url}")
-
-        start_time = time.time()
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload, headers=headers) as response:
-                    response_text = await response.text()
-                    duration = time.time() - start_time
-                    logger.debug(f"LM Studio API raw response: {response_text}")
-
-                    if response.status != 200:
-                        logger.error(f"LM Studio API error: {response.status} - {response_text}")
-
-                        # Try to extract more detailed error information if available
-                        try:
-                            error_json = json.loads(response_text)
-                            if "error" in error_json:
-                                logger.error(f"Detailed error: {error_json['error']}")
-                        except Exception as parse_error:
-                            logger.error(f"Error parsing error response: {str(parse_error)}")
-
-                        return f"Error connecting to the local LLM server: {response.status}"
-
-                    try:
-                        result = json.loads(response_text)
-
-                        # Log the full response from LM Studio for debugging
-                        logger.debug(f"LM Studio API complete response: {json.dumps(result, indent=2)}")
-                    except json.JSONDecodeError as json_error:
-                        logger.error(f"Failed to parse response as JSON: {str(json_error)}")
-                        return f"The LLM server returned an invalid JSON response: {response_text[:100]}..."
-                    if "choices" not in result or not result["choices"]:
-                        logger.error(f"No choices in LM Studio response: {result}")
-                        return "The LLM server returned an incomplete response."
-                    if "message" not in result["choices"][0]:
-                        logger.error(f"No message in first choice: {result['choices'][0]}")
-                        return "The LLM server returned an invalid response format."
-                    content = result["choices"][0]["message"].get("content")
-                    if not content:
-                        logger.error("No content in message")
-                        return "The LLM server returned an empty response."
-
-                    # Log usage data if available
-                    token_info = {}
-                    if "usage" in result:
-                        token_info = {
-                            "prompt_tokens": result["usage"].get("prompt_tokens", "N/A"),
-                            "completion_tokens": result["usage"].get("completion_tokens", "N/A"),
-                            "total_tokens": result["usage"].get("total_tokens", "N/A"),
-                        }
-                    else:
-                        logger.warning("No usage data in LM Studio response")
-                        token_info = {
-                            "prompt_tokens": "N/A",
-                            "completion_tokens": "N/A",
-                            "total_tokens": "N/A",
-                        }
-
-                        # Log to CSV
-                    self.record_usage(
-                        model="local_model",
-                        provider="lmstudio",
-                        agent=agent,
-                        token_usage=token_info,
-                        duration=duration,
-                    )
-
-                    logger.info(f"Successfully got response from LM Studio: {content[:100]}...")
-                    logger.debug(f"Duration: {duration:.2f}s, Token usage: {token_info}")
-
-                    # Return either raw content or validated JSON
-                    return self._process_content(content, return_json) if return_json else content
-        except Exception as e:
-            logger.error(f"Error in HTTP request: {str(e)}")
-            return f"Error connecting to the local LLM server: {str(e)}"
-
     def _process_content(self, content: str, return_json: bool) -> str:
         """
         Process and validate JSON content from the LLM response.
@@ -180,27 +296,28 @@ class LMStudio(LLM):
             return f"Error: The LLM returned invalid JSON format: {content[:100]}..."
 
     async def chat_with_file(
-        self, model: str, system_prompt: str, user_prompt: str, files: list[LLMFile], agent: str, return_json=False
+        self,
+        model: str,
+        system_prompt: str | Prompt,
+        user_prompt: str | Prompt,
+        files: list[LLMFile],
+        agent: str,
+        return_json=False,
     ) -> str:
         try:
             file_contents = []
             for file in files:
-                extracted_content = get_file_content_for_filename(file.filename)
+                extracted_content = await get_file_content_for_filename(file.filename)
                 if not extracted_content:
                     extracted_content = extract_text(file)
-                    set_file_content_for_filename(file.filename, extracted_content)
+                    await set_file_content_for_filename(file.filename, extracted_content)
                 file_contents.append((file.filename, extracted_content))
 
-            # Process files and add to content
-            combined_content = ""
-            for filename, content in file_contents:
-                combined_content += f"\n\nDocument: {filename}\n{content}"
-
-            # Add the file content to the user prompt
-            user_prompt += combined_content
+            # The documents come before the question, so that questions asked of the same documents share a prefix
+            documents = "\n\n".join(f"Document: {filename}\n{content}" for filename, content in file_contents)
 
             logger.info(f"Sending request with {len(files)} files attached to the prompt")
-            result = await self.chat(model, system_prompt, user_prompt, agent, return_json)
+            result = await self.chat(model, system_prompt, Prompt(documents, str(user_prompt)), agent, return_json)
 
             return result
         except Exception as file_error:
@@ -1,31 +1,59 @@
 from fastapi import HTTPException
+import httpx
 from mistralai import Mistral as MistralApi, UserMessage, SystemMessage
 import logging
 import time
+from typing import AsyncIterator
 from src.session.file_uploads import get_file_content_for_filename, set_file_content_for_filename
 from src.utils.file_utils import extract_text
 from src.utils import Config
+from .http_client import create_async_http_client
 from .llm import LLM, LLMFile
+from .prompt import Prompt, get_cached_tokens
+from .scheduler import scheduler
 
 logger = logging.getLogger(__name__)
 config = Config()
 
 
 class Mistral(LLM):
-    client = MistralApi(api_key=config.mistral_key)
+    _client: MistralApi | None = None
+    _http_client: httpx.AsyncClient | None = None
 
-    async def chat(self, model, system_prompt: str, user_prompt: str, agent: str, return_json=False) -> str:
+    @property
+    def client(self) -> MistralApi:
+        if self._client is None:
+            self._http_client = create_async_http_client()
+            self._client = MistralApi(api_key=config.mistral_key, async_client=self._http_client)
+        return self._client
+
+    @client.setter
+    def client(self, client: MistralApi):
+        self._client = client
+
+    async def close(self) -> None:
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        self._http_client = None
+        self._client = None
+
+    async def chat(
+        self, model, system_prompt: str | Prompt, user_prompt: str | Prompt, agent: str, return_json=False
+    ) -> str:
         logger.debug("Called llm. Waiting on response model with prompt {0}.".format(str([system_prompt, user_prompt])))
 
         start_time = time.time()
-        response = await self.client.chat.complete_async(
-            model=model,
-            messages=[
-                SystemMessage(content=system_prompt),
-                UserMessage(content=user_prompt),
-            ],
-            temperature=0,
-            response_format={"type": "json_object"} if return_json else None,
+        response = await scheduler.with_retry(
+            "mistral",
+            lambda: self.client.chat.complete_async(
+                model=model,
+                messages=[
+                    SystemMessage(content=str(system_prompt)),
+                    UserMessage(content=str(user_prompt)),
+                ],
+                temperature=0,
+                response_format={"type": "json_object"} if return_json else None,
+            ),
         )
         duration = time.time() - start_time
 
@@ -43,6 +71,7 @@ class Mistral(LLM):
                 "prompt_tokens": response.usage.prompt_tokens,
                 "completion_tokens": response.usage.completion_tokens,
                 "total_tokens": response.usage.total_tokens,
+                "cached_tokens": get_cached_tokens(response.usage),
             }
         else:
             logger.warning("No usage data in Mistral response")
@@ -58,24 +87,81 @@ class Mistral(LLM):
 
         return str(content)
 
+    async def chat_stream(
+        self, model, system_prompt: str | Prompt, user_prompt: str | Prompt, agent: str, return_json=False
+    ) -> AsyncIterator[str]:
+        logger.debug(
+            "Called llm stream. Waiting on response model with prompt {0}.".format(str([system_prompt, user_prompt]))
+        )
+
+        start_time = time.time()
+        stream = await scheduler.with_retry(
+            "mistral",
+            lambda: self.client.chat.stream_async(
+                model=model,
+                messages=[
+                    SystemMessage(content=str(system_prompt)),
+                    UserMessage(content=str(user_prompt)),
+                ],
+                temperature=0,
+                response_format={"type": "json_object"} if return_json else None,
+            ),
+        )
+
+        content_streamed = False
+        usage = None
+        async for event in stream:
+            if event.data.usage is not None:
+                usage = event.data.usage
+            if event.data.choices and isinstance(event.data.choices[0].delta.content, str):
+                content_streamed = True
+                yield event.data.choices[0].delta.content
+        duration = time.time() - start_time
+
+        if not content_streamed:
+            logger.error("Call to Mistral API failed: streamed message content is None or Unset")
+            yield "An error occurred while processing the request."
+            return
+
+        if usage is not None:
+            token_info = {
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "total_tokens": usage.total_tokens,
+                "cached_tokens": get_cached_tokens(usage),
+            }
+        else:
+            logger.warning("No usage data in Mistral streamed response")
+            token_info = {
+                "prompt_tokens": "N/A",
+                "completion_tokens": "N/A",
+                "total_tokens": "N/A",
+            }
+
+        self.record_usage(model=model, provider="mistral", agent=agent, token_usage=token_info, duration=duration)
+        logger.debug(f"Token data: {usage}, Duration: {duration:.2f}s")
+
     async def chat_with_file(
         self,
         model: str,
-        system_prompt: str,
-        user_prompt: str,
+        system_prompt: str | Prompt,
+        user_prompt: str | Prompt,
         files: list[LLMFile],
         agent: str,
         return_json=False
     ) -> str:
         try:
+            documents = []
             for file in files:
-                extracted_content = get_file_content_for_filename(file.filename)
+                extracted_content = await get_file_content_for_filename(file.filename)
                 if not extracted_content:
                     extracted_content = extract_text(file)
-                    set_file_content_for_filename(file.filename, extracted_content)
-                user_prompt += f"\n\nDocument:\n{extracted_content}"
+                    await set_file_content_for_filename(file.filename, extracted_content)
+                documents.append(f"Document:\n{extracted_content}")
 
-            result = await self.chat(model, system_prompt, user_prompt, agent, return_json)
+            # The documents come before the question, so that questions asked of the same documents share a prefix
+            file_prompt = Prompt("\n\n".join(documents), str(user_prompt))
+            result = await self.chat(model, system_prompt, file_prompt, agent, return_json)
 
             return result
         except Exception as file_error:
@@ -1,47 +1,62 @@
 import asyncio
+from contextvars import ContextVar
+from fastapi import HTTPException
 import logging
 import time
+from typing import AsyncIterator, cast
 
 from src.utils import Config
+from src.llm.factory import get_llm
+from src.llm.http_client import create_async_http_client
 from src.llm.llm import LLM, LLMFile, LLMFileUploadManager
-from src.session.llm_file_upload import (
-    add_llm_file_upload,
-    get_all_files,
-    get_llm_file_upload_id,
-    reset_llm_file_uploads,
-)
+from src.llm.prompt import Prompt, create_messages, get_cached_tokens
+from src.llm.retrieval import retrieve_file_context
+from src.llm.scheduler import scheduler
+from src.session.llm_file_upload import get_all_files, reset_llm_file_uploads
 from openai import NOT_GIVEN, AsyncOpenAI, OpenAIError
-from openai.types.beta.threads import Text, TextContentBlock
 
 logger = logging.getLogger(__name__)
 config = Config()
 
-
-def remove_citations(message: Text):
-    value = message.value
-    for annotation in message.annotations:
-        value = value.replace(annotation.text, "")
-    return value
+# The provider a chat is recorded under in the usage log, so chats answering questions about files stay apart
+usage_provider: ContextVar[str] = ContextVar("openai_usage_provider", default="openai")
 
 
 class OpenAI(LLM):
-    async def chat(self, model, system_prompt: str, user_prompt: str, agent: str, return_json=False) -> str:
+    _client: AsyncOpenAI | None = None
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            # Retries are made by the scheduler, so that backoff is shared with the other providers
+            self._client = AsyncOpenAI(
+                api_key=config.openai_key, http_client=create_async_http_client(), max_retries=0
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def chat(
+        self, model, system_prompt: str | Prompt, user_prompt: str | Prompt, agent: str, return_json=False
+    ) -> str:
         logger.debug(
             "##### Called open ai chat ... llm. Waiting on response model with prompt {0}.".format(
                 str([system_prompt, user_prompt])
             )
         )
         try:
-            client = AsyncOpenAI(api_key=config.openai_key)
             start_time = time.time()
-            response = await client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-                temperature=0,
-                response_format={"type": "json_object"} if return_json else NOT_GIVEN,
+            response = await scheduler.with_retry(
+                "openai",
+                lambda: self.client.chat.completions.create(
+                    model=model,
+                    messages=create_messages(system_prompt, user_prompt),
+                    temperature=0,
+                    response_format={"type": "json_object"} if return_json else NOT_GIVEN,
+                ),
             )
             duration = time.time() - start_time
             content = response.choices[0].message.content
@@ -52,6 +67,7 @@ class OpenAI(LLM):
                     "prompt_tokens": response.usage.prompt_tokens,
                     "completion_tokens": response.usage.completion_tokens,
                     "total_tokens": response.usage.total_tokens,
+                    "cached_tokens": get_cached_tokens(response.usage),
                 }
             else:
                 logger.warning("No usage data in OpenAI response")
@@ -61,7 +77,14 @@ class OpenAI(LLM):
                     "total_tokens": "N/A",
                 }
 
-            self.record_usage(model=model, provider="openai", agent=agent, token_usage=token_info, duration=duration)
+            self.record_usage(
+                model=model,
+                provider="openai",
+                agent=agent,
+                token_usage=token_info,
+                duration=duration,
+                usage_provider=usage_provider.get(),
+            )
 
             logger.info(f"OpenAI response: Finish reason: {response.choices[0].finish_reason}, Content: {content}")
             logger.info(f"Response Usage: {response.usage}")
@@ -76,111 +99,109 @@ class OpenAI(LLM):
             logger.error(f"Error calling OpenAI model: {e}")
             return "An error occurred while processing the request."
 
-    async def chat_with_file(
-        self, model: str, system_prompt: str, user_prompt: str, files: list[LLMFile], agent: str, return_json=False
-    ) -> str:
-        client = AsyncOpenAI(api_key=config.openai_key)
-        start_time = time.time()
-
-        file_ids = await OpenAILLMFileUploadManager().upload_files(files)
-
-        file_assistant = await client.beta.assistants.create(
-            name="ESG Analyst",
-            instructions=system_prompt,
-            model=model,
-            temperature=0,
-            tools=[{"type": "file_search"}],
-            response_format={"type": "json_object"} if return_json else NOT_GIVEN,
+    async def chat_stream(
+        self, model, system_prompt: str | Prompt, user_prompt: str | Prompt, agent: str, return_json=False
+    ) -> AsyncIterator[str]:
+        logger.debug(
+            "##### Called open ai chat stream ... llm. Waiting on response model with prompt {0}.".format(
+                str([system_prompt, user_prompt])
+            )
         )
+        content_streamed = False
+        try:
+            start_time = time.time()
+            stream = await scheduler.with_retry(
+                "openai",
+                lambda: self.client.chat.completions.create(
+                    model=model,
+                    messages=create_messages(system_prompt, user_prompt),
+                    temperature=0,
+                    response_format={"type": "json_object"} if return_json else NOT_GIVEN,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                ),
+            )
+            usage = None
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    content_streamed = True
+                    yield chunk.choices[0].delta.content
+            duration = time.time() - start_time
 
-        thread = await client.beta.threads.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": user_prompt,
-                    "attachments": [{"file_id": file_id, "tools": [{"type": "file_search"}]} for file_id in file_ids],
+            if usage is not None:
+                token_info = {
+                    "prompt_tokens": usage.prompt_tokens,
+                    "completion_tokens": usage.completion_tokens,
+                    "total_tokens": usage.total_tokens,
+                    "cached_tokens": get_cached_tokens(usage),
+                }
+            else:
+                logger.warning("No usage data in OpenAI streamed response")
+                token_info = {
+                    "prompt_tokens": "N/A",
+                    "completion_tokens": "N/A",
+                    "total_tokens": "N/A",
                 }
-            ]
-        )
-
-        run = await client.beta.threads.runs.create_and_poll(
-            thread_id=thread.id,
-            assistant_id=file_assistant.id,
-            temperature=0,
-            response_format={"type": "json_object"} if return_json else NOT_GIVEN,
-        )
-
-        messages = await client.beta.threads.messages.list(thread_id=thread.id, run_id=run.id)
-
-        if isinstance(messages.data[0].content[0], TextContentBlock):
-            message = remove_citations(messages.data[0].content[0].text)
-        else:
-            message = messages.data[0].content[0].to_json()
-
-        await client.beta.threads.delete(thread.id)
-
-        duration = time.time() - start_time
-
-
-        if hasattr(run, "usage") and run.usage is not None:
-            token_info = {
-                "prompt_tokens": run.usage.prompt_tokens,
-                "completion_tokens": run.usage.completion_tokens,
-                "total_tokens": run.usage.total_tokens,
-            }
-        else:
-            logger.warning("No usage data in OpenAI File response")
-            token_info = {
-                "prompt_tokens": "N/A",
-                "completion_tokens": "N/A",
-                "total_tokens": "N/A",
-            }
 
+            self.record_usage(model=model, provider="openai", agent=agent, token_usage=token_info, duration=duration)
+            logger.debug(f"Token data: {usage}, Duration: {duration:.2f}s")
 
-            # Log to CSV file using base class method
-        self.record_usage(model=model, provider="openai-file", agent=agent, token_usage=token_info, duration=duration)
+            if not content_streamed:
+                logger.error("Call to Open API failed: streamed message content is empty")
+                yield "An error occurred while processing the request."
+        except Exception as e:
+            logger.error(f"Error streaming from OpenAI model: {e}")
+            # Part of the answer has reached the caller, so an error message would read as the end of the answer
+            if content_streamed:
+                raise
+            yield "An error occurred while processing the request."
 
-        logger.info(f"OpenAI file-based response: Message length: {len(message) if message else 0}")
-        logger.debug(f"Token usage: {token_info}, Duration: {duration:.2f}s")
-        return message
+    async def chat_with_file(
+        self,
+        model: str,
+        system_prompt: str | Prompt,
+        user_prompt: str | Prompt,
+        files: list[LLMFile],
+        agent: str,
+        return_json=False,
+    ) -> str:
+        try:
+            start_time = time.time()
+            # The system prompt is the same for every question, so only the question itself picks the excerpts
+            document_context = await retrieve_file_context(files, str(user_prompt))
+            logger.info(f"OpenAI: Retrieved context from {len(files)} files in {time.time() - start_time:.2f}s")
+
+            token = usage_provider.set("openai-file")
+            try:
+                return await self.chat(
+                    model, system_prompt, f"{user_prompt}\n\n{document_context}", agent, return_json
+                )
+            finally:
+                usage_provider.reset(token)
+        except Exception as file_error:
+            logger.exception(file_error)
+            raise HTTPException(status_code=500, detail=f"Failed to process files: {file_error}") from file_error
 
 
 class OpenAILLMFileUploadManager(LLMFileUploadManager):
-    async def upload_files(self, files: list[LLMFile]) -> list[str]:
-        client = AsyncOpenAI(api_key=config.openai_key)
-
-        file_ids = []
-        files_to_upload = []
-        start_time = time.time()
-        for file in files:
-            file_id = get_llm_file_upload_id(file.filename)
-            if not file_id:
-                logger.info(f"Open AI: Preparing to upload '{file.filename}'")
-                file = (file.filename, file.file) if isinstance(file.file, bytes) else file.file
-                files_to_upload.append(client.files.create(file=file, purpose="assistants"))
-            else:
-                file_ids.append(file_id)
-                logger.info(f"Open AI: {file.filename} already uploaded to OpenAI with id '{file_id}'")
-
-        uploaded_files = await asyncio.gather(*files_to_upload)
-
-        for file in uploaded_files:
-            add_llm_file_upload(file.id, file.filename)
-            file_ids.append(file.id)
-            logger.info(f"Open AI: File '{file.filename}' uploaded with id '{file.id}'")
+    def __init__(self, client: AsyncOpenAI | None = None):
+        self._client = client
 
-        if uploaded_files:
-            logger.info(f"Open AI: Time to upload files {time.time() - start_time}")
-        return file_ids
+    @property
+    def client(self) -> AsyncOpenAI:
+        # Share the pooled client owned by the registered OpenAI LLM instance unless one was given
+        return self._client or cast(OpenAI, get_llm("openai")).client
 
     async def delete_all_files(self):
         try:
-            client = AsyncOpenAI(api_key=config.openai_key)
-            files = get_all_files()
+            client = self.client
+            files = await get_all_files()
             logger.info(f"Open AI: deleting files {files}")
             delete_tasks = [client.files.delete(file_id=file["file_id"]) for file in files]
             await asyncio.gather(*delete_tasks)
-            reset_llm_file_uploads()
+            await reset_llm_file_uploads()
             logger.info("Open AI: Files deleted")
         except OpenAIError:
             logger.info("OpenAI not configured")
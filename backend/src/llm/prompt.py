@@ -0,0 +1,49 @@
+from dataclasses import dataclass
+from typing import Any
+
+from openai.types.chat import (
+    ChatCompletionMessageParam,
+    ChatCompletionSystemMessageParam,
+    ChatCompletionUserMessageParam,
+)
+
+
+@dataclass(frozen=True)
+class Prompt:
+    """
+    A prompt split into a static prefix, identical from call to call, and a dynamic suffix holding the parts that
+    change, such as the current date. Providers serve the longest prefix they have seen before from their prompt
+    cache, so the prefix is always sent first.
+    """
+
+    prefix: str
+    suffix: str = ""
+
+    def __str__(self) -> str:
+        return f"{self.prefix}\n\n{self.suffix}" if self.suffix else self.prefix
+
+
+def create_messages(system_prompt: str | Prompt, user_prompt: str | Prompt) -> list[ChatCompletionMessageParam]:
+    """
+    The system and user messages of a chat, in the OpenAI compatible format. A structured prompt is sent as a single
+    message, rather than a message each for its prefix and suffix, as not every model accepts more than one system
+    message.
+    """
+    return [
+        ChatCompletionSystemMessageParam(role="system", content=str(system_prompt)),
+        ChatCompletionUserMessageParam(role="user", content=str(user_prompt)),
+    ]
+
+
+def get_field(value: Any, name: str) -> Any:
+    return value.get(name) if isinstance(value, dict) else getattr(value, name, None)
+
+
+def get_cached_tokens(usage: Any) -> int:
+    """
+    The prompt tokens a provider served from its prompt cache, from the usage of an OpenAI compatible response given
+    either as an object or as a dictionary. Providers that do not cache prompts, or do not report it, count none.
+    """
+    details = get_field(usage, "prompt_tokens_details")
+    cached_tokens = get_field(details, "cached_tokens") if details is not None else None
+    return cached_tokens if isinstance(cached_tokens, int) else 0
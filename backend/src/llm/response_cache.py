@@ -0,0 +1,149 @@
+import contextvars
+import hashlib
+import inspect
+import json
+import logging
+import time
+from functools import wraps
+from typing import Any, Dict, Optional, Union
+
+from src.utils import Config
+from src.utils.redis_utils import redis_client
+
+logger = logging.getLogger(__name__)
+config = Config()
+
+CACHE_KEY_PREFIX = "llm_cache_"
+CACHE_LRU_KEY = "llm_cache_lru"
+
+# Responses the providers return in place of raising, which must never be served from the cache
+ERROR_RESPONSE_PREFIXES = (
+    "An error occurred while processing the request.",
+    "Error connecting to the local LLM server",
+    "The LLM server returned",
+    "Error: The LLM returned invalid JSON format",
+)
+
+recorded_usage: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("recorded_usage", default=None)
+
+
+def capture_usage(token_usage: Optional[Union[Dict, str]], duration: float) -> None:
+    """
+    Capture the usage of the LLM call currently being cached, so that a later hit can report what it saved
+    """
+    usage = recorded_usage.get()
+    if usage is not None:
+        usage["token_usage"] = token_usage
+        usage["duration"] = duration
+
+
+def create_cache_key(provider: str, arguments: dict[str, Any]) -> str:
+    key_content = json.dumps(
+        [
+            provider,
+            arguments.get("model"),
+            str(arguments.get("system_prompt")),
+            str(arguments.get("user_prompt")),
+            arguments.get("return_json"),
+        ]
+    )
+    return CACHE_KEY_PREFIX + hashlib.sha256(key_content.encode()).hexdigest()
+
+
+def is_cacheable(response: Any, return_json: bool) -> bool:
+    if not isinstance(response, str) or not response or response.startswith(ERROR_RESPONSE_PREFIXES):
+        return False
+    if return_json:
+        try:
+            json.loads(response)
+        except json.JSONDecodeError:
+            return False
+    return True
+
+
+async def get_cached_response(key: str) -> dict | None:
+    value = await redis_client.get(key)
+    if not value or not isinstance(value, str):
+        return None
+    await redis_client.zadd(CACHE_LRU_KEY, {key: time.time()})
+    return json.loads(value)
+
+
+async def set_cached_response(key: str, entry: dict) -> None:
+    pipeline = redis_client.pipeline()
+    pipeline.set(key, json.dumps(entry), ex=config.llm_cache_ttl_seconds)
+    pipeline.zadd(CACHE_LRU_KEY, {key: time.time()})
+    pipeline.zcard(CACHE_LRU_KEY)
+    entry_count = (await pipeline.execute())[-1]
+
+    excess = entry_count - config.llm_cache_max_entries
+    if excess > 0:
+        evicted = [evicted_key for evicted_key, _ in await redis_client.zpopmin(CACHE_LRU_KEY, excess)]
+        await redis_client.delete(*evicted)
+        logger.debug(f"LLM cache evicted {len(evicted)} least recently used entries")
+
+
+async def clear_response_cache() -> None:
+    keys = await redis_client.zrange(CACHE_LRU_KEY, 0, -1)
+    if keys:
+        await redis_client.delete(*keys)
+    await redis_client.delete(CACHE_LRU_KEY)
+
+
+def cache_response(func):
+    """
+    Serve repeated, identical LLM calls from Redis. Every call in the codebase is made at temperature 0, so a
+    response is keyed on the provider, model, prompts and return_json.
+    """
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        arguments = signature.bind(self, *args, **kwargs)
+        arguments.apply_defaults()
+        call = arguments.arguments
+        agent = call.get("agent")
+
+        if not config.llm_cache_enabled or agent in config.llm_cache_excluded_agents:
+            return await func(self, *args, **kwargs)
+
+        provider = self.__class__.__name__.lower()
+        model = call.get("model")
+        key = create_cache_key(provider, call)
+        try:
+            cached = await get_cached_response(key)
+        except Exception as e:
+            logger.warning(f"LLM cache unavailable, calling {provider} directly: {e}")
+            return await func(self, *args, **kwargs)
+
+        if cached is not None:
+            logger.info(f"LLM cache hit for agent '{agent}' using {provider} {model}")
+            self.usage_recorder.record_cache_activity(
+                model, provider, agent, True, cached.get("token_usage"), cached.get("duration") or 0.0
+            )
+            return cached["response"]
+
+        outer_usage = recorded_usage.get()
+        usage: dict[str, Any] = {}
+        token = recorded_usage.set(usage)
+        try:
+            response = await func(self, *args, **kwargs)
+        finally:
+            recorded_usage.reset(token)
+            if outer_usage is not None:
+                outer_usage.update(usage)
+
+        self.usage_recorder.record_cache_activity(model, provider, agent, False, usage.get("token_usage"))
+
+        if is_cacheable(response, bool(call.get("return_json"))):
+            try:
+                await set_cached_response(
+                    key,
+                    {"response": response, "token_usage": usage.get("token_usage"), "duration": usage.get("duration")},
+                )
+            except Exception as e:
+                logger.warning(f"Failed to store LLM response in cache: {e}")
+
+        return response
+
+    return wrapper
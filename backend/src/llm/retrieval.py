@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import heapq
+import logging
+import math
+import re
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+from src.session.file_uploads import get_file_content_for_filename, set_file_content_for_filename
+from src.utils import Config
+from src.utils.file_utils import extract_text
+from .llm import LLMFile
+
+logger = logging.getLogger(__name__)
+config = Config()
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Common words in prompts and documents that carry no signal for which part of a document is relevant
+STOP_WORDS = frozenset(
+    "a about all an and any are as at be been by can do does for from has have how in include is it its of on or "
+    "our should that the their this to was were what when which who will with you your".split()
+)
+
+index_cache: OrderedDict[str, "RetrievalIndex"] = OrderedDict()
+index_locks: dict[str, asyncio.Lock] = {}
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def chunk_text(text: str, chunk_size: int, chunk_overlap: int) -> list[str]:
+    """
+    Split text into chunks of chunk_size words, each overlapping the previous chunk by chunk_overlap words
+    """
+    words = text.split()
+    step = max(chunk_size - chunk_overlap, 1)
+    return [" ".join(words[start:start + chunk_size]) for start in range(0, max(len(words) - chunk_overlap, 1), step)]
+
+
+class RetrievalIndex:
+    """
+    In-memory BM25 index over the chunks of a single document
+    """
+
+    def __init__(self, chunks: list[str], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.term_frequencies = [Counter(tokenize(chunk)) for chunk in chunks]
+        self.chunk_lengths = [sum(frequencies.values()) for frequencies in self.term_frequencies]
+        self.average_chunk_length = (sum(self.chunk_lengths) / len(chunks) if chunks else 0) or 1
+
+        document_frequencies = Counter(term for frequencies in self.term_frequencies for term in frequencies)
+        self.idf = {
+            term: math.log(1 + (len(chunks) - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequencies.items()
+        }
+
+    def score(self, query: str) -> list[float]:
+        """
+        The BM25 score of each chunk for the query
+        """
+        query_terms = {term for term in tokenize(query) if term in self.idf}
+        scores = []
+        for frequencies, length in zip(self.term_frequencies, self.chunk_lengths):
+            normaliser = self.k1 * (1 - self.b + self.b * length / self.average_chunk_length)
+            score = 0.0
+            for term in query_terms:
+                frequency = frequencies.get(term)
+                if frequency:
+                    score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + normaliser)
+            scores.append(score)
+        return scores
+
+    def search(self, query: str, top_k: int) -> list[str]:
+        """
+        Return the top_k chunks that best match the query, in the order they appear in the document
+        """
+        if len(self.chunks) <= top_k:
+            return self.chunks
+
+        scores = self.score(query)
+        top_chunks = heapq.nlargest(top_k, range(len(self.chunks)), key=scores.__getitem__)
+        return [self.chunks[i] for i in sorted(top_chunks)]
+
+
+def _cache_index(content_hash: str, index: RetrievalIndex) -> None:
+    index_cache[content_hash] = index
+    while len(index_cache) > config.retrieval_index_cache_size:
+        evicted_hash, _ = index_cache.popitem(last=False)
+        index_locks.pop(evicted_hash, None)
+
+
+async def _store_session_content(filename: str, content: str) -> None:
+    # Keep the extracted text with the session upload so later questions about the file can be answered
+    try:
+        if not await get_file_content_for_filename(filename):
+            await set_file_content_for_filename(filename, content)
+    except LookupError:
+        logger.debug(f"No session available to store extracted content of {filename}")
+
+
+async def get_file_index(file: LLMFile) -> RetrievalIndex:
+    """
+    Get the retrieval index for a file, building it on first use. Indexes are cached by the hash of the file
+    content, so a file is only extracted, chunked and indexed once however many questions are asked about it.
+    """
+    content = None
+    if isinstance(file.file, bytes) and not file.file:
+        # Uploaded files are referenced by name only, with their extracted content held in the session
+        content = await get_file_content_for_filename(file.filename)
+        if not content:
+            raise ValueError(f"No content available for file {file.filename}")
+        raw_file = content.encode()
+    elif isinstance(file.file, bytes):
+        raw_file = file.file
+    else:
+        raw_file = await asyncio.to_thread(Path(file.file).read_bytes)
+
+    content_hash = hashlib.sha256(raw_file).hexdigest()
+
+    async with index_locks.setdefault(content_hash, asyncio.Lock()):
+        index = index_cache.get(content_hash)
+        if index is not None:
+            index_cache.move_to_end(content_hash)
+            return index
+
+        start_time = time.time()
+        if content is None:
+            content = await asyncio.to_thread(extract_text, LLMFile(file.filename, raw_file))
+            if isinstance(file.file, bytes):
+                await _store_session_content(file.filename, content)
+
+        chunks = chunk_text(content, config.retrieval_chunk_size, config.retrieval_chunk_overlap)
+        index = await asyncio.to_thread(RetrievalIndex, chunks)
+        _cache_index(content_hash, index)
+        logger.info(f"Indexed {file.filename} into {len(chunks)} chunks in {time.time() - start_time:.2f}s")
+        return index
+
+
+async def retrieve_file_context(files: list[LLMFile], query: str) -> str:
+    """
+    Retrieve the parts of each file most relevant to the query, formatted to be appended to a user prompt
+    """
+    indexes = await asyncio.gather(*[get_file_index(file) for file in files])
+
+    file_contexts = []
+    for file, index in zip(files, indexes):
+        excerpts = "\n\n[...]\n\n".join(index.search(query, config.retrieval_top_k))
+        file_contexts.append(f"Document: {file.filename}\n{excerpts}")
+    return "\n\n".join(file_contexts)
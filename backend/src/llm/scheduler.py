@@ -0,0 +1,361 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextlib import asynccontextmanager, contextmanager
+from enum import IntEnum
+from functools import wraps
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterator, Optional, TypeVar, Union
+
+from src.utils import Config
+from src.utils.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+config = Config()
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+current_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar(
+    "llm_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def llm_priority(priority: Priority):
+    """
+    Run the LLM calls made within the block (including any tasks created within it) at the given priority
+    """
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class TokenBudget:
+    """
+    A ceiling on the tokens used by a group of LLM calls. The budget is not enforced on the calls themselves, but
+    signals once it is used up so that the caller can cancel the work it no longer wants to pay for.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self.exhausted = asyncio.Event()
+
+    def consume(self, tokens: int) -> None:
+        self.used += tokens
+        if self.used >= self.limit:
+            self.exhausted.set()
+
+
+current_token_budget: contextvars.ContextVar[Optional[TokenBudget]] = contextvars.ContextVar(
+    "llm_token_budget", default=None
+)
+
+
+@contextmanager
+def llm_token_budget(limit: int) -> Iterator[TokenBudget]:
+    """
+    Count the tokens used by the LLM calls made within the block (including any tasks created within it) against a
+    budget
+    """
+    budget = TokenBudget(limit)
+    token = current_token_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        current_token_budget.reset(token)
+
+
+class PriorityLimiter:
+    """
+    A semaphore that hands free slots to waiting callers in priority order, then in the order they arrived
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiters: list[tuple[int, int, asyncio.Future]] = []
+        self.sequence = itertools.count()
+
+    def queue_depth(self) -> dict[str, int]:
+        depth = {priority.name.lower(): 0 for priority in Priority}
+        for priority, _, _ in self.waiters:
+            depth[Priority(priority).name.lower()] += 1
+        return depth
+
+    async def acquire(self, priority: Priority) -> None:
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (priority, next(self.sequence), future)
+        heapq.heappush(self.waiters, waiter)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the caller was cancelled, so pass it on
+                self.release()
+            else:
+                self.waiters.remove(waiter)
+                heapq.heapify(self.waiters)
+            raise
+
+    def release(self) -> None:
+        if self.waiters:
+            # The slot passes directly to the next waiter, so the active count is unchanged
+            _, _, future = heapq.heappop(self.waiters)
+            future.set_result(None)
+            return
+        self.active -= 1
+
+
+class HeldSlot:
+    """
+    The limiter slots held by an LLM call, which it can give up while it waits between retries and take again after
+    """
+
+    def __init__(self, priority: Priority, limiters: list[PriorityLimiter]):
+        self.priority = priority
+        self.limiters = limiters
+        # The number of limiters acquired, in order, so that only those are released if acquiring is cancelled
+        self.held = 0
+
+    async def acquire(self) -> None:
+        for limiter in self.limiters[self.held :]:
+            await limiter.acquire(self.priority)
+            self.held += 1
+
+    def release(self) -> None:
+        while self.held:
+            self.held -= 1
+            self.limiters[self.held].release()
+
+
+current_slot: contextvars.ContextVar[Optional[HeldSlot]] = contextvars.ContextVar("llm_slot", default=None)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at tokens_per_minute. Calls reserve an estimate of their size before
+    starting; the reservation is returned when they finish and the actual token usage reported by the provider
+    is taken instead.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.tokens = self.capacity
+        self.refill_rate = tokens_per_minute / 60
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    async def reserve(self, tokens: int) -> None:
+        # A single call larger than the bucket can only ever wait for a full bucket
+        tokens = min(tokens, int(self.capacity))
+        while True:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return
+            await asyncio.sleep((tokens - self.tokens) / self.refill_rate)
+
+    def refund(self, tokens: int) -> None:
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + min(tokens, int(self.capacity)))
+
+    def consume(self, tokens: int) -> None:
+        # Usage is taken after the fact, so the bucket may go negative and hold back the calls that follow
+        self._refill()
+        self.tokens -= tokens
+
+
+class LLMScheduler:
+    """
+    Central scheduler that every LLM call passes through. It bounds the number of concurrent calls per provider
+    and per model, keeps each provider under its tokens-per-minute limit and retries rate limited and failed
+    requests with jittered exponential backoff. Interactive calls are always given a free slot before background
+    work such as report generation.
+    """
+
+    def __init__(self):
+        self.provider_limiters: dict[str, PriorityLimiter] = {}
+        self.model_limiters: dict[tuple[str, str], PriorityLimiter] = {}
+        self.token_buckets: dict[str, TokenBucket] = {}
+        self.retries: dict[str, int] = {}
+
+    def _get_provider_limiter(self, provider: str) -> PriorityLimiter:
+        if provider not in self.provider_limiters:
+            self.provider_limiters[provider] = PriorityLimiter(config.llm_max_concurrency)
+        return self.provider_limiters[provider]
+
+    def _get_model_limiter(self, provider: str, model: str) -> PriorityLimiter:
+        if (provider, model) not in self.model_limiters:
+            self.model_limiters[(provider, model)] = PriorityLimiter(config.llm_max_concurrency_per_model)
+        return self.model_limiters[(provider, model)]
+
+    def _get_token_bucket(self, provider: str) -> Optional[TokenBucket]:
+        if provider not in self.token_buckets:
+            tokens_per_minute = getattr(config, f"{provider}_tokens_per_minute", 0)
+            if not tokens_per_minute:
+                return None
+            self.token_buckets[provider] = TokenBucket(tokens_per_minute)
+        return self.token_buckets[provider]
+
+    @asynccontextmanager
+    async def slot(self, provider: str, model: str, estimated_tokens: int = 0) -> AsyncIterator[None]:
+        """
+        Wait for a free slot for the provider and model, and for rate limit capacity for the call
+        """
+        priority = current_priority.get()
+        model_limiter = self._get_model_limiter(provider, str(model))
+        provider_limiter = self._get_provider_limiter(provider)
+        token_bucket = self._get_token_bucket(provider)
+
+        start_time = time.monotonic()
+        held_slot = HeldSlot(priority, [model_limiter, provider_limiter])
+        # Restored rather than reset, as a streamed call may be closed from a different context
+        previous_slot = current_slot.get()
+        current_slot.set(held_slot)
+        try:
+            await held_slot.acquire()
+            if token_bucket is not None:
+                await token_bucket.reserve(estimated_tokens)
+            wait_time = time.monotonic() - start_time
+            if wait_time > 1:
+                logger.info(
+                    f"LLM call to {provider} {model} queued for {wait_time:.2f}s at {priority.name.lower()} "
+                    f"priority. Queue depth: {provider_limiter.queue_depth()}"
+                )
+            try:
+                yield
+            finally:
+                if token_bucket is not None:
+                    token_bucket.refund(estimated_tokens)
+        finally:
+            held_slot.release()
+            current_slot.set(previous_slot)
+
+    @asynccontextmanager
+    async def released_slot(self) -> AsyncIterator[None]:
+        """
+        Give up the slot held by the current call for the duration of the block, and wait for it again after
+        """
+        held_slot = current_slot.get()
+        if held_slot is not None:
+            held_slot.release()
+        try:
+            yield
+        finally:
+            if held_slot is not None:
+                await held_slot.acquire()
+
+    def record_usage(self, provider: str, token_usage: Optional[Union[Dict, str]]) -> None:
+        """
+        Take the tokens a call actually used from the provider's rate limit, and from the token budget of the calls
+        it was made within
+        """
+        if not isinstance(token_usage, dict) or not isinstance(token_usage.get("total_tokens"), int):
+            return
+        total_tokens = token_usage["total_tokens"]
+        token_budget = current_token_budget.get()
+        if token_budget is not None:
+            token_budget.consume(total_tokens)
+        token_bucket = self.token_buckets.get(provider)
+        if token_bucket is not None:
+            token_bucket.consume(total_tokens)
+
+    async def with_retry(self, provider: str, request: Callable[[], Awaitable[T]]) -> T:
+        """
+        Make a request to a provider, retrying with full-jitter exponential backoff when it is rate limited or
+        fails with a server error
+        """
+        attempt = 0
+        while True:
+            try:
+                return await request()
+            except Exception as e:
+                status_code = get_status_code(e)
+                if status_code not in RETRYABLE_STATUS_CODES or attempt >= config.llm_max_retries:
+                    raise
+                delay = random.uniform(0, min(config.llm_retry_max_delay, config.llm_retry_base_delay * 2**attempt))
+                attempt += 1
+                self.retries[provider] = self.retries.get(provider, 0) + 1
+                logger.warning(
+                    f"{provider} returned {status_code}, retrying in {delay:.2f}s "
+                    f"(attempt {attempt} of {config.llm_max_retries})"
+                )
+                # Other calls can use the slot while this one backs off
+                async with self.released_slot():
+                    await asyncio.sleep(delay)
+
+    def get_metrics(self) -> dict:
+        """
+        The current number of active and queued calls per provider and model, and retries made per provider
+        """
+        return {
+            "providers": {
+                provider: {"active": limiter.active, "queued": limiter.queue_depth()}
+                for provider, limiter in self.provider_limiters.items()
+            },
+            "models": {
+                f"{provider}/{model}": {"active": limiter.active, "queued": limiter.queue_depth()}
+                for (provider, model), limiter in self.model_limiters.items()
+            },
+            "retries": dict(self.retries),
+        }
+
+
+def get_status_code(error: Exception) -> Optional[int]:
+    # OpenAI and Mistral errors carry a status_code, aiohttp response errors a status
+    status_code = getattr(error, "status_code", None) or getattr(error, "status", None)
+    return status_code if isinstance(status_code, int) else None
+
+
+scheduler = LLMScheduler()
+
+
+def schedule_call(func):
+    """
+    Run an LLM call through the scheduler, holding a provider and model slot for the duration of the call
+    """
+
+    @wraps(func)
+    async def wrapper(self, model, system_prompt, user_prompt, *args, **kwargs):
+        provider = self.__class__.__name__.lower()
+        async with scheduler.slot(provider, model, estimate_tokens(str(system_prompt), str(user_prompt))):
+            return await func(self, model, system_prompt, user_prompt, *args, **kwargs)
+
+    return wrapper
+
+
+def schedule_stream(func):
+    """
+    Run a streamed LLM call through the scheduler, holding a provider and model slot until the stream ends
+    """
+
+    @wraps(func)
+    async def wrapper(self, model, system_prompt, user_prompt, *args, **kwargs):
+        provider = self.__class__.__name__.lower()
+        async with scheduler.slot(provider, model, estimate_tokens(str(system_prompt), str(user_prompt))):
+            async for chunk in func(self, model, system_prompt, user_prompt, *args, **kwargs):
+                yield chunk
+
+    return wrapper
@@ -0,0 +1,55 @@
+"""
+Generate and cache the knowledge graph for every CSV dataset in a directory, so that loading them later, in this or
+any other environment sharing the cache directory, needs no LLM calls.
+
+Run from the `backend` directory:
+
+    python -m src.prewarm_knowledge_graph_cache --directory ./datasets
+"""
+
+import argparse
+import asyncio
+import logging
+from itertools import islice
+from pathlib import Path
+
+from src.utils import Config
+from src.utils.dynamic_knowledge_graph import DATASET_SAMPLE_SIZE, generate_dynamic_knowledge_graph
+from src.utils.file_utils import read_csv_rows
+from src.utils.knowledge_graph_cache import create_shape_fingerprint, get_cache_path
+
+logger = logging.getLogger(__name__)
+config = Config()
+
+
+async def prewarm(path: Path) -> None:
+    sample_rows = list(islice(read_csv_rows(path), DATASET_SAMPLE_SIZE))
+    if not sample_rows:
+        print(f"Skipped {path.name}, it is empty")
+        return
+
+    cached = get_cache_path(create_shape_fingerprint(sample_rows)).exists()
+    await generate_dynamic_knowledge_graph(sample_rows)
+    print(f"{'Already cached' if cached else 'Cached'} {path.name}")
+
+
+async def main(directory: Path) -> None:
+    paths = sorted(directory.glob("*.csv"))
+    if not paths:
+        print(f"No CSV datasets found in {directory}")
+        return
+
+    results = await asyncio.gather(*[prewarm(path) for path in paths], return_exceptions=True)
+    for path, result in zip(paths, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to generate the knowledge graph for {path.name}: {result}")
+    print(f"Knowledge graph cache is in {config.knowledge_graph_cache_directory}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-warm the knowledge graph cache from a directory of datasets")
+    parser.add_argument(
+        "--directory", type=Path, default=Path(config.datasets_directory), help="Directory of CSV datasets"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.directory))
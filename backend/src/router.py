@@ -1,19 +1,155 @@
+from collections import OrderedDict
+import contextvars
+from dataclasses import dataclass
+import hashlib
 import logging
-from typing import Tuple, Any
+import re
+from typing import Optional, Tuple, Any
 
 from src.agents.agent import ChatAgentFailure
 from src.utils import to_json, Config
+from src.utils.usage_recorder import CacheStats
 from src.prompts import PromptEngine
-from src.agents import ChatAgent, get_chat_agents
+from src.agents import ChatAgent
+from src.agents.agent_registry import get_agent_registry
 from src.llm import get_llm
+from src.fast_path_router import Route, fast_path_router
 
 logger = logging.getLogger(__name__)
 prompt_engine = PromptEngine()
 config = Config()
 
+# Values that differ between otherwise identical questions: quoted text, numbers such as years, and runs of
+# capitalised words such as company names
+ENTITY_PATTERN = re.compile(r'"[^"]+"|\b\d+(?:[.,]\d+)*\b|\b[A-Z][\w&.\'-]*(?:\s+[A-Z][\w&.\'-]*)*')
+SENTENCE_START_PATTERN = re.compile(r"(^|[.?!:]\s*)$")
+PLACEHOLDER_PATTERN = re.compile(r"\x00(\d+)\x00")
+
+
+def create_question_template(question: str) -> tuple[str, list[str]]:
+    """
+    Mask the entities in a question, so that questions differing only in the companies or years they ask about share
+    a template. The capitalised first word of a sentence is not taken to be an entity.
+    """
+    parts = []
+    entities: list[str] = []
+    position = 0
+    for match in ENTITY_PATTERN.finditer(question):
+        entity = match.group(0)
+        start = match.start()
+        if entity[0].isupper() and SENTENCE_START_PATTERN.search(question[:start]):
+            first_word, _, entity = entity.partition(" ")
+            start += len(first_word) + 1
+            if not entity:
+                continue
+        parts.append(question[position:start])
+        parts.append("<number>" if entity[0].isdigit() else "<entity>")
+        entities.append(entity)
+        position = start + len(entity)
+    parts.append(question[position:])
+    template = " ".join("".join(parts).lower().split()).rstrip("?.! ")
+    return template, entities
+
+
+def template_parameters(parameters: dict[str, Any], entities: list[str]) -> Optional[dict[str, Any]]:
+    """
+    Replace the entities of a question in the parameters chosen for it with placeholders, or None if the parameters
+    cannot be filled in for another question: if any entity is missing from them, or an entity is repeated so that
+    it is ambiguous which to fill in
+    """
+    if not entities:
+        return dict(parameters)
+    if len(set(entities)) != len(entities):
+        return None
+    indexes = {entity: index for index, entity in enumerate(entities)}
+    # Longest first, so that an entity within another, such as "Shell" within "Shell plc", is not replaced in it
+    alternatives = "|".join(re.escape(entity) for entity in sorted(indexes, key=len, reverse=True))
+    pattern = re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)")
+    found = set()
+
+    def replace_entity(match: re.Match) -> str:
+        found.add(match.group(0))
+        return f"\x00{indexes[match.group(0)]}\x00"
+
+    templated = {
+        name: pattern.sub(replace_entity, value) if isinstance(value, str) else value
+        for name, value in parameters.items()
+    }
+    return templated if found == set(indexes) else None
+
+
+def fill_parameters(parameters: dict[str, Any], entities: list[str]) -> dict[str, Any]:
+    return {
+        name: PLACEHOLDER_PATTERN.sub(lambda match: entities[int(match.group(1))], value)
+        if isinstance(value, str)
+        else value
+        for name, value in parameters.items()
+    }
+
+
+@dataclass
+class CachedDecision:
+    agent: str
+    tool: str
+    parameters: dict[str, Any]
+
+
+class RouterDecisionCache:
+    """
+    In-memory LRU cache of the router's decisions, keyed on the question with its entities masked, so that a question
+    about another company or year is routed the same way with its own entities filled into the parameters. Entries
+    are also keyed on the agents and tools available, so a decision is never reused once they change.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, CachedDecision] = OrderedDict()
+        self.stats = CacheStats()
+
+    def create_key(self, template: str, catalogue: str) -> str:
+        catalogue_hash = hashlib.sha256(catalogue.encode()).hexdigest()
+        return f"{catalogue_hash}:{template}"
+
+    def get(self, question: str, catalogue: str) -> Optional[CachedDecision]:
+        template, entities = create_question_template(question)
+        key = self.create_key(template, catalogue)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.stats.hits += 1
+        logger.info(f"Router decision cache hit for '{template}', hit ratio {self.stats.hit_ratio:.2f}")
+        return CachedDecision(entry.agent, entry.tool, fill_parameters(entry.parameters, entities))
+
+    def set(self, question: str, catalogue: str, agent: str, tool: str, parameters: Any) -> None:
+        template, entities = create_question_template(question)
+        templated = template_parameters(parameters, entities) if isinstance(parameters, dict) else None
+        if templated is None:
+            logger.debug(f"Router decision for '{template}' does not refer to its entities, so is not cached")
+            return
+
+        key = self.create_key(template, catalogue)
+        self.entries[key] = CachedDecision(agent, tool, templated)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get_metrics(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "hits": self.stats.hits,
+            "misses": self.stats.misses,
+            "hit_ratio": self.stats.hit_ratio,
+        }
+
+
+router_decision_cache = RouterDecisionCache(config.router_decision_cache_max_entries)
+
 
 def find_selected_agent(name: str) -> ChatAgent | None:
-    return next((agent for agent in get_chat_agents() if agent.name == name), None)
+    return get_agent_registry().get_agent(name)
 
 
 def create_agent_failure_message(chat_agent_failures: list[ChatAgentFailure], excluded_agents: list[str]) -> str:
@@ -30,30 +166,93 @@ def list_excluded_agents(chat_agent_failures: list[ChatAgentFailure]) -> list[st
     return agents_failed_more_than_once
 
 
-async def select_tool_for_question(
-    task: str,
-    chat_agent_failures: list[ChatAgentFailure]
-) -> Tuple[ChatAgent | None, str, dict[str, Any]]:
-    if not config.router_model:
+ToolSelection = Tuple[ChatAgent, str, dict[str, Any]]
+
+
+@dataclass
+class RoutingContext:
+    task: str
+    router_model: str
+    excluded_agents: list[str]
+    catalogue: str
+    # The fast path's prediction, to compare with the route the LLM router chooses
+    prediction: Optional[Route]
+    use_decision_cache: bool
+
+
+# The routing of the question currently being answered by the LLM router, kept until the chosen agent has answered
+# it so that only routes which produced a valid answer are learnt
+current_llm_route: contextvars.ContextVar[Optional[RoutingContext]] = contextvars.ContextVar(
+    "current_llm_route", default=None
+)
+
+
+def route_without_llm(task: str, chat_agent_failures: list[ChatAgentFailure]) -> ToolSelection | RoutingContext:
+    """
+    The route for a question from the fast path or the decision cache, or else what the LLM router needs to route it
+    """
+    current_llm_route.set(None)
+    router_model = config.router_model
+    if not router_model:
         raise Exception("Router config model missing")
 
     excluded_agents = list_excluded_agents(chat_agent_failures)
+    agent_registry = get_agent_registry()
+    chat_agents = agent_registry.get_agents(excluded_agents)
+
+    prediction = None
+    # Retries are left to the LLM router, which is told why the previous attempts failed
+    if config.router_fast_path_enabled and not chat_agent_failures:
+        prediction, confident = fast_path_router.route(task, chat_agents)
+        if prediction and confident and (agent := agent_registry.get_agent(prediction.agent)):
+            return agent, prediction.tool, prediction.parameters or {}
+
+    catalogue = agent_registry.get_catalogue(excluded_agents)
+
+    use_decision_cache = config.router_decision_cache_enabled and not chat_agent_failures
+    decision = router_decision_cache.get(task, catalogue) if use_decision_cache else None
+    if decision and (agent := agent_registry.get_agent(decision.agent)):
+        return agent, decision.tool, decision.parameters
 
-    agents = [
-        agent.get_agent_details()
-        for agent in get_chat_agents() if agent.name not in excluded_agents
-    ]
     logger.info("#####  ~  Calling LLM for next best step  ~  #####")
-    logger.info(f"Agents: {agents}")
     logger.info(f"Excluded agents: {excluded_agents}")
+    return RoutingContext(task, router_model, excluded_agents, catalogue, prediction, use_decision_cache)
+
+
+def confirm_llm_route(selection: ToolSelection) -> None:
+    """
+    Learn the route the LLM router chose for the current question, and cache the decision, once the selected agent
+    has answered it. Routes that were not taken through the LLM router are already known, so are ignored.
+    """
+    context = current_llm_route.get()
+    if context is None:
+        return
+    current_llm_route.set(None)
+
+    agent, tool_name, parameters = selection
+    if config.router_fast_path_enabled:
+        fast_path_router.record_llm_route(context.task, context.prediction, agent.name, tool_name)
+    if context.use_decision_cache:
+        router_decision_cache.set(context.task, context.catalogue, agent.name, tool_name, parameters)
+
+
+async def select_tool_for_question(
+    task: str, chat_agent_failures: list[ChatAgentFailure]
+) -> Optional[ToolSelection]:
+    """
+    The agent and tool to answer a question with, or None if the router chose an agent that does not exist
+    """
+    context = route_without_llm(task, chat_agent_failures)
+    if not isinstance(context, RoutingContext):
+        return context
 
     best_next_step_response = await get_llm(config.router_llm).chat(
-        config.router_model,
-        prompt_engine.load_prompt("agent-selection-system-prompt"),
+        context.router_model,
+        # The agents are listed in the system prompt, so that it is the same on every call for providers to cache
+        prompt_engine.load_prompt("agent-selection-system-prompt", list_of_agents_and_tools=context.catalogue),
         prompt_engine.load_prompt(
             "agent-selection-user-prompt",
-            list_of_agents_and_tools=agents,
-            agent_failure_message=create_agent_failure_message(chat_agent_failures, excluded_agents),
+            agent_failure_message=create_agent_failure_message(chat_agent_failures, context.excluded_agents),
             question=task
         ),
         agent="router",
@@ -62,7 +261,51 @@ async def select_tool_for_question(
 
     best_next_step = to_json(best_next_step_response, "Failed to interpret LLM next step format from step string")
     agent = find_selected_agent(best_next_step["agent"])
+    if agent is None:
+        return None
     tool_name = best_next_step["tool"]
     parameters = best_next_step["parameters"]
 
+    current_llm_route.set(context)
     return agent, tool_name, parameters
+
+
+async def select_tools_for_question(
+    task: str, chat_agent_failures: list[ChatAgentFailure], count: int
+) -> list[ToolSelection]:
+    """
+    Up to count agents and tools to answer a question, the most likely first, for them to be tried at the same time.
+    A route taken without the LLM router is returned alone, as it is certain enough not to need alternatives.
+    """
+    context = route_without_llm(task, chat_agent_failures)
+    if not isinstance(context, RoutingContext):
+        return [context]
+
+    ranking_response = await get_llm(config.router_llm).chat(
+        context.router_model,
+        prompt_engine.load_prompt("agent-ranking-system-prompt", list_of_agents_and_tools=context.catalogue),
+        prompt_engine.load_prompt(
+            "agent-ranking-user-prompt",
+            agent_failure_message=create_agent_failure_message(chat_agent_failures, context.excluded_agents),
+            question=task,
+            count=count,
+        ),
+        agent="router",
+        return_json=True
+    )
+
+    ranking = to_json(ranking_response, "Failed to interpret LLM ranked steps format from step string")
+    selections: list[ToolSelection] = []
+    for candidate in ranking.get("candidates") or []:
+        agent = find_selected_agent(candidate.get("agent", ""))
+        tool_name = candidate.get("tool", "")
+        if agent is None or any(agent is selected and tool_name == name for selected, name, _ in selections):
+            continue
+        selections.append((agent, tool_name, candidate.get("parameters") or {}))
+        if len(selections) == count:
+            break
+
+    if selections:
+        current_llm_route.set(context)
+    logger.info(f"Router ranked {[f'{agent.name} {tool_name}' for agent, tool_name, _ in selections]}")
+    return selections
@@ -1,28 +1,45 @@
-from typing import TypedDict
+from typing import NotRequired, TypedDict
 import logging
 
+from src.utils.tokens import estimate_tokens
+from .redis_session import register_list_session_key
 from .redis_session_middleware import get_session, set_session
 
 logger = logging.getLogger(__name__)
 
 CHAT_SESSION_KEY = "chat"
+CHAT_SUMMARY_SESSION_KEY = "chat_summary"
+register_list_session_key(CHAT_SESSION_KEY)
 
 class Message(TypedDict):
     role: str | None # user or system
     content: str | None
+    # Counted once when the message is added, so the history can be fitted to a token budget without recounting
+    tokens: NotRequired[int]
+
+
+class ChatSummary(TypedDict):
+    # A summary of the messages no longer kept in the chat history
+    text: str
+    tokens: int
 
 
 def get_session_chat() -> list[Message] | None:
     return get_session(CHAT_SESSION_KEY, [])
 
 
+def get_session_chat_summary() -> ChatSummary | None:
+    return get_session(CHAT_SUMMARY_SESSION_KEY) or None
+
+
 def update_session_chat(role=None, content=None):
     chat_session = get_session(CHAT_SESSION_KEY, [])
     if not chat_session:
         chat_session = []
-    chat_session.append({"role": role, "content": content})
+    chat_session.append({"role": role, "content": content, "tokens": estimate_tokens(content)})
     set_session(CHAT_SESSION_KEY, chat_session)
 
 
 def clear_session_chat():
     set_session(CHAT_SESSION_KEY, [])
+    set_session(CHAT_SUMMARY_SESSION_KEY, None)
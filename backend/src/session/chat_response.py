@@ -1,10 +1,12 @@
 import logging
 
+from .redis_session import register_list_session_key
 from .redis_session_middleware import get_session, set_session
 
 logger = logging.getLogger(__name__)
 
 CHAT_RESPONSE_SESSION_KEY = "chatresponse"
+register_list_session_key(CHAT_RESPONSE_SESSION_KEY)
 
 def get_session_chat_response_ids() -> list[str]:
     return get_session(CHAT_RESPONSE_SESSION_KEY, [])
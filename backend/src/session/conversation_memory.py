@@ -0,0 +1,80 @@
+import logging
+
+from src.utils import Config
+from src.utils.tokens import estimate_tokens
+from .chat import CHAT_SESSION_KEY, CHAT_SUMMARY_SESSION_KEY, ChatSummary, Message, get_session_chat
+from .chat import get_session_chat_summary
+from .redis_session import Session
+
+logger = logging.getLogger(__name__)
+config = Config()
+
+NO_CHAT_HISTORY = "There is no chat history"
+
+
+def get_message_tokens(message: Message) -> int:
+    # Messages stored before token counts were cached are counted when read
+    if "tokens" in message:
+        return message["tokens"]
+    return estimate_tokens(message["content"])
+
+
+def format_message(message: Message) -> str:
+    speaker = "User" if message["role"] == "user" else "System"
+    return f"{speaker}: {message['content']}"
+
+
+def select_recent_messages(messages: list[Message], budget_tokens: int) -> list[Message]:
+    """
+    The newest messages whose combined tokens fit within the budget, oldest first
+    """
+    used = 0
+    count = 0
+    for message in reversed(messages):
+        used += get_message_tokens(message)
+        if used > budget_tokens:
+            break
+        count += 1
+    return messages[len(messages) - count :]
+
+
+def format_chat_history(messages: list[Message], summary: ChatSummary | None, budget_tokens: int) -> str:
+    lines = []
+    if summary:
+        lines.append(f"Summary of the earlier conversation: {summary['text']}")
+        budget_tokens -= summary["tokens"]
+    lines.extend(format_message(message) for message in select_recent_messages(messages, budget_tokens))
+    return "\n".join(lines) if lines else NO_CHAT_HISTORY
+
+
+def get_chat_history(budget_tokens: int) -> str:
+    """
+    The summary of the earlier conversation and as many of the newest messages as fit within the budget, so that the
+    size of a prompt does not grow with the length of the conversation
+    """
+    return format_chat_history(get_session_chat() or [], get_session_chat_summary(), budget_tokens)
+
+
+def count_messages_to_summarise(messages: list[Message]) -> int:
+    """
+    The number of the oldest messages to fold into the summary once the history outgrows its window. Messages are
+    folded until about half the window remains, so that a summary is not needed after every message.
+    """
+    remaining = sum(get_message_tokens(message) for message in messages)
+    if remaining <= config.chat_history_window_tokens:
+        return 0
+    count = 0
+    # The newest message is always kept verbatim
+    while remaining > config.chat_history_window_tokens // 2 and count < len(messages) - 1:
+        remaining -= get_message_tokens(messages[count])
+        count += 1
+    return count
+
+
+def apply_summary(session: Session, count: int, text: str) -> None:
+    """
+    Replace the oldest messages of a session's chat history with a summary of them
+    """
+    session.trim(CHAT_SESSION_KEY, count)
+    session[CHAT_SUMMARY_SESSION_KEY] = ChatSummary(text=text, tokens=estimate_tokens(text))
+    logger.info(f"Summarised {count} messages of the chat history for session {session.session_id}")
@@ -0,0 +1,174 @@
+import json
+import logging
+from typing import Any, Optional
+
+from src.utils import Config
+from src.utils.json import try_parse_to_json
+from src.utils.redis_utils import redis_client
+
+logger = logging.getLogger(__name__)
+config = Config()
+
+SESSION_KEY_PREFIX = "session_"
+
+# Session values that only grow, such as the chat history, which are stored as redis lists and appended to
+list_session_keys: set[str] = set()
+
+
+def register_list_session_key(key: str) -> None:
+    list_session_keys.add(key)
+
+
+def get_hash_key(session_id: str) -> str:
+    return SESSION_KEY_PREFIX + session_id
+
+
+def get_list_key(session_id: str, key: str) -> str:
+    return f"{SESSION_KEY_PREFIX}{session_id}_{key}"
+
+
+def get_redis_keys(session_id: str) -> list[str]:
+    return [get_hash_key(session_id)] + [get_list_key(session_id, key) for key in sorted(list_session_keys)]
+
+
+class Session(dict):
+    """
+    The values of a session, stored as a redis hash with one field per key, plus a list for each list session key.
+    The keys read or set during a request are tracked, so that only the values that changed are written back, and
+    values appended to a list are pushed rather than the whole list rewritten.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        fields: Optional[dict[str, str]] = None,
+        lists: Optional[dict[str, list[str]]] = None,
+    ):
+        fields = fields or {}
+        lists = lists or {}
+        super().__init__()
+        for key, value in fields.items():
+            parsed = try_parse_to_json(value)
+            if parsed is not None:
+                super().__setitem__(key, parsed)
+        for key, values in lists.items():
+            if values:
+                super().__setitem__(key, [json.loads(value) for value in values])
+        self.session_id = session_id
+        self.stored_fields = fields
+        # Parsed separately from the values above, as those may be appended to in place
+        self.stored_lists = {key: [json.loads(value) for value in values] for key, values in lists.items()}
+        self.touched: set[str] = set()
+        self.trimmed: dict[str, int] = {}
+        self.cleared = False
+
+    def __getitem__(self, key: str) -> Any:
+        self.touched.add(key)
+        return super().__getitem__(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        self.touched.add(key)
+        return super().get(key, default)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.touched.add(key)
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        self.touched.add(key)
+        super().__delitem__(key)
+
+    def pop(self, key: str, *default: Any) -> Any:
+        self.touched.add(key)
+        return super().pop(key, *default)
+
+    def clear(self) -> None:
+        super().clear()
+        self.cleared = True
+        self.touched.clear()
+        self.trimmed.clear()
+
+    def trim(self, key: str, count: int) -> None:
+        """
+        Remove the first values of a list. They are removed from the stored list with LTRIM, which is safe against
+        values appended to it by concurrent requests.
+        """
+        self.touched.add(key)
+        del super().__getitem__(key)[:count]
+        if not self.cleared:
+            self.stored_lists[key] = self.stored_lists.get(key, [])[count:]
+            self.trimmed[key] = self.trimmed.get(key, 0) + count
+
+    def get_changes(self) -> tuple[dict[str, str], set[str], dict[str, list[str]], set[str]]:
+        """
+        The hash fields to set and to delete, the values to push onto each list, and the lists to replace before
+        they are pushed. A removed list is replaced with no values.
+        """
+        stored_fields = {} if self.cleared else self.stored_fields
+        stored_lists = {} if self.cleared else self.stored_lists
+        fields: dict[str, str] = {}
+        removed_fields: set[str] = set()
+        pushes: dict[str, list[str]] = {}
+        replaced: set[str] = set()
+        for key in self.touched:
+            if key not in self:
+                if key in list_session_keys and stored_lists.get(key):
+                    replaced.add(key)
+                elif key in stored_fields:
+                    removed_fields.add(key)
+                continue
+            value = super().__getitem__(key)
+            if key in list_session_keys and isinstance(value, list):
+                stored = stored_lists.get(key, [])
+                if value[: len(stored)] == stored:
+                    new_values = value[len(stored) :]
+                else:
+                    replaced.add(key)
+                    new_values = value
+                if new_values:
+                    pushes[key] = [json.dumps(item) for item in new_values]
+            else:
+                serialised = json.dumps(value)
+                if serialised != stored_fields.get(key):
+                    fields[key] = serialised
+        return fields, removed_fields, pushes, replaced
+
+    async def save(self) -> None:
+        fields, removed_fields, pushes, replaced = self.get_changes()
+        if not (self.cleared or fields or removed_fields or pushes or replaced or self.trimmed):
+            return
+
+        hash_key = get_hash_key(self.session_id)
+        pipeline = redis_client.pipeline()
+        if self.cleared:
+            pipeline.delete(*get_redis_keys(self.session_id))
+        elif replaced:
+            pipeline.delete(*[get_list_key(self.session_id, key) for key in replaced])
+        for key, count in self.trimmed.items():
+            if key not in replaced:
+                pipeline.ltrim(get_list_key(self.session_id, key), count, -1)
+        if fields:
+            pipeline.hset(hash_key, mapping=fields)
+        if removed_fields:
+            pipeline.hdel(hash_key, *sorted(removed_fields))
+        for key, values in pushes.items():
+            pipeline.rpush(get_list_key(self.session_id, key), *values)
+        for key in get_redis_keys(self.session_id):
+            pipeline.expire(key, config.session_ttl_seconds)
+        await pipeline.execute()
+        logger.debug(f"Stored session fields {list(fields)} and lists {list(pushes)} for {self.session_id}")
+
+
+async def load_session(session_id: str) -> Session:
+    """
+    Read a session and extend its expiry in a single round trip
+    """
+    pipeline = redis_client.pipeline(transaction=False)
+    pipeline.hgetall(get_hash_key(session_id))
+    keys = sorted(list_session_keys)
+    for key in keys:
+        pipeline.lrange(get_list_key(session_id, key), 0, -1)
+    for redis_key in get_redis_keys(session_id):
+        pipeline.expire(redis_key, config.session_ttl_seconds)
+    results = await pipeline.execute()
+    return Session(session_id, results[0], dict(zip(keys, results[1 : len(keys) + 1])))
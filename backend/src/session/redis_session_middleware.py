@@ -1,10 +1,8 @@
-import json
 from typing import Optional
 from uuid import uuid4
-import redis
-from src.utils import test_redis_connection
+from src.session.redis_session import Session, load_session
 from src.utils import Config
-from src.utils import try_parse_to_json
+from src.utils.redis_utils import redis_health
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 import contextvars
@@ -17,34 +15,46 @@ REQUEST_CONTEXT_KEY = "redis_session_context"
 SESSION_COOKIE_NAME = "session_id"
 
 request_context = contextvars.ContextVar(REQUEST_CONTEXT_KEY)
-redis_client = redis.Redis(host=config.redis_host, port=6379, decode_responses=True)
 
 
 class RedisSessionMiddleware(BaseHTTPMiddleware):
+    """
+    Load the session from redis before a request and store the values that changed after it, with at most one read
+    and one write. Whether redis is reachable is tracked by a background health probe rather than checked on each
+    request.
+    """
+
     async def dispatch(self, request: Request, call_next):
         request_context.set(request)
 
-        redis_healthy = test_redis_connection()
-
-        if (not redis_healthy or ignore_request(request)):
-            response = await call_next(request)
-        else:
-            session_data = get_redis_session(request)
-            request.state.session = session_data
-
-            response = await call_next(request)
-
-            session_id = request.cookies.get(SESSION_COOKIE_NAME) or str(uuid4())
-            response.set_cookie(
-                SESSION_COOKIE_NAME,
-                session_id,
-                domain=request.url.hostname,
-                samesite='strict',
-                httponly=True,
-                secure=config.redis_host != "redis"
-            )
-
-            redis_client.set(session_id, json.dumps(request.state.session))
+        if not redis_health.healthy or ignore_request(request):
+            return await call_next(request)
+
+        try:
+            session = await get_redis_session(request)
+        except Exception as e:
+            logger.warning(f"Unable to read session from redis: {e}")
+            redis_health.mark_unhealthy()
+            request.state.session = {}
+            return await call_next(request)
+        request.state.session = session
+
+        response = await call_next(request)
+
+        response.set_cookie(
+            SESSION_COOKIE_NAME,
+            session.session_id,
+            domain=request.url.hostname,
+            samesite='strict',
+            httponly=True,
+            secure=config.redis_host != "redis"
+        )
+
+        try:
+            await session.save()
+        except Exception as e:
+            logger.warning(f"Unable to store session in redis: {e}")
+            redis_health.mark_unhealthy()
 
         return response
 
@@ -66,22 +76,25 @@ def set_session(key: str, value):
     request.state.session[key] = value
 
 
+def get_session_id() -> Optional[str]:
+    request: Request = request_context.get()
+    session = getattr(request.state, "session", None)
+    # Requests made while redis is unavailable have no stored session
+    return session.session_id if isinstance(session, Session) else None
+
+
 def reset_session():
     logger.info("Reset chat session")
     request: Request = request_context.get()
-    request.state.session = {}
-    logger.info(f"db size {redis_client.dbsize()}")
+    # Cleared rather than replaced, so that the stored session is deleted when the request completes
+    request.state.session.clear()
 
 
-def get_redis_session(request: Request):
+async def get_redis_session(request: Request) -> Session:
     session_id = request.cookies.get(SESSION_COOKIE_NAME)
-    logger.info(f"Attempting to get session for session_id: {session_id}")
+    logger.debug(f"Attempting to get session for session_id: {session_id}")
     if session_id:
-        session_data = redis_client.get(session_id)
-        logger.info(f"***************** Session data retrieved from Redis for {session_id}: {session_data}")
-        if session_data and isinstance(session_data, str):
-            parsed_session_data = try_parse_to_json(session_data)
-            if parsed_session_data:
-                return parsed_session_data
-    return {}
+        return await load_session(session_id)
+    # A new session has nothing stored to read
+    return Session(str(uuid4()))
 
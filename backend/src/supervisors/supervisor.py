@@ -1,12 +1,15 @@
 import asyncio
 import logging
+from typing import Optional
 
 from src.agents.agent import ChatAgentSuccess, ChatAgentFailure
-from src.utils import update_scratchpad
-from src.router import select_tool_for_question
+from src.llm.scheduler import llm_token_budget
+from src.utils import Config, update_scratchpad
+from src.router import ToolSelection, confirm_llm_route, select_tool_for_question, select_tools_for_question
 from src.agents import get_generalist_agent
 
 logger = logging.getLogger(__name__)
+config = Config()
 
 no_questions_response = "No questions found to solve"
 unsolvable_response = "I am sorry, but I was unable to find an answer to this task"
@@ -32,16 +35,20 @@ async def solve_questions(questions: list[str]) -> None:
 async def solve_question(question) -> ChatAgentSuccess:
     chat_agent_failures = []
     for attempt in range(number_of_attempts):
-        agent, tool_name, parameters = await select_tool_for_question(question, chat_agent_failures)
-        if agent is None:
+        # The first attempt may try the router's top ranked agents at once, rather than one after the other
+        if attempt == 0 and config.router_speculative_enabled:
+            selections = await select_tools_for_question(
+                question, chat_agent_failures, config.router_speculative_candidates
+            )
+        else:
+            selection = await select_tool_for_question(question, chat_agent_failures)
+            selections = [selection] if selection is not None else []
+        if not selections:
             break
 
-        answer = await agent.invoke(question, tool_name, parameters)
-        logger.info(f"Agent answer: {answer} ")
-        if isinstance(answer, ChatAgentSuccess):
+        answer = await invoke_selections(question, selections, chat_agent_failures)
+        if answer is not None:
             return answer
-        else:
-            chat_agent_failures.append(answer)
 
     logger.info("Defaulting to Generalist Agent")
     answer = await get_generalist_agent().generalist_answer(question)
@@ -49,3 +56,64 @@ async def solve_question(question) -> ChatAgentSuccess:
         return answer
     else:
         raise Exception(f"Could not create answer for question: {question}")
+
+
+async def invoke_selections(
+    question, selections: list[ToolSelection], chat_agent_failures: list[ChatAgentFailure]
+) -> Optional[ChatAgentSuccess]:
+    """
+    Invoke the selected agents at the same time, returning the first answer to pass validation and cancelling the
+    rest. Once they have used the token budget of a speculative round, all but the best ranked agent still running are
+    cancelled, so that trying alternatives never costs more than the budget and one agent. The failures are recorded
+    best ranked first, and only the route that answered is learnt by the router.
+    """
+    if len(selections) == 1:
+        agent, tool_name, parameters = selections[0]
+        answer = await agent.invoke(question, tool_name, parameters)
+        logger.info(f"Agent answer: {answer} ")
+        if isinstance(answer, ChatAgentSuccess):
+            confirm_llm_route(selections[0])
+            return answer
+        chat_agent_failures.append(answer)
+        return None
+
+    with llm_token_budget(config.router_speculative_token_budget) as budget:
+        # Tasks created within the budget count the tokens of their LLM calls against it
+        tasks = [
+            asyncio.create_task(agent.invoke(question, tool_name, parameters))
+            for agent, tool_name, parameters in selections
+        ]
+    budget_exhausted: Optional[asyncio.Task] = asyncio.create_task(budget.exhausted.wait())
+    failures: dict[int, ChatAgentFailure] = {}
+    pending = set(tasks)
+    try:
+        while pending:
+            waiting = pending | {budget_exhausted} if budget_exhausted else pending
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            for rank, task in enumerate(tasks):
+                if task not in done:
+                    continue
+                pending.discard(task)
+                answer = task.result()
+                logger.info(f"Agent answer: {answer} ")
+                if isinstance(answer, ChatAgentSuccess):
+                    logger.info(f"Speculative routing answered with rank {rank + 1} of {len(tasks)} agents")
+                    confirm_llm_route(selections[rank])
+                    return answer
+                failures[rank] = answer
+
+            if budget_exhausted in done:
+                budget_exhausted = None
+                best_ranked = min(pending, key=tasks.index, default=None)
+                cancelled = pending - {best_ranked}
+                for task in cancelled:
+                    task.cancel()
+                pending -= cancelled
+                logger.info(f"Speculative routing used {budget.used} tokens, cancelled {len(cancelled)} agents")
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+        if budget_exhausted:
+            budget_exhausted.cancel()
+        chat_agent_failures.extend(failures[rank] for rank in sorted(failures))
@@ -0,0 +1,390 @@
+import logging
+import re
+from dataclasses import dataclass, field
+from itertools import chain, islice
+from typing import Iterable, Optional
+
+import numpy as np
+
+from src.utils.metric_views import ColumnRoles, find_column_roles, parse_number, parse_year, SAMPLE_SIZE
+
+logger = logging.getLogger(__name__)
+
+AGGREGATIONS = {
+    "average": ("average", "avg", "mean"),
+    "sum": ("sum", "total"),
+    "count": ("count", "number of", "how many"),
+    "max": ("max", "maximum", "highest", "largest", "most"),
+    "min": ("min", "minimum", "lowest", "smallest", "least"),
+}
+DESCENDING_WORDS = ("desc", "descending", "highest", "largest", "top", "most", "best")
+ASCENDING_WORDS = ("asc", "ascending", "lowest", "smallest", "bottom", "least", "worst")
+LATEST_WORDS = ("latest", "most recent", "current", "this year")
+YEAR_RANGE_PATTERN = re.compile(r"\b(\d{4})\s*(?:-|–|to|until|and)\s*(\d{4})\b")
+YEAR_PATTERN = re.compile(r"\b(\d{4})\b")
+# Questions for an ordered list, rather than the single entry with the highest or lowest value
+LIST_WORDS = ("top", "bottom", "rank", "ranked", "ranking", "list", "order", "sort", "sorted")
+GROUP_BY_PREFIXES = ("by", "per", "each", "every", "across", "by each", "for each", "grouped by")
+LIMIT_PATTERN = re.compile(r"\b(?:top|bottom|first|last)\s+(\d+)\b")
+# Suffixes of company names that questions tend to leave out, e.g. "Apple" for "Apple Inc"
+COMPANY_SUFFIXES = {"inc", "corp", "corporation", "co", "company", "plc", "ltd", "limited", "group", "holdings"}
+# Shorter values, such as a single letter identifier, would match ordinary words in questions
+MIN_VALUE_LENGTH = 3
+
+
+def normalise(text: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+
+def mentions(text: str, phrase: str) -> bool:
+    """
+    Whether the normalised text contains the normalised phrase as whole words
+    """
+    return bool(phrase) and f" {phrase} " in f" {text} "
+
+
+def get_column_names(column: str) -> set[str]:
+    """
+    The ways a column may be referred to in a question, e.g. "company" or "companies" for `Company Name`
+    """
+    name = normalise(column)
+    names = {name, name.removesuffix(" name")}
+    return names | {f"{name}s" for name in names} | {f"{name[:-1]}ies" for name in names if name.endswith("y")}
+
+
+def mentions_column(text: str, column: str, prefixes: tuple[str, ...] = ("",)) -> bool:
+    return any(mentions(text, f"{prefix} {name}".strip()) for name in get_column_names(column) for prefix in prefixes)
+
+
+def mentions_metric(text: str, metric: str) -> bool:
+    """
+    Whether the text mentions every word of a metric, in any order, e.g. "environmental ESG score" for
+    `ESG score (Environmental)`
+    """
+    words = normalise(metric).split()
+    return bool(words) and set(words) <= set(text.split())
+
+
+def get_dataset_names(name: str) -> set[str]:
+    """
+    The ways a dataset may be named in a question, e.g. "esg poc" or its namespace "EsgPoc_" for esg_poc
+    """
+    return {normalise(name), normalise(name).replace(" ", "")}
+
+
+def get_value_names(value: str, entity: bool) -> set[str]:
+    names = {normalise(value)}
+    if entity:
+        words = normalise(value).split()
+        while len(words) > 1 and words[-1] in COMPANY_SUFFIXES:
+            words.pop()
+            names.add(" ".join(words))
+    return {name for name in names if len(name) >= MIN_VALUE_LENGTH}
+
+
+@dataclass
+class ColumnarDataset:
+    """
+    An in-memory columnar copy of a dataset: a float array for each numeric column, with missing values as NaN, and
+    an object array for each other column
+    """
+
+    name: str
+    roles: ColumnRoles
+    numeric: dict[str, np.ndarray]
+    categorical: dict[str, np.ndarray]
+    years: Optional[np.ndarray]
+    entity: Optional[str]
+    row_count: int
+    # The names each distinct value of a categorical column may be mentioned by in a question
+    categories: dict[str, dict[str, str]] = field(default_factory=dict)
+
+    @classmethod
+    def from_rows(cls, name: str, rows: Iterable[list[str]]) -> "ColumnarDataset":
+        rows = iter(rows)
+        sample_rows = list(islice(rows, SAMPLE_SIZE))
+        headers = sample_rows[0]
+        roles = find_column_roles(sample_rows)
+        values: list[list[str]] = [[] for _ in headers]
+        for row in chain(sample_rows[1:], rows):
+            for index in range(len(headers)):
+                values[index].append(row[index].strip() if index < len(row) else "")
+
+        numeric = {
+            header: np.array([parse_number(value) for value in values[index]], dtype=float)
+            for index, header in roles.metrics.items()
+        }
+        categorical = {
+            header: np.array(values[index], dtype=object)
+            for index, header in enumerate(headers)
+            if index not in roles.metrics and index != roles.time
+        }
+        years = None
+        if roles.time is not None:
+            years = np.array([parse_year(value) for value in values[roles.time]], dtype=float)
+        dataset = cls(
+            name=name,
+            roles=roles,
+            numeric=numeric,
+            categorical=categorical,
+            years=years,
+            entity=headers[roles.entity] if roles.entity is not None else None,
+            row_count=len(values[0]) if values else 0,
+        )
+        dataset.categories = {
+            header: {
+                name: value
+                for value in np.unique(column)
+                for name in get_value_names(value, entity=header == dataset.entity)
+            }
+            for header, column in categorical.items()
+        }
+        return dataset
+
+
+@dataclass
+class TabularQuery:
+    metric: Optional[str]
+    aggregation: Optional[str] = None
+    group_by: Optional[str] = None
+    filters: dict[str, list[str]] = field(default_factory=dict)
+    years: Optional[tuple[int, int]] = None
+    latest_year: bool = False
+    descending: Optional[bool] = None
+    limit: Optional[int] = None
+    # Other columns the question refers to, which are counted distinctly or included in listed rows
+    columns: list[str] = field(default_factory=list)
+
+
+def find_aggregation(text: str) -> Optional[str]:
+    for aggregation, words in AGGREGATIONS.items():
+        if any(mentions(text, normalise(word)) for word in words):
+            return aggregation
+    return None
+
+
+def find_sort_order(text: str) -> Optional[bool]:
+    if any(mentions(text, word) for word in DESCENDING_WORDS):
+        return True
+    if any(mentions(text, word) for word in ASCENDING_WORDS):
+        return False
+    return None
+
+
+def find_years(timeframe: str) -> tuple[Optional[tuple[int, int]], bool]:
+    if year_range := YEAR_RANGE_PATTERN.search(timeframe):
+        first, last = sorted((int(year_range.group(1)), int(year_range.group(2))))
+        return (first, last), False
+    if year := YEAR_PATTERN.search(timeframe):
+        return (int(year.group(1)), int(year.group(1))), False
+    return None, any(mentions(normalise(timeframe), normalise(word)) for word in LATEST_WORDS)
+
+
+def interpret(
+    dataset: ColumnarDataset,
+    question_intent: str,
+    operation: str,
+    question_params: str,
+    aggregation: str,
+    sort_order: str,
+    timeframe: str,
+) -> Optional[TabularQuery]:
+    """
+    Map the parameters the router extracts from a question onto the columns and values of the dataset. Returns None
+    if the question does not name a metric of the dataset, or a count, to compute.
+    """
+    subject = normalise(f"{question_params} {question_intent}")
+    everything = normalise(f"{question_params} {question_intent} {operation}")
+
+    # The most specific column mentioned, so that `ESG score (Social)` is preferred over `ESG score`
+    metrics = sorted(
+        (name for name in dataset.numeric if mentions_metric(subject, name)),
+        key=lambda name: (len(normalise(name).split()), len(name)),
+        reverse=True,
+    )
+    query = TabularQuery(
+        metric=metrics[0] if metrics else None,
+        aggregation=find_aggregation(normalise(aggregation)),
+        descending=find_sort_order(normalise(f"{sort_order} {operation} {question_intent}")),
+    )
+    if query.metric is None and query.aggregation != "count":
+        return None
+
+    for column, values in dataset.categories.items():
+        matched = list(dict.fromkeys(value for name, value in values.items() if mentions(everything, name)))
+        if matched:
+            query.filters[column] = matched
+        elif query.aggregation and mentions_column(everything, column, GROUP_BY_PREFIXES):
+            query.group_by = query.group_by or column
+        elif mentions_column(everything, column):
+            query.columns.append(column)
+
+    if not (query.aggregation or query.filters or query.descending is not None):
+        # Listing every row is never the answer, so a value the question is about was not found in the dataset
+        return None
+
+    query.years, query.latest_year = find_years(timeframe)
+    if limit := LIMIT_PATTERN.search(everything):
+        query.limit = int(limit.group(1))
+    elif (
+        query.descending is not None
+        and query.group_by is None
+        and not query.aggregation
+        and not any(mentions(subject, word) for word in LIST_WORDS)
+    ):
+        # e.g. "Which company has the highest ESG score?" returns every entity tied at the top
+        query.limit = 1
+    return query
+
+
+def execute(dataset: ColumnarDataset, query: TabularQuery) -> list[dict]:
+    """
+    Run a query over the columns of a dataset with vectorised NumPy operations
+    """
+    mask = np.ones(dataset.row_count, dtype=bool)
+    for column, values in query.filters.items():
+        mask &= np.isin(dataset.categorical[column], values)
+    if dataset.years is not None:
+        if query.years is not None:
+            mask &= (dataset.years >= query.years[0]) & (dataset.years <= query.years[1])
+        elif query.latest_year and mask.any():
+            mask &= dataset.years == np.nanmax(dataset.years[mask])
+
+    metric_values = dataset.numeric[query.metric] if query.metric else np.zeros(dataset.row_count)
+    if query.metric:
+        mask &= ~np.isnan(metric_values)
+    values = metric_values[mask]
+    label = f"{query.aggregation}_{query.metric}" if query.metric else "count"
+
+    if query.aggregation and query.group_by:
+        groups, inverse = np.unique(dataset.categorical[query.group_by][mask], return_inverse=True)
+        results = aggregate_groups(query.aggregation, values, inverse, len(groups))
+        records = [{query.group_by: group, label: float(result)} for group, result in zip(groups, results)]
+        return sort_records(records, label, query)
+
+    if query.aggregation == "count" and query.columns:
+        # e.g. "How many companies are in the Airlines industry?" counts each company once
+        return [{f"count_{column}": len(np.unique(dataset.categorical[column][mask])) for column in query.columns}]
+
+    if query.aggregation:
+        if not len(values):
+            return []
+        return [{label: float(aggregate_all(query.aggregation, values))}]
+
+    if query.metric is None:
+        # Questions without a metric are only answered when they are counts
+        return []
+
+    columns = [name for name in (*query.columns, dataset.entity, *query.filters) if name]
+    records = [
+        {
+            **{column: dataset.categorical[column][index] for column in dict.fromkeys(columns)},
+            **({"year": int(dataset.years[index])} if dataset.years is not None else {}),
+            query.metric: float(dataset.numeric[query.metric][index]),
+        }
+        for index in np.flatnonzero(mask)
+    ]
+    return sort_records(records, query.metric, query)
+
+
+def aggregate_groups(aggregation: str, values: np.ndarray, inverse: np.ndarray, group_count: int) -> np.ndarray:
+    counts = np.bincount(inverse, minlength=group_count)
+    if aggregation == "count":
+        return counts
+    if aggregation in ("sum", "average"):
+        sums = np.bincount(inverse, weights=values, minlength=group_count)
+        return sums if aggregation == "sum" else sums / counts
+    extremes = np.full(group_count, -np.inf if aggregation == "max" else np.inf)
+    (np.maximum if aggregation == "max" else np.minimum).at(extremes, inverse, values)
+    return extremes
+
+
+def aggregate_all(aggregation: str, values: np.ndarray) -> float:
+    match aggregation:
+        case "count":
+            return len(values)
+        case "sum":
+            return values.sum()
+        case "average":
+            return values.mean()
+        case "max":
+            return values.max()
+        case _:
+            return values.min()
+
+
+def sort_records(records: list[dict], key: str, query: TabularQuery) -> list[dict]:
+    if query.descending is None:
+        return records[: query.limit] if query.limit else records
+    records.sort(key=lambda record: record[key], reverse=query.descending)
+    if query.limit and len(records) > query.limit:
+        # Entries tied with the last one returned are kept, rather than arbitrarily dropped
+        cutoff = records[query.limit - 1][key]
+        return [record for index, record in enumerate(records) if index < query.limit or record[key] == cutoff]
+    return records
+
+
+class ColumnarStore:
+    def __init__(self):
+        self.datasets: dict[str, ColumnarDataset] = {}
+
+    def load(self, name: str, rows: Iterable[list[str]]) -> None:
+        self.datasets[name] = ColumnarDataset.from_rows(name, rows)
+        logger.info(f"Loaded {self.datasets[name].row_count} rows of {name} into the columnar engine")
+
+    def find_named_datasets(self, text: str) -> list[ColumnarDataset]:
+        """
+        The datasets a question names. A name that is part of another named dataset's name, such as bloomberg in
+        "bloomberg_2", is not counted.
+        """
+        named = [
+            dataset
+            for dataset in self.datasets.values()
+            if any(mentions(text, name) for name in get_dataset_names(dataset.name))
+        ]
+        return [
+            dataset
+            for dataset in named
+            if not any(
+                other is not dataset and mentions(normalise(other.name), normalise(dataset.name)) for other in named
+            )
+        ]
+
+    def query(
+        self,
+        question_intent: str,
+        operation: str,
+        question_params: str,
+        aggregation: str,
+        sort_order: str,
+        timeframe: str,
+    ) -> Optional[list[dict]]:
+        """
+        Answer a question from the dataset it names, or otherwise the one whose columns and values it mentions most.
+        Datasets that match it equally well, such as two sharing a schema, are resolved to the one loaded first.
+        Returns None if no dataset has the columns it needs.
+        """
+        datasets = self.find_named_datasets(normalise(f"{question_params} {question_intent}"))
+        candidates = []
+        for dataset in datasets or self.datasets.values():
+            query = interpret(
+                dataset, question_intent, operation, question_params, aggregation, sort_order, timeframe
+            )
+            if query is not None:
+                matches = bool(query.metric) + len(query.filters) + bool(query.group_by)
+                specificity = len(normalise(query.metric).split()) if query.metric else 0
+                candidates.append(((matches, specificity), dataset, query))
+        if not candidates:
+            return None
+
+        best_match = max(match for match, _, _ in candidates)
+        best_candidates = [(dataset, query) for match, dataset, query in candidates if match == best_match]
+        dataset, query = best_candidates[0]
+        if len(best_candidates) > 1:
+            names = ", ".join(dataset.name for dataset, _ in best_candidates)
+            logger.info(f"Question matches {names} equally well, answering from {dataset.name} as it was loaded first")
+        logger.info(f"Answering from {dataset.name} in the columnar engine with {query}")
+        return execute(dataset, query)
+
+
+columnar_store = ColumnarStore()
@@ -41,10 +41,62 @@ class Config(object):
         self.router_model = None
         self.file_agent_llm = None
         self.redis_host = default_redis_host
+        self.redis_max_connections = 50
+        self.redis_health_check_interval = 5.0
+        self.session_ttl_seconds = 24 * 60 * 60
+        self.chat_history_window_tokens = 2000
+        self.intent_chat_history_tokens = 1500
+        self.suggestions_chat_history_tokens = 500
+        self.intent_report_tokens = 2000
+        self.suggestions_report_tokens = 1000
         self.suggestions_model = None
         self.dynamic_knowledge_graph_model = None
         self.allowed_chat_agents = None
         self.llm_usage_log_filename = "llm_usage.csv"
+        self.router_decisions_log_filename = "router_decisions.jsonl"
+        self.router_fast_path_enabled = True
+        self.router_fast_path_confidence = 0.9
+        self.router_fast_path_min_examples = 20
+        self.router_decision_cache_enabled = True
+        self.router_decision_cache_max_entries = 1000
+        self.router_speculative_enabled = False
+        self.router_speculative_candidates = 3
+        self.router_speculative_token_budget = 30000
+        self.llm_max_connections = 100
+        self.llm_max_keepalive_connections = 20
+        self.llm_keepalive_expiry = 30.0
+        self.llm_timeout = 120.0
+        self.llm_connect_timeout = 10.0
+        self.llm_cache_enabled = False
+        self.llm_cache_ttl_seconds = 86400
+        self.llm_cache_max_entries = 10000
+        self.llm_cache_excluded_agents = []
+        self.retrieval_chunk_size = 300
+        self.retrieval_chunk_overlap = 50
+        self.retrieval_top_k = 8
+        self.retrieval_index_cache_size = 32
+        self.llm_max_concurrency = 16
+        self.llm_max_concurrency_per_model = 8
+        self.openai_tokens_per_minute = 0
+        self.mistral_tokens_per_minute = 0
+        self.lmstudio_tokens_per_minute = 0
+        self.llm_max_retries = 3
+        self.llm_retry_base_delay = 1.0
+        self.llm_retry_max_delay = 30.0
+        self.neo4j_max_connection_pool_size = 50
+        self.neo4j_connection_acquisition_timeout = 60.0
+        self.neo4j_query_timeout = 30.0
+        self.neo4j_ingest_batch_size = 1000
+        self.neo4j_delete_batch_size = 10000
+        self.datasets_directory = "./datasets"
+        self.knowledge_graph_cache_enabled = True
+        self.metric_views_enabled = True
+        self.columnar_engine_enabled = True
+        self.knowledge_graph_cache_directory = "./knowledge_graph_cache"
+        self.query_cache_enabled = True
+        self.query_cache_max_bytes = 64 * 1024 * 1024
+        self.cypher_plan_cache_enabled = False
+        self.cypher_plan_cache_ttl_seconds = 7 * 86400
         self.load_env()
 
     def load_env(self):
@@ -88,10 +140,66 @@ class Config(object):
             self.chart_generator_model = os.getenv("CHART_GENERATOR_MODEL")
             self.router_model = os.getenv("ROUTER_MODEL")
             self.redis_host = os.getenv("REDIS_HOST", default_redis_host)
+            self.redis_max_connections = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+            self.redis_health_check_interval = float(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 5.0))
+            self.session_ttl_seconds = int(os.getenv("SESSION_TTL_SECONDS", 24 * 60 * 60))
+            self.chat_history_window_tokens = int(os.getenv("CHAT_HISTORY_WINDOW_TOKENS", 2000))
+            self.intent_chat_history_tokens = int(os.getenv("INTENT_CHAT_HISTORY_TOKENS", 1500))
+            self.suggestions_chat_history_tokens = int(os.getenv("SUGGESTIONS_CHAT_HISTORY_TOKENS", 500))
+            self.intent_report_tokens = int(os.getenv("INTENT_REPORT_TOKENS", 2000))
+            self.suggestions_report_tokens = int(os.getenv("SUGGESTIONS_REPORT_TOKENS", 1000))
             self.suggestions_model = os.getenv("SUGGESTIONS_MODEL")
             self.dynamic_knowledge_graph_model = os.getenv("DYNAMIC_KNOWLEDGE_GRAPH_MODEL")
             self.file_agent_model = os.getenv("FILE_AGENT_MODEL")
             self.llm_usage_log_filename = os.getenv("LLM_USAGE_LOG_FILENAME", "llm_usage.csv")
+            self.router_decisions_log_filename = os.getenv("ROUTER_DECISIONS_LOG_FILENAME", "router_decisions.jsonl")
+            self.router_fast_path_enabled = os.getenv("ROUTER_FAST_PATH_ENABLED", "true").lower() == "true"
+            self.router_fast_path_confidence = float(os.getenv("ROUTER_FAST_PATH_CONFIDENCE", 0.9))
+            self.router_fast_path_min_examples = int(os.getenv("ROUTER_FAST_PATH_MIN_EXAMPLES", 20))
+            self.router_decision_cache_enabled = os.getenv("ROUTER_DECISION_CACHE_ENABLED", "true").lower() == "true"
+            self.router_decision_cache_max_entries = int(os.getenv("ROUTER_DECISION_CACHE_MAX_ENTRIES", 1000))
+            self.router_speculative_enabled = os.getenv("ROUTER_SPECULATIVE_ENABLED", "false").lower() == "true"
+            self.router_speculative_candidates = int(os.getenv("ROUTER_SPECULATIVE_CANDIDATES", 3))
+            self.router_speculative_token_budget = int(os.getenv("ROUTER_SPECULATIVE_TOKEN_BUDGET", 30000))
+            self.llm_max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", 100))
+            self.llm_max_keepalive_connections = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 20))
+            self.llm_keepalive_expiry = float(os.getenv("LLM_KEEPALIVE_EXPIRY", 30.0))
+            self.llm_timeout = float(os.getenv("LLM_TIMEOUT", 120.0))
+            self.llm_connect_timeout = float(os.getenv("LLM_CONNECT_TIMEOUT", 10.0))
+            self.llm_cache_enabled = os.getenv("LLM_CACHE_ENABLED", "false").lower() == "true"
+            self.llm_cache_ttl_seconds = int(os.getenv("LLM_CACHE_TTL_SECONDS", 86400))
+            self.llm_cache_max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+            self.llm_cache_excluded_agents = (
+                os.getenv("LLM_CACHE_EXCLUDED_AGENTS", "").split(",") if os.getenv("LLM_CACHE_EXCLUDED_AGENTS") else []
+            )
+            self.retrieval_chunk_size = int(os.getenv("RETRIEVAL_CHUNK_SIZE", 300))
+            self.retrieval_chunk_overlap = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", 50))
+            self.retrieval_top_k = int(os.getenv("RETRIEVAL_TOP_K", 8))
+            self.retrieval_index_cache_size = int(os.getenv("RETRIEVAL_INDEX_CACHE_SIZE", 32))
+            self.llm_max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+            self.llm_max_concurrency_per_model = int(os.getenv("LLM_MAX_CONCURRENCY_PER_MODEL", 8))
+            self.openai_tokens_per_minute = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", 0))
+            self.mistral_tokens_per_minute = int(os.getenv("MISTRAL_TOKENS_PER_MINUTE", 0))
+            self.lmstudio_tokens_per_minute = int(os.getenv("LMSTUDIO_TOKENS_PER_MINUTE", 0))
+            self.llm_max_retries = int(os.getenv("LLM_MAX_RETRIES", 3))
+            self.llm_retry_base_delay = float(os.getenv("LLM_RETRY_BASE_DELAY", 1.0))
+            self.llm_retry_max_delay = float(os.getenv("LLM_RETRY_MAX_DELAY", 30.0))
+            self.neo4j_max_connection_pool_size = int(os.getenv("NEO4J_MAX_CONNECTION_POOL_SIZE", 50))
+            self.neo4j_connection_acquisition_timeout = float(os.getenv("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", 60.0))
+            self.neo4j_query_timeout = float(os.getenv("NEO4J_QUERY_TIMEOUT", 30.0))
+            self.neo4j_ingest_batch_size = int(os.getenv("NEO4J_INGEST_BATCH_SIZE", 1000))
+            self.neo4j_delete_batch_size = int(os.getenv("NEO4J_DELETE_BATCH_SIZE", 10000))
+            self.datasets_directory = os.getenv("DATASETS_DIRECTORY", "./datasets")
+            self.knowledge_graph_cache_enabled = os.getenv("KNOWLEDGE_GRAPH_CACHE_ENABLED", "true").lower() == "true"
+            self.metric_views_enabled = os.getenv("METRIC_VIEWS_ENABLED", "true").lower() == "true"
+            self.columnar_engine_enabled = os.getenv("COLUMNAR_ENGINE_ENABLED", "true").lower() == "true"
+            self.knowledge_graph_cache_directory = os.getenv(
+                "KNOWLEDGE_GRAPH_CACHE_DIRECTORY", "./knowledge_graph_cache"
+            )
+            self.query_cache_enabled = os.getenv("QUERY_CACHE_ENABLED", "true").lower() == "true"
+            self.query_cache_max_bytes = int(os.getenv("QUERY_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+            self.cypher_plan_cache_enabled = os.getenv("CYPHER_PLAN_CACHE_ENABLED", "false").lower() == "true"
+            self.cypher_plan_cache_ttl_seconds = int(os.getenv("CYPHER_PLAN_CACHE_TTL_SECONDS", 7 * 86400))
             self.allowed_chat_agents = (
                 os.getenv("ALLOWED_CHAT_AGENTS", "").split(",") if os.getenv("ALLOWED_CHAT_AGENTS") else None
             )
@@ -0,0 +1,80 @@
+import contextvars
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+from src.utils import Config
+from src.utils.redis_utils import redis_client
+
+logger = logging.getLogger(__name__)
+config = Config()
+
+PLAN_KEY_PREFIX = "cypher_plan_"
+
+
+@dataclass
+class CypherPlan:
+    key: str
+    query: str
+    from_cache: bool
+
+
+# The plan used by the datastore tool for the question currently being answered, kept until its answer has been
+# validated so that only plans which produced a valid answer are cached
+current_plan: contextvars.ContextVar[Optional[CypherPlan]] = contextvars.ContextVar("current_plan", default=None)
+
+
+def create_plan_key(graph_schema: str, **tool_parameters: str) -> str:
+    """
+    Key a plan by the tool parameters it answers and the graph schema it was written against, so that plans are not
+    reused once the datasets have been reloaded into a different schema
+    """
+    normalised = {name: " ".join(str(value).lower().split()) for name, value in sorted(tool_parameters.items())}
+    return PLAN_KEY_PREFIX + hashlib.sha256(json.dumps([graph_schema, normalised]).encode()).hexdigest()
+
+
+async def get_cypher_plan(key: str) -> Optional[str]:
+    if not config.cypher_plan_cache_enabled:
+        return None
+    try:
+        return await redis_client.get(key)
+    except Exception as e:
+        logger.warning(f"Cypher plan cache unavailable: {e}")
+        return None
+
+
+async def store_cypher_plan(key: str, query: str) -> None:
+    if not config.cypher_plan_cache_enabled:
+        return
+    try:
+        await redis_client.set(key, query, ex=config.cypher_plan_cache_ttl_seconds)
+    except Exception as e:
+        logger.warning(f"Failed to store Cypher plan: {e}")
+
+
+async def evict_cypher_plan(key: str) -> None:
+    if not config.cypher_plan_cache_enabled:
+        return
+    try:
+        await redis_client.delete(key)
+        logger.info("Evicted Cypher plan that failed")
+    except Exception as e:
+        logger.warning(f"Failed to evict Cypher plan: {e}")
+
+
+async def confirm_current_plan(valid: bool) -> None:
+    """
+    Cache the plan used for the current question if its answer passed validation, or evict it if it did not
+    """
+    plan = current_plan.get()
+    if plan is None:
+        return
+    current_plan.set(None)
+
+    if valid:
+        # Storing a plan that was served from the cache again refreshes its expiry
+        await store_cypher_plan(plan.key, plan.query)
+    elif plan.from_cache:
+        await evict_cypher_plan(plan.key)
@@ -0,0 +1,97 @@
+import hashlib
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from src.utils import Config
+from src.utils.redis_utils import redis_client
+
+logger = logging.getLogger(__name__)
+config = Config()
+
+DATASET_HASH_KEY_PREFIX = "dataset_hash_"
+
+LABEL = r"(?:`[^`]+`|\w+)"
+# The labels of a node pattern, e.g. `(c:Company:Listed {name: row[0]})` or `(:Fund)`, and of SET and REMOVE clauses
+NODE_LABELS_PATTERN = re.compile(rf"(\(\s*\w*\s*)((?::\s*{LABEL}\s*)+)")
+SET_LABELS_PATTERN = re.compile(rf"(\b(?:SET|REMOVE)\s+\w+\s*)((?::\s*{LABEL}\s*)+)", re.IGNORECASE)
+SINGLE_LABEL_PATTERN = re.compile(rf":(\s*)({LABEL})")
+
+
+@dataclass(frozen=True)
+class Dataset:
+    name: str
+    path: Path
+    namespace: str
+
+    @property
+    def file_name(self) -> str:
+        return self.path.name
+
+
+def create_namespace(name: str) -> str:
+    """
+    The label prefix for a dataset, e.g. `EsgPoc_` for esg_poc.csv. Every node a dataset loads is labelled with
+    its namespace so that datasets sharing the single Neo4j database can be told apart and replaced independently.
+    """
+    return "".join(part.capitalize() for part in re.split(r"[^A-Za-z0-9]+", name) if part) + "_"
+
+
+def get_datasets() -> list[Dataset]:
+    directory = Path(config.datasets_directory)
+    if not directory.is_dir():
+        logger.warning(f"Datasets directory {directory} does not exist")
+        return []
+
+    datasets: list[Dataset] = []
+    namespaces: dict[str, str] = {}
+    for path in sorted(directory.glob("*.csv")):
+        namespace = create_namespace(path.stem)
+        if namespace in namespaces:
+            raise ValueError(f"Datasets {namespaces[namespace]} and {path.name} share the namespace {namespace}")
+        namespaces[namespace] = path.name
+        datasets.append(Dataset(path.stem, path, namespace))
+    return datasets
+
+
+def apply_namespace(query: str, namespace: str) -> str:
+    """
+    Prefix every node label in a generated import query with the dataset namespace
+    """
+
+    def prefix_label(match: re.Match) -> str:
+        label = match.group(2)
+        if label.startswith("`"):
+            return f":{match.group(1)}`{namespace}{label[1:]}"
+        return f":{match.group(1)}{namespace}{label}"
+
+    def prefix_labels(match: re.Match) -> str:
+        return match.group(1) + SINGLE_LABEL_PATTERN.sub(prefix_label, match.group(2))
+
+    query = NODE_LABELS_PATTERN.sub(prefix_labels, query)
+    return SET_LABELS_PATTERN.sub(prefix_labels, query)
+
+
+def create_content_hash(dataset: Dataset) -> str:
+    content_hash = hashlib.sha256()
+    with dataset.path.open("rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+async def get_loaded_hash(dataset: Dataset) -> Optional[str]:
+    try:
+        return await redis_client.get(DATASET_HASH_KEY_PREFIX + dataset.name)
+    except Exception as e:
+        logger.warning(f"Unable to read the loaded hash of dataset {dataset.name}: {e}")
+        return None
+
+
+async def store_loaded_hash(dataset: Dataset, content_hash: str) -> None:
+    try:
+        await redis_client.set(DATASET_HASH_KEY_PREFIX + dataset.name, content_hash)
+    except Exception as e:
+        logger.warning(f"Unable to store the loaded hash of dataset {dataset.name}: {e}")
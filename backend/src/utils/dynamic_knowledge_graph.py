@@ -1,9 +1,12 @@
+import asyncio
 import json
 import logging
+from collections import defaultdict
 
 from src.llm.factory import get_llm
 from src.prompts import PromptEngine
 from src.utils import Config
+from src.utils.knowledge_graph_cache import create_shape_fingerprint, load_knowledge_graph, store_knowledge_graph
 
 logger = logging.getLogger(__name__)
 engine = PromptEngine()
@@ -11,11 +14,35 @@ config = Config()
 
 llm_model = config.dynamic_knowledge_graph_model
 
+# The number of rows, including the header row, the knowledge graph is generated from
+DATASET_SAMPLE_SIZE = 50
+
+# Datasets of the same shape loaded at once wait for a single generation rather than each generating their own
+generation_locks: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
 
 async def generate_dynamic_knowledge_graph(csv_data: list[list[str]]) -> dict[str, str]:
-    llm = get_llm(config.dynamic_knowledge_graph_llm)
+    """
+    Generate the data model and import query for a dataset from a sample of its rows, the first of which is the
+    header row. Knowledge graphs are cached on disk by the shape of the dataset, so are only generated once for
+    datasets with the same columns.
+    """
+    reduced_data_set = csv_data[slice(DATASET_SAMPLE_SIZE)]
+    fingerprint = create_shape_fingerprint(reduced_data_set)
+
+    async with generation_locks[fingerprint]:
+        knowledge_graph = load_knowledge_graph(fingerprint)
+        if knowledge_graph is not None:
+            logger.info("Using cached knowledge graph for a dataset of the same shape")
+            return knowledge_graph
 
-    reduced_data_set = csv_data[slice(50)]
+        knowledge_graph = await generate_knowledge_graph(reduced_data_set)
+        store_knowledge_graph(fingerprint, reduced_data_set[0], knowledge_graph)
+        return knowledge_graph
+
+
+async def generate_knowledge_graph(reduced_data_set: list[list[str]]) -> dict[str, str]:
+    llm = get_llm(config.dynamic_knowledge_graph_llm)
 
     model_response = await llm.chat(
         llm_model,  # type: ignore[reportArgumentType]
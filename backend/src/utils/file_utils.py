@@ -1,6 +1,8 @@
+import csv
 from io import BytesIO, TextIOWrapper
 from pathlib import Path
 import time
+from typing import Iterator
 from fastapi import HTTPException
 import logging
 from os import PathLike
@@ -53,5 +55,13 @@ def extract_text(file: LLMFile) -> str:
     return all_content
 
 
-def get_file_upload(upload_id) -> FileUpload | None:
-    return get_session_file_upload(upload_id)
+def read_csv_rows(path: PathLike[str] | str) -> Iterator[list[str]]:
+    """
+    Read a CSV file one row at a time, so that files of any size can be processed in bounded memory
+    """
+    with open(path, newline="", encoding="utf-8") as file:
+        yield from csv.reader(file)
+
+
+async def get_file_upload(upload_id) -> FileUpload | None:
+    return await get_session_file_upload(upload_id)
@@ -1,6 +1,10 @@
 import logging
-from neo4j import GraphDatabase
+import time
+from itertools import batched
+from typing import Any, AsyncGenerator, Iterable, LiteralString, Optional, cast
+from neo4j import AsyncGraphDatabase, AsyncManagedTransaction, Query
 from src.utils import Config
+from src.utils.query_cache import query_cache
 
 logger = logging.getLogger(__name__)
 
@@ -9,58 +13,172 @@ config = Config()
 URI = config.neo4j_uri
 
 AUTH = (str(config.neo4j_user), str(config.neo4j_password))
-driver = GraphDatabase.driver(URI, auth=AUTH)
-
-
-def test_connection():
+PROGRESS_INTERVAL_SECONDS = 5
+# Matches the nodes of a single dataset, whose labels are all prefixed with its namespace
+NAMESPACE_MATCH = "MATCH (n) WHERE any(label IN labels(n) WHERE label STARTS WITH $namespace) "
+# A single long-lived driver whose connection pool is shared by every query. It is only closed on shutdown.
+driver = AsyncGraphDatabase.driver(
+    URI,
+    auth=AUTH,
+    max_connection_pool_size=config.neo4j_max_connection_pool_size,
+    connection_acquisition_timeout=config.neo4j_connection_acquisition_timeout,
+)
+
+
+async def test_connection() -> bool:
     connection_healthy = False
     try:
-        driver.verify_connectivity()
+        await driver.verify_connectivity()
         connection_healthy = True
 
     except Exception as e:
         logger.exception(f"Database connection failed: {e}")
 
     finally:
-        driver.close()
         return connection_healthy
 
 
-def execute_query(llm_query):
+async def stream_query(
+    query: str, parameters: Optional[dict[str, Any]] = None
+) -> AsyncGenerator[dict[str, Any], None]:
+    """
+    Run a query, yielding each record as it arrives from the database rather than once the whole result is
+    buffered. The query is cancelled by the database if it runs for longer than the configured timeout.
+    """
     try:
-        with driver.session() as session:
-            query = llm_query
-            records = session.run(query)
-            record_dict = [record.data() for record in records]
-            return record_dict
+        async with driver.session() as session:
+            timed_query = Query(cast(LiteralString, query), timeout=config.neo4j_query_timeout)
+            result = await session.run(timed_query, parameters)
+            async for record in result:
+                yield record.data()
 
     except Exception as e:
         logger.exception(f"Error: {e}")
         raise
 
+
+async def execute_query(
+    query: str, parameters: Optional[dict[str, Any]] = None, use_cache: bool = False
+) -> list[dict[str, Any]]:
+    """
+    Run a query and return all of its records. With use_cache, results are served from the query cache when
+    an equivalent query has already been run against the current dataset.
+    """
+    use_cache = use_cache and config.query_cache_enabled
+    if use_cache:
+        cached_records = query_cache.get(query, parameters)
+        if cached_records is not None:
+            return cached_records
+
+    start_time = time.time()
+    records = [record async for record in stream_query(query, parameters)]
+    if use_cache:
+        query_cache.set(query, parameters, records, time.time() - start_time)
+    return records
+
+
+async def _write_batch(tx: AsyncManagedTransaction, query: str, data: Any) -> None:
+    result = await tx.run(cast(LiteralString, query), data=data)
+    await result.consume()
+
+
+async def populate_db(query: str, rows: Iterable[list[str]], namespace: Optional[str] = None) -> None:
+    """
+    Replace the contents of the database with the given rows, the first of which is the header row. Rows are
+    consumed lazily and written in batches, each in its own transaction, so memory use is bounded by the batch size.
+    The query reads the batch from `$data.all_data`, with the header row first.
+    Given a namespace, only the nodes labelled with that namespace are replaced and other datasets are left intact.
+    """
+    rows = iter(rows)
+    headers = next(rows, None)
+    if headers is None:
+        raise ValueError("Unable to populate database from a dataset without a header row")
+
+    try:
+        async with driver.session() as session:
+            match_clause = NAMESPACE_MATCH if namespace else "MATCH (n) "
+            delete_result = await session.run(
+                cast(
+                    LiteralString,
+                    match_clause + "CALL { WITH n DETACH DELETE n } "
+                    f"IN TRANSACTIONS OF {config.neo4j_delete_batch_size} ROWS",
+                ),
+                {"namespace": namespace} if namespace else None,
+            )
+            await delete_result.consume()
+            logger.debug(f"Cleared namespace {namespace}" if namespace else "Cleared database")
+
+            start_time = time.time()
+            last_progress_time = start_time
+            imported_rows = 0
+            for batch in batched(rows, config.neo4j_ingest_batch_size):
+                await session.execute_write(_write_batch, query, {"all_data": [headers, *batch]})
+                imported_rows += len(batch)
+                if time.time() - last_progress_time >= PROGRESS_INTERVAL_SECONDS:
+                    last_progress_time = time.time()
+                    rate = imported_rows / (last_progress_time - start_time)
+                    logger.info(f"Imported {imported_rows} rows into the database ({rate:.0f} rows/s)")
+
+            logger.info(
+                f"Database populated with {imported_rows} rows{f' into {namespace}' if namespace else ''} "
+                f"in {time.time() - start_time:.2f}s"
+            )
+    except Exception as e:
+        logger.exception(f"Error: {e}")
+        raise
     finally:
-        driver.close()
+        # Results cached for the previous dataset are stale, even if repopulating failed part way through
+        query_cache.bump_generation()
 
 
-def populate_db(query, data) -> None:
-    data = {"all_data": data}
+async def create_nodes(label: str, records: Iterable[dict[str, Any]]) -> None:
+    """
+    Create a node with the given label for each record, setting its properties from the record. Records are written
+    in batches, each in its own transaction.
+    """
+    query = f"UNWIND $data AS properties CREATE (n:`{label}`) SET n = properties"
     try:
-        with driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")
-            logger.debug("Cleared database")
+        async with driver.session() as session:
+            for batch in batched(records, config.neo4j_ingest_batch_size):
+                await session.execute_write(_write_batch, query, list(batch))
+    except Exception as e:
+        logger.exception(f"Error: {e}")
+        raise
+    finally:
+        query_cache.bump_generation()
+
 
-            session.run(query, data=data)
-            logger.debug("Database populated")
+async def remove_other_namespaces(namespaces: list[str]) -> None:
+    """
+    Remove every node outside of the given namespaces, such as those of a dataset no longer registered
+    """
+    try:
+        async with driver.session() as session:
+            result = await session.run(
+                cast(
+                    LiteralString,
+                    "MATCH (n) WHERE none(label IN labels(n) WHERE any(namespace IN $namespaces "
+                    "WHERE label STARTS WITH namespace)) CALL { WITH n DETACH DELETE n } "
+                    f"IN TRANSACTIONS OF {config.neo4j_delete_batch_size} ROWS",
+                ),
+                {"namespaces": namespaces},
+            )
+            await result.consume()
+            logger.info("Removed nodes outside of the registered datasets")
     except Exception as e:
         logger.exception(f"Error: {e}")
         raise
     finally:
-        driver.close()
+        query_cache.bump_generation()
+
 
-def is_db_populated() -> bool:
+async def is_db_populated(namespace: Optional[str] = None) -> bool:
     has_data = False
     try:
-        db_response = execute_query("MATCH (n) RETURN n LIMIT 1")
+        if namespace:
+            db_response = await execute_query(NAMESPACE_MATCH + "RETURN n LIMIT 1", {"namespace": namespace})
+        else:
+            db_response = await execute_query("MATCH (n) RETURN n LIMIT 1")
         if len(db_response) > 0:
             has_data = True
 
@@ -69,3 +187,7 @@ def is_db_populated() -> bool:
 
     finally:
         return has_data
+
+
+async def close_driver() -> None:
+    await driver.close()
@@ -0,0 +1,164 @@
+import logging
+import re
+from dataclasses import dataclass
+
+from src.utils.graph_db_utils import execute_query
+from src.utils.semantic_layer_builder import filter_node_properties, node_property_query
+
+logger = logging.getLogger(__name__)
+
+NAME = r"(?:`[^`]+`|\w+)"
+# A node pattern MERGEd on its properties, e.g. `MERGE (c:Company {name: row[1]})`
+MERGE_NODE_PATTERN = re.compile(rf"\bMERGE\s*\(\s*\w*\s*:\s*({NAME})[^{{)]*\{{([^}}]*)\}}", re.IGNORECASE)
+MAP_KEY_PATTERN = re.compile(rf"({NAME})\s*:")
+# Properties that questions typically filter or join on, such as company names and identifiers, years and industries
+CATEGORY_WORDS = {"industry", "sector", "country"}
+IDENTIFIER_WORDS = {"id", "identifier", "ric", "isin", "ticker", "code", "name", "date", "year"} | CATEGORY_WORDS
+# String properties also searched by substring, e.g. `WHERE c.name CONTAINS 'Apple'`
+TEXT_INDEX_WORDS = {"name"} | CATEGORY_WORDS
+
+
+@dataclass(frozen=True)
+class IndexPlan:
+    kind: str
+    label: str
+    properties: tuple[str, ...]
+
+    @property
+    def name(self) -> str:
+        return re.sub(r"\W+", "_", f"{self.kind}_{self.label}_{'_'.join(self.properties)}").lower()
+
+    def to_cypher(self) -> str:
+        label = quote(self.label)
+        if self.kind == "unique":
+            return (
+                f"CREATE CONSTRAINT {self.name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{quote(self.properties[0])} "
+                "IS UNIQUE"
+            )
+        properties = ", ".join(f"n.{quote(prop)}" for prop in self.properties)
+        index_type = "TEXT INDEX" if self.kind == "text" else "INDEX"
+        return f"CREATE {index_type} {self.name} IF NOT EXISTS FOR (n:{label}) ON ({properties})"
+
+
+def quote(name: str) -> str:
+    return name if re.fullmatch(r"[A-Za-z_]\w*", name) else f"`{name.replace('`', '``')}`"
+
+
+def unquote(name: str) -> str:
+    return name[1:-1].replace("``", "`") if name.startswith("`") else name
+
+
+def get_name_words(property_name: str) -> set[str]:
+    spaced = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", property_name)
+    return {word.lower() for word in re.split(r"[^A-Za-z0-9]+", spaced) if word}
+
+
+def is_identifier_property(property_name: str) -> bool:
+    return bool(get_name_words(property_name) & IDENTIFIER_WORDS)
+
+
+def find_merge_keys(import_query: str) -> list[tuple[str, tuple[str, ...]]]:
+    """
+    The label and key properties of every node the import query MERGEs, which are unique by construction
+    """
+    merge_keys = []
+    for match in MERGE_NODE_PATTERN.finditer(import_query):
+        keys = tuple(unquote(key) for key in MAP_KEY_PATTERN.findall(match.group(2)))
+        if keys and (unquote(match.group(1)), keys) not in merge_keys:
+            merge_keys.append((unquote(match.group(1)), keys))
+    return merge_keys
+
+
+def plan_merge_indexes(import_query: str) -> list[IndexPlan]:
+    # A node MERGEd on a single property is unique on it. Composite keys need node key constraints, which are only
+    # available in Neo4j Enterprise Edition, so are given a composite range index instead.
+    return [
+        IndexPlan("unique", label, keys) if len(keys) == 1 else IndexPlan("range", label, keys)
+        for label, keys in find_merge_keys(import_query)
+    ]
+
+
+def plan_property_indexes(node_properties: list[dict], unique: set[tuple[str, str]]) -> list[IndexPlan]:
+    plans = []
+    for node in node_properties:
+        for prop in node["properties"]:
+            if not is_identifier_property(prop["name"]):
+                continue
+            # A uniqueness constraint is already backed by a range index
+            if (node["label"], prop["name"]) not in unique:
+                plans.append(IndexPlan("range", node["label"], (prop["name"],)))
+            if prop["data_type"] == "String" and get_name_words(prop["name"]) & TEXT_INDEX_WORDS:
+                plans.append(IndexPlan("text", node["label"], (prop["name"],)))
+    return plans
+
+
+async def create_indexes(plans: list[IndexPlan]) -> None:
+    for plan in plans:
+        try:
+            await execute_query(plan.to_cypher())
+        except Exception as e:
+            # e.g. a uniqueness constraint on a property that already holds duplicate values
+            logger.warning(f"Unable to create {plan.kind} index {plan.name}: {e}")
+            if plan.kind == "unique":
+                await create_indexes([IndexPlan("range", plan.label, plan.properties)])
+
+
+async def provision_merge_indexes(import_query: str) -> None:
+    """
+    Index the properties a dataset's import query MERGEs its nodes on, before it is loaded, so that each MERGE is
+    an index lookup rather than a scan of every node with the label
+    """
+    await create_indexes(plan_merge_indexes(import_query))
+
+
+async def get_node_properties() -> list[dict]:
+    return filter_node_properties(await execute_query(node_property_query))
+
+
+async def get_indexed_properties() -> dict[tuple[str, str], set[str]]:
+    indexes = await execute_query(
+        "SHOW INDEXES YIELD type, entityType, labelsOrTypes, properties, owningConstraint "
+        "WHERE entityType = 'NODE' AND labelsOrTypes IS NOT NULL"
+    )
+    indexed: dict[tuple[str, str], set[str]] = {}
+    for index in indexes:
+        kind = "UNIQUE" if index["owningConstraint"] else index["type"]
+        for label in index["labelsOrTypes"]:
+            for prop in index["properties"]:
+                indexed.setdefault((label, prop), set()).add(kind)
+    return indexed
+
+
+async def provision_property_indexes() -> None:
+    """
+    Index the identifier-like properties of every node in the graph, such as names, identifiers, dates and
+    industries, which generated queries typically filter on
+    """
+    indexed = await get_indexed_properties()
+    unique = {key for key, kinds in indexed.items() if "UNIQUE" in kinds}
+    await create_indexes(plan_property_indexes(await get_node_properties(), unique))
+
+
+async def get_index_coverage() -> dict:
+    """
+    The indexes on each identifier-like property in the graph, to show which of the properties queries are likely
+    to filter on are not indexed
+    """
+    indexed = await get_indexed_properties()
+    properties = [
+        {
+            "label": node["label"],
+            "property": prop["name"],
+            "indexes": sorted(indexed.get((node["label"], prop["name"]), [])),
+        }
+        for node in await get_node_properties()
+        for prop in node["properties"]
+        if is_identifier_property(prop["name"])
+    ]
+    covered = sum(1 for prop in properties if prop["indexes"])
+    return {
+        "identifier_properties": len(properties),
+        "indexed": covered,
+        "coverage": covered / len(properties) if properties else 1.0,
+        "properties": properties,
+    }
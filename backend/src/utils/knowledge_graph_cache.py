@@ -0,0 +1,96 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from src.prompts import PromptEngine
+from src.utils import Config
+
+logger = logging.getLogger(__name__)
+engine = PromptEngine()
+config = Config()
+
+# Bump when the structure of a cached knowledge graph changes, so that entries written in the old form are ignored
+KNOWLEDGE_GRAPH_CACHE_VERSION = 1
+MISSING_VALUES = {"", "na", "n/a", "nan", "null", "none", "-"}
+INTEGER_PATTERN = re.compile(r"^[+-]?\d+$")
+FLOAT_PATTERN = re.compile(r"^[+-]?(\d+\.\d*|\.\d+|\d+)([eE][+-]?\d+)?$")
+BOOLEAN_VALUES = {"true", "false", "yes", "no"}
+DATE_PATTERN = re.compile(r"^(\d{4}-\d{1,2}-\d{1,2}|\d{1,2}/\d{1,2}/\d{2,4})([ T].*)?$")
+
+
+def infer_column_type(values: list[str]) -> str:
+    values = [value.strip() for value in values if value.strip().lower() not in MISSING_VALUES]
+    if not values:
+        return "empty"
+    if all(INTEGER_PATTERN.match(value) for value in values):
+        return "integer"
+    if all(FLOAT_PATTERN.match(value) for value in values):
+        return "float"
+    if all(value.lower() in BOOLEAN_VALUES for value in values):
+        return "boolean"
+    if all(DATE_PATTERN.match(value) for value in values):
+        return "date"
+    return "string"
+
+
+def create_shape_fingerprint(csv_data: list[list[str]]) -> str:
+    """
+    Fingerprint the shape of a dataset from a sample of its rows, the first of which is the header row: its column
+    names, the type of value in each column, and the prompts and model the knowledge graph is generated with.
+    Datasets of the same shape share a fingerprint, whatever their values.
+    """
+    headers, *rows = csv_data
+    column_types = [
+        infer_column_type([row[index] for row in rows if index < len(row)]) for index in range(len(headers))
+    ]
+    prompts = [
+        engine.load_prompt("generate-knowledge-graph-model"),
+        engine.load_prompt("generate-knowledge-graph-cypher-system-prompt"),
+        engine.load_prompt("generate-knowledge-graph-cypher-user-prompt", input_data="", data_model=""),
+    ]
+    content = [
+        KNOWLEDGE_GRAPH_CACHE_VERSION,
+        list(zip(headers, column_types)),
+        config.dynamic_knowledge_graph_llm,
+        config.dynamic_knowledge_graph_model,
+        prompts,
+    ]
+    return hashlib.sha256(json.dumps(content).encode()).hexdigest()
+
+
+def get_cache_path(fingerprint: str) -> Path:
+    return Path(config.knowledge_graph_cache_directory) / f"{fingerprint}.json"
+
+
+def load_knowledge_graph(fingerprint: str) -> Optional[dict[str, str]]:
+    if not config.knowledge_graph_cache_enabled:
+        return None
+    path = get_cache_path(fingerprint)
+    try:
+        with path.open(encoding="utf-8") as file:
+            cached = json.load(file)
+        return {"cypher_query": cached["cypher_query"], "model": cached["model"]}
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable knowledge graph cache entry {path}: {e}")
+        return None
+
+
+def store_knowledge_graph(fingerprint: str, headers: list[str], knowledge_graph: dict[str, str]) -> None:
+    if not config.knowledge_graph_cache_enabled:
+        return
+    path = get_cache_path(fingerprint)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written to a temporary file first so that a concurrent or interrupted write never leaves a partial entry
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=path.parent, suffix=".tmp", delete=False) as file:
+            json.dump({"headers": headers, **knowledge_graph}, file, indent=2)
+        os.replace(file.name, path)
+    except Exception as e:
+        logger.warning(f"Failed to store knowledge graph in the cache: {e}")
@@ -0,0 +1,259 @@
+import logging
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from itertools import chain, islice
+from typing import Iterable, Optional
+
+from src.utils.graph_db_utils import create_nodes, execute_query
+from src.utils.knowledge_graph_cache import MISSING_VALUES, infer_column_type
+
+logger = logging.getLogger(__name__)
+
+METRIC_ROLLUP_LABEL = "MetricRollup"
+METRIC_RANK_LABEL = "MetricRank"
+# Columns whose values group the main entity, which metrics are averaged over
+GROUP_WORDS = {"industry", "sector", "country"}
+TIME_WORDS = {"date", "year"}
+ENTITY_WORDS = {"company", "name"}
+# Numeric columns that identify rather than measure, and so are never aggregated
+IDENTIFIER_WORDS = {"id", "identifier", "ric", "code"}
+YEAR_PATTERN = re.compile(r"\b(\d{4})\b")
+SAMPLE_SIZE = 50
+
+METRIC_ROLLUP_DESCRIPTION = (
+    "Precomputed aggregate of a metric over all rows sharing a group, such as an industry, in a year. Use these "
+    "nodes, rather than aggregating the dataset, to answer questions about average, minimum, maximum or total "
+    "metric values by group, the ranking of groups, or how a group's average changed from the previous year."
+)
+METRIC_ROLLUP_PROPERTIES = {
+    "group_by": "The column the rows are grouped by, e.g. 'Industry'",
+    "group_name": "The value of the group_by column, e.g. 'Airlines'",
+    "year": "The year the rows are for, absent if the dataset has no dates",
+    "metric_name": "The metric column aggregated, e.g. 'ESG_score'",
+    "average": "The mean metric value",
+    "minimum": "The lowest metric value",
+    "maximum": "The highest metric value",
+    "total": "The sum of the metric values",
+    "count": "The number of rows with a value for the metric",
+    "rank": "The position of this group by average among all groups for the same metric and year, 1 being highest",
+    "previous_average": "The mean metric value of the group in the previous year",
+    "change": "average minus previous_average",
+    "percent_change": "change as a percentage of previous_average",
+}
+METRIC_RANK_DESCRIPTION = (
+    "Precomputed value and ranking of a metric for each main entity, such as a company, in a year. Use these nodes, "
+    "rather than sorting the dataset, to answer questions about the top or bottom entities for a metric, such as the "
+    "largest emitters, or how an entity's metric changed from the previous year."
+)
+METRIC_RANK_PROPERTIES = {
+    "entity_name": "The name of the entity, e.g. 'Apple Inc'",
+    "year": "The year the value is for, absent if the dataset has no dates",
+    "metric_name": "The metric column, e.g. 'Scope_1'",
+    "value": "The metric value, the mean if the entity has several rows in the year",
+    "rank": "The position of the entity by value among all entities for the same metric and year, 1 being highest",
+    "previous_value": "The metric value of the entity in the previous year",
+    "change": "value minus previous_value",
+    "percent_change": "change as a percentage of previous_value",
+}
+
+
+@dataclass
+class ColumnRoles:
+    metrics: dict[int, str]
+    groups: dict[int, str]
+    time: Optional[int]
+    entity: Optional[int]
+
+
+@dataclass
+class Aggregate:
+    total: float = 0
+    count: int = 0
+    minimum: float = float("inf")
+    maximum: float = float("-inf")
+
+    def add(self, value: float) -> None:
+        self.total += value
+        self.count += 1
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    @property
+    def average(self) -> float:
+        return self.total / self.count
+
+
+def get_words(header: str) -> set[str]:
+    spaced = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", header)
+    return {word.lower() for word in re.split(r"[^A-Za-z0-9]+", spaced) if word}
+
+
+def find_column_roles(sample_rows: list[list[str]]) -> ColumnRoles:
+    """
+    Work out from a sample of a dataset, the first row of which is the header row, which columns are numeric metrics,
+    which group the rows, which holds the date and which names the main entity each row is about
+    """
+    headers, *rows = sample_rows
+    roles = ColumnRoles(metrics={}, groups={}, time=None, entity=None)
+    entity_candidates = []
+    for index, header in enumerate(headers):
+        words = get_words(header)
+        column_type = infer_column_type([row[index] for row in rows if index < len(row)])
+        if words & TIME_WORDS and column_type in ("integer", "date") and roles.time is None:
+            roles.time = index
+        elif column_type in ("integer", "float") and not words & IDENTIFIER_WORDS:
+            roles.metrics[index] = header
+        elif column_type == "string" and words & GROUP_WORDS:
+            roles.groups[index] = header
+        elif column_type == "string" and words & ENTITY_WORDS:
+            entity_candidates.append((0 if "company" in words else 1, index))
+    if entity_candidates:
+        roles.entity = min(entity_candidates)[1]
+    return roles
+
+
+def parse_number(value: str) -> Optional[float]:
+    if value.strip().lower() in MISSING_VALUES:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_year(value: str) -> Optional[int]:
+    match = YEAR_PATTERN.search(value)
+    return int(match.group(1)) if match else None
+
+
+def get_change(value: float, previous: Optional[float]) -> dict:
+    if previous is None:
+        return {}
+    change = value - previous
+    return {"change": change, "percent_change": change / abs(previous) * 100 if previous else None}
+
+
+def rank_by(records: list[dict], key: str, partition: tuple[str, ...]) -> None:
+    """
+    Rank records by a value, highest first, within each partition. Tied values share a rank.
+    """
+    partitions = defaultdict(list)
+    for record in records:
+        partitions[tuple(record.get(name) for name in partition)].append(record)
+    for partitioned_records in partitions.values():
+        partitioned_records.sort(key=lambda record: record[key], reverse=True)
+        previous = None
+        for position, record in enumerate(partitioned_records, start=1):
+            if previous is not None and previous[key] == record[key]:
+                record["rank"] = previous["rank"]
+            else:
+                record["rank"] = position
+            previous = record
+
+
+def compute_metric_views(rows: Iterable[list[str]], roles: ColumnRoles) -> tuple[list[dict], list[dict]]:
+    """
+    Aggregate every metric by each group and year, and by entity and year, in a single pass over the rows
+    """
+    group_aggregates: defaultdict[tuple, Aggregate] = defaultdict(Aggregate)
+    entity_aggregates: defaultdict[tuple, Aggregate] = defaultdict(Aggregate)
+    for row in rows:
+        year = parse_year(row[roles.time]) if roles.time is not None and roles.time < len(row) else None
+        for index, metric in roles.metrics.items():
+            value = parse_number(row[index]) if index < len(row) else None
+            if value is None:
+                continue
+            for group_index, group_by in roles.groups.items():
+                if group_index < len(row) and row[group_index].strip():
+                    group_aggregates[(group_by, row[group_index].strip(), year, metric)].add(value)
+            if roles.entity is not None and roles.entity < len(row) and row[roles.entity].strip():
+                entity_aggregates[(row[roles.entity].strip(), year, metric)].add(value)
+
+    rollups = []
+    for (group_by, group_name, year, metric), aggregate in group_aggregates.items():
+        previous = group_aggregates.get((group_by, group_name, year - 1, metric)) if year is not None else None
+        rollups.append(
+            {
+                "group_by": group_by,
+                "group_name": group_name,
+                "year": year,
+                "metric_name": metric,
+                "average": aggregate.average,
+                "minimum": aggregate.minimum,
+                "maximum": aggregate.maximum,
+                "total": aggregate.total,
+                "count": aggregate.count,
+                "previous_average": previous.average if previous else None,
+                **get_change(aggregate.average, previous.average if previous else None),
+            }
+        )
+    rank_by(rollups, "average", ("group_by", "year", "metric_name"))
+
+    ranks = []
+    for (entity_name, year, metric), aggregate in entity_aggregates.items():
+        previous = entity_aggregates.get((entity_name, year - 1, metric)) if year is not None else None
+        ranks.append(
+            {
+                "entity_name": entity_name,
+                "year": year,
+                "metric_name": metric,
+                "value": aggregate.average,
+                "previous_value": previous.average if previous else None,
+                **get_change(aggregate.average, previous.average if previous else None),
+            }
+        )
+    rank_by(ranks, "value", ("year", "metric_name"))
+    return rollups, ranks
+
+
+async def materialise_metric_views(rows: Iterable[list[str]], namespace: str) -> None:
+    """
+    Precompute common rollups of a loaded dataset, the first row of which is the header row: averages by group and
+    year, and rankings of entities, with their year-over-year changes. They are stored as summary nodes in the
+    dataset's namespace. The rows are read rather than the graph queried, as the shape of the graph is generated
+    and so not known in advance.
+    """
+    rows = iter(rows)
+    sample_rows = list(islice(rows, SAMPLE_SIZE))
+    if not sample_rows:
+        return
+    roles = find_column_roles(sample_rows)
+    if not roles.metrics:
+        logger.info(f"No metrics to materialise in namespace {namespace}")
+        return
+
+    rollups, ranks = compute_metric_views(chain(sample_rows[1:], rows), roles)
+    await create_nodes(namespace + METRIC_ROLLUP_LABEL, rollups)
+    await create_nodes(namespace + METRIC_RANK_LABEL, ranks)
+    logger.info(f"Materialised {len(rollups)} metric rollups and {len(ranks)} metric ranks in namespace {namespace}")
+
+
+def is_metric_view(label: str) -> bool:
+    return label.endswith(METRIC_ROLLUP_LABEL) or label.endswith(METRIC_RANK_LABEL)
+
+
+async def describe_metric_views(labels: list[str]) -> list[dict]:
+    """
+    Describe each metric view in the graph for the semantic layer, with the metrics and groups it holds
+    """
+    views = []
+    for label in labels:
+        summary = await execute_query(
+            f"MATCH (n:`{label}`) RETURN collect(DISTINCT n.metric_name) AS metrics, "
+            "collect(DISTINCT n.group_by) AS group_by, min(n.year) AS first_year, max(n.year) AS last_year"
+        )
+        rollup = label.endswith(METRIC_ROLLUP_LABEL)
+        view = {
+            "label": label,
+            "cypher_representation": f"(:{label})",
+            "description": METRIC_ROLLUP_DESCRIPTION if rollup else METRIC_RANK_DESCRIPTION,
+            "properties": METRIC_ROLLUP_PROPERTIES if rollup else METRIC_RANK_PROPERTIES,
+            "metric_names": sorted(summary[0]["metrics"]) if summary else [],
+        }
+        if rollup:
+            view["group_by"] = sorted(summary[0]["group_by"]) if summary else []
+        if summary and summary[0]["first_year"] is not None:
+            view["years"] = [summary[0]["first_year"], summary[0]["last_year"]]
+        views.append(view)
+    return views
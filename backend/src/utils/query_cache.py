@@ -0,0 +1,134 @@
+import copy
+import json
+import logging
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from src.utils import Config
+from src.utils.usage_recorder import CacheStats
+
+logger = logging.getLogger(__name__)
+config = Config()
+
+# String literals, and backticked identifiers such as `Company Name`, whose text is kept exactly as written
+STRING_LITERAL_PATTERN = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`(?:[^`]|``)*`")
+PLACEHOLDER_PATTERN = re.compile(r"\x00(\d+)\x00")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+PUNCTUATION_SPACING_PATTERN = re.compile(r"\s*([(),\[\]{}:=<>])\s*")
+# A list of literals tested for membership, e.g. `IN ['b', 'a', 3]`, whose order makes no difference to the result
+IN_LITERAL_LIST_PATTERN = re.compile(r"\bIN\[((?:\x00\d+\x00|-?[\d.]+)(?:,(?:\x00\d+\x00|-?[\d.]+))*)\]", re.IGNORECASE)
+# The variable a list is iterated over with, e.g. `[x IN [...] | ...]` or `reduce(s = 0, x IN [...] | ...)`, rather than
+# a value tested for membership. The order of an iterated list can make a difference to the result
+ITERATION_VARIABLE_PATTERN = re.compile(r"[\[(,][A-Za-z_]\w* ?$")
+
+
+def normalise_query(query: str) -> str:
+    """
+    Normalise a Cypher query so that equivalent queries generated for repeated questions share a cache entry.
+    Whitespace outside of string literals and backticked identifiers is collapsed, string literals are single quoted
+    and the literals in lists tested for membership with `IN` are sorted.
+    """
+    literals: list[str] = []
+
+    def extract_literal(match: re.Match) -> str:
+        literal = match.group(0)
+        if literal.startswith('"') and "'" not in literal:
+            literal = f"'{literal[1:-1]}'"
+        literals.append(literal)
+        return f"\x00{len(literals) - 1}\x00"
+
+    normalised = STRING_LITERAL_PATTERN.sub(extract_literal, query)
+    normalised = WHITESPACE_PATTERN.sub(" ", normalised).strip().rstrip(";").strip()
+    normalised = PUNCTUATION_SPACING_PATTERN.sub(r"\1", normalised)
+
+    def restore_literals(text: str) -> str:
+        return PLACEHOLDER_PATTERN.sub(lambda match: literals[int(match.group(1))], text)
+
+    def sort_literal_list(match: re.Match) -> str:
+        if ITERATION_VARIABLE_PATTERN.search(match.string, 0, match.start()):
+            return match.group(0)
+        items = sorted(restore_literals(item) for item in match.group(1).split(","))
+        return f"IN[{','.join(items)}]"
+
+    normalised = IN_LITERAL_LIST_PATTERN.sub(sort_literal_list, normalised)
+    return restore_literals(normalised)
+
+
+@dataclass
+class CachedResult:
+    records: list[dict[str, Any]]
+    size: int
+    duration: float
+
+
+class QueryResultCache:
+    """
+    In-memory LRU cache of query results, bounded by the approximate size of the cached records. The dataset only
+    changes when the database is repopulated, so entries are keyed on the dataset generation and every result
+    cached for an earlier generation is dropped when it is bumped.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.generation = 0
+        self.entries: OrderedDict[str, CachedResult] = OrderedDict()
+        self.stats = CacheStats()
+
+    def create_key(self, query: str, parameters: Optional[dict[str, Any]]) -> str:
+        return json.dumps([self.generation, normalise_query(query), parameters or {}], sort_keys=True, default=str)
+
+    def get(self, query: str, parameters: Optional[dict[str, Any]] = None) -> Optional[list[dict[str, Any]]]:
+        key = self.create_key(query, parameters)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.stats.hits += 1
+        self.stats.saved_duration += entry.duration
+        logger.debug(f"Query cache hit, hit ratio {self.stats.hit_ratio:.2f}")
+        # A copy, so that a caller changing the records does not change them for later hits
+        return copy.deepcopy(entry.records)
+
+    def set(
+        self, query: str, parameters: Optional[dict[str, Any]], records: list[dict[str, Any]], duration: float
+    ) -> None:
+        size = len(json.dumps(records, default=str))
+        if size > self.max_bytes:
+            logger.debug(f"Query result of {size} bytes is too large to cache")
+            return
+
+        key = self.create_key(query, parameters)
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= previous.size
+        self.entries[key] = CachedResult(copy.deepcopy(records), size, duration)
+        self.size += size
+
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.size
+
+    def bump_generation(self) -> None:
+        self.generation += 1
+        self.entries.clear()
+        self.size = 0
+        logger.info(f"Dataset generation is now {self.generation}, query cache cleared")
+
+    def get_metrics(self) -> dict:
+        return {
+            "generation": self.generation,
+            "entries": len(self.entries),
+            "size_bytes": self.size,
+            "hits": self.stats.hits,
+            "misses": self.stats.misses,
+            "hit_ratio": self.stats.hit_ratio,
+            "saved_duration": self.stats.saved_duration,
+        }
+
+
+query_cache = QueryResultCache(config.query_cache_max_bytes)
@@ -1,22 +1,63 @@
+import asyncio
 import logging
-import redis
+from typing import Optional
+
+from redis.asyncio import ConnectionPool, Redis
 from src.utils import Config
 
 logger = logging.getLogger(__name__)
 
 config = Config()
 
-redis_client = redis.Redis(host=config.redis_host, port=6379)
+# A single pool of connections shared by the session middleware and the session stores
+redis_pool = ConnectionPool(
+    host=config.redis_host, port=6379, decode_responses=True, max_connections=config.redis_max_connections
+)
+redis_client = Redis(connection_pool=redis_pool)
 
-def test_redis_connection():
-    connection_healthy = False
-    try:
-        ping_response = redis_client.ping()
-        connection_healthy = ping_response
 
+async def test_redis_connection() -> bool:
+    try:
+        return bool(await redis_client.ping())
     except Exception as e:
-        logger.exception(f"Redis connection failed: {e}")
+        logger.warning(f"Redis connection failed: {e}")
+        return False
+
+
+class RedisHealthProbe:
+    """
+    Track whether redis is reachable with a background ping, so that requests need not each check it
+    """
+
+    def __init__(self):
+        self.healthy = False
+        self.task: Optional[asyncio.Task] = None
+
+    async def check(self) -> bool:
+        healthy = await test_redis_connection()
+        if healthy != self.healthy:
+            logger.info(f"Redis is {'healthy' if healthy else 'unhealthy'}")
+        self.healthy = healthy
+        return healthy
+
+    def mark_unhealthy(self) -> None:
+        # A failed command is not worth retrying on every request until the next check finds redis again
+        self.healthy = False
+
+    async def start(self) -> None:
+        await self.check()
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(config.redis_health_check_interval)
+            await self.check()
+
+    async def stop(self) -> None:
+        if self.task:
+            self.task.cancel()
+            self.task = None
+        await redis_pool.disconnect()
+
 
-    finally:
-        redis_client.close()
-        return connection_healthy
+redis_health = RedisHealthProbe()
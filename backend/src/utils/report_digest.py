@@ -0,0 +1,125 @@
+import re
+from collections import Counter
+
+from src.llm.retrieval import RetrievalIndex, tokenize
+from src.session.file_uploads import (
+    ReportDigest,
+    ReportResponse,
+    ReportSection,
+    get_uploaded_report,
+    get_uploaded_report_digest,
+)
+from src.utils.tokens import estimate_tokens, truncate_to_tokens
+
+HEADING_PATTERN = re.compile(r"^#{1,6}\s+(.+?)\s*#*\s*$", re.MULTILINE)
+SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?])\s")
+# Markdown that carries no meaning once a section is summarised
+MARKDOWN_PATTERN = re.compile(r"[*_`>|]+|^\s*[-+]\s+", re.MULTILINE)
+
+SECTION_SUMMARY_TOKENS = 60
+SECTION_KEYWORDS = 8
+
+
+def split_sections(report: str) -> list[tuple[str, str]]:
+    """
+    The title and content of each section of a markdown report. Text before the first heading is an untitled section,
+    and headings with no content of their own, such as those grouping subsections, are dropped.
+    """
+    headings = list(HEADING_PATTERN.finditer(report))
+    starts = [(None, 0)] + [(heading.group(1), heading.end()) for heading in headings]
+    ends = [heading.start() for heading in headings] + [len(report)]
+
+    sections = []
+    for (title, start), end in zip(starts, ends):
+        content = report[start:end].strip()
+        if content:
+            sections.append((title or "Introduction", content))
+    return sections
+
+
+def summarise_section(content: str) -> str:
+    """
+    The leading sentences of a section, which in the generated reports state what the section covers
+    """
+    text = " ".join(MARKDOWN_PATTERN.sub("", content).split())
+    summary = ""
+    for sentence in SENTENCE_END_PATTERN.split(text):
+        if summary and estimate_tokens(summary, sentence) > SECTION_SUMMARY_TOKENS:
+            break
+        summary = f"{summary} {sentence}".strip()
+    return truncate_to_tokens(summary, SECTION_SUMMARY_TOKENS)
+
+
+def get_keywords(content: str) -> list[str]:
+    terms = Counter(term for term in tokenize(content) if len(term) > 2 and not term.isdigit())
+    return [term for term, _ in terms.most_common(SECTION_KEYWORDS)]
+
+
+def create_report_digest(report: ReportResponse) -> ReportDigest:
+    return ReportDigest(
+        id=report["id"],
+        filename=report.get("filename"),
+        sections=[
+            ReportSection(
+                title=title, summary=summarise_section(content), keywords=get_keywords(content), content=content
+            )
+            for title, content in split_sections(report.get("report") or "")
+        ],
+    )
+
+
+def select_relevant_sections(digest: ReportDigest, query: str, budget_tokens: int) -> list[ReportSection]:
+    """
+    The sections that best match the query, most relevant first, whose combined content fits within the budget.
+    Sections that share no terms with the query are never selected.
+    """
+    sections = digest["sections"]
+    if not sections:
+        return []
+    # Titles and keywords are weighted in with the content, as they name what the section is about
+    index = RetrievalIndex(
+        [f"{section['title']} {' '.join(section['keywords'])} {section['content']}" for section in sections]
+    )
+    scores = index.score(query)
+
+    selected = []
+    for position in sorted(range(len(sections)), key=scores.__getitem__, reverse=True):
+        if scores[position] <= 0:
+            break
+        section_tokens = estimate_tokens(sections[position]["content"])
+        if section_tokens > budget_tokens:
+            continue
+        budget_tokens -= section_tokens
+        selected.append(sections[position])
+    return selected
+
+
+def format_report_digest(digest: ReportDigest, query: str, budget_tokens: int) -> str:
+    """
+    The outline of a report, with the full content of only the sections relevant to the query
+    """
+    outline = "\n".join(
+        f"- {section['title']}: {section['summary']} (keywords: {', '.join(section['keywords'])})"
+        for section in digest["sections"]
+    )
+    lines = [f"The following report was generated from the file {digest['filename']}.", "", "Sections:", outline]
+
+    relevant_sections = select_relevant_sections(digest, query, budget_tokens)
+    if relevant_sections:
+        lines += ["", "The full content of the most relevant sections is:"]
+        lines += [f"## {section['title']}\n{section['content']}" for section in relevant_sections]
+    return "\n".join(lines)
+
+
+async def get_uploaded_report_prompt(query: str, budget_tokens: int) -> str | None:
+    """
+    The digest of the report uploaded in this session, with the sections relevant to the query
+    """
+    digest = await get_uploaded_report_digest()
+    if digest is None:
+        # Reports stored before digests were created have their digest built when needed
+        report = await get_uploaded_report()
+        if not report or not report.get("report"):
+            return None
+        digest = create_report_digest(report)
+    return format_report_digest(digest, query, budget_tokens)
@@ -1,12 +1,22 @@
 from src.utils.graph_db_utils import execute_query
+from src.utils.metric_views import describe_metric_views, is_metric_view
+import hashlib
 import logging
 from src.prompts import PromptEngine
+from src.utils import Config
+from src.utils.redis_utils import redis_client
 import json
 import asyncio
 
 semantic_layer_ready = asyncio.Event()
 
 logger = logging.getLogger(__name__)
+config = Config()
+
+SEMANTIC_LAYER_KEY_PREFIX = "semantic_layer_"
+LATEST_SEMANTIC_LAYER_KEY = "semantic_layer_latest"
+# Bump when the structure of the enriched semantic layer changes, so that layers persisted in the old form are rebuilt
+SEMANTIC_LAYER_VERSION = 2
 
 engine = PromptEngine()
 relationship_property_query = engine.load_prompt("relationship-property-cypher-query")
@@ -31,12 +41,59 @@ neo4j_relationships_understanding_prompt = engine.load_prompt(
 )
 
 
-async def get_semantic_layer(llm, model, agent):
-    finalised_graph_structure = {"nodes": {}, "properties": {}}
+def create_fingerprint(content) -> str:
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def create_prompts_fingerprint() -> str:
+    return create_fingerprint(
+        [
+            SEMANTIC_LAYER_VERSION,
+            neo4j_relationships_understanding_prompt,
+            neo4j_nodes_understanding_prompt,
+            neo4j_relationship_property_prompt,
+            neo4j_node_property_prompt,
+        ]
+    )
+
+
+def create_schema_hash(*schema_results) -> str:
+    """
+    Hash the raw schema returned by Neo4j, along with the prompts used to enrich it, so that a persisted semantic
+    layer is only reused while neither has changed
+    """
+    return create_fingerprint([create_prompts_fingerprint(), schema_results])
+
+
+async def load_semantic_layer(schema_hash: str) -> dict | None:
+    try:
+        semantic_layer = await redis_client.get(SEMANTIC_LAYER_KEY_PREFIX + schema_hash)
+        return json.loads(semantic_layer) if isinstance(semantic_layer, str) else None
+    except Exception as e:
+        logger.warning(f"Unable to load persisted semantic layer: {e}")
+        return None
+
+
+async def load_latest_semantic_layer() -> dict | None:
+    try:
+        latest_hash = await redis_client.get(LATEST_SEMANTIC_LAYER_KEY)
+    except Exception as e:
+        logger.warning(f"Unable to load persisted semantic layer: {e}")
+        return None
+    return await load_semantic_layer(latest_hash) if isinstance(latest_hash, str) else None
+
 
-    relationship_result = execute_query(relationship_query)
-    payload = relationship_result[0]
+async def store_semantic_layer(schema_hash: str, persisted_layer: dict) -> None:
+    try:
+        pipeline = redis_client.pipeline()
+        pipeline.set(SEMANTIC_LAYER_KEY_PREFIX + schema_hash, json.dumps(persisted_layer))
+        pipeline.set(LATEST_SEMANTIC_LAYER_KEY, schema_hash)
+        await pipeline.execute()
+    except Exception as e:
+        logger.warning(f"Unable to persist semantic layer: {e}")
 
+
+def convert_schema(payload) -> tuple[list, list]:
     nodes = []
     relationships_dict = {}
 
@@ -68,67 +125,220 @@ async def get_semantic_layer(llm, model, agent):
         relationships_dict[relationship_type]["paths"].append({"path": path, "detail": ""})
     # Convert relationships_dict to a list
     relationships = list(relationships_dict.values())
+    return nodes, relationships
 
-    finalised_graph_structure = {"nodes": nodes, "relationships": relationships}
-    json.dumps(finalised_graph_structure)
 
-    async with asyncio.TaskGroup() as tg:
-        tg.create_task(enrich_relationships(llm, model, finalised_graph_structure, agent))
-        tg.create_task(enrich_nodes(llm, model, finalised_graph_structure, agent))
-        tg.create_task(enriched_rel_properties(llm, model, finalised_graph_structure, agent))
-        tg.create_task(enrich_nodes_properties(llm, model, finalised_graph_structure, agent))
+def clean_relationship_properties(properties_result) -> list:
+    cleaned_rel_properties = []
+    for rel_property in properties_result[0]["relProperties"]:
+        cleaned_properties = [prop for prop in rel_property["properties"] if prop["name"] is not None]
+        if cleaned_properties:
+            cleaned_rel_properties.append({**rel_property, "properties": cleaned_properties})
+    return cleaned_rel_properties
+
+
+def filter_node_properties(node_properties_neo4j_result) -> list:
+    return [
+        node
+        for node in node_properties_neo4j_result[0]["nodeProperties"]
+        if all(prop["data_type"] is not None and prop["name"] is not None for prop in node["properties"])
+    ]
+
+
+def get_node_list(nodes) -> list:
+    # FS-67 - OpenAI nests the enriched nodes under a "nodes" key, whereas Mistral returns the list directly
+    return nodes["nodes"] if isinstance(nodes, dict) else nodes
+
+
+def create_fingerprints(nodes, relationships, rel_properties, node_properties) -> dict:
+    return {
+        "nodes": {node["label"]: create_fingerprint(node) for node in nodes},
+        "relationships": {rel["cypher_representation"]: create_fingerprint(rel) for rel in relationships},
+        "relationship_properties": {
+            rel_property["relationship_type"]: create_fingerprint(rel_property) for rel_property in rel_properties
+        },
+        "node_properties": {node["label"]: create_fingerprint(node) for node in node_properties},
+    }
+
+
+async def get_semantic_layer(llm, model, agent):
+    relationship_result, properties_result, node_properties_neo4j_result = await asyncio.gather(
+        execute_query(relationship_query),
+        execute_query(relationship_property_query),
+        execute_query(node_property_query),
+    )
+
+    schema_hash = create_schema_hash(relationship_result, properties_result, node_properties_neo4j_result)
+    persisted_layer = await load_semantic_layer(schema_hash)
+    if persisted_layer is not None:
+        logger.info(f"Loaded persisted semantic layer for schema {schema_hash[:12]}")
+        semantic_layer_ready.set()
+        return persisted_layer["semantic_layer"]
+
+    nodes, relationships = convert_schema(relationship_result[0])
+    rel_properties = clean_relationship_properties(properties_result)
+    node_properties = filter_node_properties(node_properties_neo4j_result)
+    # Metric views have fixed descriptions, so are advertised separately rather than enriched by the LLM
+    metric_view_labels = [node["label"] for node in nodes if is_metric_view(node["label"])]
+    nodes = [node for node in nodes if not is_metric_view(node["label"])]
+    node_properties = [node for node in node_properties if not is_metric_view(node["label"])]
+    fingerprints = create_fingerprints(nodes, relationships, rel_properties, node_properties)
+
+    previous_layer = await load_latest_semantic_layer()
+    if previous_layer is None or previous_layer.get("prompts") != create_prompts_fingerprint():
+        logger.info(f"No semantic layer persisted for schema {schema_hash[:12]}, enriching whole schema")
+        previous_layer = {"fingerprints": {}, "semantic_layer": {"nodes": [], "relationships": []}}
+    else:
+        logger.info(f"Schema changed to {schema_hash[:12]}, enriching only the changes")
+
+    finalised_graph_structure = await enrich_schema_changes(
+        llm, model, agent, previous_layer, fingerprints, nodes, relationships, rel_properties, node_properties
+    )
+    if metric_view_labels:
+        finalised_graph_structure["metric_views"] = await describe_metric_views(metric_view_labels)
+
+    await store_semantic_layer(
+        schema_hash,
+        {
+            "prompts": create_prompts_fingerprint(),
+            "fingerprints": fingerprints,
+            "semantic_layer": finalised_graph_structure,
+        },
+    )
     semantic_layer_ready.set()
     logger.info("Semantic layer initialized successfully.")
     return finalised_graph_structure
 
 
-async def enrich_relationships(llm, model, finalised_graph_structure, agent):
-    relationships = finalised_graph_structure["relationships"]
-    enriched_relationships_list = []
+async def enrich_schema_changes(
+    llm, model, agent, previous_layer, fingerprints, nodes, relationships, rel_properties, node_properties
+) -> dict:
+    """
+    Enrich only the nodes, relationships and properties that are new or have changed since the previous semantic
+    layer, reusing the previous descriptions of everything else. With no previous layer the whole schema is enriched.
+    """
+    previous_fingerprints = previous_layer["fingerprints"]
+    previous_nodes = {node["label"]: node for node in get_node_list(previous_layer["semantic_layer"]["nodes"])}
+    previous_relationships = {
+        rel["cypher_representation"]: rel for rel in previous_layer["semantic_layer"]["relationships"]
+    }
 
-    for relationship in relationships:
-        enriched_relationship = await llm.chat(
-            model, neo4j_relationships_understanding_prompt, str(relationship), agent=agent, return_json=True
+    def has_changed(category: str, key: str, previous: dict | None = None) -> bool:
+        unchanged = previous_fingerprints.get(category, {}).get(key) == fingerprints[category][key]
+        return not unchanged or (previous is not None and key not in previous)
+
+    changed_nodes = [node for node in nodes if has_changed("nodes", node["label"], previous_nodes)]
+    changed_relationships = [
+        rel
+        for rel in relationships
+        if has_changed("relationships", rel["cypher_representation"], previous_relationships)
+    ]
+    changed_rel_properties = [
+        rel_property
+        for rel_property in rel_properties
+        if has_changed("relationship_properties", rel_property["relationship_type"])
+    ]
+    changed_node_properties = [node for node in node_properties if has_changed("node_properties", node["label"])]
+    logger.info(
+        f"Enriching {len(changed_nodes)} of {len(nodes)} nodes, {len(changed_relationships)} of "
+        f"{len(relationships)} relationships, {len(changed_rel_properties)} of {len(rel_properties)} relationship "
+        f"property sets and {len(changed_node_properties)} of {len(node_properties)} node property sets"
+    )
+
+    # The enrichments are independent LLM calls, so they are all made at once and only merged once they complete
+    async with asyncio.TaskGroup() as tg:
+        enriched_relationships = tg.create_task(enrich_relationships(llm, model, changed_relationships, agent))
+        enriched_nodes = tg.create_task(enrich_nodes(llm, model, changed_nodes, agent))
+        enriched_relationship_properties = tg.create_task(
+            enriched_rel_properties(llm, model, changed_rel_properties, agent)
+        )
+        enriched_node_properties = tg.create_task(
+            enrich_nodes_properties(llm, model, changed_node_properties, agent)
         )
-        enriched_relationships_list.append(json.loads(enriched_relationship))
 
-        finalised_graph_structure["relationships"] = enriched_relationships_list
-    logger.debug(f"finalised graph structure with enriched relationships: {finalised_graph_structure}")
+    enriched_nodes_by_label = {node["label"]: node for node in get_node_list(enriched_nodes.result())}
+    enriched_relationships_by_type = {
+        rel["cypher_representation"]: enriched_rel
+        for rel, enriched_rel in zip(changed_relationships, enriched_relationships.result())
+    }
+    node_property_labels = {node["label"] for node in node_properties}
+    relationship_property_types = {rel_property["relationship_type"] for rel_property in rel_properties}
+
+    finalised_nodes = []
+    for node in nodes:
+        label = node["label"]
+        if label in enriched_nodes_by_label:
+            finalised_node = dict(enriched_nodes_by_label[label])
+        elif label in previous_nodes and node not in changed_nodes:
+            finalised_node = dict(previous_nodes[label])
+        else:
+            # The LLM did not describe this node, so fall back to its raw schema
+            finalised_node = dict(node)
+        # Properties are enriched separately, so keep the previous description of them until they are re-enriched
+        finalised_node.pop("properties", None)
+        if label in node_property_labels and "properties" in previous_nodes.get(label, {}):
+            finalised_node["properties"] = previous_nodes[label]["properties"]
+        finalised_nodes.append(finalised_node)
+
+    finalised_relationships = []
+    for rel in relationships:
+        cypher_representation = rel["cypher_representation"]
+        if cypher_representation in enriched_relationships_by_type:
+            finalised_relationship = dict(enriched_relationships_by_type[cypher_representation])
+        else:
+            finalised_relationship = dict(previous_relationships[cypher_representation])
+        finalised_relationship.pop("property", None)
+        if (
+            cypher_representation in relationship_property_types
+            and "property" in previous_relationships.get(cypher_representation, {})
+        ):
+            finalised_relationship["property"] = previous_relationships[cypher_representation]["property"]
+        finalised_relationships.append(finalised_relationship)
+
+    finalised_graph_structure = {"nodes": finalised_nodes, "relationships": finalised_relationships}
+    merge_relationship_properties(finalised_graph_structure, enriched_relationship_properties.result())
+    merge_node_properties(finalised_graph_structure, enriched_node_properties.result())
+    return finalised_graph_structure
 
 
-async def enrich_nodes(llm, model, finalised_graph_structure, agent):
-    neo4j_data = finalised_graph_structure["nodes"]
-    print(f"neo4j data: {neo4j_data}")
-    enriched_nodes = await llm.chat(
-        model, neo4j_nodes_understanding_prompt, str(neo4j_data), agent=agent, return_json=True
+async def enrich_relationships(llm, model, relationships, agent) -> list:
+    if not relationships:
+        return []
+    enriched_relationships = await asyncio.gather(
+        *[
+            llm.chat(model, neo4j_relationships_understanding_prompt, str(relationship), agent=agent, return_json=True)
+            for relationship in relationships
+        ]
     )
-    enriched_nodes = json.loads(enriched_nodes)
-    json.dumps(enriched_nodes)
-    finalised_graph_structure["nodes"] = enriched_nodes
-    logger.debug(f"finalised graph structure: {finalised_graph_structure}")
-    print(f"finalised_graph_structure with nodes: {finalised_graph_structure}")
+    enriched_relationships_list = [json.loads(relationship) for relationship in enriched_relationships]
+    logger.debug(f"enriched relationships: {enriched_relationships_list}")
+    return enriched_relationships_list
 
 
-async def enriched_rel_properties(llm, model, finalised_graph_structure, agent):
-    properties_result = execute_query(relationship_property_query)
-    rel_properties_neo4j = properties_result[0]
-    cleaned_rel_properties = []
-
-    for rel_property in rel_properties_neo4j["relProperties"]:
-        cleaned_properties = [prop for prop in rel_property["properties"] if prop["name"] is not None]
-        if cleaned_properties:
-            rel_property["properties"] = cleaned_properties
-            cleaned_rel_properties.append(rel_property)
+async def enrich_nodes(llm, model, nodes, agent):
+    if not nodes:
+        return []
+    logger.debug(f"neo4j data: {nodes}")
+    enriched_nodes = await llm.chat(model, neo4j_nodes_understanding_prompt, str(nodes), agent=agent, return_json=True)
+    enriched_nodes = json.loads(enriched_nodes)
+    logger.debug(f"enriched nodes: {enriched_nodes}")
+    return enriched_nodes
 
-    rel_properties_neo4j = {"relProperties": cleaned_rel_properties}
-    json.dumps(rel_properties_neo4j)
 
+async def enriched_rel_properties(llm, model, rel_properties, agent) -> dict:
+    if not rel_properties:
+        return {"relProperties": []}
     enriched_rel_properties = await llm.chat(
-        model, neo4j_relationship_property_prompt, str(rel_properties_neo4j), agent=agent, return_json=True
+        model,
+        neo4j_relationship_property_prompt,
+        str({"relProperties": rel_properties}),
+        agent=agent,
+        return_json=True,
     )
-    enriched_rel_properties = json.loads(enriched_rel_properties)
+    return json.loads(enriched_rel_properties)
+
 
-    # Merge properties
+def merge_relationship_properties(finalised_graph_structure, enriched_rel_properties) -> None:
     for new_rel in enriched_rel_properties["relProperties"]:
         # FS-67 - This change was done as relType is unavailable here for mistral.
         relationship_type = new_rel.get("relType", None)
@@ -145,21 +355,16 @@ async def enriched_rel_properties(llm, model, finalised_graph_structure, agent):
     logger.debug(f"finalised graph structure with enriched properties: {finalised_graph_structure}")
 
 
-async def enrich_nodes_properties(llm, model, finalised_graph_structure, agent):
-    node_properties_neo4j_result = execute_query(node_property_query)
-    node_properties_neo4j = node_properties_neo4j_result[0]
-    filtered_payload = {
-        "nodeProperties": [
-            node
-            for node in node_properties_neo4j["nodeProperties"]
-            if all(prop["data_type"] is not None and prop["name"] is not None for prop in node["properties"])
-        ]
-    }
+async def enrich_nodes_properties(llm, model, node_properties, agent) -> dict:
+    if not node_properties:
+        return {"nodeProperties": []}
     enriched_node_properties = await llm.chat(
-        model, neo4j_node_property_prompt, str(filtered_payload), agent=agent, return_json=True
+        model, neo4j_node_property_prompt, str({"nodeProperties": node_properties}), agent=agent, return_json=True
     )
-    enriched_node_properties = json.loads(enriched_node_properties)
+    return json.loads(enriched_node_properties)
+
 
+def merge_node_properties(finalised_graph_structure, enriched_node_properties) -> None:
     for new_node in enriched_node_properties["nodeProperties"]:
         label = new_node["label"]
         properties_to_add = new_node["properties"]
@@ -0,0 +1,12 @@
+# Rough number of characters per token, used where the real count is not known, such as before an LLM call is made
+CHARACTERS_PER_TOKEN = 4
+
+
+def estimate_tokens(*texts: str | None) -> int:
+    return sum(len(text or "") for text in texts) // CHARACTERS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    if estimate_tokens(text) <= tokens:
+        return text
+    return text[: tokens * CHARACTERS_PER_TOKEN] + "..."
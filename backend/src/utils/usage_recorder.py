@@ -4,6 +4,7 @@ import csv
 import datetime
 from pathlib import Path
 import os
+from dataclasses import dataclass
 
 from typing import Optional, Dict, Union
 from src.utils import Config
@@ -19,6 +20,17 @@ CSV_HEADERS = [
     "completion_tokens",
     "total_tokens",
     "duration_seconds",
+    "cached_tokens",
+]
+
+CACHE_CSV_HEADERS = [
+    "timestamp",
+    "model",
+    "provider",
+    "agent",
+    "cache_hit",
+    "saved_tokens",
+    "saved_duration_seconds",
 ]
 
 # Ensure the logs directory exists
@@ -28,9 +40,61 @@ logger = logging.getLogger(__name__)
 config = Config()
 
 
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    saved_tokens: int = 0
+    saved_duration: float = 0.0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass
+class PromptCacheStats:
+    prompt_tokens: int = 0
+    # The prompt tokens served from a provider's prompt cache, which are billed at a discount and processed faster
+    cached_tokens: int = 0
+
+    @property
+    def cached_ratio(self) -> float:
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+
+def needs_csv_headers(path: Path, headers: list[str]) -> bool:
+    """
+    Whether headers need to be written to a CSV log before appending to it. A log with other headers, such as one
+    written before a column was added, is moved aside with a timestamp suffix so that a new log is started.
+    """
+    if not os.path.isfile(path):
+        return True
+    with open(path, newline="") as file:
+        if next(csv.reader(file), None) == headers:
+            return False
+
+    rotated_path = path.with_name(f"{path.stem}_{datetime.datetime.now():%Y%m%d%H%M%S}{path.suffix}")
+    os.replace(path, rotated_path)
+    logger.info(f"Moved {path} to {rotated_path} as its headers are out of date")
+    return True
+
+
+def get_token_count(token_usage: Optional[Union[Dict, str]], key: str) -> int:
+    if isinstance(token_usage, dict) and isinstance(token_usage.get(key), int):
+        return token_usage[key]
+    return 0
+
+
+def get_total_tokens(token_usage: Optional[Union[Dict, str]]) -> int:
+    return get_token_count(token_usage, "total_tokens")
+
+
 class UsageRecorder(ABC):
     def __init__(self):
-        pass
+        self.cache_stats: dict[str, CacheStats] = {}
+        self.prompt_cache_stats: dict[str, PromptCacheStats] = {}
 
     @abstractmethod
     def record_activity(
@@ -43,9 +107,51 @@ class UsageRecorder(ABC):
     ):
         pass
 
+    def record_cache_activity(
+        self,
+        model: str,
+        provider: str,
+        agent: str,
+        cache_hit: bool,
+        token_usage: Optional[Union[Dict, str]] = None,
+        duration: float = 0.0,
+    ) -> CacheStats:
+        """
+        Count an LLM response cache hit or miss for an agent.
+
+        Args:
+            model: The model name used for the request
+            provider: The provider name used for the request
+            agent: The name of the agent making the request
+            cache_hit: Whether the response was served from the cache
+            token_usage: The token usage of the original LLM call, saved by a cache hit
+            duration: The duration of the original LLM call in seconds, saved by a cache hit
+        """
+        stats = self.cache_stats.setdefault(agent, CacheStats())
+        if cache_hit:
+            stats.hits += 1
+            stats.saved_tokens += get_total_tokens(token_usage)
+            stats.saved_duration += duration
+        else:
+            stats.misses += 1
+        return stats
+
+    def record_prompt_cache_activity(
+        self, agent: str, token_usage: Optional[Union[Dict, str]] = None
+    ) -> PromptCacheStats:
+        """
+        Count the prompt tokens of an LLM call for an agent, and how many of them the provider served from its prompt
+        cache
+        """
+        stats = self.prompt_cache_stats.setdefault(agent, PromptCacheStats())
+        stats.prompt_tokens += get_token_count(token_usage, "prompt_tokens")
+        stats.cached_tokens += get_token_count(token_usage, "cached_tokens")
+        return stats
+
 
 class ConsoleUsageRecorder(UsageRecorder):
     def __init__(self):
+        super().__init__()
         logger.info("Usage will be logged to the console")
 
     def record_activity(
@@ -60,12 +166,27 @@ class ConsoleUsageRecorder(UsageRecorder):
             {"model": model, "provider": provider, "agent": agent, "token_usage": token_usage, "duration": duration}
         )
 
+    def record_cache_activity(
+        self,
+        model: str,
+        provider: str,
+        agent: str,
+        cache_hit: bool,
+        token_usage: Optional[Union[Dict, str]] = None,
+        duration: float = 0.0,
+    ) -> CacheStats:
+        stats = super().record_cache_activity(model, provider, agent, cache_hit, token_usage, duration)
+        logger.info({"model": model, "provider": provider, "agent": agent, "cache_hit": cache_hit, "stats": stats})
+        return stats
+
 
 class CSVUsageRecorder(UsageRecorder):
     def __init__(self):
+        super().__init__()
         # Get the configured CSV filename, or use default if not set
         csv_filename = config.llm_usage_log_filename or DEFAULT_CSV_FILENAME
         self.csv_file_path = CSV_DIR / csv_filename
+        self.cache_csv_file_path = CSV_DIR / f"cache_{csv_filename}"
 
         logger.info(f"Usage logs will be saved to the following path: {self.csv_file_path}")
 
@@ -94,19 +215,20 @@ class CSVUsageRecorder(UsageRecorder):
             prompt_tokens = token_usage.get("prompt_tokens", "N/A")
             completion_tokens = token_usage.get("completion_tokens", "N/A")
             total_tokens = token_usage.get("total_tokens", "N/A")
+            cached_tokens = token_usage.get("cached_tokens", "N/A")
         else:
             prompt_tokens = "N/A"
             completion_tokens = "N/A"
             total_tokens = "N/A"
+            cached_tokens = "N/A"
 
-        # Create the file with headers if it doesn't exist
-        file_exists = os.path.isfile(self.csv_file_path)
+        # Create the file with headers if it doesn't exist, or was written with other headers
+        write_headers = needs_csv_headers(self.csv_file_path, CSV_HEADERS)
 
         with open(self.csv_file_path, mode="a", newline="") as file:
             writer = csv.writer(file)
 
-            # Write headers if file is new
-            if not file_exists:
+            if write_headers:
                 writer.writerow(CSV_HEADERS)
 
             # Write the data row
@@ -120,7 +242,46 @@ class CSVUsageRecorder(UsageRecorder):
                     completion_tokens,
                     total_tokens,
                     f"{duration:.2f}",
+                    cached_tokens,
                 ]
             )
 
         logger.debug(f"Logged {model} / {provider} usage data to {self.csv_file_path}")
+
+    def record_cache_activity(
+        self,
+        model: str,
+        provider: str,
+        agent: str,
+        cache_hit: bool,
+        token_usage: Optional[Union[Dict, str]] = None,
+        duration: float = 0.0,
+    ) -> CacheStats:
+        """
+        Count an LLM response cache hit or miss and log it, with the tokens and time saved, to a CSV file
+        alongside the usage log.
+        """
+        stats = super().record_cache_activity(model, provider, agent, cache_hit, token_usage, duration)
+
+        write_headers = needs_csv_headers(self.cache_csv_file_path, CACHE_CSV_HEADERS)
+
+        with open(self.cache_csv_file_path, mode="a", newline="") as file:
+            writer = csv.writer(file)
+
+            if write_headers:
+                writer.writerow(CACHE_CSV_HEADERS)
+
+            writer.writerow(
+                [
+                    datetime.datetime.now().isoformat(),
+                    model,
+                    provider,
+                    agent,
+                    cache_hit,
+                    get_total_tokens(token_usage) if cache_hit else 0,
+                    f"{duration if cache_hit else 0.0:.2f}",
+                ]
+            )
+
+        logger.debug(f"Logged {agent} cache {'hit' if cache_hit else 'miss'}, hit ratio {stats.hit_ratio:.2f}")
+        return stats
@@ -9,6 +9,7 @@ class MessageTypes(Enum):
     PING = "ping"
     PONG = "pong"
     CHAT = "chat"
+    CHAT_ANSWER_STREAM = "chat:answer-stream"
     LOG = "log"
     IMAGE = "image"
     CONFIRMATION = "confirmation"
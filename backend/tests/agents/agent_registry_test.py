@@ -0,0 +1,76 @@
+import json
+
+from src.agents import ChatAgent, chat_agent, agent_registry
+from src.agents.agent_registry import AgentRegistry
+from src.agents.tool import ToolAnswerType
+from tests.agents import MockChatAgent, mock_tools
+
+mock_model = "mockmodel"
+uploaded_files = ["a.pdf"]
+
+
+def describe_files(cls) -> str:
+    return f"Reads the files {', '.join(uploaded_files)}"
+
+
+@chat_agent(name="Static Agent", description="An agent with a fixed description", tools=mock_tools[:1])
+class StaticAgent(ChatAgent):
+    async def validate(self, utterance: str, answer: ToolAnswerType) -> bool:
+        return True
+
+
+@chat_agent(name="Dynamic Agent", description=describe_files, tools=mock_tools[:1])
+class DynamicAgent(ChatAgent):
+    async def validate(self, utterance: str, answer: ToolAnswerType) -> bool:
+        return True
+
+
+dynamic_agent = DynamicAgent("mockllm", mock_model)
+static_agent = StaticAgent("mockllm", mock_model)
+
+
+def test_catalogue_lists_agents_with_changing_descriptions_last():
+    registry = AgentRegistry([dynamic_agent, static_agent])
+
+    catalogue = json.loads(registry.get_catalogue())
+
+    assert catalogue == [static_agent.get_agent_details(), dynamic_agent.get_agent_details()]
+    assert [agent.name for agent in registry.get_agents()] == ["Static Agent", "Dynamic Agent"]
+
+
+def test_catalogue_excludes_agents():
+    registry = AgentRegistry([dynamic_agent, static_agent])
+
+    assert [agent["agent"] for agent in json.loads(registry.get_catalogue(["Static Agent"]))] == ["Dynamic Agent"]
+    assert registry.get_agents(["Static Agent"]) == [dynamic_agent]
+
+
+def test_changing_description_is_serialised_again_only_when_changed(mocker):
+    registry = AgentRegistry([static_agent, dynamic_agent])
+    serialise_details = mocker.spy(agent_registry, "serialise_details")
+
+    first = registry.get_catalogue()
+    assert registry.get_catalogue() == first
+    assert serialise_details.call_count == 1
+
+    uploaded_files.append("b.pdf")
+    try:
+        second = registry.get_catalogue()
+    finally:
+        uploaded_files.remove("b.pdf")
+
+    assert serialise_details.call_count == 2
+    assert json.loads(second)[1]["description"] == "Reads the files a.pdf, b.pdf"
+    # Only the end of the catalogue changes, so the prompt it is in keeps the same prefix
+    static_details = registry.descriptors[0].details
+    assert static_details is not None
+    assert second.startswith("[\n" + static_details)
+    assert first.startswith("[\n" + static_details)
+
+
+def test_get_agent_by_name():
+    mock_agent = MockChatAgent("mockllm", mock_model)
+    registry = AgentRegistry([mock_agent, static_agent])
+
+    assert registry.get_agent("Static Agent") is static_agent
+    assert registry.get_agent("Unknown Agent") is None
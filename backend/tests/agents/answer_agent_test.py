@@ -0,0 +1,47 @@
+import pytest
+
+from src.agents import answer_agent
+from src.agents.answer_agent import AnswerAgent
+from src.llm.factory import get_llm
+from src.websockets.types import MessageTypes
+
+mock_model = "mockmodel"
+mock_llm = get_llm("mockllm")
+
+
+@pytest.fixture
+def mock_broadcast(mocker):
+    async def chat_stream(*args, **kwargs):
+        for chunk in ["The ", "whole ", "answer"]:
+            yield chunk
+
+    mocker.patch.object(mock_llm, "chat_stream", chat_stream)
+    mocker.patch("src.agents.answer_agent.get_scratchpad", return_value=[])
+    return mocker.patch("src.agents.answer_agent.connection_manager.broadcast")
+
+
+@pytest.mark.asyncio
+async def test_create_answer_streams_answer_over_websocket(mocker, mock_broadcast):
+    mocker.patch.object(answer_agent, "ANSWER_STREAM_INTERVAL_SECONDS", 0)
+
+    agent = AnswerAgent(llm_name="mockllm", model=mock_model)
+
+    answer = await agent.create_answer("example question")
+
+    assert answer == "The whole answer"
+    streamed = [call.args[0] for call in mock_broadcast.await_args_list]
+    assert [message.type for message in streamed] == [MessageTypes.CHAT_ANSWER_STREAM] * 3
+    assert [message.data for message in streamed] == ["The ", "The whole ", "The whole answer"]
+
+
+@pytest.mark.asyncio
+async def test_create_answer_throttles_streamed_updates(mocker, mock_broadcast):
+    mocker.patch.object(answer_agent, "ANSWER_STREAM_INTERVAL_SECONDS", 60)
+
+    agent = AnswerAgent(llm_name="mockllm", model=mock_model)
+
+    answer = await agent.create_answer("example question")
+
+    assert answer == "The whole answer"
+    # The first chunk is sent straight away and the rest of the answer once the stream ends
+    assert [call.args[0].data for call in mock_broadcast.await_args_list] == ["The ", "The whole answer"]
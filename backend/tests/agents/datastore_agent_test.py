@@ -1,13 +1,15 @@
 import pytest
-from unittest.mock import AsyncMock, patch, MagicMock
+from unittest.mock import AsyncMock, patch
 
-from src.agents.tool import ToolActionSuccess
-from src.agents.datastore_agent import generate_cypher_query_core
+from src.agents.tool import ToolActionFailure, ToolActionSuccess
+from src.llm.prompt import Prompt
+from src.agents.datastore_agent import DatastoreAgent, analyse_tabular_data_core, generate_cypher_query_core
+from src.utils.cypher_plan_cache import CypherPlan, current_plan
 
 @pytest.mark.asyncio
 @patch("src.agents.datastore_agent.semantic_layer_ready", new_callable=AsyncMock)
 @patch("src.agents.datastore_agent.get_semantic_layer", new_callable=AsyncMock)
-@patch("src.agents.datastore_agent.execute_query", new_callable=MagicMock)
+@patch("src.agents.datastore_agent.execute_query", new_callable=AsyncMock)
 @patch("src.agents.datastore_agent.publish_log_info", new_callable=AsyncMock)
 @patch("src.agents.datastore_agent.engine.load_prompt", autospec=True)
 async def test_generate_query_success(mock_load_prompt, mock_publish_log_info,
@@ -19,7 +21,8 @@ async def test_generate_query_success(mock_load_prompt, mock_publish_log_info,
 
     mock_load_prompt.side_effect = [
         "details to create cypher query prompt",
-        "generate cypher query prompt"
+        "generate cypher query prompt",
+        "current date prompt",
     ]
 
     llm.chat.return_value = '{"query": "MATCH (n) RETURN n"}'
@@ -44,18 +47,18 @@ async def test_generate_query_success(mock_load_prompt, mock_publish_log_info,
     mock_load_prompt.assert_called()
     llm.chat.assert_called_once_with(
         model,
-        "generate cypher query prompt",
+        Prompt("generate cypher query prompt", "current date prompt"),
         "details to create cypher query prompt",
         agent="datastore",
         return_json=True
     )
-    mock_execute_query.assert_called_once_with("MATCH (n) RETURN n")
+    mock_execute_query.assert_called_once_with("MATCH (n) RETURN n", use_cache=True)
     mock_publish_log_info.assert_called()
 
 @pytest.mark.asyncio
 @patch("src.agents.datastore_agent.semantic_layer_ready", new_callable=AsyncMock)
 @patch("src.agents.datastore_agent.get_semantic_layer", new_callable=AsyncMock)
-@patch("src.agents.datastore_agent.execute_query", new_callable=MagicMock)
+@patch("src.agents.datastore_agent.execute_query", new_callable=AsyncMock)
 @patch("src.agents.datastore_agent.publish_log_info", new_callable=AsyncMock)
 @patch("src.agents.datastore_agent.engine.load_prompt", autospec=True)
 async def test_generate_query_failure(mock_load_prompt, mock_publish_log_info,
@@ -67,7 +70,8 @@ async def test_generate_query_failure(mock_load_prompt, mock_publish_log_info,
 
     mock_load_prompt.side_effect = [
         "details to create cypher query prompt",
-        "generate cypher query prompt"
+        "generate cypher query prompt",
+        "current date prompt",
     ]
 
     llm.chat.side_effect = Exception("LLM chat failed")
@@ -89,7 +93,7 @@ async def test_generate_query_failure(mock_load_prompt, mock_publish_log_info,
     mock_load_prompt.assert_called()
     llm.chat.assert_called_once_with(
         model,
-        "generate cypher query prompt",
+        Prompt("generate cypher query prompt", "current date prompt"),
         "details to create cypher query prompt",
         agent="datastore",
         return_json=True
@@ -97,5 +101,91 @@ async def test_generate_query_failure(mock_load_prompt, mock_publish_log_info,
     mock_publish_log_info.assert_not_called()
     mock_execute_query.assert_not_called()
 
+@pytest.mark.asyncio
+@patch("src.agents.datastore_agent.semantic_layer_ready", new_callable=AsyncMock)
+@patch("src.agents.datastore_agent.get_semantic_layer_cache", new_callable=AsyncMock)
+@patch("src.agents.datastore_agent.get_cypher_plan", return_value="MATCH (n) RETURN n")
+@patch("src.agents.datastore_agent.execute_query", new_callable=AsyncMock)
+@patch("src.agents.datastore_agent.publish_log_info", new_callable=AsyncMock)
+async def test_generate_query_reuses_cached_plan(mock_publish_log_info, mock_execute_query, mock_get_cypher_plan,
+                                                 mock_get_semantic_layer_cache, mock_semantic_layer_ready):
+    llm = AsyncMock()
+    mock_semantic_layer_ready.wait = AsyncMock(return_value=None)
+    mock_get_semantic_layer_cache.return_value = {"nodes": []}
+    mock_execute_query.return_value = "Mocked response from the database"
+
+    result = await generate_cypher_query_core("Find all nodes", "MATCH", "n", "none", "none", "2024", llm, "gpt-4")
+
+    assert result == ToolActionSuccess("Mocked response from the database")
+    llm.chat.assert_not_called()
+    mock_execute_query.assert_called_once_with("MATCH (n) RETURN n", use_cache=True)
+    assert current_plan.get() == CypherPlan(mock_get_cypher_plan.call_args.args[0], "MATCH (n) RETURN n", True)
+
+
+@pytest.mark.asyncio
+@patch("src.agents.datastore_agent.semantic_layer_ready", new_callable=AsyncMock)
+@patch("src.agents.datastore_agent.get_semantic_layer_cache", new_callable=AsyncMock)
+@patch("src.agents.datastore_agent.get_cypher_plan", return_value="MATCH (n) RETURN x")
+@patch("src.agents.datastore_agent.evict_cypher_plan")
+@patch("src.agents.datastore_agent.execute_query", new_callable=AsyncMock)
+@patch("src.agents.datastore_agent.publish_log_info", new_callable=AsyncMock)
+async def test_generate_query_evicts_failing_cached_plan(mock_publish_log_info, mock_execute_query,
+                                                         mock_evict_cypher_plan, mock_get_cypher_plan,
+                                                         mock_get_semantic_layer_cache, mock_semantic_layer_ready):
+    llm = AsyncMock()
+    llm.chat.return_value = '{"query": "MATCH (n) RETURN n"}'
+    mock_semantic_layer_ready.wait = AsyncMock(return_value=None)
+    mock_get_semantic_layer_cache.return_value = {"nodes": []}
+    mock_execute_query.side_effect = [Exception("Variable `x` not defined"), "Mocked response from the database"]
+
+    result = await generate_cypher_query_core("Find all nodes", "MATCH", "n", "none", "none", "2024", llm, "gpt-4")
+
+    assert result == ToolActionSuccess("Mocked response from the database")
+    plan_key = mock_get_cypher_plan.call_args.args[0]
+    mock_evict_cypher_plan.assert_awaited_once_with(plan_key)
+    llm.chat.assert_called_once()
+    assert current_plan.get() == CypherPlan(plan_key, "MATCH (n) RETURN n", False)
+
+
+@pytest.mark.asyncio
+@patch("src.agents.datastore_agent.BaseChatAgent.validate", new_callable=AsyncMock, return_value=False)
+@patch("src.agents.datastore_agent.confirm_current_plan")
+async def test_datastore_agent_validation_confirms_current_plan(mock_confirm_current_plan, mock_validate):
+    agent = DatastoreAgent("mockllm", "mock_model")
+
+    valid = await agent.validate("question", "answer")
+
+    assert not valid
+    mock_confirm_current_plan.assert_awaited_once_with(False)
+
+
 if __name__ == "__main__":
     pytest.main(["-v"])
+
+
+@pytest.mark.asyncio
+@patch("src.agents.datastore_agent.publish_log_info", new_callable=AsyncMock)
+@patch("src.agents.datastore_agent.columnar_store")
+async def test_analyse_tabular_data_success(mock_columnar_store, mock_publish_log_info):
+    mock_columnar_store.query.return_value = [{"Industry": "Airlines", "average_ESG_score": 65.0}]
+
+    result = await analyse_tabular_data_core(
+        "Average ESG score by industry", "group", "ESG_score, industry", "average", "none", "2021"
+    )
+
+    assert result == ToolActionSuccess([{"Industry": "Airlines", "average_ESG_score": 65.0}])
+    mock_columnar_store.query.assert_called_once_with(
+        "Average ESG score by industry", "group", "ESG_score, industry", "average", "none", "2021"
+    )
+
+
+@pytest.mark.asyncio
+@patch("src.agents.datastore_agent.columnar_store")
+async def test_analyse_tabular_data_falls_back_to_cypher(mock_columnar_store):
+    mock_columnar_store.query.return_value = None
+
+    result = await analyse_tabular_data_core("Funds holding Apple", "match", "fund, Apple", "none", "none", "none")
+
+    assert isinstance(result, ToolActionFailure)
+    assert result.retry
+    assert "generate cypher query" in result.reason
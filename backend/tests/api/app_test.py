@@ -29,6 +29,38 @@ def test_health_check_response_neo4j_unhealthy(mocker):
     assert response.json() == unhealthy_neo4j_response
 
 
+def test_llm_metrics_response(mocker):
+    metrics = {"providers": {}, "models": {}, "retries": {}}
+    mocker.patch("src.api.app.scheduler.get_metrics", return_value=metrics)
+
+    response = client.get("/metrics/llm")
+
+    assert response.status_code == 200
+    assert response.json() == metrics
+
+
+def test_index_coverage_metrics_response(mocker):
+    coverage = {"identifier_properties": 1, "indexed": 1, "coverage": 1.0, "properties": []}
+    mocker.patch("src.api.app.get_index_coverage", return_value=coverage)
+
+    response = client.get("/metrics/index-coverage")
+
+    assert response.status_code == 200
+    assert response.json() == coverage
+
+
+def test_router_metrics_response(mocker):
+    metrics = {"fast_path_routes": 3, "llm_routes": 1, "comparisons": 1, "agreements": 1}
+    decision_cache = {"entries": 1, "hits": 1, "misses": 1, "hit_ratio": 0.5}
+    mocker.patch("src.api.app.fast_path_router.get_metrics", return_value=metrics)
+    mocker.patch("src.api.app.router_decision_cache.get_metrics", return_value=decision_cache)
+
+    response = client.get("/metrics/router")
+
+    assert response.status_code == 200
+    assert response.json() == {**metrics, "decision_cache": decision_cache}
+
+
 def test_chat_response_success(mocker):
     mock_question = mocker.patch("src.api.app.question", return_value=expected_message)
 
@@ -104,12 +136,42 @@ def test_report_response_success(mocker):
 @pytest.mark.asyncio
 async def test_lifespan_populates_db(mocker) -> None:
     mock_dataset_upload = mocker.patch("src.api.app.dataset_upload", return_value=mocker.Mock())
+    mocker.patch("src.api.app.get_agent_registry")
     mocker.patch("src.api.app.OpenAILLMFileUploadManager.delete_all_files")
+    mocker.patch("src.api.app.close_driver")
 
     with client:
         mock_dataset_upload.assert_called_once_with()
 
 
+@pytest.mark.asyncio
+async def test_lifespan_closes_llm_clients_on_shutdown(mocker) -> None:
+    mocker.patch("src.api.app.dataset_upload", return_value=mocker.Mock())
+    mocker.patch("src.api.app.get_agent_registry")
+    mocker.patch("src.api.app.OpenAILLMFileUploadManager.delete_all_files")
+    mocker.patch("src.api.app.close_driver")
+    mock_close_instances = mocker.patch("src.api.app.LLM.close_instances")
+
+    with client:
+        mock_close_instances.assert_not_called()
+
+    mock_close_instances.assert_called_once_with()
+
+
+@pytest.mark.asyncio
+async def test_lifespan_closes_neo4j_driver_on_shutdown(mocker) -> None:
+    mocker.patch("src.api.app.dataset_upload", return_value=mocker.Mock())
+    mocker.patch("src.api.app.get_agent_registry")
+    mocker.patch("src.api.app.OpenAILLMFileUploadManager.delete_all_files")
+    mocker.patch("src.api.app.LLM.close_instances")
+    mock_close_driver = mocker.patch("src.api.app.close_driver")
+
+    with client:
+        mock_close_driver.assert_not_called()
+
+    mock_close_driver.assert_called_once_with()
+
+
 def test_get_report_success(mocker):
     report = ReportResponse(id="12", filename="test.pdf", report="test report", answer="chat message")
     mock_get_report = mocker.patch("src.api.app.get_report", return_value=report)
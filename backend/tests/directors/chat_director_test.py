@@ -0,0 +1,142 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.directors.chat_director import compact_conversation, dataset_upload
+from src.session.chat import CHAT_SESSION_KEY, CHAT_SUMMARY_SESSION_KEY
+from src.session.redis_session import Session
+from src.utils.columnar_engine import ColumnarStore
+from src.utils.dataset_registry import Dataset, create_content_hash
+
+
+@pytest.fixture
+def datasets(tmp_path):
+    bloomberg = tmp_path / "bloomberg.csv"
+    bloomberg.write_text("Company Name,ESG_score\nA,1\n")
+    esg_poc = tmp_path / "esg_poc.csv"
+    esg_poc.write_text("Fund Name,Company Name\nF,A\n")
+    return [Dataset("bloomberg", bloomberg, "Bloomberg_"), Dataset("esg_poc", esg_poc, "EsgPoc_")]
+
+
+@pytest.fixture
+def mock_loading(mocker, datasets):
+    mocker.patch("src.directors.chat_director.get_datasets", return_value=datasets)
+    mocker.patch("src.directors.chat_director.initialize_semantic_layer", new_callable=AsyncMock)
+    mocker.patch("src.directors.chat_director.is_db_populated", new_callable=AsyncMock, return_value=True)
+    mocker.patch("src.directors.chat_director.store_loaded_hash", new_callable=AsyncMock)
+    mocker.patch("src.directors.chat_director.columnar_store", ColumnarStore())
+    mocker.patch(
+        "src.directors.chat_director.get_index_coverage",
+        new_callable=AsyncMock,
+        return_value={"identifier_properties": 0, "indexed": 0, "coverage": 1.0, "properties": []},
+    )
+    mocker.patch(
+        "src.directors.chat_director.generate_dynamic_knowledge_graph",
+        new_callable=AsyncMock,
+        return_value={"cypher_query": "MERGE (c:Company {name: row[0]})", "model": ""},
+    )
+    return {
+        "provision_merge_indexes": mocker.patch(
+            "src.directors.chat_director.provision_merge_indexes", new_callable=AsyncMock
+        ),
+        "provision_property_indexes": mocker.patch(
+            "src.directors.chat_director.provision_property_indexes", new_callable=AsyncMock
+        ),
+        "materialise_metric_views": mocker.patch(
+            "src.directors.chat_director.materialise_metric_views", new_callable=AsyncMock
+        ),
+        "populate_db": mocker.patch("src.directors.chat_director.populate_db", new_callable=AsyncMock),
+        "remove_other_namespaces": mocker.patch(
+            "src.directors.chat_director.remove_other_namespaces", new_callable=AsyncMock
+        ),
+    }
+
+
+async def test_dataset_upload_loads_each_dataset_into_its_namespace(mocker, mock_loading):
+    mocker.patch("src.directors.chat_director.get_loaded_hash", new_callable=AsyncMock, return_value=None)
+
+    await dataset_upload()
+
+    mock_loading["remove_other_namespaces"].assert_awaited_once_with(["Bloomberg_", "EsgPoc_"])
+    loads = {call.args[2]: call.args[0] for call in mock_loading["populate_db"].call_args_list}
+    assert loads == {
+        "Bloomberg_": "MERGE (c:Bloomberg_Company {name: row[0]})",
+        "EsgPoc_": "MERGE (c:EsgPoc_Company {name: row[0]})",
+    }
+    assert mock_loading["materialise_metric_views"].await_count == 2
+    mock_loading["provision_merge_indexes"].assert_any_await("MERGE (c:EsgPoc_Company {name: row[0]})")
+    mock_loading["provision_property_indexes"].assert_awaited_once()
+
+
+async def test_dataset_upload_skips_unchanged_datasets(mocker, mock_loading, datasets):
+    bloomberg_hash = create_content_hash(datasets[0])
+    mocker.patch(
+        "src.directors.chat_director.get_loaded_hash",
+        new_callable=AsyncMock,
+        side_effect=lambda dataset: bloomberg_hash if dataset.name == "bloomberg" else "outdated",
+    )
+
+    await dataset_upload()
+
+    mock_loading["populate_db"].assert_awaited_once()
+    assert mock_loading["populate_db"].call_args.args[2] == "EsgPoc_"
+
+
+async def test_dataset_upload_skips_loading_when_all_datasets_are_loaded(mocker, mock_loading, datasets):
+    mocker.patch("src.directors.chat_director.get_loaded_hash", new_callable=AsyncMock, side_effect=create_content_hash)
+
+    await dataset_upload()
+
+    mock_loading["populate_db"].assert_not_awaited()
+    mock_loading["remove_other_namespaces"].assert_not_awaited()
+    mock_loading["provision_property_indexes"].assert_awaited_once()
+
+
+async def test_dataset_upload_continues_when_a_dataset_fails_to_load(mocker, mock_loading):
+    mocker.patch("src.directors.chat_director.get_loaded_hash", new_callable=AsyncMock, return_value=None)
+    mock_loading["populate_db"].side_effect = [Exception("Load failed"), None]
+
+    await dataset_upload()
+
+    assert mock_loading["populate_db"].await_count == 2
+
+
+async def test_dataset_upload_loads_every_dataset_into_the_columnar_store(mocker, mock_loading):
+    mocker.patch("src.directors.chat_director.get_loaded_hash", new_callable=AsyncMock, side_effect=create_content_hash)
+    columnar_store = mocker.patch("src.directors.chat_director.columnar_store", ColumnarStore())
+
+    await dataset_upload()
+
+    assert sorted(columnar_store.datasets) == ["bloomberg", "esg_poc"]
+    assert columnar_store.datasets["bloomberg"].row_count == 1
+
+
+async def test_compact_conversation_summarises_the_oldest_messages(mocker):
+    messages = [{"role": "user", "content": "a" * 400, "tokens": 100}, {"role": "system", "content": "b", "tokens": 1}]
+    session = Session("1234")
+    session[CHAT_SESSION_KEY] = list(messages)
+    session.save = AsyncMock()
+    mocker.patch("src.directors.chat_director.load_session", new_callable=AsyncMock, return_value=session)
+    mocker.patch("src.session.conversation_memory.config.chat_history_window_tokens", 50)
+    intent_agent = mocker.patch("src.directors.chat_director.get_intent_agent").return_value
+    intent_agent.summarise_conversation = AsyncMock(return_value="The user asked about a.")
+
+    await compact_conversation("1234")
+
+    intent_agent.summarise_conversation.assert_awaited_once_with(None, messages[:1])
+    assert session[CHAT_SESSION_KEY] == messages[1:]
+    assert session[CHAT_SUMMARY_SESSION_KEY]["text"] == "The user asked about a."
+    session.save.assert_awaited_once()
+
+
+async def test_compact_conversation_skips_short_conversations(mocker):
+    session = Session("1234")
+    session[CHAT_SESSION_KEY] = [{"role": "user", "content": "Hello", "tokens": 1}]
+    session.save = AsyncMock()
+    mocker.patch("src.directors.chat_director.load_session", new_callable=AsyncMock, return_value=session)
+    intent_agent = mocker.patch("src.directors.chat_director.get_intent_agent").return_value
+
+    await compact_conversation("1234")
+
+    intent_agent.summarise_conversation.assert_not_called()
+    session.save.assert_not_called()
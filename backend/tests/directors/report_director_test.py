@@ -31,7 +31,7 @@ async def test_prepare_file_for_report(mocker):
     mock_update_session_file_uploads = mocker.patch("src.directors.report_director.update_session_file_uploads")
 
     file_contents = b"test"
-    prepare_file_for_report(file_contents, filename, mock_id)
+    await prepare_file_for_report(file_contents, filename, mock_id)
 
 
     mock_update_session_file_uploads.assert_called_once_with(session_file)
@@ -58,6 +58,7 @@ async def test_create_report_from_file(mocker):
 
 
     mock_store_report = mocker.patch("src.directors.report_director.store_report", return_value=file_upload)
+    mock_store_report_digest = mocker.patch("src.directors.report_director.store_report_digest")
 
     file = UploadFile(
         file=BytesIO(b"test"), size=12, headers=Headers({"content-type": "text/plain"}), filename=filename
@@ -68,6 +69,9 @@ async def test_create_report_from_file(mocker):
     expected_response = {"filename": filename, "id": str(mock_id), "report": mock_report, "answer": expected_answer}
 
     mock_store_report.assert_called_once_with(expected_response)
+    digest = mock_store_report_digest.call_args.args[0]
+    assert digest["id"] == str(mock_id)
+    assert [section["content"] for section in digest["sections"]] == [mock_report]
 
     mock_materiality_agent.list_material_topics_for_company.assert_called_once_with("CompanyABC")
 
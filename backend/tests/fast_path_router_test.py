@@ -0,0 +1,149 @@
+import json
+
+import pytest
+
+from src.fast_path_router import FastPathRouter, RouteClassifier, fill_parameters, find_sector
+from src.agents.file_agent import FileAgent
+from src.agents.materiality_agent import MaterialityAgent
+from src.agents.web_agent import WebAgent
+from src.agents.datastore_agent import DatastoreAgent
+from src.utils.usage_recorder import ConsoleUsageRecorder
+from tests.llm.mock_llm import MockLLM
+
+MockLLM(ConsoleUsageRecorder())
+mock_model = "mockmodel"
+file_agent = FileAgent("mockllm", mock_model)
+materiality_agent = MaterialityAgent("mockllm", mock_model)
+web_agent = WebAgent("mockllm", mock_model)
+datastore_agent = DatastoreAgent("mockllm", mock_model)
+agents = [datastore_agent, web_agent, materiality_agent, file_agent]
+
+web_route = ("WebAgent", "web_general_search")
+datastore_route = ("DatastoreAgent", "generate cypher query")
+web_questions = ["Find recent news articles about Tesla", "Find the latest news about Shell online"]
+datastore_questions = ["What is the ESG score of Tesla in the dataset?", "Which fund holds the most Shell shares?"]
+
+
+@pytest.fixture
+def uploads(mocker):
+    uploads = []
+    mocker.patch("src.fast_path_router.get_session_file_uploads_meta", return_value=uploads)
+    return uploads
+
+
+@pytest.fixture
+def fast_path_router(tmp_path, mocker, uploads):
+    mocker.patch("src.fast_path_router.config.router_fast_path_min_examples", 2)
+    mocker.patch("src.fast_path_router.config.router_fast_path_confidence", 0.6)
+    return FastPathRouter(tmp_path / "router_decisions.jsonl")
+
+
+def test_classifier_predicts_the_most_likely_route():
+    classifier = RouteClassifier()
+    for question in web_questions:
+        classifier.learn(question, web_route)
+    for question in datastore_questions:
+        classifier.learn(question, datastore_route)
+
+    prediction = classifier.predict("Find news about Tesla", {web_route, datastore_route})
+
+    assert prediction is not None
+    label, confidence = prediction
+    assert label == web_route
+    assert confidence > 0.6
+
+
+def test_classifier_is_not_confident_of_unfamiliar_questions():
+    classifier = RouteClassifier()
+    classifier.learn("Find news about Tesla", web_route)
+
+    prediction = classifier.predict("Summarise the governance structure", {web_route})
+
+    assert prediction is not None
+    assert prediction[1] == 0
+    assert classifier.predict("Find news about Tesla", {datastore_route}) is None
+
+
+def test_find_sector_prefers_the_longest_match():
+    assert find_sector("What is material for Agriculture Aquaculture and Fishing?") == (
+        "Agriculture Aquaculture and Fishing"
+    )
+    assert find_sector("What is material for software companies?") is None
+
+
+def test_fill_parameters(uploads):
+    assert fill_parameters(web_agent, "web_general_search", "News about Tesla") == {"search_query": "News about Tesla"}
+    assert fill_parameters(file_agent, "read_file", "Summarise the report") is None
+    assert fill_parameters(datastore_agent, "generate cypher query", "ESG score of Tesla") is None
+
+
+def test_uploaded_filename_is_routed_to_the_file_agent(fast_path_router, uploads):
+    uploads.append({"id": "1", "filename": "Shell_Annual_Report.pdf"})
+
+    route, confident = fast_path_router.route("What does shell_annual_report say about emissions?", agents)
+
+    assert confident
+    assert (route.agent, route.tool) == ("FileAgent", "read_file")
+    assert route.parameters["filename"] == "Shell_Annual_Report.pdf"
+
+
+def test_materiality_of_sector_is_routed_to_the_materiality_agent(fast_path_router):
+    route, confident = fast_path_router.route("What are the material topics for the Oil and Gas sector?", agents)
+
+    assert confident
+    assert route.parameters == {
+        "user_question": "What are the material topics for the Oil and Gas sector?",
+        "sector": "Oil and Gas",
+    }
+
+
+def test_learnt_route_is_taken_once_confident(fast_path_router):
+    question = "Find the latest news about Tesla"
+    route, confident = fast_path_router.route(question, agents)
+    assert route is None and not confident
+
+    for learnt_question in web_questions:
+        fast_path_router.record_llm_route(learnt_question, None, *web_route)
+    for learnt_question in datastore_questions:
+        fast_path_router.record_llm_route(learnt_question, None, *datastore_route)
+
+    route, confident = fast_path_router.route(question, agents)
+
+    assert confident
+    assert route.parameters == {"search_query": question}
+    assert fast_path_router.get_metrics()["fast_path_routes"] == 1
+
+
+def test_route_without_parameters_is_left_to_the_llm(fast_path_router):
+    for question in datastore_questions * 2:
+        fast_path_router.record_llm_route(question, None, *datastore_route)
+
+    route, confident = fast_path_router.route("What is the ESG score of Shell in the dataset?", agents)
+
+    assert route.agent == "DatastoreAgent"
+    assert not confident
+
+
+def test_llm_routes_are_logged_and_compared(fast_path_router):
+    prediction, _ = fast_path_router.route("Find news about BP", agents)
+    fast_path_router.record_llm_route("Find news about BP", prediction, *web_route)
+    prediction, _ = fast_path_router.route("Find news about Shell", agents)
+    fast_path_router.record_llm_route("Find news about Shell", prediction, *datastore_route)
+
+    with open(fast_path_router.decisions_path) as file:
+        decisions = [json.loads(line) for line in file]
+    assert decisions[0] == {"question": "Find news about BP", "agent": "WebAgent", "tool": "web_general_search"}
+
+    metrics = fast_path_router.get_metrics()
+    assert metrics["llm_routes"] == 2
+    assert (metrics["comparisons"], metrics["agreements"]) == (1, 0)
+
+
+def test_classifier_is_trained_from_the_decisions_log(tmp_path, uploads):
+    decisions_path = tmp_path / "router_decisions.jsonl"
+    decisions_path.write_text(
+        "\n".join(json.dumps({"question": question, "agent": "WebAgent", "tool": "web_general_search"})
+                  for question in web_questions) + "\n"
+    )
+
+    assert FastPathRouter(decisions_path).get_classifier().label_counts[web_route] == 2
@@ -36,3 +36,10 @@ async def test_chat_multi_model(mocker):
     await model_2.chat("model", "system prompt", "user prompt")
 
     assert counter_mock.count == 2
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_defaults_to_single_chunk_from_chat():
+    chunks = [chunk async for chunk in model.chat_stream("model", "system prompt", "user prompt", "agent")]
+
+    assert chunks == ["mocked response"]
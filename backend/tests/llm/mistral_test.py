@@ -2,9 +2,17 @@ import logging
 from typing import cast
 from unittest.mock import AsyncMock, MagicMock
 from mistralai import UNSET, AssistantMessage, Mistral as MistralApi, SystemMessage, UserMessage
-from mistralai.models import ChatCompletionResponse, ChatCompletionChoice, UsageInfo
+from mistralai.models import (
+    ChatCompletionResponse,
+    ChatCompletionChoice,
+    CompletionChunk,
+    CompletionEvent,
+    CompletionResponseStreamChoice,
+    DeltaMessage,
+    UsageInfo,
+)
 import pytest
-from src.llm import get_llm, Mistral
+from src.llm import get_llm, LLMFile, Mistral, Prompt
 from src.utils import Config
 
 mock_model = "mockmodel"
@@ -53,6 +61,18 @@ async def test_chat_calls_client_chat(mocker):
     )
 
 
+@pytest.mark.asyncio
+async def test_chat_with_file_sends_documents_before_question(mocker):
+    mocker.patch("src.llm.mistral.get_file_content_for_filename", return_value="Report content")
+    mock_chat = mocker.patch.object(mistral, "chat", AsyncMock(return_value=content_response))
+
+    await mistral.chat_with_file(mock_model, system_prompt, user_prompt, [LLMFile("report.pdf", b"")], "test-agent")
+
+    mock_chat.assert_awaited_once_with(
+        mock_model, system_prompt, Prompt("Document:\nReport content", user_prompt), "test-agent", False
+    )
+
+
 @pytest.mark.asyncio
 async def test_chat_response_none_logs_error(mocker, caplog):
     mistral.client = mocker.AsyncMock(return_value=mock_client)
@@ -136,3 +156,38 @@ async def test_chat_response_choices_message_content_unset_logs_error(mocker, ca
         logging.ERROR,
         "Call to Mistral API failed: message content is None or Unset",
     ) in caplog.record_tuples
+
+
+@pytest.mark.asyncio
+async def test_client_is_reused_until_closed():
+    mistral._client = None
+
+    client = mistral.client
+
+    assert mistral.client is client
+
+    await mistral.close()
+
+    assert mistral._client is None
+    assert mistral._http_client is None
+
+
+@pytest.mark.asyncio
+async def test_chat_stream_yields_content(mocker):
+    async def stream():
+        for content in ["Hello", " there"]:
+            chunk = CompletionChunk(
+                id="id",
+                model="model",
+                choices=[
+                    CompletionResponseStreamChoice(index=0, delta=DeltaMessage(content=content), finish_reason=None)
+                ],
+            )
+            yield CompletionEvent(data=chunk)
+
+    mistral.client = mocker.AsyncMock(return_value=mock_client)
+    mistral.client.chat.stream_async.return_value = stream()
+
+    chunks = [chunk async for chunk in mistral.chat_stream(mock_model, system_prompt, user_prompt, "test-agent")]
+
+    assert chunks == ["Hello", " there"]
@@ -1,15 +1,17 @@
-from src.llm import LLM, LLMFile
+from src.llm import LLM, LLMFile, Prompt
 
 
 class MockLLM(LLM):
-    async def chat(self, model: str, system_prompt: str, user_prompt: str, agent="mock-llm", return_json=False) -> str:
+    async def chat(
+        self, model: str, system_prompt: str | Prompt, user_prompt: str | Prompt, agent="mock-llm", return_json=False
+    ) -> str:
         return "mocked response"
 
     async def chat_with_file(
         self,
         model: str,
-        system_prompt: str,
-        user_prompt: str,
+        system_prompt: str | Prompt,
+        user_prompt: str | Prompt,
         files: list[LLMFile],
         agent: str,
         return_json: bool = False,
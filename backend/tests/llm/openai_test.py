@@ -1,84 +1,173 @@
 import pytest
-from dataclasses import dataclass
-from pathlib import Path
 
-from unittest.mock import patch, AsyncMock
-from openai.types.beta.threads import Text, FileCitationAnnotation, TextContentBlock
-from openai.types.beta.threads.file_citation_annotation import FileCitation
+from unittest.mock import patch, AsyncMock, MagicMock
 
-from src.llm import LLMFile
-from src.llm.openai import OpenAI
+from src.llm import LLMFile, Prompt
+from src.llm.openai import OpenAI, OpenAILLMFileUploadManager
 
 from src.utils.usage_recorder import ConsoleUsageRecorder
 
 
-@dataclass
-class MockResponse:
-    id: str
-
-
-@dataclass
-class MockFileResponse:
-    id: str
-    filename: str
-
-
-@dataclass
-class MockMessage:
-    content: list[TextContentBlock]
-
-
-class MockListResponse:
-    data = [
-        MockMessage(
-            content=[
-                TextContentBlock(
-                    text=Text(
-                        annotations=[
-                            FileCitationAnnotation(
-                                file_citation=FileCitation(file_id="123"),
-                                text="【7†source】",
-                                end_index=1,
-                                start_index=2,
-                                type="file_citation",
-                            ),
-                            FileCitationAnnotation(
-                                file_citation=FileCitation(file_id="123"),
-                                text="【1:9†source】",
-                                end_index=1,
-                                start_index=2,
-                                type="file_citation",
-                            ),
-                        ],
-                        value="Response with quote【7†source】【1:9†source】",
-                    ),
-                    type="text",
-                )
-            ]
-        )
+@pytest.mark.asyncio
+@patch("src.llm.openai.retrieve_file_context")
+async def test_chat_with_file_sends_retrieved_context_to_chat(mock_retrieve_file_context, mocker):
+    mock_retrieve_file_context.return_value = "Document: report.pdf\nRelevant excerpt"
+    client = OpenAI(ConsoleUsageRecorder())
+    mock_chat = mocker.patch.object(client, "chat", AsyncMock(return_value="Response"))
+    files = [LLMFile("report.pdf", b"report")]
+
+    response = await client.chat_with_file(
+        model="model", system_prompt="system", user_prompt="question", files=files, agent="test-agent"
+    )
+
+    assert response == "Response"
+    mock_retrieve_file_context.assert_awaited_once_with(files, "question")
+    mock_chat.assert_awaited_once_with(
+        "model", "system", "question\n\nDocument: report.pdf\nRelevant excerpt", "test-agent", False
+    )
+
+
+@pytest.mark.asyncio
+@patch("src.llm.openai.retrieve_file_context")
+@patch("src.llm.openai.AsyncOpenAI")
+async def test_chat_with_file_is_recorded_as_file_chat(mock_async_openai, mock_retrieve_file_context):
+    mock_retrieve_file_context.return_value = "Document: report.pdf\nRelevant excerpt"
+    mock_async_openai.return_value.chat.completions.create = AsyncMock(return_value=MagicMock())
+    recorder = MagicMock()
+    client = OpenAI(recorder)
+
+    await client.chat_with_file("model", "system", "question", [LLMFile("report.pdf", b"report")], "test-agent")
+    await client.chat("model", "system", "question", "test-agent")
+
+    assert [call.args[1] for call in recorder.record_activity.call_args_list] == ["openai-file", "openai"]
+
+
+@pytest.mark.asyncio
+@patch("src.llm.openai.AsyncOpenAI")
+async def test_chat_reuses_pooled_client(mock_async_openai):
+    mock_instance = mock_async_openai.return_value
+    mock_instance.chat.completions.create = AsyncMock(return_value=MagicMock())
+
+    client = OpenAI(ConsoleUsageRecorder())
+    await client.chat(model="", system_prompt="", user_prompt="", agent="test-agent")
+    await client.chat(model="", system_prompt="", user_prompt="", agent="test-agent")
+
+    mock_async_openai.assert_called_once()
+    assert mock_instance.chat.completions.create.await_count == 2
+
+
+@pytest.mark.asyncio
+@patch("src.llm.openai.AsyncOpenAI")
+async def test_chat_sends_static_prefix_first(mock_async_openai):
+    mock_instance = mock_async_openai.return_value
+    mock_instance.chat.completions.create = AsyncMock(return_value=MagicMock())
+
+    client = OpenAI(ConsoleUsageRecorder())
+    await client.chat(model="", system_prompt=Prompt("schema", "date"), user_prompt="question", agent="test-agent")
+
+    assert mock_instance.chat.completions.create.call_args.kwargs["messages"] == [
+        {"role": "system", "content": "schema\n\ndate"},
+        {"role": "user", "content": "question"},
     ]
 
 
 @pytest.mark.asyncio
 @patch("src.llm.openai.AsyncOpenAI")
-@patch("src.llm.openai.OpenAILLMFileUploadManager.upload_files")
-async def test_chat_with_file_removes_citations(upload_files_method, mock_async_openai):
-    upload_files_method.return_value = AsyncMock(return_value=["file_id_1"])
+async def test_close_closes_pooled_client(mock_async_openai):
+    mock_instance = mock_async_openai.return_value
+    mock_instance.close = AsyncMock()
+
+    client = OpenAI(ConsoleUsageRecorder())
+    assert client.client is mock_instance
+
+    await client.close()
+
+    mock_instance.close.assert_awaited_once()
+    assert client._client is None
+
+
+@pytest.mark.asyncio
+async def test_file_upload_manager_uses_given_client():
+    mock_client = MagicMock()
+    mock_client.files.delete = AsyncMock()
+
+    with patch("src.llm.openai.get_all_files", return_value=[{"file_id": "file-1", "filename": "a.pdf"}]), patch(
+        "src.llm.openai.reset_llm_file_uploads"
+    ):
+        await OpenAILLMFileUploadManager(mock_client).delete_all_files()
+
+    mock_client.files.delete.assert_awaited_once_with(file_id="file-1")
+
+
+def create_stream_chunk(content=None, usage=None):
+    chunk = MagicMock()
+    chunk.choices = [MagicMock()] if content is not None else []
+    if content is not None:
+        chunk.choices[0].delta.content = content
+    chunk.usage = usage
+    return chunk
+
+
+@pytest.mark.asyncio
+@patch("src.llm.openai.AsyncOpenAI")
+async def test_chat_stream_yields_content_and_records_usage(mock_async_openai):
+    async def stream():
+        for chunk in [
+            create_stream_chunk("Hello"),
+            create_stream_chunk(" there"),
+            create_stream_chunk(
+                usage=MagicMock(
+                    prompt_tokens=1,
+                    completion_tokens=2,
+                    total_tokens=3,
+                    prompt_tokens_details=MagicMock(cached_tokens=1),
+                )
+            ),
+        ]:
+            yield chunk
 
     mock_instance = mock_async_openai.return_value
+    mock_instance.chat.completions.create = AsyncMock(return_value=stream())
+    recorder = MagicMock()
+
+    client = OpenAI(recorder)
+    chunks = [chunk async for chunk in client.chat_stream("model", "system", "user", "test-agent")]
 
-    mock_instance.beta.assistants.create = AsyncMock(return_value=MockResponse(id="assistant-id"))
-    mock_instance.beta.threads.create = AsyncMock(return_value=MockResponse(id="thread-id"))
-    mock_instance.beta.threads.runs.create_and_poll = AsyncMock(return_value=MockResponse(id="run-id"))
-    mock_instance.beta.threads.messages.list = AsyncMock(return_value=MockListResponse())
-    mock_instance.beta.threads.delete = AsyncMock()
+    assert chunks == ["Hello", " there"]
+    assert mock_instance.chat.completions.create.call_args.kwargs["stream"] is True
+    recorder.record_activity.assert_called_once()
+    assert recorder.record_activity.call_args.args[3] == {
+        "prompt_tokens": 1,
+        "completion_tokens": 2,
+        "total_tokens": 3,
+        "cached_tokens": 1,
+    }
+
+
+@pytest.mark.asyncio
+@patch("src.llm.openai.AsyncOpenAI")
+async def test_chat_stream_yields_error_message_on_failure(mock_async_openai):
+    mock_async_openai.return_value.chat.completions.create = AsyncMock(side_effect=Exception("Failure"))
 
     client = OpenAI(ConsoleUsageRecorder())
-    response = await client.chat_with_file(
-        model="",
-        system_prompt="",
-        user_prompt="",
-        files=[LLMFile("filename", Path("./backend/library/AstraZeneca-Sustainability-Report-2023.pdf"))],
-        agent="test-agent"
-    )
-    assert response == "Response with quote"
+    chunks = [chunk async for chunk in client.chat_stream("model", "system", "user", "test-agent")]
+
+    assert chunks == ["An error occurred while processing the request."]
+
+
+@pytest.mark.asyncio
+@patch("src.llm.openai.AsyncOpenAI")
+async def test_chat_stream_raises_when_failing_after_content_is_streamed(mock_async_openai):
+    async def stream():
+        yield create_stream_chunk("Hello")
+        raise Exception("Connection dropped")
+
+    mock_async_openai.return_value.chat.completions.create = AsyncMock(return_value=stream())
+
+    client = OpenAI(ConsoleUsageRecorder())
+    chunks = []
+    with pytest.raises(Exception, match="Connection dropped"):
+        async for chunk in client.chat_stream("model", "system", "user", "test-agent"):
+            chunks.append(chunk)
+
+    assert chunks == ["Hello"]
@@ -0,0 +1,28 @@
+from unittest.mock import MagicMock
+
+from src.llm.prompt import Prompt, create_messages, get_cached_tokens
+
+
+def test_prompt_sends_prefix_before_suffix():
+    assert str(Prompt("instructions", "The current date is today.")) == "instructions\n\nThe current date is today."
+    assert str(Prompt("instructions")) == "instructions"
+
+
+def test_create_messages_from_structured_prompts():
+    messages = create_messages(Prompt("instructions", "context"), Prompt("document", "question"))
+
+    assert messages == [
+        {"role": "system", "content": "instructions\n\ncontext"},
+        {"role": "user", "content": "document\n\nquestion"},
+    ]
+
+
+def test_get_cached_tokens_from_response_usage():
+    assert get_cached_tokens(MagicMock(prompt_tokens_details=MagicMock(cached_tokens=1024))) == 1024
+    assert get_cached_tokens({"prompt_tokens": 2000, "prompt_tokens_details": {"cached_tokens": 1024}}) == 1024
+
+
+def test_get_cached_tokens_is_zero_when_not_reported():
+    assert get_cached_tokens(MagicMock(prompt_tokens_details=None)) == 0
+    assert get_cached_tokens({"prompt_tokens": 2000}) == 0
+    assert get_cached_tokens({"prompt_tokens_details": {"cached_tokens": None}}) == 0
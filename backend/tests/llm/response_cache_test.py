@@ -0,0 +1,136 @@
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.llm import LLMFile
+from src.llm.response_cache import create_cache_key, is_cacheable
+from src.utils.usage_recorder import ConsoleUsageRecorder
+from tests.llm.mock_llm import MockLLM
+
+cached_entry = {"response": "cached response", "token_usage": {"total_tokens": 30}, "duration": 1.5}
+
+
+@pytest.fixture
+def mock_redis(mocker):
+    redis = AsyncMock()
+    redis.get.return_value = None
+    redis.pipeline = MagicMock()
+    redis.pipeline.return_value.execute = AsyncMock(return_value=[True, 1, 1])
+    mocker.patch("src.llm.response_cache.redis_client", redis)
+    return redis
+
+
+@pytest.fixture
+def cache_config(mocker):
+    mocker.patch("src.llm.response_cache.config.llm_cache_enabled", True)
+    mocker.patch("src.llm.response_cache.config.llm_cache_excluded_agents", ["excluded"])
+    mocker.patch("src.llm.response_cache.config.llm_cache_max_entries", 10)
+
+
+@pytest.mark.asyncio
+async def test_cache_hit_returns_cached_response(mock_redis, cache_config):
+    mock_redis.get.return_value = json.dumps(cached_entry)
+    llm = MockLLM(ConsoleUsageRecorder())
+
+    response = await llm.chat("model", "system prompt", "user prompt", agent="router")
+
+    assert response == "cached response"
+    stats = llm.usage_recorder.cache_stats["router"]
+    assert stats.hits == 1
+    assert stats.saved_tokens == 30
+    assert stats.saved_duration == 1.5
+
+
+@pytest.mark.asyncio
+async def test_cache_miss_stores_response(mock_redis, cache_config):
+    llm = MockLLM(ConsoleUsageRecorder())
+
+    response = await llm.chat("model", "system prompt", "user prompt", agent="router")
+
+    assert response == "mocked response"
+    pipeline = mock_redis.pipeline.return_value
+    stored = json.loads(pipeline.set.call_args.args[1])
+    assert stored["response"] == "mocked response"
+    assert llm.usage_recorder.cache_stats["router"].misses == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_evicts_least_recently_used_entries(mock_redis, cache_config):
+    mock_redis.pipeline.return_value.execute.return_value = [True, 1, 12]
+    mock_redis.zpopmin.return_value = [("key_1", 1.0), ("key_2", 2.0)]
+    llm = MockLLM(ConsoleUsageRecorder())
+
+    await llm.chat("model", "system prompt", "user prompt", agent="router")
+
+    mock_redis.zpopmin.assert_called_once_with("llm_cache_lru", 2)
+    mock_redis.delete.assert_called_once_with("key_1", "key_2")
+
+
+@pytest.mark.asyncio
+async def test_cache_is_skipped_for_excluded_agent(mock_redis, cache_config):
+    llm = MockLLM(ConsoleUsageRecorder())
+
+    await llm.chat("model", "system prompt", "user prompt", agent="excluded")
+
+    mock_redis.get.assert_not_called()
+    assert "excluded" not in llm.usage_recorder.cache_stats
+
+
+@pytest.mark.asyncio
+async def test_cache_is_skipped_when_disabled(mock_redis, mocker):
+    mocker.patch("src.llm.response_cache.config.llm_cache_enabled", False)
+    llm = MockLLM(ConsoleUsageRecorder())
+
+    await llm.chat("model", "system prompt", "user prompt", agent="router")
+
+    mock_redis.get.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_cache_unavailable_calls_llm(mock_redis, cache_config):
+    mock_redis.get.side_effect = Exception("Connection refused")
+    llm = MockLLM(ConsoleUsageRecorder())
+
+    response = await llm.chat("model", "system prompt", "user prompt", agent="router")
+
+    assert response == "mocked response"
+
+
+def test_cache_key_changes_with_prompts():
+    arguments = {"model": "model", "system_prompt": "system", "user_prompt": "user", "return_json": False}
+
+    key = create_cache_key("openai", arguments)
+
+    assert key == create_cache_key("openai", dict(arguments))
+    assert key != create_cache_key("openai", {**arguments, "user_prompt": "another user"})
+    assert key != create_cache_key("mistral", arguments)
+
+
+class FileChatLLM(MockLLM):
+    async def chat_with_file(self, model, system_prompt, user_prompt, files, agent, return_json=False) -> str:
+        return await self.chat(model, system_prompt, f"{user_prompt} {files[0].filename}", agent, return_json)
+
+
+@pytest.mark.asyncio
+async def test_chat_with_file_is_cached_once_through_chat(mock_redis, cache_config):
+    llm = FileChatLLM(ConsoleUsageRecorder())
+
+    await llm.chat_with_file("model", "system prompt", "user prompt", [LLMFile("report.pdf", b"report")], "router")
+
+    assert llm.usage_recorder.cache_stats["router"].misses == 1
+    mock_redis.get.assert_awaited_once()
+
+
+@pytest.mark.parametrize(
+    "response, return_json, expected",
+    [
+        ("answer", False, True),
+        ('{"answer": 1}', True, True),
+        ("not json", True, False),
+        ("An error occurred while processing the request.", False, False),
+        ("", False, False),
+    ],
+)
+def test_is_cacheable(response, return_json, expected):
+    assert is_cacheable(response, return_json) == expected
@@ -0,0 +1,93 @@
+import pytest
+
+from src.llm import LLMFile
+from src.llm import retrieval
+from src.llm.retrieval import RetrievalIndex, chunk_text, get_file_index, retrieve_file_context
+
+
+@pytest.fixture(autouse=True)
+def clear_index_cache():
+    retrieval.index_cache.clear()
+    retrieval.index_locks.clear()
+    yield
+    retrieval.index_cache.clear()
+    retrieval.index_locks.clear()
+
+
+def test_chunk_text_overlaps_chunks():
+    words = " ".join(str(i) for i in range(10))
+
+    chunks = chunk_text(words, chunk_size=4, chunk_overlap=2)
+
+    assert chunks == ["0 1 2 3", "2 3 4 5", "4 5 6 7", "6 7 8 9"]
+
+
+def test_chunk_text_short_text_is_single_chunk():
+    assert chunk_text("a short document", chunk_size=300, chunk_overlap=50) == ["a short document"]
+
+
+def test_search_returns_most_relevant_chunks_in_document_order():
+    chunks = [
+        "scope 1 emissions fell by 10 percent",
+        "the board has twelve directors",
+        "water usage targets for 2030",
+        "scope 2 emissions from purchased electricity",
+    ]
+    index = RetrievalIndex(chunks)
+
+    results = index.search("What are the scope emissions?", top_k=2)
+
+    assert results == [chunks[0], chunks[3]]
+
+
+def test_search_returns_all_chunks_when_fewer_than_top_k():
+    index = RetrievalIndex(["one", "two"])
+
+    assert index.search("anything", top_k=5) == ["one", "two"]
+
+
+@pytest.mark.asyncio
+async def test_get_file_index_extracts_and_indexes_file_once(mocker):
+    mock_extract_text = mocker.patch("src.llm.retrieval.extract_text", return_value="some report content")
+    mocker.patch("src.llm.retrieval.get_file_content_for_filename", return_value=None)
+    mocker.patch("src.llm.retrieval.set_file_content_for_filename")
+
+    file = LLMFile("report.pdf", b"report bytes")
+    first = await get_file_index(file)
+    second = await get_file_index(LLMFile("renamed.pdf", b"report bytes"))
+
+    assert first is second
+    mock_extract_text.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_get_file_index_uses_session_content_for_file_referenced_by_name(mocker):
+    mock_extract_text = mocker.patch("src.llm.retrieval.extract_text")
+    mocker.patch("src.llm.retrieval.get_file_content_for_filename", return_value="content from the session")
+
+    index = await get_file_index(LLMFile("report.pdf", bytes()))
+
+    assert index.chunks == ["content from the session"]
+    mock_extract_text.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_file_index_evicts_least_recently_used_index(mocker):
+    mocker.patch("src.llm.retrieval.config.retrieval_index_cache_size", 1)
+    mocker.patch("src.llm.retrieval.extract_text", return_value="content")
+    mocker.patch("src.llm.retrieval.get_file_content_for_filename", return_value="content")
+
+    await get_file_index(LLMFile("first.pdf", b"first"))
+    await get_file_index(LLMFile("second.pdf", b"second"))
+
+    assert len(retrieval.index_cache) == 1
+
+
+@pytest.mark.asyncio
+async def test_retrieve_file_context_formats_excerpts_per_file(mocker):
+    mocker.patch("src.llm.retrieval.extract_text", return_value="emissions data")
+    mocker.patch("src.llm.retrieval.get_file_content_for_filename", return_value="emissions data")
+
+    context = await retrieve_file_context([LLMFile("report.pdf", b"report")], "emissions")
+
+    assert context == "Document: report.pdf\nemissions data"
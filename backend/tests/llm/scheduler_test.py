@@ -0,0 +1,226 @@
+import asyncio
+
+import pytest
+
+from src.llm.scheduler import (
+    LLMScheduler,
+    Priority,
+    PriorityLimiter,
+    TokenBucket,
+    llm_priority,
+    llm_token_budget,
+    scheduler,
+)
+from src.utils.usage_recorder import ConsoleUsageRecorder
+from tests.llm.mock_llm import MockLLM
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture
+def retry_config(mocker):
+    mocker.patch("src.llm.scheduler.config.llm_max_retries", 2)
+    mocker.patch("src.llm.scheduler.config.llm_retry_base_delay", 0.001)
+    mocker.patch("src.llm.scheduler.config.llm_retry_max_delay", 0.001)
+
+
+@pytest.mark.asyncio
+async def test_priority_limiter_serves_interactive_before_background():
+    limiter = PriorityLimiter(1)
+    order = []
+
+    async def call(name: str, priority: Priority):
+        await limiter.acquire(priority)
+        order.append(name)
+        limiter.release()
+
+    await limiter.acquire(Priority.INTERACTIVE)
+    background = asyncio.create_task(call("background", Priority.BACKGROUND))
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(call("interactive", Priority.INTERACTIVE))
+    await asyncio.sleep(0)
+
+    assert limiter.queue_depth() == {"interactive": 1, "background": 1}
+
+    limiter.release()
+    await asyncio.gather(background, interactive)
+
+    assert order == ["interactive", "background"]
+    assert limiter.active == 0
+
+
+@pytest.mark.asyncio
+async def test_priority_limiter_removes_cancelled_waiter():
+    limiter = PriorityLimiter(1)
+    await limiter.acquire(Priority.INTERACTIVE)
+    waiter = asyncio.create_task(limiter.acquire(Priority.BACKGROUND))
+    await asyncio.sleep(0)
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    limiter.release()
+
+    assert limiter.queue_depth() == {"interactive": 0, "background": 0}
+    assert limiter.active == 0
+
+
+@pytest.mark.asyncio
+async def test_slot_bounds_concurrent_calls_per_model(mocker):
+    mocker.patch("src.llm.scheduler.config.llm_max_concurrency_per_model", 2)
+    llm_scheduler = LLMScheduler()
+    running = 0
+    max_running = 0
+
+    async def call():
+        nonlocal running, max_running
+        async with llm_scheduler.slot("openai", "gpt-4o"):
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    await asyncio.gather(*[call() for _ in range(6)])
+
+    assert max_running == 2
+    assert llm_scheduler.get_metrics()["models"]["openai/gpt-4o"] == {
+        "active": 0,
+        "queued": {"interactive": 0, "background": 0},
+    }
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_waits_for_capacity():
+    bucket = TokenBucket(tokens_per_minute=6000)
+    bucket.consume(6000)
+
+    start = asyncio.get_running_loop().time()
+    await bucket.reserve(10)
+
+    assert asyncio.get_running_loop().time() - start >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_record_usage_takes_actual_tokens_from_bucket(mocker):
+    mocker.patch("src.llm.scheduler.config.openai_tokens_per_minute", 1000)
+    llm_scheduler = LLMScheduler()
+
+    async with llm_scheduler.slot("openai", "gpt-4o", estimated_tokens=100):
+        llm_scheduler.record_usage("openai", {"total_tokens": 400})
+
+    assert llm_scheduler.token_buckets["openai"].tokens == pytest.approx(600, abs=1)
+
+
+@pytest.mark.asyncio
+async def test_record_usage_takes_tokens_from_budget_of_tasks_created_within_it():
+    llm_scheduler = LLMScheduler()
+
+    async def call(tokens: int):
+        llm_scheduler.record_usage("openai", {"total_tokens": tokens})
+
+    with llm_token_budget(1000) as budget:
+        await asyncio.gather(call(400), call(400))
+        assert not budget.exhausted.is_set()
+        await asyncio.create_task(call(200))
+    llm_scheduler.record_usage("openai", {"total_tokens": 400})
+
+    assert budget.used == 1000
+    assert budget.exhausted.is_set()
+
+
+@pytest.mark.asyncio
+async def test_with_retry_retries_rate_limited_requests(retry_config, mocker):
+    llm_scheduler = LLMScheduler()
+    request = mocker.AsyncMock(side_effect=[StatusError(429), StatusError(503), "response"])
+
+    response = await llm_scheduler.with_retry("openai", request)
+
+    assert response == "response"
+    assert request.call_count == 3
+    assert llm_scheduler.get_metrics()["retries"] == {"openai": 2}
+
+
+@pytest.mark.asyncio
+async def test_with_retry_gives_up_after_max_retries(retry_config, mocker):
+    request = mocker.AsyncMock(side_effect=StatusError(429))
+
+    with pytest.raises(StatusError):
+        await LLMScheduler().with_retry("openai", request)
+
+    assert request.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_with_retry_frees_the_slot_while_backing_off(retry_config, mocker):
+    mocker.patch("src.llm.scheduler.config.llm_max_concurrency", 1)
+    mocker.patch("src.llm.scheduler.config.llm_max_concurrency_per_model", 1)
+    mocker.patch("src.llm.scheduler.random.uniform", return_value=0.1)
+    llm_scheduler = LLMScheduler()
+    order = []
+
+    async def retried_call():
+        request = mocker.AsyncMock(side_effect=[StatusError(429), "response"])
+        async with llm_scheduler.slot("openai", "model"):
+            await llm_scheduler.with_retry("openai", request)
+        order.append("retried call")
+
+    async def other_call():
+        async with llm_scheduler.slot("openai", "model"):
+            order.append("other call")
+
+    retried = asyncio.create_task(retried_call())
+    await asyncio.sleep(0.01)
+    await asyncio.wait_for(other_call(), timeout=0.05)
+    await retried
+
+    assert order == ["other call", "retried call"]
+    assert llm_scheduler.get_metrics()["providers"]["openai"]["active"] == 0
+    assert llm_scheduler.get_metrics()["models"]["openai/model"]["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_with_retry_does_not_retry_client_errors(retry_config, mocker):
+    request = mocker.AsyncMock(side_effect=StatusError(400))
+
+    with pytest.raises(StatusError):
+        await LLMScheduler().with_retry("openai", request)
+
+    assert request.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_llm_chat_is_scheduled_at_current_priority(mocker):
+    slot = mocker.spy(scheduler, "slot")
+    acquire = mocker.spy(PriorityLimiter, "acquire")
+    llm = MockLLM(ConsoleUsageRecorder())
+
+    with llm_priority(Priority.BACKGROUND):
+        await llm.chat("model", "system prompt", "user prompt", agent="report")
+
+    slot.assert_called_once_with("mockllm", "model", 6)
+    assert [call.args[1] for call in acquire.call_args_list] == [Priority.BACKGROUND, Priority.BACKGROUND]
+
+
+@pytest.mark.asyncio
+async def test_llm_chat_stream_from_chat_holds_one_slot(mocker):
+    mocker.patch("src.llm.scheduler.config.llm_max_concurrency", 1)
+    mocker.patch("src.llm.scheduler.config.llm_max_concurrency_per_model", 1)
+    mocker.patch.object(scheduler, "provider_limiters", {})
+    mocker.patch.object(scheduler, "model_limiters", {})
+    slot = mocker.spy(scheduler, "slot")
+    llm = MockLLM(ConsoleUsageRecorder())
+
+    chunks = await asyncio.wait_for(
+        collect_chunks(llm.chat_stream("model", "system prompt", "user prompt", agent="answer")), timeout=1
+    )
+
+    assert chunks == ["mocked response"]
+    slot.assert_called_once()
+
+
+async def collect_chunks(stream) -> list[str]:
+    return [chunk async for chunk in stream]
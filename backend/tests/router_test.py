@@ -4,10 +4,19 @@ from unittest.mock import MagicMock
 import pytest
 
 from src.agents.agent import ChatAgentFailure
+from src.agents.agent_registry import AgentRegistry
+from src.fast_path_router import FastPathRouter, Route
 from tests.agents import MockChatAgent, mock_tool_a_name
 from tests.llm.mock_llm import MockLLM
 from src.utils.usage_recorder import ConsoleUsageRecorder
-from src.router import select_tool_for_question
+from src.router import (
+    RouterDecisionCache,
+    confirm_llm_route,
+    create_question_template,
+    select_tool_for_question,
+    select_tools_for_question,
+    template_parameters,
+)
 
 
 mock_model = "mockmodel"
@@ -18,28 +27,44 @@ mock_agent_2.name = "mock_agent_2"
 mock_agents = [mock_agent_1, mock_agent_2]
 
 
+@pytest.fixture(autouse=True)
+def fast_path_router(mocker, tmp_path):
+    fast_path_router = FastPathRouter(tmp_path / "router_decisions.jsonl")
+    mocker.patch("src.router.fast_path_router", fast_path_router)
+    return fast_path_router
+
+
+@pytest.fixture(autouse=True)
+def router_decision_cache(mocker):
+    router_decision_cache = RouterDecisionCache(10)
+    mocker.patch("src.router.router_decision_cache", router_decision_cache)
+    return router_decision_cache
+
+
 @pytest.mark.asyncio
 async def test_select_agent_for_task_no_agent_found(mocker):
     selected_agent = '{"agent": "this_agent_does_not_exist", "tool": "example_tool", "parameters": {}}'
     mocker.patch("src.router.get_llm", return_value=mock_llm)
-    mocker.patch("src.router.get_chat_agents", return_value=mock_agents)
+    mocker.patch("src.router.get_agent_registry", return_value=AgentRegistry(mock_agents))
     mocker.patch("src.router.config.router_model", new_callable=MagicMock)
-    mock_llm.chat = mocker.AsyncMock(return_value=selected_agent)
-
-    agent, tool, parameters = await select_tool_for_question("task1", [])
+    mocker.patch.object(mock_llm, "chat", mocker.AsyncMock(return_value=selected_agent))
 
-    assert agent is None
+    assert await select_tool_for_question("task1", []) is None
 
 
 @pytest.mark.asyncio
 async def test_select_agent_for_task_agent_found(mocker):
     selected_agent_and_tool = {"agent": mock_agent_1.name, "tool": mock_tool_a_name, "parameters": {"input": "input"}}
     mocker.patch("src.router.get_llm", return_value=mock_llm)
-    mocker.patch("src.router.get_chat_agents", return_value=mock_agents)
+    mocker.patch("src.router.get_agent_registry", return_value=AgentRegistry(mock_agents))
     mocker.patch("src.router.config.router_model", new_callable=MagicMock)
-    mock_llm.chat = mocker.AsyncMock(return_value=json.dumps(selected_agent_and_tool))
+    mocker.patch.object(mock_llm, "chat", mocker.AsyncMock(return_value=json.dumps(selected_agent_and_tool)))
 
-    agent, tool, parameters = await select_tool_for_question("task1", [])
+    selection = await select_tool_for_question("task1", [])
+
+    assert selection is not None
+
+    agent, tool, parameters = selection
 
     assert agent is mock_agent_1
     assert tool == mock_tool_a_name
@@ -53,16 +78,209 @@ async def test_select_agent_for_task_given_agent_failed_only_once_then_selects_t
     chat_agent_failure_2 = ChatAgentFailure(mock_agent_2.name, "failure")
     chat_agent_failures = [chat_agent_failure_1, chat_agent_failure_1, chat_agent_failure_2]
     mocker.patch("src.router.get_llm", return_value=mock_llm)
-    mocker.patch("src.router.get_chat_agents", return_value=mock_agents)
+    mocker.patch("src.router.get_agent_registry", return_value=AgentRegistry(mock_agents))
     mocker.patch("src.router.config.router_model", new_callable=MagicMock)
-    mock_llm.chat = mocker.AsyncMock(return_value=json.dumps(plan))
+    mocker.patch.object(mock_llm, "chat", mocker.AsyncMock(return_value=json.dumps(plan)))
     spy_chat = mocker.spy(mock_llm, 'chat')
 
-    agent, tool, parameters = await select_tool_for_question("task1", chat_agent_failures)
+    selection = await select_tool_for_question("task1", chat_agent_failures)
+
+    assert selection is not None
 
+    agent, tool, parameters = selection
+
+    spy_chat_system_prompt_args = spy_chat.call_args_list[0][0][1]
     spy_chat_user_prompt_args = spy_chat.call_args_list[0][0][2]
 
     assert agent is mock_agent_2
     assert "ChatAgentFailure(agent_name='Mock Agent', reason='failure'" not in spy_chat_user_prompt_args
     assert "ChatAgentFailure(agent_name='mock_agent_2', reason='failure'" in spy_chat_user_prompt_args
-    assert "[{'agent': 'mock_agent_2', 'description': 'A test agent called Mock Agent'" in spy_chat_user_prompt_args
+    assert '[\n{"agent": "mock_agent_2", "description": "A test agent called Mock Agent"' in spy_chat_system_prompt_args
+
+
+@pytest.mark.asyncio
+async def test_select_tools_for_task_ranks_distinct_known_tools(mocker, fast_path_router):
+    record_llm_route = mocker.patch.object(fast_path_router, "record_llm_route")
+    candidates = [
+        {"agent": mock_agent_2.name, "tool": mock_tool_a_name, "parameters": {"input": "second"}},
+        {"agent": "this_agent_does_not_exist", "tool": "example_tool", "parameters": {}},
+        {"agent": mock_agent_2.name, "tool": mock_tool_a_name, "parameters": {"input": "again"}},
+        {"agent": mock_agent_1.name, "tool": mock_tool_a_name, "parameters": {"input": "first"}},
+        {"agent": mock_agent_1.name, "tool": "another_tool", "parameters": {}},
+    ]
+    mocker.patch("src.router.get_llm", return_value=mock_llm)
+    mocker.patch("src.router.get_agent_registry", return_value=AgentRegistry(mock_agents))
+    mocker.patch("src.router.config.router_model", new_callable=MagicMock)
+    mock_chat = mocker.patch.object(
+        mock_llm, "chat", mocker.AsyncMock(return_value=json.dumps({"candidates": candidates}))
+    )
+
+    selections = await select_tools_for_question("task1", [], 2)
+
+    assert selections == [
+        (mock_agent_2, mock_tool_a_name, {"input": "second"}),
+        (mock_agent_1, mock_tool_a_name, {"input": "first"}),
+    ]
+    assert "Which 2 tools are most likely" in mock_chat.call_args.args[2]
+    record_llm_route.assert_not_called()
+
+    confirm_llm_route(selections[1])
+
+    record_llm_route.assert_called_once_with("task1", None, mock_agent_1.name, mock_tool_a_name)
+
+
+@pytest.mark.asyncio
+async def test_select_tools_for_task_takes_confident_fast_path_route_alone(mocker, fast_path_router):
+    route = Route(mock_agent_2.name, mock_tool_a_name, {"input": "task1"}, 1.0, "rule")
+    mocker.patch.object(fast_path_router, "route", return_value=(route, True))
+    mocker.patch("src.router.get_agent_registry", return_value=AgentRegistry(mock_agents))
+    mocker.patch("src.router.config.router_model", new_callable=MagicMock)
+    mock_chat = mocker.patch.object(mock_llm, "chat", mocker.AsyncMock())
+
+    selections = await select_tools_for_question("task1", [], 3)
+
+    assert selections == [(mock_agent_2, mock_tool_a_name, {"input": "task1"})]
+    mock_chat.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_select_agent_for_task_takes_confident_fast_path_route(mocker, fast_path_router):
+    route = Route(mock_agent_2.name, mock_tool_a_name, {"input": "task1"}, 1.0, "rule")
+    mocker.patch.object(fast_path_router, "route", return_value=(route, True))
+    mocker.patch("src.router.get_agent_registry", return_value=AgentRegistry(mock_agents))
+    mocker.patch("src.router.config.router_model", new_callable=MagicMock)
+    mock_chat = mocker.patch.object(mock_llm, "chat", mocker.AsyncMock())
+
+    selection = await select_tool_for_question("task1", [])
+
+    assert selection is not None
+
+    agent, tool, parameters = selection
+
+    assert agent is mock_agent_2
+    assert (tool, parameters) == (mock_tool_a_name, {"input": "task1"})
+    mock_chat.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_select_agent_for_task_learns_llm_route_against_prediction_once_answered(mocker, fast_path_router):
+    prediction = Route(mock_agent_2.name, mock_tool_a_name, None, 0.4, "classifier")
+    mocker.patch.object(fast_path_router, "route", return_value=(prediction, False))
+    record_llm_route = mocker.patch.object(fast_path_router, "record_llm_route")
+    selected_agent_and_tool = {"agent": mock_agent_1.name, "tool": mock_tool_a_name, "parameters": {"input": "input"}}
+    mocker.patch("src.router.get_llm", return_value=mock_llm)
+    mocker.patch("src.router.get_agent_registry", return_value=AgentRegistry(mock_agents))
+    mocker.patch("src.router.config.router_model", new_callable=MagicMock)
+    mocker.patch.object(mock_llm, "chat", mocker.AsyncMock(return_value=json.dumps(selected_agent_and_tool)))
+
+    selection = await select_tool_for_question("task1", [])
+
+    assert selection is not None
+
+    agent, _, _ = selection
+
+    assert agent is mock_agent_1
+    record_llm_route.assert_not_called()
+
+    confirm_llm_route(selection)
+
+    record_llm_route.assert_called_once_with("task1", prediction, mock_agent_1.name, mock_tool_a_name)
+
+
+@pytest.mark.asyncio
+async def test_select_agent_for_task_does_not_learn_llm_route_that_failed(mocker, fast_path_router):
+    record_llm_route = mocker.patch.object(fast_path_router, "record_llm_route")
+    failed_plan = {"agent": mock_agent_1.name, "tool": mock_tool_a_name, "parameters": {"input": "input"}}
+    retried_plan = {"agent": mock_agent_2.name, "tool": mock_tool_a_name, "parameters": {"input": "input"}}
+    mocker.patch("src.router.get_llm", return_value=mock_llm)
+    mocker.patch("src.router.get_agent_registry", return_value=AgentRegistry(mock_agents))
+    mocker.patch("src.router.config.router_model", new_callable=MagicMock)
+    mocker.patch.object(
+        mock_llm, "chat", mocker.AsyncMock(side_effect=[json.dumps(failed_plan), json.dumps(retried_plan)])
+    )
+
+    await select_tool_for_question("task1", [])
+    selection = await select_tool_for_question("task1", [ChatAgentFailure(mock_agent_1.name, "failure", True)])
+    assert selection is not None
+    confirm_llm_route(selection)
+
+    record_llm_route.assert_called_once_with("task1", None, mock_agent_2.name, mock_tool_a_name)
+
+
+@pytest.mark.asyncio
+async def test_select_agent_for_task_retries_skip_fast_path(mocker, fast_path_router):
+    route = mocker.patch.object(fast_path_router, "route")
+    plan = {"agent": mock_agent_1.name, "tool": mock_tool_a_name, "parameters": {"input": "input"}}
+    mocker.patch("src.router.get_llm", return_value=mock_llm)
+    mocker.patch("src.router.get_agent_registry", return_value=AgentRegistry(mock_agents))
+    mocker.patch("src.router.config.router_model", new_callable=MagicMock)
+    mocker.patch.object(mock_llm, "chat", mocker.AsyncMock(return_value=json.dumps(plan)))
+
+    await select_tool_for_question("task1", [ChatAgentFailure(mock_agent_1.name, "failure", True)])
+
+    route.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "question, template, entities",
+    [
+        (
+            "What is the ESG score of Exxon Mobil in 2021?",
+            "what is the <entity> score of <entity> in <number>",
+            ["ESG", "Exxon Mobil", "2021"],
+        ),
+        ("Which fund holds the most Shell shares?", "which fund holds the most <entity> shares", ["Shell"]),
+        ('Find articles titled "net zero"', "find articles titled <entity>", ['"net zero"']),
+        ("Tesla news. What did Apple say?", "tesla news. what did <entity> say", ["Apple"]),
+    ],
+)
+def test_create_question_template(question, template, entities):
+    assert create_question_template(question) == (template, entities)
+
+
+def test_template_parameters():
+    assert template_parameters({"params": "Scope 1, BP", "year": "2021", "limit": 5}, ["Scope", "1", "BP", "2021"]) == {
+        "params": "\x000\x00 \x001\x00, \x002\x00",
+        "year": "\x003\x00",
+        "limit": 5,
+    }
+    assert template_parameters({"params": "TSLA"}, ["Tesla"]) is None
+    assert template_parameters({"params": "Tesla"}, ["Tesla", "Tesla"]) is None
+
+
+@pytest.mark.asyncio
+async def test_select_agent_for_task_reuses_decision_for_similar_question(mocker, router_decision_cache):
+    plan = {"agent": mock_agent_1.name, "tool": mock_tool_a_name, "parameters": {"input": "Tesla in 2022"}}
+    mocker.patch("src.router.get_llm", return_value=mock_llm)
+    mocker.patch("src.router.get_agent_registry", return_value=AgentRegistry(mock_agents))
+    mocker.patch("src.router.config.router_model", new_callable=MagicMock)
+    mock_chat = mocker.patch.object(mock_llm, "chat", mocker.AsyncMock(return_value=json.dumps(plan)))
+
+    first_selection = await select_tool_for_question("What is the score of Tesla in 2022?", [])
+    assert first_selection is not None
+    confirm_llm_route(first_selection)
+    selection = await select_tool_for_question("What is the score of Apple in 2021?", [])
+    assert selection is not None
+    agent, tool, parameters = selection
+
+    mock_chat.assert_called_once()
+    assert agent is mock_agent_1
+    assert (tool, parameters) == (mock_tool_a_name, {"input": "Apple in 2021"})
+    assert router_decision_cache.get_metrics() == {"entries": 1, "hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+
+@pytest.mark.asyncio
+async def test_select_agent_for_task_ignores_decisions_for_other_agents(mocker):
+    plan = {"agent": mock_agent_1.name, "tool": mock_tool_a_name, "parameters": {"input": "Tesla"}}
+    mocker.patch("src.router.get_llm", return_value=mock_llm)
+    get_agent_registry = mocker.patch("src.router.get_agent_registry", return_value=AgentRegistry(mock_agents))
+    mocker.patch("src.router.config.router_model", new_callable=MagicMock)
+    mock_chat = mocker.patch.object(mock_llm, "chat", mocker.AsyncMock(return_value=json.dumps(plan)))
+
+    first_selection = await select_tool_for_question("News about Tesla", [])
+    assert first_selection is not None
+    confirm_llm_route(first_selection)
+    get_agent_registry.return_value = AgentRegistry([mock_agent_1])
+    await select_tool_for_question("News about Tesla", [])
+
+    assert mock_chat.call_count == 2
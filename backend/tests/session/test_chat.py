@@ -16,8 +16,8 @@ def test_session_chat(mocker, mock_request_context):
     update_session_chat(role="user", content="Hello")
     update_session_chat(role="system", content="Hi there")
     assert get_session_chat() == [
-        {"role": "user", "content": "Hello"},
-        {"role": "system", "content": "Hi there"}
+        {"role": "user", "content": "Hello", "tokens": 1},
+        {"role": "system", "content": "Hi there", "tokens": 2}
     ]
 
 
@@ -25,6 +25,6 @@ def test_clear_session_chat(mocker, mock_request_context):
     mocker.patch("src.session.redis_session_middleware.request_context", mock_request_context)
 
     update_session_chat(role="user", content="Hello")
-    assert get_session_chat() == [{"role": "user", "content": "Hello"}]
+    assert get_session_chat() == [{"role": "user", "content": "Hello", "tokens": 1}]
     clear_session_chat()
     assert get_session_chat() == []
@@ -0,0 +1,84 @@
+from contextvars import ContextVar
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.session.chat import CHAT_SESSION_KEY, CHAT_SUMMARY_SESSION_KEY, Message
+from src.session.conversation_memory import (
+    apply_summary,
+    count_messages_to_summarise,
+    get_chat_history,
+    select_recent_messages,
+)
+from src.session.redis_session import Session
+
+
+def message(role: str, tokens: int) -> Message:
+    return Message(role=role, content=f"{role} message of {tokens} tokens", tokens=tokens)
+
+
+@pytest.fixture
+def session(mocker):
+    session = {}
+    request = MagicMock()
+    request.state.session = session
+    context = ContextVar("request_context")
+    context.set(request)
+    mocker.patch("src.session.redis_session_middleware.request_context", context)
+    return session
+
+
+def test_select_recent_messages_fits_the_newest_within_budget():
+    messages = [message("user", 50), message("system", 30), message("user", 20)]
+
+    assert select_recent_messages(messages, 55) == messages[1:]
+    assert select_recent_messages(messages, 10) == []
+
+
+def test_message_without_cached_tokens_is_counted():
+    assert select_recent_messages([Message(role="user", content="x" * 40)], 9) == []
+
+
+def test_chat_history_includes_summary_and_recent_messages(session):
+    session[CHAT_SESSION_KEY] = [message("user", 50), message("system", 30), message("user", 20)]
+    session[CHAT_SUMMARY_SESSION_KEY] = {"text": "The user asked about Exxon.", "tokens": 40}
+
+    assert get_chat_history(100) == (
+        "Summary of the earlier conversation: The user asked about Exxon.\n"
+        "System: system message of 30 tokens\n"
+        "User: user message of 20 tokens"
+    )
+
+
+def test_empty_chat_history(session):
+    assert get_chat_history(100) == "There is no chat history"
+
+
+def test_history_within_window_is_not_summarised(mocker):
+    mocker.patch("src.session.conversation_memory.config.chat_history_window_tokens", 100)
+
+    assert count_messages_to_summarise([message("user", 50), message("system", 50)]) == 0
+
+
+def test_oldest_messages_are_summarised_until_half_the_window_remains(mocker):
+    mocker.patch("src.session.conversation_memory.config.chat_history_window_tokens", 100)
+    messages = [message("user", 40), message("system", 40), message("user", 20), message("system", 20)]
+
+    assert count_messages_to_summarise(messages) == 2
+
+
+def test_newest_message_is_never_summarised(mocker):
+    mocker.patch("src.session.conversation_memory.config.chat_history_window_tokens", 100)
+
+    assert count_messages_to_summarise([message("user", 10), message("system", 200)]) == 1
+
+
+def test_apply_summary_replaces_the_oldest_messages():
+    messages = [message("user", 40), message("system", 40), message("user", 20)]
+    session = Session("1234")
+    session[CHAT_SESSION_KEY] = list(messages)
+
+    apply_summary(session, 2, "The user asked about Exxon.")
+
+    assert session[CHAT_SESSION_KEY] == messages[2:]
+    assert session[CHAT_SUMMARY_SESSION_KEY] == {"text": "The user asked about Exxon.", "tokens": 6}
@@ -1,16 +1,20 @@
 import json
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 from starlette.requests import Request
 from starlette.responses import Response
 from src.session.file_uploads import (
     FileUpload,
+    ReportDigest,
     ReportResponse,
+    ReportSection,
     clear_session_file_uploads,
     get_report,
+    get_report_digest,
     get_session_file_upload,
     get_session_file_uploads_meta,
     store_report,
+    store_report_digest,
     update_session_file_uploads,
 )
 
@@ -18,7 +22,7 @@ from src.session.file_uploads import (
 @pytest.fixture
 def mock_redis():
     with patch("src.session.file_uploads.redis_client") as mock_redis:
-        mock_instance = MagicMock()
+        mock_instance = AsyncMock()
         mock_redis.return_value = mock_instance
         yield mock_instance
 
@@ -53,18 +57,18 @@ def test_get_session_file_uploads_meta_empty(mocker, mock_request_context):
     assert get_session_file_uploads_meta() == []
 
 
-def test_set_session(mocker, mock_redis, mock_request_context):
+async def test_set_session(mocker, mock_redis, mock_request_context):
     mocker.patch("src.session.redis_session_middleware.request_context", mock_request_context)
     mocker.patch("src.session.file_uploads.redis_client", mock_redis)
     file = FileUpload(content="test", id="1234", filename="test.txt", upload_id=None)
     file2 = FileUpload(content="test2", id="12345", filename="test2.txt", upload_id=None)
 
-    update_session_file_uploads(file_upload=file)
+    await update_session_file_uploads(file_upload=file)
 
     assert get_session_file_uploads_meta() == [{"filename": "test.txt", "id": "1234"}]
     mock_redis.set.assert_called_with("file_upload_1234", json.dumps(file))
 
-    update_session_file_uploads(file_upload=file2)
+    await update_session_file_uploads(file_upload=file2)
     assert get_session_file_uploads_meta() == [
         {"filename": "test.txt", "id": "1234"},
         {"filename": "test2.txt", "id": "12345"},
@@ -73,57 +77,73 @@ def test_set_session(mocker, mock_redis, mock_request_context):
     mock_redis.set.assert_called_with("file_upload_12345", json.dumps(file2))
 
 
-def test_get_session_file_upload(mocker, mock_redis):
+async def test_get_session_file_upload(mocker, mock_redis):
     mocker.patch("src.session.file_uploads.redis_client", mock_redis)
     file = FileUpload(content="test", id="1234", filename="test.txt", upload_id=None)
     mock_redis.get.return_value = json.dumps(file)
-    assert get_session_file_upload("file_upload_1234") == file
+    assert await get_session_file_upload("file_upload_1234") == file
 
 
-def test_clear_session_file_uploads_meta(mocker, mock_redis, mock_request_context):
+async def test_clear_session_file_uploads_meta(mocker, mock_redis, mock_request_context):
     mocker.patch("src.session.file_uploads.redis_client", mock_redis)
     mocker.patch("src.session.redis_session_middleware.request_context", mock_request_context)
 
     file = FileUpload(content="test", id="1234", filename="test.txt", upload_id=None)
     file2 = FileUpload(content="test2", id="12345", filename="test2.txt", upload_id=None)
 
-    update_session_file_uploads(file_upload=file)
+    await update_session_file_uploads(file_upload=file)
 
-    clear_session_file_uploads()
+    await clear_session_file_uploads()
     assert get_session_file_uploads_meta() == []
-    mock_redis.delete.assert_any_call("file_upload_1234")
-    mock_redis.delete.assert_any_call("report_1234")
+    mock_redis.delete.assert_awaited_with("file_upload_1234", "report_1234", "report_digest_1234")
 
-    update_session_file_uploads(file_upload=file)
-    update_session_file_uploads(file_upload=file2)
+    await update_session_file_uploads(file_upload=file)
+    await update_session_file_uploads(file_upload=file2)
     assert get_session_file_uploads_meta() == [
         {"filename": "test.txt", "id": "1234"},
         {"filename": "test2.txt", "id": "12345"},
     ]
 
-    clear_session_file_uploads()
+    await clear_session_file_uploads()
     assert get_session_file_uploads_meta() == []
-    mock_redis.delete.assert_any_call("file_upload_1234")
-    mock_redis.delete.assert_any_call("report_1234")
-    mock_redis.delete.assert_any_call("file_upload_12345")
-    mock_redis.delete.assert_any_call("report_12345")
-
-def test_store_report(mocker, mock_redis):
+    mock_redis.delete.assert_awaited_with(
+        "file_upload_1234",
+        "report_1234",
+        "report_digest_1234",
+        "file_upload_12345",
+        "report_12345",
+        "report_digest_12345",
+    )
+
+async def test_store_report(mocker, mock_redis):
     mocker.patch("src.session.file_uploads.redis_client", mock_redis)
     report = ReportResponse(filename="test.txt", id="12", report="test report", answer="chat message")
 
-    store_report(report)
+    await store_report(report)
 
     mock_redis.set.assert_called_with("report_12", json.dumps(report))
 
 
-def test_get_report(mocker, mock_redis):
+async def test_get_report(mocker, mock_redis):
     mocker.patch("src.session.file_uploads.redis_client", mock_redis)
 
     report = ReportResponse(filename="test.txt", id="12", report="test report", answer="chat message")
     mock_redis.get.return_value = json.dumps(report)
 
-    value = get_report("12")
+    value = await get_report("12")
 
     assert value == report
     mock_redis.get.assert_called_with("report_12")
+
+
+async def test_store_and_get_report_digest(mocker, mock_redis):
+    mocker.patch("src.session.file_uploads.redis_client", mock_redis)
+    section = ReportSection(title="Overview", summary="About Exxon.", keywords=["exxon"], content="About Exxon.")
+    digest = ReportDigest(id="12", filename="test.txt", sections=[section])
+
+    await store_report_digest(digest)
+    mock_redis.set.assert_called_with("report_digest_12", json.dumps(digest))
+
+    mock_redis.get.return_value = json.dumps(digest)
+    assert await get_report_digest("12") == digest
+    mock_redis.get.assert_called_with("report_digest_12")
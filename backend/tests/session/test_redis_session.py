@@ -0,0 +1,152 @@
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.session.chat import CHAT_SESSION_KEY
+from src.session.chat_response import CHAT_RESPONSE_SESSION_KEY
+from src.session.redis_session import Session, load_session
+
+message = {"role": "user", "content": "Hello"}
+reply = {"role": "system", "content": "Hi there"}
+
+
+class RecordingPipeline:
+    def __init__(self, results=None):
+        self.commands = []
+        self.results = results or []
+
+    def __getattr__(self, command):
+        return lambda *args, **kwargs: self.commands.append((command, args, kwargs))
+
+    async def execute(self):
+        return self.results
+
+
+@pytest.fixture
+def pipeline(mocker):
+    pipeline = RecordingPipeline()
+    mock_redis = MagicMock()
+    mock_redis.pipeline.return_value = pipeline
+    mocker.patch("src.session.redis_session.redis_client", mock_redis)
+    mocker.patch("src.session.redis_session.config.session_ttl_seconds", 60)
+    return pipeline
+
+
+def writes(pipeline):
+    return [command for command in pipeline.commands if command[0] != "expire"]
+
+
+def stored_session():
+    return Session(
+        "1234",
+        fields={"file_uploads_meta": json.dumps([{"id": "1", "filename": "a.pdf"}])},
+        lists={CHAT_SESSION_KEY: [json.dumps(message)]},
+    )
+
+
+async def test_load_session_reads_and_extends_expiry_in_one_round_trip(pipeline):
+    pipeline.results = [{"cypher_query": "[]"}, [json.dumps(message)], ['"response-1"'], True, True, True]
+
+    session = await load_session("1234")
+
+    assert session == {"cypher_query": [], CHAT_SESSION_KEY: [message], CHAT_RESPONSE_SESSION_KEY: ["response-1"]}
+    assert [command[0] for command in pipeline.commands].count("hgetall") == 1
+    assert ("expire", ("session_1234", 60), {}) in pipeline.commands
+
+
+async def test_unchanged_session_is_not_written(pipeline):
+    session = stored_session()
+    session.get(CHAT_SESSION_KEY)
+    session.get("file_uploads_meta")
+
+    await session.save()
+
+    assert pipeline.commands == []
+
+
+async def test_only_changed_fields_are_written(pipeline):
+    session = stored_session()
+    session.get(CHAT_SESSION_KEY)
+    cypher_query = [{"queryid": "1", "cypher_query": "MATCH (n) RETURN n"}]
+    session["cypher_query"] = cypher_query
+
+    await session.save()
+
+    assert writes(pipeline) == [("hset", ("session_1234",), {"mapping": {"cypher_query": json.dumps(cypher_query)}})]
+
+
+async def test_appended_values_are_pushed(pipeline):
+    session = stored_session()
+    session.get(CHAT_SESSION_KEY).append(reply)
+
+    await session.save()
+
+    assert writes(pipeline) == [("rpush", ("session_1234_chat", json.dumps(reply)), {})]
+    assert ("expire", ("session_1234_chat", 60), {}) in pipeline.commands
+
+
+async def test_in_place_changes_are_written(pipeline):
+    session = stored_session()
+    session.get("file_uploads_meta").append({"id": "2", "filename": "b.pdf"})
+
+    await session.save()
+
+    file_uploads_meta = json.dumps([{"id": "1", "filename": "a.pdf"}, {"id": "2", "filename": "b.pdf"}])
+    assert writes(pipeline) == [("hset", ("session_1234",), {"mapping": {"file_uploads_meta": file_uploads_meta}})]
+
+
+async def test_replaced_list_is_rewritten(pipeline):
+    session = stored_session()
+    session[CHAT_SESSION_KEY] = [reply]
+
+    await session.save()
+
+    assert writes(pipeline) == [
+        ("delete", ("session_1234_chat",), {}),
+        ("rpush", ("session_1234_chat", json.dumps(reply)), {}),
+    ]
+
+
+async def test_removed_field_is_deleted(pipeline):
+    session = stored_session()
+    del session["file_uploads_meta"]
+
+    await session.save()
+
+    assert writes(pipeline) == [("hdel", ("session_1234", "file_uploads_meta"), {})]
+
+
+async def test_removed_list_is_deleted(pipeline):
+    session = stored_session()
+    session.pop(CHAT_SESSION_KEY)
+    session.pop("cypher_query", None)
+
+    await session.save()
+
+    assert writes(pipeline) == [("delete", ("session_1234_chat",), {})]
+
+
+async def test_cleared_session_is_deleted(pipeline):
+    session = stored_session()
+    session.clear()
+
+    await session.save()
+
+    delete = writes(pipeline)[0]
+    assert delete[0] == "delete"
+    assert {"session_1234", "session_1234_chat"} <= set(delete[1])
+
+
+async def test_trimmed_values_are_removed_from_the_front_of_the_list(pipeline):
+    session = Session("1234", lists={CHAT_SESSION_KEY: [json.dumps(message), json.dumps(reply)]})
+    session.trim(CHAT_SESSION_KEY, 1)
+    session.get(CHAT_SESSION_KEY).append(message)
+
+    await session.save()
+
+    assert session[CHAT_SESSION_KEY] == [reply, message]
+    assert writes(pipeline) == [
+        ("ltrim", ("session_1234_chat", 1, -1), {}),
+        ("rpush", ("session_1234_chat", json.dumps(message)), {}),
+    ]
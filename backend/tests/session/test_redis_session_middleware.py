@@ -1,23 +1,18 @@
-import json
+from contextvars import ContextVar
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock, patch, MagicMock
 from uuid import uuid4
 from starlette.requests import Request
 from starlette.responses import Response
+from src.session.redis_session import Session
 from src.session.redis_session_middleware import (
+    RedisSessionMiddleware,
     get_session,
     reset_session,
     set_session,
     get_redis_session
 )
 
-@pytest.fixture
-def mock_redis():
-    with patch('src.session.redis_session_middleware.redis_client') as mock_redis:
-        mock_instance = MagicMock()
-        mock_redis.return_value = mock_instance
-        yield mock_instance
-
 @pytest.fixture
 def mock_request():
     request = MagicMock(spec=Request)
@@ -53,17 +48,30 @@ def test_set_session(mocker, mock_request_context):
     assert get_session("key") == "value"
 
 
-def test_get_redis_session(mocker, mock_request, mock_redis):
-    mocker.patch("src.session.redis_session_middleware.redis_client", mock_redis)
-    session_id = uuid4()
+async def test_get_redis_session(mocker, mock_request):
+    session_id = str(uuid4())
     mock_request.cookies.get.return_value = session_id
-    mock_redis.get.return_value = '{"user_id": 1}'
+    mock_load_session = mocker.patch(
+        "src.session.redis_session_middleware.load_session",
+        new_callable=AsyncMock,
+        return_value=Session(session_id, {"user_id": "1"}),
+    )
 
-    mock_redis.set(session_id, json.dumps({"user_id": 1}))
-    result = get_redis_session(mock_request)
+    result = await get_redis_session(mock_request)
 
     assert result == {"user_id": 1}
-    mock_redis.get.assert_called_once_with(session_id)
+    mock_load_session.assert_awaited_once_with(session_id)
+
+
+async def test_get_redis_session_for_new_session(mocker, mock_request):
+    mock_request.cookies.get.return_value = None
+    mock_load_session = mocker.patch("src.session.redis_session_middleware.load_session", new_callable=AsyncMock)
+
+    result = await get_redis_session(mock_request)
+
+    assert result == {}
+    assert result.session_id
+    mock_load_session.assert_not_awaited()
 
 def test_reset_session(mocker, mock_request_context):
     mocker.patch("src.session.redis_session_middleware.request_context", mock_request_context)
@@ -76,3 +84,62 @@ def test_reset_session(mocker, mock_request_context):
     reset_session()
     assert get_session("key1") == []
     assert get_session("key2") == []
+
+
+async def stub_app(scope, receive, send):
+    pass
+
+
+@pytest.fixture
+def session_request():
+    request = MagicMock(spec=Request)
+    request.cookies = {"session_id": "1234"}
+    request.url.hostname = "localhost"
+    request.url.path = "/chat"
+    request.method = "GET"
+    return request
+
+
+@pytest.fixture
+def stored_session(mocker):
+    session = Session("1234", lists={"chat": []})
+    session.save = AsyncMock()
+    mocker.patch("src.session.redis_session_middleware.load_session", new_callable=AsyncMock, return_value=session)
+    mocker.patch("src.session.redis_session_middleware.redis_health.healthy", True)
+    mocker.patch("src.session.redis_session_middleware.request_context", ContextVar("request_context"))
+    return session
+
+
+async def test_dispatch_saves_session(session_request, stored_session):
+    async def call_next(request):
+        set_session("chat", ["message"])
+        return Response("test response")
+
+    response = await RedisSessionMiddleware(stub_app).dispatch(session_request, call_next)
+
+    assert stored_session["chat"] == ["message"]
+    stored_session.save.assert_awaited_once()
+    assert "session_id=1234" in response.headers["set-cookie"]
+
+
+async def test_dispatch_skips_session_when_redis_unhealthy(mocker, session_request, stored_session, mock_call_next):
+    mocker.patch("src.session.redis_session_middleware.redis_health.healthy", False)
+
+    await RedisSessionMiddleware(stub_app).dispatch(session_request, mock_call_next)
+
+    stored_session.save.assert_not_awaited()
+
+
+async def test_dispatch_marks_redis_unhealthy_when_read_fails(mocker, session_request, mock_call_next):
+    mocker.patch(
+        "src.session.redis_session_middleware.load_session",
+        new_callable=AsyncMock,
+        side_effect=ConnectionError("Connection refused"),
+    )
+    mock_redis_health = mocker.patch("src.session.redis_session_middleware.redis_health")
+    mock_redis_health.healthy = True
+
+    await RedisSessionMiddleware(stub_app).dispatch(session_request, mock_call_next)
+
+    assert session_request.state.session == {}
+    mock_redis_health.mark_unhealthy.assert_called_once()
@@ -1,7 +1,10 @@
+import asyncio
+
 import pytest
 
 from src.agents.generalist_agent import GeneralistAgent
 from src.agents.agent import ChatAgentFailure, ChatAgentSuccess
+from src.llm.scheduler import scheduler
 from tests.agents import MockChatAgent, mock_tool_a_name
 from src.supervisors import (
     solve_questions,
@@ -126,6 +129,23 @@ async def test_solve_question_when_first_agent_fails_no_retry_and_second_agent_s
     assert bad_agent_spy_invoke.call_count == 1
 
 
+@pytest.mark.asyncio
+async def test_solve_question_learns_only_the_route_that_answered(mocker):
+    good_agent = MockChatAgent("mockllm", mock_model)
+    bad_agent = MockChatAgent("mockllm", mock_model)
+    good_agent.invoke = mocker.AsyncMock(return_value=ChatAgentSuccess("MockChatAgent2", mock_answer))
+    bad_agent.invoke = mocker.AsyncMock(return_value=ChatAgentFailure("MockChatAgent", "failure"))
+    mocker.patch(
+        "src.supervisors.supervisor.select_tool_for_question",
+        side_effect=[(bad_agent, mock_tool_a_name, {}), (good_agent, mock_tool_a_name, {})]
+    )
+    confirm_llm_route = mocker.patch("src.supervisors.supervisor.confirm_llm_route")
+
+    await solve_question(task)
+
+    confirm_llm_route.assert_called_once_with((good_agent, mock_tool_a_name, {}))
+
+
 @pytest.mark.asyncio
 async def test_solve_question_when_no_agents_succeed_will_default_to_generalist(mocker):
     expected = ChatAgentSuccess("GeneralistAgent", "mocked response")
@@ -172,3 +192,128 @@ async def test_solve_question_no_agent_found(mocker):
     with pytest.raises(Exception) as error:
         await solve_question(task)
         assert error == no_agent_response
+
+
+@pytest.fixture
+def speculative_routing(mocker):
+    mocker.patch("src.supervisors.supervisor.config.router_speculative_enabled", True)
+    mocker.patch("src.supervisors.supervisor.config.router_speculative_candidates", 3)
+    mocker.patch("src.supervisors.supervisor.config.router_speculative_token_budget", 1000)
+
+
+def create_agent(mocker, invoke) -> MockChatAgent:
+    agent = MockChatAgent("mockllm", mock_model)
+    agent.invoke = mocker.AsyncMock(side_effect=invoke)
+    return agent
+
+
+@pytest.mark.asyncio
+async def test_speculative_routing_takes_first_answer_to_pass_validation(mocker, speculative_routing):
+    expected = ChatAgentSuccess("FastAgent", mock_answer)
+    slow_agent_cancelled = asyncio.Event()
+
+    async def slow_invoke(*args):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            slow_agent_cancelled.set()
+            raise
+
+    async def fast_invoke(*args):
+        return expected
+
+    slow_agent = create_agent(mocker, slow_invoke)
+    fast_agent = create_agent(mocker, fast_invoke)
+    patched_select_tools = mocker.patch(
+        "src.supervisors.supervisor.select_tools_for_question",
+        return_value=[(slow_agent, mock_tool_a_name, {}), (fast_agent, mock_tool_a_name, {})],
+    )
+    patched_select_tool = mocker.patch("src.supervisors.supervisor.select_tool_for_question")
+    confirm_llm_route = mocker.patch("src.supervisors.supervisor.confirm_llm_route")
+
+    answer = await solve_question(query)
+    await asyncio.wait_for(slow_agent_cancelled.wait(), 1)
+
+    assert answer == expected
+    patched_select_tools.assert_awaited_once_with(query, [], 3)
+    patched_select_tool.assert_not_called()
+    confirm_llm_route.assert_called_once_with((fast_agent, mock_tool_a_name, {}))
+
+
+@pytest.mark.asyncio
+async def test_speculative_routing_retries_with_failures_in_ranked_order(mocker, speculative_routing):
+    expected = ChatAgentSuccess("MockChatAgent", mock_answer)
+    first_failure = ChatAgentFailure("FirstAgent", "failure", retry=True)
+    second_failure = ChatAgentFailure("SecondAgent", "failure")
+
+    async def fail_slowly(*args):
+        await asyncio.sleep(0.01)
+        return first_failure
+
+    async def fail(*args):
+        return second_failure
+
+    first_agent = create_agent(mocker, fail_slowly)
+    second_agent = create_agent(mocker, fail)
+    chat_agent.invoke = mocker.AsyncMock(return_value=expected)
+    mocker.patch(
+        "src.supervisors.supervisor.select_tools_for_question",
+        return_value=[(first_agent, mock_tool_a_name, {}), (second_agent, mock_tool_a_name, {})],
+    )
+    patched_select_tool = mocker.patch(
+        "src.supervisors.supervisor.select_tool_for_question", return_value=(chat_agent, mock_tool_a_name, {})
+    )
+
+    answer = await solve_question(query)
+
+    assert answer == expected
+    patched_select_tool.assert_awaited_once_with(query, [first_failure, second_failure])
+
+
+@pytest.mark.asyncio
+async def test_speculative_routing_keeps_only_best_ranked_agent_once_budget_is_used(mocker, speculative_routing):
+    expected = ChatAgentSuccess("FirstAgent", mock_answer)
+    budget_used = asyncio.Event()
+    second_agent_cancelled = asyncio.Event()
+
+    async def answer_once_budget_is_used(*args):
+        await budget_used.wait()
+        await asyncio.sleep(0.01)
+        return expected
+
+    async def use_budget(*args):
+        scheduler.record_usage("openai", {"total_tokens": 1000})
+        budget_used.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            second_agent_cancelled.set()
+            raise
+
+    first_agent = create_agent(mocker, answer_once_budget_is_used)
+    second_agent = create_agent(mocker, use_budget)
+    mocker.patch(
+        "src.supervisors.supervisor.select_tools_for_question",
+        return_value=[(first_agent, mock_tool_a_name, {}), (second_agent, mock_tool_a_name, {})],
+    )
+
+    answer = await solve_question(query)
+
+    # The lower ranked agent is cancelled as soon as the budget is used, before the best ranked one answers
+    assert second_agent_cancelled.is_set()
+    assert answer == expected
+
+
+@pytest.mark.asyncio
+async def test_speculative_routing_defaults_to_generalist_when_no_agent_is_ranked(mocker, speculative_routing):
+    expected = ChatAgentSuccess("GeneralistAgent", "mocked response")
+    generalist_agent = GeneralistAgent("mockllm", mock_model)
+    generalist_agent.generalist_answer = mocker.AsyncMock(return_value=expected)
+    mocker.patch("src.supervisors.supervisor.get_generalist_agent", return_value=generalist_agent)
+    mocker.patch("src.supervisors.supervisor.select_tools_for_question", return_value=[])
+    patched_select_tool = mocker.patch("src.supervisors.supervisor.select_tool_for_question")
+
+    answer = await solve_question(query)
+
+    assert answer == expected
+    patched_select_tool.assert_not_called()
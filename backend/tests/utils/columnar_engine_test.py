@@ -0,0 +1,165 @@
+import pytest
+
+from src.utils.columnar_engine import (
+    ColumnarDataset,
+    ColumnarStore,
+    execute,
+    find_years,
+    get_value_names,
+    interpret,
+    mentions_column,
+)
+
+rows = [
+    ["Identifier (RIC)", "Company Name", "Date", "ESG_score", "Scope_1", "Industry"],
+    ["AAL", "American Airlines Group Inc", "2021", "59", "900", "Airlines"],
+    ["AAL", "American Airlines Group Inc", "2020", "69", "904", "Airlines"],
+    ["DAL", "Delta Air Lines Inc", "2021", "71", "", "Airlines"],
+    ["DAL", "Delta Air Lines Inc", "2020", "65", "610", "Airlines"],
+    ["XOM", "Exxon Mobil Corp", "2021", "71", "1100", "Oil & Gas"],
+    ["XOM", "Exxon Mobil Corp", "2020", "40", "1200", "Oil & Gas"],
+]
+
+
+@pytest.fixture
+def dataset():
+    return ColumnarDataset.from_rows("bloomberg", rows)
+
+
+def ask(dataset, question_intent, question_params, aggregation="none", sort_order="none", timeframe="none"):
+    query = interpret(dataset, question_intent, "", question_params, aggregation, sort_order, timeframe)
+    return execute(dataset, query) if query else None
+
+
+def test_from_rows_splits_columns_by_type(dataset):
+    assert list(dataset.numeric) == ["ESG_score", "Scope_1"]
+    assert dataset.entity == "Company Name"
+    assert dataset.row_count == 6
+    assert dataset.years.tolist() == [2021, 2020, 2021, 2020, 2021, 2020]
+    assert dataset.categories["Company Name"]["exxon mobil"] == "Exxon Mobil Corp"
+
+
+@pytest.mark.parametrize(
+    "text, column, expected",
+    [
+        ("companies in each industry", "Company Name", True),
+        ("the company", "Company Name", True),
+        ("the industries", "Industry", True),
+        ("industrial output", "Industry", False),
+    ],
+)
+def test_mentions_column(text, column, expected):
+    assert mentions_column(text, column) == expected
+
+
+def test_get_value_names_drops_company_suffixes():
+    assert get_value_names("Delta Air Lines Inc", entity=True) == {"delta air lines inc", "delta air lines"}
+    assert get_value_names("AA", entity=False) == set()
+
+
+@pytest.mark.parametrize(
+    "timeframe, expected",
+    [("2020 to 2021", ((2020, 2021), False)), ("in 2021", ((2021, 2021), False)), ("latest", (None, True))],
+)
+def test_find_years(timeframe, expected):
+    assert find_years(timeframe) == expected
+
+
+def test_average_grouped_by_column(dataset):
+    result = ask(dataset, "Average ESG score by industry", "ESG_score, industry", "average", timeframe="2021")
+
+    assert result == [
+        {"Industry": "Airlines", "average_ESG_score": 65.0},
+        {"Industry": "Oil & Gas", "average_ESG_score": 71.0},
+    ]
+
+
+def test_filter_by_value_and_latest_year(dataset):
+    result = ask(dataset, "What is the ESG score of Exxon Mobil?", "ESG_score, Exxon Mobil", timeframe="latest")
+
+    assert result == [{"Company Name": "Exxon Mobil Corp", "year": 2021, "ESG_score": 71.0}]
+
+
+def test_highest_value_keeps_ties(dataset):
+    result = ask(dataset, "Which company has the highest ESG score?", "ESG_score", "none", "descending", "2021")
+
+    assert result is not None
+    assert [record["Company Name"] for record in result] == ["Delta Air Lines Inc", "Exxon Mobil Corp"]
+
+
+def test_highest_value_sorted_by_operation_returns_one_entry(dataset):
+    query = interpret(dataset, "Which company has the highest ESG score?", "sort", "ESG_score", "none", "none", "2020")
+
+    assert query is not None
+    assert execute(dataset, query) == [{"Company Name": "American Airlines Group Inc", "year": 2020, "ESG_score": 69.0}]
+
+
+def test_metric_words_match_in_any_order():
+    dataset = ColumnarDataset.from_rows(
+        "esg_poc", [["Company Name", "ESG score (Environmental)", "ESG score (Social)"], ["Ryanair", "90", "72"]]
+    )
+
+    query = interpret(dataset, "Highest environmental ESG score", "none", "none", "none", "descending", "none")
+
+    assert query is not None
+    assert query.metric == "ESG score (Environmental)"
+
+
+def test_missing_values_are_ignored(dataset):
+    assert ask(dataset, "Total Scope_1 emissions of airlines", "Scope_1, Airlines", "sum", timeframe="2021") == [
+        {"sum_Scope_1": 900.0}
+    ]
+
+
+def test_count_distinct_values(dataset):
+    assert ask(dataset, "How many companies are in the Airlines industry?", "company, Airlines", "count") == [
+        {"count_Company Name": 2}
+    ]
+
+
+def test_unknown_value_is_not_answered(dataset):
+    assert ask(dataset, "What is the ESG score of Apple?", "ESG_score, Apple") is None
+
+
+def test_question_without_metric_is_not_answered(dataset):
+    assert ask(dataset, "Which funds hold Exxon Mobil?", "funds, Exxon Mobil") is None
+
+
+def test_store_answers_from_dataset_with_the_question_columns():
+    store = ColumnarStore()
+    store.load("bloomberg", rows)
+    store.load("esg_poc", [["Fund Name", "Fund Size"], ["Green Fund", "100"], ["Blue Fund", "200"]])
+
+    assert store.query("Largest fund size", "sort", "Fund Size", "max", "none", "none") == [{"max_Fund Size": 200.0}]
+    assert store.query("Unrelated question", "none", "none", "none", "none", "none") is None
+
+
+def test_store_answers_from_named_dataset():
+    store = ColumnarStore()
+    store.load("bloomberg", rows)
+    store.load("bloomberg_2", [rows[0], ["AAPL", "Apple Inc", "2021", "85", "12", "Technology"]])
+
+    assert store.query("Highest ESG score in bloomberg_2", "none", "ESG_score", "max", "none", "none") == [
+        {"max_ESG_score": 85.0}
+    ]
+    assert store.query("Highest ESG score in Bloomberg", "none", "ESG_score", "max", "none", "none") == [
+        {"max_ESG_score": 71.0}
+    ]
+
+
+def test_store_answers_from_first_loaded_of_datasets_sharing_a_schema():
+    store = ColumnarStore()
+    store.load("bloomberg", rows)
+    store.load("bloomberg_2", [rows[0], ["AAPL", "Apple Inc", "2021", "85", "12", "Technology"]])
+
+    assert store.query("Highest ESG score", "none", "ESG_score", "max", "none", "none") == [{"max_ESG_score": 71.0}]
+
+
+def test_store_prefers_dataset_with_more_specific_metric():
+    store = ColumnarStore()
+    store.load("bloomberg", rows)
+    store.load("esg_poc", [["Company Name", "ESG score (Environmental)"], ["Ryanair", "90"], ["EasyJet", "60"]])
+
+    assert store.query("Highest environmental ESG score", "none", "none", "max", "none", "none") == [
+        {"max_ESG score (Environmental)": 90.0}
+    ]
@@ -0,0 +1,85 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.utils.cypher_plan_cache import (
+    CypherPlan,
+    confirm_current_plan,
+    create_plan_key,
+    current_plan,
+    get_cypher_plan,
+)
+
+
+@pytest.fixture
+def mock_redis(mocker):
+    redis = AsyncMock()
+    mocker.patch("src.utils.cypher_plan_cache.redis_client", redis)
+    mocker.patch("src.utils.cypher_plan_cache.config.cypher_plan_cache_enabled", True)
+    mocker.patch("src.utils.cypher_plan_cache.config.cypher_plan_cache_ttl_seconds", 60)
+    return redis
+
+
+def test_plan_key_ignores_case_and_whitespace():
+    key = create_plan_key("schema", question_intent="Find ESG scores", timeframe="2024")
+
+    assert key == create_plan_key("schema", timeframe="2024 ", question_intent="find  esg scores")
+    assert key != create_plan_key("schema", question_intent="Find ESG scores", timeframe="2023")
+
+
+def test_create_plan_key_changes_with_graph_schema():
+    key = create_plan_key("schema", question_intent="Find ESG scores", timeframe="2024")
+
+    assert key != create_plan_key("reloaded schema", question_intent="Find ESG scores", timeframe="2024")
+
+
+@pytest.mark.asyncio
+async def test_get_cypher_plan_returns_stored_query(mock_redis):
+    mock_redis.get.return_value = "MATCH (n) RETURN n"
+
+    assert await get_cypher_plan("cypher_plan_key") == "MATCH (n) RETURN n"
+
+
+@pytest.mark.asyncio
+async def test_get_cypher_plan_is_skipped_when_disabled(mock_redis, mocker):
+    mocker.patch("src.utils.cypher_plan_cache.config.cypher_plan_cache_enabled", False)
+
+    assert await get_cypher_plan("cypher_plan_key") is None
+    mock_redis.get.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_get_cypher_plan_returns_none_when_redis_unavailable(mock_redis):
+    mock_redis.get.side_effect = Exception("Connection refused")
+
+    assert await get_cypher_plan("cypher_plan_key") is None
+
+
+@pytest.mark.asyncio
+async def test_confirm_current_plan_stores_valid_plan(mock_redis):
+    current_plan.set(CypherPlan("cypher_plan_key", "MATCH (n) RETURN n", from_cache=False))
+
+    await confirm_current_plan(True)
+
+    mock_redis.set.assert_awaited_once_with("cypher_plan_key", "MATCH (n) RETURN n", ex=60)
+    assert current_plan.get() is None
+
+
+@pytest.mark.asyncio
+async def test_confirm_current_plan_evicts_cached_plan_that_failed_validation(mock_redis):
+    current_plan.set(CypherPlan("cypher_plan_key", "MATCH (n) RETURN n", from_cache=True))
+
+    await confirm_current_plan(False)
+
+    mock_redis.delete.assert_awaited_once_with("cypher_plan_key")
+    mock_redis.set.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_confirm_current_plan_does_not_store_new_plan_that_failed_validation(mock_redis):
+    current_plan.set(CypherPlan("cypher_plan_key", "MATCH (n) RETURN n", from_cache=False))
+
+    await confirm_current_plan(False)
+
+    mock_redis.set.assert_not_awaited()
+    mock_redis.delete.assert_not_awaited()
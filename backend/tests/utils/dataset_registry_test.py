@@ -0,0 +1,86 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.utils.dataset_registry import (
+    Dataset,
+    apply_namespace,
+    create_content_hash,
+    create_namespace,
+    get_datasets,
+    get_loaded_hash,
+)
+
+
+@pytest.fixture
+def datasets_directory(mocker, tmp_path):
+    mocker.patch("src.utils.dataset_registry.config.datasets_directory", str(tmp_path))
+    return tmp_path
+
+
+def test_create_namespace():
+    assert create_namespace("bloomberg") == "Bloomberg_"
+    assert create_namespace("bloomberg_2") == "Bloomberg2_"
+    assert create_namespace("esg_poc") == "EsgPoc_"
+
+
+def test_get_datasets_registers_each_csv(datasets_directory):
+    (datasets_directory / "esg_poc.csv").write_text("a\n1\n")
+    (datasets_directory / "bloomberg.csv").write_text("a\n1\n")
+    (datasets_directory / "README.md").write_text("# Datasets")
+
+    datasets = get_datasets()
+
+    assert [(dataset.name, dataset.namespace) for dataset in datasets] == [
+        ("bloomberg", "Bloomberg_"),
+        ("esg_poc", "EsgPoc_"),
+    ]
+
+
+def test_get_datasets_rejects_shared_namespace(datasets_directory):
+    (datasets_directory / "esg_poc.csv").write_text("a\n1\n")
+    (datasets_directory / "esg-poc.csv").write_text("a\n1\n")
+
+    with pytest.raises(ValueError):
+        get_datasets()
+
+
+def test_get_datasets_without_directory(mocker, tmp_path):
+    mocker.patch("src.utils.dataset_registry.config.datasets_directory", str(tmp_path / "missing"))
+
+    assert get_datasets() == []
+
+
+def test_apply_namespace_prefixes_node_labels():
+    query = (
+        "WITH $data AS data UNWIND data.all_data[1..] AS row WITH data.all_data[0] AS headers, row "
+        "MERGE (c:Company {name: row[1]}) MERGE (i : Industry:`Sector Group` {name: coalesce(row[10], 'n/a')}) "
+        "MERGE (c)-[:IN_INDUSTRY]->(i) CREATE (:Score {value: toFloat(row[3])}) SET c:Listed"
+    )
+
+    assert apply_namespace(query, "Bloomberg_") == (
+        "WITH $data AS data UNWIND data.all_data[1..] AS row WITH data.all_data[0] AS headers, row "
+        "MERGE (c:Bloomberg_Company {name: row[1]}) "
+        "MERGE (i : Bloomberg_Industry:`Bloomberg_Sector Group` {name: coalesce(row[10], 'n/a')}) "
+        "MERGE (c)-[:IN_INDUSTRY]->(i) CREATE (:Bloomberg_Score {value: toFloat(row[3])}) SET c:Bloomberg_Listed"
+    )
+
+
+def test_create_content_hash_changes_with_content(tmp_path):
+    path = tmp_path / "bloomberg.csv"
+    dataset = Dataset("bloomberg", path, "Bloomberg_")
+
+    path.write_text("a\n1\n")
+    first = create_content_hash(dataset)
+    path.write_text("a\n2\n")
+
+    assert create_content_hash(dataset) != first
+
+
+@pytest.mark.asyncio
+async def test_get_loaded_hash_fails_open(mocker, tmp_path):
+    redis = AsyncMock()
+    redis.get.side_effect = Exception("Connection refused")
+    mocker.patch("src.utils.dataset_registry.redis_client", redis)
+
+    assert await get_loaded_hash(Dataset("bloomberg", tmp_path / "bloomberg.csv", "Bloomberg_")) is None
@@ -4,7 +4,7 @@ from fastapi import HTTPException
 import pytest
 
 from src.llm.llm import LLMFile
-from src.utils.file_utils import extract_text
+from src.utils.file_utils import extract_text, read_csv_rows
 
 
 def test_handle_file_upload_unsupported_type():
@@ -23,3 +23,13 @@ def test_handle_file_upload_pdf(mocker):
     extract_text(LLMFile(filename="test.pdf", file=file_content))
 
     pdf_mock.assert_called_once()
+
+
+def test_read_csv_rows_handles_quoted_commas(tmp_path):
+    csv_file = tmp_path / "dataset.csv"
+    csv_file.write_text('Company Name,Industry\n"Acme, Inc",Airlines\nGlobex,\n', encoding="utf-8")
+
+    rows = read_csv_rows(csv_file)
+
+    assert next(rows) == ["Company Name", "Industry"]
+    assert list(rows) == [["Acme, Inc", "Airlines"], ["Globex", ""]]
@@ -1,102 +1,236 @@
 import pytest
-from unittest.mock import MagicMock
-from neo4j import Driver, Record, Session
-from src.utils.graph_db_utils import is_db_populated, populate_db
+from unittest.mock import AsyncMock, MagicMock
+from neo4j import AsyncDriver, AsyncSession, Query
+from src.utils.graph_db_utils import (
+    NAMESPACE_MATCH,
+    create_nodes,
+    execute_query,
+    is_db_populated,
+    populate_db,
+    remove_other_namespaces,
+    stream_query,
+)
 from src.utils import test_connection as verify_connection
+from src.utils.query_cache import QueryResultCache
+
+
+class MockResult:
+    def __init__(self, records):
+        self.records = records
+
+    def __aiter__(self):
+        return self.iterate()
+
+    async def iterate(self):
+        for record in self.records:
+            yield record
+
+    async def consume(self):
+        pass
+
+
+class RecordEntryMock:
+    def __init__(self, data):
+        self._data = data
+
+    def data(self):
+        return self._data
 
 
 @pytest.fixture
 def mock_session():
-    session = MagicMock(spec=Session)
-    session.run = MagicMock()
-    session.close = MagicMock()
+    session = MagicMock(spec=AsyncSession)
+    session.run = AsyncMock(return_value=MockResult([]))
     return session
 
 
 @pytest.fixture
-def mock_driver(mock_session):
-    driver = MagicMock(spec=Driver)
-    driver.session.return_value.__enter__.return_value = mock_session
-    driver.session.return_value.__exit__.return_value = None
-    driver.close = MagicMock()
+def mock_driver(mocker, mock_session):
+    driver = MagicMock(spec=AsyncDriver)
+    driver.session.return_value.__aenter__.return_value = mock_session
+    driver.session.return_value.__aexit__.return_value = None
+    driver.verify_connectivity = AsyncMock()
+    driver.close = AsyncMock()
+    mocker.patch("src.utils.graph_db_utils.driver", driver)
     return driver
 
 
-def remove_whitespace_and_newlines(original):
-    return " ".join(original.replace(r"\n", " ").replace(r"\r", "").split())
-
-
-def test_database_connectivity_is_healthy(mocker, mock_driver):
-    mocker.patch("src.utils.graph_db_utils.driver", mock_driver)
-    mock_driver.verify_connectivity.return_value = None
-
-    connected = verify_connection()
+@pytest.mark.asyncio
+async def test_database_connectivity_is_healthy(mock_driver):
+    connected = await verify_connection()
 
     assert connected
-    mock_driver.verify_connectivity.assert_called_once()
-    mock_driver.close.assert_called_once()
+    mock_driver.verify_connectivity.assert_awaited_once()
+    mock_driver.close.assert_not_called()
 
 
-def test_database_connectivity_is_unhealthy(mocker, mock_driver):
-    mocker.patch("src.utils.graph_db_utils.driver", mock_driver)
+@pytest.mark.asyncio
+async def test_database_connectivity_is_unhealthy(mock_driver):
     mock_driver.verify_connectivity.side_effect = Exception
 
-    connected = verify_connection()
+    connected = await verify_connection()
 
     assert not connected
-    mock_driver.verify_connectivity.assert_called_once()
-    mock_driver.close.assert_called_once()
+    mock_driver.verify_connectivity.assert_awaited_once()
+    mock_driver.close.assert_not_called()
 
 
-def test_populate_db_populates_db(mocker, mock_driver, mock_session):
-    mocker.patch("src.utils.graph_db_utils.driver", mock_driver)
+@pytest.mark.asyncio
+async def test_execute_query_returns_records_with_timeout(mocker, mock_driver, mock_session):
+    mocker.patch("src.utils.graph_db_utils.config.neo4j_query_timeout", 5.0)
+    mock_session.run.return_value = MockResult([RecordEntryMock({"a": 1}), RecordEntryMock({"a": 2})])
 
-    query = "CREATE (n:Test {data: $all_data})"
-    data = {"key": "value"}
+    records = await execute_query("MATCH (n) RETURN n.a AS a", {"limit": 2})
 
-    populate_db(query, data)
+    assert records == [{"a": 1}, {"a": 2}]
+    query, parameters = mock_session.run.call_args.args
+    assert isinstance(query, Query)
+    assert query.text == "MATCH (n) RETURN n.a AS a"
+    assert query.timeout == 5.0
+    assert parameters == {"limit": 2}
+    mock_driver.close.assert_not_called()
 
-    mock_session.run.assert_any_call("MATCH (n) DETACH DELETE n")
-    mock_session.run.assert_any_call(query, data={"all_data": data})
 
-    mock_driver.session.return_value.__exit__.assert_called_once()
-    mock_driver.close.assert_called_once()
+@pytest.mark.asyncio
+async def test_stream_query_yields_records_as_they_arrive(mock_driver, mock_session):
+    mock_session.run.return_value = MockResult([RecordEntryMock({"a": 1}), RecordEntryMock({"a": 2})])
 
+    stream = stream_query("MATCH (n) RETURN n.a AS a")
 
-def test_populate_db_throws_exception(mocker, mock_driver, mock_session):
-    mocker.patch("src.utils.graph_db_utils.driver", mock_driver)
+    assert await stream.__anext__() == {"a": 1}
+    assert await stream.__anext__() == {"a": 2}
+    await stream.aclose()
 
-    query = "CREATE (n:Test {data: $all_data})"
-    data = {"key": "value"}
 
+@pytest.mark.asyncio
+async def test_execute_query_throws_exception(mock_driver, mock_session):
     mock_session.run.side_effect = Exception("Test exception")
 
     with pytest.raises(Exception, match="Test exception"):
-        populate_db(query, data)
+        await execute_query("MATCH (n) RETURN n")
+
+    mock_driver.session.return_value.__aexit__.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_populate_db_populates_db_in_batches(mocker, mock_driver, mock_session):
+    mocker.patch("src.utils.graph_db_utils.config.neo4j_ingest_batch_size", 2)
+    mocker.patch("src.utils.graph_db_utils.config.neo4j_delete_batch_size", 500)
+    mock_session.execute_write = AsyncMock()
+    query = "WITH $data AS data UNWIND data.all_data[1..] AS row RETURN row"
+    rows = iter([["name", "score"], ["a", "1"], ["b", "2"], ["c", "3"]])
+
+    await populate_db(query, rows)
+
+    mock_session.run.assert_called_once_with(
+        "MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 500 ROWS", None
+    )
+    assert [call.args[1:] for call in mock_session.execute_write.call_args_list] == [
+        (query, {"all_data": [["name", "score"], ["a", "1"], ["b", "2"]]}),
+        (query, {"all_data": [["name", "score"], ["c", "3"]]}),
+    ]
+    mock_driver.session.return_value.__aexit__.assert_called_once()
+    mock_driver.close.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_populate_db_only_replaces_namespace(mocker, mock_driver, mock_session):
+    mocker.patch("src.utils.graph_db_utils.config.neo4j_delete_batch_size", 500)
+    mock_session.execute_write = AsyncMock()
+
+    await populate_db("CREATE (n:EsgPoc_Fund {data: $data})", [["header"], ["value"]], "EsgPoc_")
+
+    mock_session.run.assert_called_once_with(
+        NAMESPACE_MATCH + "CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 500 ROWS", {"namespace": "EsgPoc_"}
+    )
+    mock_session.execute_write.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_create_nodes_in_batches(mocker, mock_driver, mock_session):
+    mocker.patch("src.utils.graph_db_utils.config.neo4j_ingest_batch_size", 2)
+    mock_session.execute_write = AsyncMock()
+
+    await create_nodes("Bloomberg_MetricRank", [{"rank": 1}, {"rank": 2}, {"rank": 3}])
+
+    query = "UNWIND $data AS properties CREATE (n:`Bloomberg_MetricRank`) SET n = properties"
+    assert [call.args[1:] for call in mock_session.execute_write.call_args_list] == [
+        (query, [{"rank": 1}, {"rank": 2}]),
+        (query, [{"rank": 3}]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_remove_other_namespaces(mock_driver, mock_session):
+    await remove_other_namespaces(["Bloomberg_", "EsgPoc_"])
+
+    query, parameters = mock_session.run.call_args.args
+    assert "none(label IN labels(n)" in query
+    assert parameters == {"namespaces": ["Bloomberg_", "EsgPoc_"]}
+
+
+@pytest.mark.asyncio
+async def test_populate_db_throws_exception(mock_driver, mock_session):
+    mock_session.execute_write = AsyncMock(side_effect=Exception("Test exception"))
+
+    with pytest.raises(Exception, match="Test exception"):
+        await populate_db("CREATE (n:Test {data: $data})", [["header"], ["value"]])
+
+    mock_driver.session.return_value.__aexit__.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_populate_db_rejects_empty_dataset(mock_driver, mock_session):
+    with pytest.raises(ValueError):
+        await populate_db("CREATE (n:Test {data: $data})", [])
+
+    mock_session.run.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_is_db_populated_returns_true(mock_driver, mock_session):
+    mock_session.run.return_value = MockResult([RecordEntryMock({"key": "value"})])
+
+    assert await is_db_populated()
+    mock_driver.session.return_value.__aexit__.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_is_db_populated_checks_namespace(mock_driver, mock_session):
+    mock_session.run.return_value = MockResult([RecordEntryMock({"key": "value"})])
+
+    assert await is_db_populated("EsgPoc_")
+    query, parameters = mock_session.run.call_args.args
+    assert query.text == NAMESPACE_MATCH + "RETURN n LIMIT 1"
+    assert parameters == {"namespace": "EsgPoc_"}
+
+
+@pytest.mark.asyncio
+async def test_is_db_populated_returns_false(mock_driver, mock_session):
+    assert not await is_db_populated()
+    mock_driver.session.return_value.__aexit__.assert_called_once()
 
-    mock_driver.session.return_value.__exit__.assert_called_once()
-    mock_driver.close.assert_called_once()
 
-def test_is_db_populated_returns_true(mocker, mock_driver, mock_session):
-    mocker.patch("src.utils.graph_db_utils.driver", mock_driver)
+@pytest.mark.asyncio
+async def test_execute_query_serves_repeated_query_from_cache(mocker, mock_driver, mock_session):
+    mocker.patch("src.utils.graph_db_utils.query_cache", QueryResultCache(max_bytes=1024))
+    mock_session.run.return_value = MockResult([RecordEntryMock({"a": 1})])
 
-    class RecordEntryMock:
-        def data(self):
-            return {"key": "value"}
+    first = await execute_query("MATCH (n) RETURN n.a AS a", use_cache=True)
+    second = await execute_query("MATCH (n)\n RETURN n.a AS a", use_cache=True)
 
-    record = Record([("a", RecordEntryMock())])
+    assert first == second == [{"a": 1}]
+    mock_session.run.assert_awaited_once()
 
-    mock_session.run.return_value = record
 
-    assert is_db_populated()
-    mock_driver.session.return_value.__exit__.assert_called_once()
-    mock_driver.close.assert_called_once()
+@pytest.mark.asyncio
+async def test_populate_db_invalidates_query_cache(mocker, mock_driver, mock_session):
+    cache = QueryResultCache(max_bytes=1024)
+    mocker.patch("src.utils.graph_db_utils.query_cache", cache)
+    cache.set("MATCH (n) RETURN n", None, [{"n": 1}], duration=0)
 
-def test_is_db_populated_returns_false(mocker, mock_driver, mock_session):
-    mocker.patch("src.utils.graph_db_utils.driver", mock_driver)
+    mock_session.execute_write = AsyncMock()
 
-    mock_session.run.return_value = Record([])
+    await populate_db("CREATE (n:Test {data: $data})", [["header"], ["value"]])
 
-    assert not is_db_populated()
-    mock_driver.session.return_value.__exit__.assert_called_once()
-    mock_driver.close.assert_called_once()
+    assert cache.get("MATCH (n) RETURN n") is None
@@ -0,0 +1,124 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.utils.graph_indexes import (
+    IndexPlan,
+    create_indexes,
+    find_merge_keys,
+    get_index_coverage,
+    is_identifier_property,
+    plan_merge_indexes,
+    plan_property_indexes,
+)
+
+import_query = (
+    "WITH $data AS data UNWIND data.all_data[1..] AS row WITH data.all_data[0] AS headers, row "
+    "MERGE (c:Bloomberg_Company {ric: row[0]}) SET c.name = row[1] "
+    "MERGE (i:Bloomberg_Industry {name: row[10]}) "
+    "MERGE (r:Bloomberg_ESGReport {ric: row[0], year: toInteger(row[2])}) "
+    "MERGE (c)-[:IN_INDUSTRY]->(i) MERGE (c)-[:HAS_REPORT]->(r)"
+)
+
+node_properties = [
+    {
+        "label": "Bloomberg_Company",
+        "properties": [{"name": "ric", "data_type": "String"}, {"name": "companyName", "data_type": "String"}],
+    },
+    {
+        "label": "Bloomberg_ESGReport",
+        "properties": [{"name": "year", "data_type": "Long"}, {"name": "esg_score", "data_type": "Double"}],
+    },
+]
+
+
+@pytest.mark.parametrize(
+    "property_name, expected",
+    [("ric", True), ("companyName", True), ("Company Name", True), ("report_date", True), ("esg_score", False)],
+)
+def test_is_identifier_property(property_name, expected):
+    assert is_identifier_property(property_name) == expected
+
+
+def test_find_merge_keys():
+    assert find_merge_keys(import_query) == [
+        ("Bloomberg_Company", ("ric",)),
+        ("Bloomberg_Industry", ("name",)),
+        ("Bloomberg_ESGReport", ("ric", "year")),
+    ]
+
+
+def test_plan_merge_indexes_constrains_single_keys():
+    assert [plan.to_cypher() for plan in plan_merge_indexes(import_query)] == [
+        "CREATE CONSTRAINT unique_bloomberg_company_ric IF NOT EXISTS FOR (n:Bloomberg_Company) REQUIRE n.ric "
+        "IS UNIQUE",
+        "CREATE CONSTRAINT unique_bloomberg_industry_name IF NOT EXISTS FOR (n:Bloomberg_Industry) REQUIRE n.name "
+        "IS UNIQUE",
+        "CREATE INDEX range_bloomberg_esgreport_ric_year IF NOT EXISTS FOR (n:Bloomberg_ESGReport) ON (n.ric, n.year)",
+    ]
+
+
+def test_plan_property_indexes():
+    plans = plan_property_indexes(node_properties, unique={("Bloomberg_Company", "ric")})
+
+    assert plans == [
+        IndexPlan("range", "Bloomberg_Company", ("companyName",)),
+        IndexPlan("text", "Bloomberg_Company", ("companyName",)),
+        IndexPlan("range", "Bloomberg_ESGReport", ("year",)),
+    ]
+
+
+def test_index_plan_quotes_names():
+    plan = IndexPlan("text", "EsgPoc_Fund", ("Fund Name",))
+
+    assert plan.to_cypher() == (
+        "CREATE TEXT INDEX text_esgpoc_fund_fund_name IF NOT EXISTS FOR (n:EsgPoc_Fund) ON (n.`Fund Name`)"
+    )
+
+
+@pytest.mark.asyncio
+async def test_create_indexes_falls_back_to_range_index(mocker):
+    mock_execute_query = mocker.patch(
+        "src.utils.graph_indexes.execute_query", new_callable=AsyncMock, side_effect=[Exception("Duplicates"), []]
+    )
+
+    await create_indexes([IndexPlan("unique", "Bloomberg_Company", ("ric",))])
+
+    assert mock_execute_query.call_args.args[0] == (
+        "CREATE INDEX range_bloomberg_company_ric IF NOT EXISTS FOR (n:Bloomberg_Company) ON (n.ric)"
+    )
+
+
+@pytest.mark.asyncio
+async def test_get_index_coverage(mocker):
+    indexes = [
+        {
+            "type": "RANGE",
+            "entityType": "NODE",
+            "labelsOrTypes": ["Bloomberg_Company"],
+            "properties": ["ric"],
+            "owningConstraint": "unique_bloomberg_company_ric",
+        },
+        {
+            "type": "TEXT",
+            "entityType": "NODE",
+            "labelsOrTypes": ["Bloomberg_Company"],
+            "properties": ["companyName"],
+            "owningConstraint": None,
+        },
+    ]
+    mocker.patch(
+        "src.utils.graph_indexes.execute_query",
+        new_callable=AsyncMock,
+        side_effect=[indexes, [{"nodeProperties": node_properties}]],
+    )
+
+    coverage = await get_index_coverage()
+
+    assert coverage["identifier_properties"] == 3
+    assert coverage["indexed"] == 2
+    assert coverage["properties"] == [
+        {"label": "Bloomberg_Company", "property": "ric", "indexes": ["UNIQUE"]},
+        {"label": "Bloomberg_Company", "property": "companyName", "indexes": ["TEXT"]},
+        {"label": "Bloomberg_ESGReport", "property": "year", "indexes": []},
+    ]
@@ -0,0 +1,80 @@
+import json
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.utils.dynamic_knowledge_graph import generate_dynamic_knowledge_graph
+from src.utils.knowledge_graph_cache import (
+    create_shape_fingerprint,
+    get_cache_path,
+    infer_column_type,
+    load_knowledge_graph,
+    store_knowledge_graph,
+)
+
+knowledge_graph = {"cypher_query": "MERGE (c:Company {name: row[0]})", "model": "Company"}
+
+
+@pytest.fixture
+def cache_directory(mocker, tmp_path):
+    mocker.patch("src.utils.knowledge_graph_cache.config.knowledge_graph_cache_directory", str(tmp_path))
+    mocker.patch("src.utils.knowledge_graph_cache.config.knowledge_graph_cache_enabled", True)
+    return tmp_path
+
+
+@pytest.mark.parametrize(
+    "values, expected",
+    [
+        (["1", "-2", ""], "integer"),
+        (["1", "2.5", "NA"], "float"),
+        (["True", "false"], "boolean"),
+        (["2023-01-01", "2024-12-31"], "date"),
+        (["Ryanair", "1"], "string"),
+        (["", "n/a"], "empty"),
+    ],
+)
+def test_infer_column_type(values, expected):
+    assert infer_column_type(values) == expected
+
+
+def test_shape_fingerprint_ignores_values():
+    fingerprint = create_shape_fingerprint([["Company Name", "ESG_score"], ["Apple", "85.3"]])
+
+    assert fingerprint == create_shape_fingerprint([["Company Name", "ESG_score"], ["Google", "87.4"], ["X", "1"]])
+    assert fingerprint != create_shape_fingerprint([["Company Name", "ESG_score"], ["Apple", "high"]])
+    assert fingerprint != create_shape_fingerprint([["Fund Name", "ESG_score"], ["Apple", "85.3"]])
+
+
+def test_store_and_load_knowledge_graph(cache_directory):
+    store_knowledge_graph("fingerprint", ["Company Name"], knowledge_graph)
+
+    assert load_knowledge_graph("fingerprint") == knowledge_graph
+    assert json.loads(get_cache_path("fingerprint").read_text())["headers"] == ["Company Name"]
+    assert [path.name for path in cache_directory.iterdir()] == ["fingerprint.json"]
+
+
+def test_load_knowledge_graph_ignores_unreadable_entry(cache_directory):
+    get_cache_path("fingerprint").write_text("{")
+
+    assert load_knowledge_graph("fingerprint") is None
+
+
+def test_load_knowledge_graph_when_disabled(mocker, cache_directory):
+    store_knowledge_graph("fingerprint", ["Company Name"], knowledge_graph)
+    mocker.patch("src.utils.knowledge_graph_cache.config.knowledge_graph_cache_enabled", False)
+
+    assert load_knowledge_graph("fingerprint") is None
+
+
+async def test_generate_dynamic_knowledge_graph_reuses_graph_for_same_shape(mocker, cache_directory):
+    mock_generate = mocker.patch(
+        "src.utils.dynamic_knowledge_graph.generate_knowledge_graph",
+        new_callable=AsyncMock,
+        return_value=knowledge_graph,
+    )
+
+    first = await generate_dynamic_knowledge_graph([["Company Name", "ESG_score"], ["Apple", "85.3"]])
+    second = await generate_dynamic_knowledge_graph([["Company Name", "ESG_score"], ["Google", "87.4"]])
+
+    assert first == second == knowledge_graph
+    mock_generate.assert_awaited_once()
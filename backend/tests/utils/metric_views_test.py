@@ -0,0 +1,127 @@
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.utils.metric_views import (
+    compute_metric_views,
+    describe_metric_views,
+    find_column_roles,
+    is_metric_view,
+    materialise_metric_views,
+)
+
+rows = [
+    ["Identifier (RIC)", "Company Name", "Date", "ESG_score", "Industry"],
+    ["AAL", "American Airlines", "2020", "60", "Airlines"],
+    ["AAL", "American Airlines", "2021", "50", "Airlines"],
+    ["DAL", "Delta", "2020", "70", "Airlines"],
+    ["DAL", "Delta", "2021", "80", "Airlines"],
+    ["AAPL", "Apple", "2021", "90", "Technology"],
+    ["GOOG", "Google", "2021", "", "Technology"],
+]
+
+
+def test_find_column_roles():
+    roles = find_column_roles(rows)
+
+    assert roles.metrics == {3: "ESG_score"}
+    assert roles.groups == {4: "Industry"}
+    assert roles.time == 2
+    assert roles.entity == 1
+
+
+def test_find_column_roles_prefers_company_names():
+    roles = find_column_roles([["Fund Name", "Company Name", "ESG score"], ["WhiteRock ETF", "Ryanair", "90"]])
+
+    assert roles.entity == 1
+
+
+def test_compute_metric_views_rolls_up_by_group_and_year():
+    rollups, _ = compute_metric_views(rows[1:], find_column_roles(rows))
+
+    airlines_2021 = next(r for r in rollups if r["group_name"] == "Airlines" and r["year"] == 2021)
+    assert airlines_2021 == {
+        "group_by": "Industry",
+        "group_name": "Airlines",
+        "year": 2021,
+        "metric_name": "ESG_score",
+        "average": 65,
+        "minimum": 50,
+        "maximum": 80,
+        "total": 130,
+        "count": 2,
+        "previous_average": 65,
+        "change": 0,
+        "percent_change": 0,
+        "rank": 2,
+    }
+    technology_2021 = next(r for r in rollups if r["group_name"] == "Technology")
+    assert technology_2021["count"] == 1
+    assert technology_2021["rank"] == 1
+    assert "change" not in technology_2021
+
+
+def test_compute_metric_views_ranks_entities_with_changes():
+    _, ranks = compute_metric_views(rows[1:], find_column_roles(rows))
+
+    ranks_2021 = sorted((r for r in ranks if r["year"] == 2021), key=lambda r: r["rank"])
+    assert [(r["entity_name"], r["rank"]) for r in ranks_2021] == [
+        ("Apple", 1),
+        ("Delta", 2),
+        ("American Airlines", 3),
+    ]
+    assert ranks_2021[1]["previous_value"] == 70
+    assert ranks_2021[1]["change"] == 10
+
+
+def test_compute_metric_views_ties_share_a_rank():
+    tied_rows = [rows[0], ["A", "A", "2021", "1", "X"], ["B", "B", "2021", "1", "X"], ["C", "C", "2021", "0", "X"]]
+
+    _, ranks = compute_metric_views(tied_rows[1:], find_column_roles(tied_rows))
+
+    assert sorted(r["rank"] for r in ranks) == [1, 1, 3]
+
+
+@pytest.mark.asyncio
+async def test_materialise_metric_views_creates_nodes_in_namespace(mocker):
+    mock_create_nodes = mocker.patch("src.utils.metric_views.create_nodes", new_callable=AsyncMock)
+
+    await materialise_metric_views(iter(rows), "Bloomberg_")
+
+    labels = [call.args[0] for call in mock_create_nodes.call_args_list]
+    assert labels == ["Bloomberg_MetricRollup", "Bloomberg_MetricRank"]
+    assert len(mock_create_nodes.call_args_list[1].args[1]) == 5
+
+
+@pytest.mark.asyncio
+async def test_materialise_metric_views_skips_dataset_without_metrics(mocker):
+    mock_create_nodes = mocker.patch("src.utils.metric_views.create_nodes", new_callable=AsyncMock)
+
+    await materialise_metric_views([["Company Name"], ["Apple"]], "Bloomberg_")
+
+    mock_create_nodes.assert_not_awaited()
+
+
+def test_is_metric_view():
+    assert is_metric_view("Bloomberg_MetricRollup")
+    assert is_metric_view("EsgPoc_MetricRank")
+    assert not is_metric_view("Bloomberg_Company")
+
+
+@pytest.mark.asyncio
+async def test_describe_metric_views(mocker):
+    mocker.patch(
+        "src.utils.metric_views.execute_query",
+        new_callable=AsyncMock,
+        return_value=[
+            {"metrics": ["Scope_1", "ESG_score"], "group_by": ["Industry"], "first_year": 2012, "last_year": 2021}
+        ],
+    )
+
+    [view] = await describe_metric_views(["Bloomberg_MetricRollup"])
+
+    assert view["label"] == "Bloomberg_MetricRollup"
+    assert view["metric_names"] == ["ESG_score", "Scope_1"]
+    assert view["group_by"] == ["Industry"]
+    assert view["years"] == [2012, 2021]
+    assert "group_name" in view["properties"]
@@ -0,0 +1,96 @@
+import pytest
+
+from src.utils.query_cache import QueryResultCache, normalise_query
+
+
+@pytest.mark.parametrize(
+    "query, equivalent_query",
+    [
+        ("MATCH (n)\n  RETURN n", "MATCH (n) RETURN n;"),
+        ("MATCH (c:Company {name: \"Acme\"}) RETURN c", "MATCH (c:Company {name:'Acme'}) RETURN c"),
+        ("MATCH (c) WHERE c.name IN ['b', 'a'] RETURN c", "MATCH (c) WHERE c.name IN ['a','b'] RETURN c"),
+        ("MATCH (f) WHERE f.year IN [2023, 2021] RETURN f", "MATCH (f) WHERE f.year in [2021,2023] RETURN f"),
+    ],
+)
+def test_normalise_query_matches_equivalent_queries(query, equivalent_query):
+    assert normalise_query(query) == normalise_query(equivalent_query)
+
+
+def test_normalise_query_preserves_whitespace_in_string_literals():
+    assert normalise_query("MATCH (c {name: 'Acme  Corp'}) RETURN c") == "MATCH(c{name:'Acme  Corp'})RETURN c"
+
+
+def test_normalise_query_preserves_whitespace_in_backticked_identifiers():
+    query = "MATCH (c:`Energy  Company` {name: 'Acme'}) RETURN c.`Total ( CO2 )`"
+
+    assert normalise_query(query) == "MATCH(c:`Energy  Company`{name:'Acme'})RETURN c.`Total ( CO2 )`"
+
+
+def test_normalise_query_keeps_order_of_returned_lists():
+    assert normalise_query("RETURN ['b', 'a']") == "RETURN['b','a']"
+
+
+@pytest.mark.parametrize(
+    "query, iterated_list",
+    [
+        ("RETURN [x IN ['b', 'a'] | x + '!']", "['b','a']"),
+        ("RETURN reduce(s = '', x IN ['b', 'a'] | s + x)", "['b','a']"),
+        ("MATCH (c) WHERE any(x IN [2, 1] WHERE x = c.rank) RETURN c", "[2,1]"),
+    ],
+)
+def test_normalise_query_keeps_order_of_iterated_lists(query, iterated_list):
+    assert f"IN{iterated_list}" in normalise_query(query)
+
+
+def test_cache_returns_results_for_equivalent_query():
+    cache = QueryResultCache(max_bytes=1024)
+    cache.set("MATCH (n) RETURN n", None, [{"n": 1}], duration=0.5)
+
+    assert cache.get("MATCH (n)   RETURN n;") == [{"n": 1}]
+    assert cache.get("MATCH (n) RETURN n", {"limit": 1}) is None
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+    assert cache.stats.saved_duration == 0.5
+
+
+def test_cache_evicts_least_recently_used_results_when_full():
+    cache = QueryResultCache(max_bytes=25)
+    cache.set("RETURN 1", None, [{"a": 1}], duration=0)
+    cache.set("RETURN 2", None, [{"a": 2}], duration=0)
+    cache.get("RETURN 1")
+    cache.set("RETURN 3", None, [{"a": 3}], duration=0)
+
+    assert cache.get("RETURN 1") == [{"a": 1}]
+    assert cache.get("RETURN 2") is None
+    assert cache.get("RETURN 3") == [{"a": 3}]
+    assert cache.size <= 25
+
+
+def test_cache_does_not_store_results_larger_than_cache():
+    cache = QueryResultCache(max_bytes=10)
+    cache.set("MATCH (n) RETURN n", None, [{"name": "a long company name"}], duration=0)
+
+    assert cache.get("MATCH (n) RETURN n") is None
+    assert cache.size == 0
+
+
+def test_bump_generation_invalidates_cached_results():
+    cache = QueryResultCache(max_bytes=1024)
+    cache.set("MATCH (n) RETURN n", None, [{"n": 1}], duration=0)
+
+    cache.bump_generation()
+
+    assert cache.get("MATCH (n) RETURN n") is None
+    assert cache.get_metrics()["generation"] == 1
+
+
+def test_cache_results_are_not_changed_by_callers():
+    cache = QueryResultCache(max_bytes=1024)
+    records = [{"n": 1}]
+    cache.set("MATCH (n) RETURN n", None, records, duration=0)
+    records.append({"n": 2})
+    cached = cache.get("MATCH (n) RETURN n")
+    assert cached is not None
+    cached.append({"n": 3})
+
+    assert cache.get("MATCH (n) RETURN n") == [{"n": 1}]
@@ -0,0 +1,51 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.utils import redis_utils
+from src.utils.redis_utils import RedisHealthProbe
+
+
+@pytest.fixture
+def mock_redis(mocker):
+    return mocker.patch("src.utils.redis_utils.redis_client", new_callable=AsyncMock)
+
+
+async def test_redis_connection_keeps_client_open(mock_redis):
+    mock_redis.ping.return_value = True
+
+    assert await redis_utils.test_redis_connection()
+    mock_redis.close.assert_not_awaited()
+
+
+async def test_redis_connection_failure(mock_redis):
+    mock_redis.ping.side_effect = ConnectionError("Connection refused")
+
+    assert not await redis_utils.test_redis_connection()
+
+
+async def test_health_probe_tracks_redis(mock_redis):
+    probe = RedisHealthProbe()
+    mock_redis.ping.return_value = True
+    await probe.check()
+    assert probe.healthy
+
+    mock_redis.ping.side_effect = ConnectionError("Connection refused")
+    await probe.check()
+    assert not probe.healthy
+
+
+async def test_health_probe_runs_in_background(mocker, mock_redis):
+    mocker.patch("src.utils.redis_utils.config.redis_health_check_interval", 0)
+    mocker.patch("src.utils.redis_utils.redis_pool", AsyncMock())
+    probe = RedisHealthProbe()
+
+    await probe.start()
+    assert probe.healthy
+    probe.mark_unhealthy()
+    await asyncio.sleep(0.01)
+
+    assert probe.healthy
+    await probe.stop()
+    assert probe.task is None
@@ -0,0 +1,95 @@
+from unittest.mock import AsyncMock
+
+from src.session.file_uploads import ReportResponse
+from src.utils.report_digest import (
+    create_report_digest,
+    format_report_digest,
+    get_uploaded_report_prompt,
+    select_relevant_sections,
+    split_sections,
+    summarise_section,
+)
+
+report = """# Overview
+Exxon Mobil is an oil and gas company. The report covers 2022 and 2023.
+
+# Environmental
+
+## Emissions
+Scope 1 emissions fell by **10%** to 90 million tonnes. Flaring was reduced across upstream operations.
+
+## Water
+Water withdrawal in drought regions increased.
+
+# Governance
+The board has twelve directors, ten of whom are independent.
+"""
+
+mock_report = ReportResponse(id="12", filename="exxon.pdf", report=report, answer="")
+
+
+def test_split_sections_drops_headings_without_content():
+    sections = split_sections(report)
+
+    assert [title for title, _ in sections] == ["Overview", "Emissions", "Water", "Governance"]
+    assert sections[3][1] == "The board has twelve directors, ten of whom are independent."
+
+
+def test_text_before_first_heading_is_a_section():
+    assert split_sections("Summary of the report\n# Overview\nText") == [
+        ("Introduction", "Summary of the report"),
+        ("Overview", "Text"),
+    ]
+
+
+def test_summarise_section_keeps_leading_sentences_without_markdown():
+    assert summarise_section("- Scope 1 emissions fell by **10%**. Flaring was reduced.") == (
+        "Scope 1 emissions fell by 10%. Flaring was reduced."
+    )
+    assert len(summarise_section("word " * 1000)) <= 60 * 4 + 3
+
+
+def test_create_report_digest():
+    digest = create_report_digest(mock_report)
+
+    assert digest["id"] == "12"
+    assert digest["filename"] == "exxon.pdf"
+    assert digest["sections"][1]["title"] == "Emissions"
+    assert "emissions" in digest["sections"][1]["keywords"]
+
+
+def test_select_relevant_sections_matches_the_query():
+    digest = create_report_digest(mock_report)
+
+    assert [section["title"] for section in select_relevant_sections(digest, "How have emissions changed?", 1000)] == [
+        "Emissions"
+    ]
+    assert select_relevant_sections(digest, "What is the share price?", 1000) == []
+    assert select_relevant_sections(digest, "How have emissions changed?", 5) == []
+
+
+def test_format_report_digest_includes_outline_and_relevant_sections_only():
+    digest = create_report_digest(mock_report)
+
+    prompt = format_report_digest(digest, "How independent is the board?", 1000)
+
+    assert "- Water: Water withdrawal in drought regions increased." in prompt
+    assert "## Governance\nThe board has twelve directors" in prompt
+    assert "## Water" not in prompt
+
+
+async def test_report_prompt_builds_missing_digest(mocker):
+    mocker.patch("src.utils.report_digest.get_uploaded_report_digest", new_callable=AsyncMock, return_value=None)
+    mocker.patch("src.utils.report_digest.get_uploaded_report", new_callable=AsyncMock, return_value=mock_report)
+
+    prompt = await get_uploaded_report_prompt("water", 1000)
+
+    assert prompt is not None
+    assert "## Water\nWater withdrawal" in prompt
+
+
+async def test_no_report_prompt_without_an_uploaded_report(mocker):
+    mocker.patch("src.utils.report_digest.get_uploaded_report_digest", new_callable=AsyncMock, return_value=None)
+    mocker.patch("src.utils.report_digest.get_uploaded_report", new_callable=AsyncMock, return_value=None)
+
+    assert await get_uploaded_report_prompt("water", 1000) is None
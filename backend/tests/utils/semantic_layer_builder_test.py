@@ -0,0 +1,187 @@
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.utils import semantic_layer_builder
+from src.utils.semantic_layer_builder import (
+    clean_relationship_properties,
+    convert_schema,
+    create_fingerprints,
+    create_prompts_fingerprint,
+    create_schema_hash,
+    filter_node_properties,
+    get_semantic_layer,
+)
+
+relationship_result = [
+    {
+        "nodes": [{"name": "Fund"}, {"name": "Company"}],
+        "relationships": [
+            [{"name": "Fund"}, "CONTAINS", {"name": "Company"}],
+            [{"name": "Company"}, "HAS_ESGSCORE", {"name": "ESGScore"}],
+        ],
+    }
+]
+relationship_properties_result = [
+    {"relProperties": [{"relationship_type": "[:CONTAINS]", "properties": [{"name": "weight"}, {"name": None}]}]}
+]
+node_properties_result = [
+    {"nodeProperties": [{"label": "Fund", "properties": [{"name": "name", "data_type": "STRING"}]}]}
+]
+
+
+@pytest.fixture
+def mock_execute_query(mocker):
+    return mocker.patch(
+        "src.utils.semantic_layer_builder.execute_query",
+        AsyncMock(side_effect=[relationship_result, relationship_properties_result, node_properties_result]),
+    )
+
+
+@pytest.fixture
+def mock_redis(mocker):
+    redis = AsyncMock()
+    redis.get.return_value = None
+    redis.pipeline = MagicMock()
+    redis.pipeline.return_value.execute = AsyncMock(return_value=[True, True])
+    mocker.patch("src.utils.semantic_layer_builder.redis_client", redis)
+    return redis
+
+
+def mock_llm_response(model, system_prompt, user_prompt, agent, return_json):
+    if system_prompt == semantic_layer_builder.neo4j_relationships_understanding_prompt:
+        relationship = user_prompt.split("'type': '")[1].split("'")[0]
+        return json.dumps({"cypher_representation": f"[:{relationship}]", "detail": f"{relationship} detail"})
+    if system_prompt == semantic_layer_builder.neo4j_nodes_understanding_prompt:
+        return json.dumps([{"label": "Fund", "detail": "A fund"}, {"label": "Company", "detail": "A company"}])
+    if system_prompt == semantic_layer_builder.neo4j_relationship_property_prompt:
+        return json.dumps({"relProperties": [{"relType": "[:CONTAINS]", "property": [{"name": "weight"}]}]})
+    return json.dumps({"nodeProperties": [{"label": "Fund", "properties": [{"name": "name"}]}]})
+
+
+@pytest.mark.asyncio
+async def test_get_semantic_layer_enriches_and_persists_schema(mock_execute_query, mock_redis):
+    llm = MagicMock()
+    llm.chat = AsyncMock(side_effect=mock_llm_response)
+
+    semantic_layer = await get_semantic_layer(llm, "model", "datastore")
+
+    assert semantic_layer == {
+        "nodes": [
+            {"label": "Fund", "detail": "A fund", "properties": [{"name": "name"}]},
+            {"label": "Company", "detail": "A company"},
+        ],
+        "relationships": [
+            {"cypher_representation": "[:CONTAINS]", "detail": "CONTAINS detail", "property": [{"name": "weight"}]},
+            {"cypher_representation": "[:HAS_ESGSCORE]", "detail": "HAS_ESGSCORE detail"},
+        ],
+    }
+    assert llm.chat.await_count == 5
+    schema_hash = create_schema_hash(relationship_result, relationship_properties_result, node_properties_result)
+    pipeline = mock_redis.pipeline.return_value
+    persisted_key, persisted_layer = pipeline.set.call_args_list[0].args
+    assert persisted_key == f"semantic_layer_{schema_hash}"
+    assert json.loads(persisted_layer)["semantic_layer"] == semantic_layer
+    pipeline.set.assert_any_call("semantic_layer_latest", schema_hash)
+    pipeline.execute.assert_awaited_once()
+    assert semantic_layer_builder.semantic_layer_ready.is_set()
+
+
+@pytest.mark.asyncio
+async def test_get_semantic_layer_only_enriches_schema_changes(mock_execute_query, mock_redis):
+    previous_relationship_result = [
+        {
+            "nodes": relationship_result[0]["nodes"],
+            "relationships": relationship_result[0]["relationships"][:1],
+        }
+    ]
+    nodes, relationships = convert_schema(previous_relationship_result[0])
+    previous_layer = {
+        "prompts": create_prompts_fingerprint(),
+        "fingerprints": create_fingerprints(
+            nodes,
+            relationships,
+            clean_relationship_properties(relationship_properties_result),
+            filter_node_properties(node_properties_result),
+        ),
+        "semantic_layer": {
+            "nodes": [
+                {"label": "Fund", "detail": "A fund", "properties": [{"name": "name"}]},
+                {"label": "Company", "detail": "A company"},
+            ],
+            "relationships": [
+                {"cypher_representation": "[:CONTAINS]", "detail": "CONTAINS detail", "property": [{"name": "weight"}]},
+            ],
+        },
+    }
+    mock_redis.get.side_effect = lambda key: {
+        "semantic_layer_latest": "previous_hash",
+        "semantic_layer_previous_hash": json.dumps(previous_layer),
+    }.get(key)
+    llm = MagicMock()
+    llm.chat = AsyncMock(side_effect=mock_llm_response)
+
+    semantic_layer = await get_semantic_layer(llm, "model", "datastore")
+
+    llm.chat.assert_awaited_once()
+    assert "HAS_ESGSCORE" in llm.chat.call_args.args[2]
+    assert semantic_layer == {
+        "nodes": previous_layer["semantic_layer"]["nodes"],
+        "relationships": [
+            {"cypher_representation": "[:CONTAINS]", "detail": "CONTAINS detail", "property": [{"name": "weight"}]},
+            {"cypher_representation": "[:HAS_ESGSCORE]", "detail": "HAS_ESGSCORE detail"},
+        ],
+    }
+
+
+@pytest.mark.asyncio
+async def test_get_semantic_layer_loads_persisted_layer(mock_execute_query, mock_redis):
+    persisted_layer = {"nodes": [{"label": "Fund"}], "relationships": []}
+    mock_redis.get.return_value = json.dumps({"semantic_layer": persisted_layer})
+    llm = MagicMock()
+    llm.chat = AsyncMock()
+
+    semantic_layer = await get_semantic_layer(llm, "model", "datastore")
+
+    assert semantic_layer == persisted_layer
+    llm.chat.assert_not_called()
+    mock_redis.pipeline.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_get_semantic_layer_advertises_metric_views(mocker, mock_redis):
+    schema = [{"nodes": [{"name": "Fund"}, {"name": "Bloomberg_MetricRollup"}], "relationships": []}]
+    node_properties = [
+        {
+            "nodeProperties": [
+                {"label": "Fund", "properties": [{"name": "name", "data_type": "STRING"}]},
+                {"label": "Bloomberg_MetricRollup", "properties": [{"name": "average", "data_type": "Double"}]},
+            ]
+        }
+    ]
+    mocker.patch(
+        "src.utils.semantic_layer_builder.execute_query",
+        AsyncMock(side_effect=[schema, [{"relProperties": []}], node_properties]),
+    )
+    metric_views = [{"label": "Bloomberg_MetricRollup", "metric_names": ["ESG_score"]}]
+    mock_describe = mocker.patch(
+        "src.utils.semantic_layer_builder.describe_metric_views", AsyncMock(return_value=metric_views)
+    )
+    llm = MagicMock()
+    llm.chat = AsyncMock(side_effect=mock_llm_response)
+
+    semantic_layer = await get_semantic_layer(llm, "model", "datastore")
+
+    mock_describe.assert_awaited_once_with(["Bloomberg_MetricRollup"])
+    assert semantic_layer["metric_views"] == metric_views
+    assert "Bloomberg_MetricRollup" not in str(llm.chat.call_args_list)
+
+
+def test_schema_hash_changes_with_schema():
+    schema_hash = create_schema_hash(relationship_result, relationship_properties_result, node_properties_result)
+
+    assert schema_hash == create_schema_hash(
+        relationship_result, relationship_properties_result, node_properties_result
+    )
+    assert schema_hash != create_schema_hash(relationship_result, relationship_properties_result, [])
@@ -57,6 +57,23 @@ def test_csv_usage_recorder_record_activity(mocker):
         assert "30" in rows[1]
 
 
+def test_csv_usage_recorder_starts_new_log_when_headers_change(tmp_path):
+    recorder = CSVUsageRecorder()
+    recorder.csv_file_path = tmp_path / "llm_usage.csv"
+    recorder.csv_file_path.write_text(",".join(CSV_HEADERS[:-1]) + "\n2024-01-01,old-model,,,1,2,3,0.50\n")
+
+    recorder.record_activity(model="test-model", provider="test-provider", agent="agent-name", duration=1.5)
+    recorder.record_activity(model="test-model", provider="test-provider", agent="agent-name", duration=1.5)
+
+    with open(recorder.csv_file_path, newline="") as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == CSV_HEADERS
+    assert len(rows) == 3
+    assert all(len(row) == len(CSV_HEADERS) for row in rows)
+    [rotated_path] = tmp_path.glob("llm_usage_*.csv")
+    assert "old-model" in rotated_path.read_text()
+
+
 def test_csv_usage_recorder_uses_default_filename(mocker):
     """Test that CSVUsageRecorder uses the default filename when config is None"""
     # Mock Config to return None for filename
@@ -66,3 +83,33 @@ def test_csv_usage_recorder_uses_default_filename(mocker):
 
     # Check that the default filename is used
     assert recorder.csv_file_path.name == "llm_usage.csv"
+
+
+def test_record_cache_activity_counts_hits_and_savings_per_agent():
+    recorder = ConsoleUsageRecorder()
+
+    recorder.record_cache_activity("test-model", "test-provider", "router", True, {"total_tokens": 30}, 1.5)
+    recorder.record_cache_activity("test-model", "test-provider", "router", False, {"total_tokens": 30}, 1.5)
+    recorder.record_cache_activity("test-model", "test-provider", "intent", False)
+
+    router_stats = recorder.cache_stats["router"]
+    assert router_stats.hits == 1
+    assert router_stats.misses == 1
+    assert router_stats.saved_tokens == 30
+    assert router_stats.saved_duration == 1.5
+    assert router_stats.hit_ratio == 0.5
+    assert recorder.cache_stats["intent"].hit_ratio == 0.0
+
+
+def test_record_prompt_cache_activity_counts_cached_prompt_tokens_per_agent():
+    recorder = ConsoleUsageRecorder()
+
+    recorder.record_prompt_cache_activity("datastore", {"prompt_tokens": 2000, "cached_tokens": 1536})
+    recorder.record_prompt_cache_activity("datastore", {"prompt_tokens": 2000, "cached_tokens": "N/A"})
+    recorder.record_prompt_cache_activity("intent", "N/A")
+
+    datastore_stats = recorder.prompt_cache_stats["datastore"]
+    assert datastore_stats.prompt_tokens == 4000
+    assert datastore_stats.cached_tokens == 1536
+    assert datastore_stats.cached_ratio == 0.384
+    assert recorder.prompt_cache_stats["intent"].cached_ratio == 0.0
@@ -1,5 +1,5 @@
 import React, { useContext, useEffect, useState } from 'react';
-import { Message, MessageComponent } from './message';
+import { Message, MessageComponent, Role } from './message';
 import * as styles from './chat.module.css';
 import { Waiting } from './waiting';
 import {
@@ -38,6 +38,7 @@ export const Chat = ({
   const { lastMessage, send } = useContext(WebsocketContext);
   const [chart, setChart] = useState<string | undefined>(undefined);
   const [confirmation, setConfirmation] = useState<Confirmation | null>(null);
+  const [streamedAnswer, setStreamedAnswer] = useState<string | null>(null);
 
   useEffect(() => {
     if (lastMessage) {
@@ -54,6 +55,9 @@ export const Chat = ({
         case MessageType.REPORT_FAILED:
           setWaiting(false);
           break;
+        case MessageType.CHAT_ANSWER_STREAM:
+          setStreamedAnswer(lastMessage.data ?? null);
+          break;
         case MessageType.IMAGE: {
           const imageData = `data:image/png;base64,${lastMessage.data}`;
           setChart(imageData);
@@ -70,11 +74,17 @@ export const Chat = ({
     }
   }, [lastMessage, setWaiting]);
 
+  useEffect(() => {
+    if (!waiting) {
+      setStreamedAnswer(null);
+    }
+  }, [waiting]);
+
   useEffect(() => {
     if (containerRef.current) {
       containerRef.current.scrollTo(0, containerRef.current.scrollHeight);
     }
-  }, [messages.length]);
+  }, [messages.length, streamedAnswer]);
 
   return (
     <>
@@ -93,6 +103,17 @@ export const Chat = ({
           />
         ))}
         {chart && <img src={chart} alt="Generated chart" />}
+        {waiting && streamedAnswer && (
+          <MessageComponent
+            message={{
+              role: Role.Bot,
+              content: streamedAnswer,
+              time: new Date().toLocaleTimeString(),
+            }}
+            selectedMessage={selectedMessage}
+            selectMessage={selectMessage}
+          />
+        )}
         {waiting && <Waiting />}
       </div>
     </>
@@ -3,6 +3,7 @@ import { createContext } from 'react';
 export enum MessageType {
   PING = 'ping',
   CHAT = 'chat',
+  CHAT_ANSWER_STREAM = 'chat:answer-stream',
   IMAGE = 'image',
   CONFIRMATION = 'confirmation',
   REPORT_IN_PROGRESS = 'report:in-progress',